@@ -11,18 +11,34 @@ from .security import (
     get_current_user,
     authenticate_user,
 )
+from .io_executor import io_executor
 from .storage import (
     sanitize_path,
     get_user_storage_path,
     get_note_path,
     get_attachment_path,
     compute_hash,
+    get_blob_path,
+    store_blob,
+    link_blob,
+    collect_blobs,
     save_note,
     read_note,
     delete_note,
     save_attachment,
+    save_attachment_stream,
+    adopt_attachment_file,
+    link_attachment,
+    open_attachment,
+    save_staged_chunk,
+    staged_chunks_exist,
+    staged_chunk_sizes,
+    assemble_attachment,
+    ContentTooLargeError,
     read_attachment,
     delete_attachment,
+    move_note,
+    move_attachment,
     get_note_size,
     get_attachment_size,
 )
@@ -45,17 +61,33 @@ __all__ = [
     "get_current_user",
     "authenticate_user",
     # Storage
+    "io_executor",
     "sanitize_path",
     "get_user_storage_path",
     "get_note_path",
     "get_attachment_path",
     "compute_hash",
+    "get_blob_path",
+    "store_blob",
+    "link_blob",
+    "collect_blobs",
     "save_note",
     "read_note",
     "delete_note",
     "save_attachment",
+    "save_attachment_stream",
+    "adopt_attachment_file",
+    "link_attachment",
+    "open_attachment",
+    "save_staged_chunk",
+    "staged_chunks_exist",
+    "staged_chunk_sizes",
+    "assemble_attachment",
+    "ContentTooLargeError",
     "read_attachment",
     "delete_attachment",
+    "move_note",
+    "move_attachment",
     "get_note_size",
     "get_attachment_size",
 ]
@@ -0,0 +1,100 @@
+"""
+Découpage des pièces jointes en morceaux définis par le contenu (FastCDC).
+
+Les frontières de morceaux dépendent du contenu et non de la position : une
+modification locale (annotation d'un PDF, ré-export d'un canvas) ne change que
+les morceaux qui l'entourent. Client et serveur doivent découper à l'identique :
+
+- hachage « gear » : h = ((h << 1) + GEAR[octet]) mod 2^64, avec
+  GEAR[i] = les 8 premiers octets (little-endian) de sha256(bytes([i])) ;
+- pas de coupure avant MIN_CHUNK_SIZE, coupure forcée à MAX_CHUNK_SIZE ;
+- normalisation : masque MASK_S (18 bits de poids fort) avant AVG_CHUNK_SIZE,
+  MASK_L (14 bits) ensuite ; coupure après l'octet où (h & masque) == 0.
+
+Un morceau est identifié par le sha256 de son contenu.
+"""
+import hashlib
+from pathlib import Path
+from typing import List, NamedTuple
+
+MIN_CHUNK_SIZE = 16 * 1024
+AVG_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 256 * 1024
+
+_HASH_BITS = 64
+_HASH_MASK = (1 << _HASH_BITS) - 1
+MASK_S = ((1 << 18) - 1) << (_HASH_BITS - 18)
+MASK_L = ((1 << 14) - 1) << (_HASH_BITS - 14)
+
+GEAR = tuple(
+    int.from_bytes(hashlib.sha256(bytes([i])).digest()[:8], "little")
+    for i in range(256)
+)
+
+# Taille des lectures lors du découpage d'un fichier
+_READ_SIZE = 4 * MAX_CHUNK_SIZE
+
+
+class Chunk(NamedTuple):
+    """Morceau d'un fichier : position, longueur et hash sha256."""
+    offset: int
+    length: int
+    chunk_hash: str
+
+
+def cut_point(data: bytes, start: int, end: int) -> int:
+    """Position (absolue) de fin du morceau qui commence à start dans data[start:end]."""
+    remaining = end - start
+    if remaining <= MIN_CHUNK_SIZE:
+        return end
+    stop = start + min(remaining, MAX_CHUNK_SIZE)
+    normal = start + min(remaining, AVG_CHUNK_SIZE)
+
+    gear, hash_mask = GEAR, _HASH_MASK
+    h = 0
+    i = start + MIN_CHUNK_SIZE
+    while i < normal:
+        h = ((h << 1) + gear[data[i]]) & hash_mask
+        i += 1
+        if not h & MASK_S:
+            return i
+    while i < stop:
+        h = ((h << 1) + gear[data[i]]) & hash_mask
+        i += 1
+        if not h & MASK_L:
+            return i
+    return stop
+
+
+def chunk_bytes(data: bytes) -> List[Chunk]:
+    """Découpe un contenu en mémoire."""
+    chunks: List[Chunk] = []
+    pos = 0
+    while pos < len(data):
+        end = cut_point(data, pos, len(data))
+        chunks.append(Chunk(pos, end - pos, hashlib.sha256(data[pos:end]).hexdigest()))
+        pos = end
+    return chunks
+
+
+def chunk_file(path: Path) -> List[Chunk]:
+    """Découpe un fichier en le lisant par blocs (mémoire bornée). Bloquant."""
+    chunks: List[Chunk] = []
+    offset = 0
+    with open(path, "rb") as f:
+        buf = f.read(_READ_SIZE)
+        pos = 0
+        eof = not buf
+        while pos < len(buf):
+            # Toujours au moins MAX_CHUNK_SIZE d'avance, sauf en fin de fichier
+            if not eof and len(buf) - pos < MAX_CHUNK_SIZE:
+                more = f.read(_READ_SIZE)
+                eof = not more
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+            end = cut_point(buf, pos, len(buf))
+            chunks.append(Chunk(offset, end - pos, hashlib.sha256(buf[pos:end]).hexdigest()))
+            offset += end - pos
+            pos = end
+    return chunks
@@ -0,0 +1,199 @@
+"""
+Compression zstd des notes au repos (activée par NOTE_COMPRESSION=true).
+
+Les notes sont compressées avec un dictionnaire entraîné sur un échantillon des
+notes de l'utilisateur (frontmatter, modèles et callouts se répètent d'une note
+à l'autre). Les dictionnaires sont stockés globalement par identifiant
+(storage_path/dicts/<dict_id>) : l'identifiant est inscrit dans chaque trame
+zstd, ce qui permet de relire un blob partagé entre utilisateurs.
+
+Le hash d'une note reste celui du contenu brut (compute_hash) ; le blob
+compressé est rangé sous le hash de ses octets compressés. Une note
+compressée se reconnaît au nombre magique zstd, qui ne peut pas commencer
+un texte UTF-8 valide.
+"""
+import os
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+import zstandard
+
+from .config import settings
+from . import packs
+
+
+logger = logging.getLogger(__name__)
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+FRAME_HEADER_MAX_BYTES = 18
+DICTS_DIRNAME = "dicts"
+USER_DICT_FILENAME = "zstd_dict_id"
+
+# Entraînement des dictionnaires
+DICT_SIZE = 112 * 1024
+MIN_TRAINING_SAMPLES = 64
+MAX_TRAINING_SAMPLES = 2000
+MAX_TRAINING_BYTES = 16 * 1024 * 1024
+
+
+def compression_enabled() -> bool:
+    """La compression est-elle activée ?"""
+    return settings.note_compression
+
+
+def is_compressed(data: bytes) -> bool:
+    return data[:4] == ZSTD_MAGIC
+
+
+def get_dicts_root() -> Path:
+    return Path(settings.storage_path) / DICTS_DIRNAME
+
+
+def _user_dict_pointer(user_id: int) -> Path:
+    return Path(settings.storage_path) / str(user_id) / USER_DICT_FILENAME
+
+
+def get_user_dict_id(user_id: int) -> Optional[int]:
+    """Identifiant du dictionnaire de l'utilisateur, ou None s'il n'en a pas."""
+    try:
+        return int(_user_dict_pointer(user_id).read_text().strip())
+    except (OSError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=64)
+def _load_dictionary(dict_id: int):
+    data = (get_dicts_root() / str(dict_id)).read_bytes()
+    return zstandard.ZstdCompressionDict(data)
+
+
+def compress_note(user_id: int, content: bytes) -> bytes:
+    """
+    Compresse une note avec le dictionnaire de l'utilisateur (sans dictionnaire s'il
+    n'en a pas encore). Retourne le contenu brut si la compression ne gagne rien.
+    """
+    dict_data = None
+    dict_id = get_user_dict_id(user_id)
+    if dict_id is not None:
+        try:
+            dict_data = _load_dictionary(dict_id)
+        except OSError:
+            logger.warning(f"Dictionnaire zstd introuvable - user_id={user_id}, dict_id={dict_id}")
+
+    compressor = zstandard.ZstdCompressor(
+        level=settings.note_compression_level,
+        dict_data=dict_data,
+        write_content_size=True
+    )
+    compressed = compressor.compress(content)
+    return compressed if len(compressed) < len(content) else content
+
+
+def decompress(data: bytes) -> bytes:
+    """Décompresse un contenu stocké (retourné tel quel s'il n'est pas compressé)."""
+    if not is_compressed(data):
+        return data
+
+    dict_id = zstandard.get_frame_parameters(data).dict_id
+    dict_data = _load_dictionary(dict_id) if dict_id else None
+    return zstandard.ZstdDecompressor(dict_data=dict_data).decompress(data)
+
+
+def open_decompressed(f: BinaryIO, header: bytes) -> Tuple[BinaryIO, int]:
+    """
+    Lecteur décompressant au fil de la lecture une note compressée (f au début
+    de la trame, header = ses premiers octets), et taille du contenu décompressé.
+    Fermer le lecteur ferme f.
+    """
+    params = zstandard.get_frame_parameters(header)
+    if params.content_size < 0:
+        raise ValueError("Taille décompressée absente de la trame")
+    dict_data = _load_dictionary(params.dict_id) if params.dict_id else None
+    reader = zstandard.ZstdDecompressor(dict_data=dict_data).stream_reader(f)
+    return reader, params.content_size
+
+
+def decompressed_size(header: bytes) -> Optional[int]:
+    """Taille décompressée inscrite dans l'en-tête d'une trame, None si absente."""
+    if not is_compressed(header):
+        return None
+    size = zstandard.get_frame_parameters(header).content_size
+    return size if size >= 0 else None
+
+
+def _iter_stored_notes(user_id: int) -> Iterator[bytes]:
+    """Contenu stocké des notes de l'utilisateur : packs d'abord, puis fichiers."""
+    for _, data in packs.get_pack_store(user_id).iter_live():
+        yield data
+    notes_root = Path(settings.storage_path) / str(user_id) / "notes"
+    for dirpath, _, filenames in os.walk(notes_root):
+        for filename in filenames:
+            if filename.startswith("."):
+                continue
+            try:
+                yield (Path(dirpath) / filename).read_bytes()
+            except OSError:
+                continue
+
+
+def _training_samples(user_id: int) -> List[bytes]:
+    samples: List[bytes] = []
+    total = 0
+    for stored in _iter_stored_notes(user_id):
+        try:
+            data = decompress(stored)
+        except (OSError, zstandard.ZstdError):
+            continue
+        samples.append(data)
+        total += len(data)
+        if len(samples) >= MAX_TRAINING_SAMPLES or total >= MAX_TRAINING_BYTES:
+            break
+    return samples
+
+
+def _write_file_atomic(target: Path, data: bytes) -> None:
+    tmp = target.with_name(target.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, target)
+
+
+def train_user_dictionary(user_id: int) -> Optional[int]:
+    """
+    Entraîne un dictionnaire sur les notes de l'utilisateur et l'active pour les
+    prochaines écritures. Retourne son identifiant, ou None si l'échantillon est
+    insuffisant. Les notes déjà compressées restent lisibles (dictionnaire conservé).
+    """
+    samples = _training_samples(user_id)
+    if len(samples) < MIN_TRAINING_SAMPLES:
+        return None
+
+    try:
+        trained = zstandard.train_dictionary(DICT_SIZE, samples)
+    except zstandard.ZstdError as e:
+        logger.warning(f"Entraînement du dictionnaire zstd impossible - user_id={user_id}, error={str(e)}")
+        return None
+
+    dict_id = trained.dict_id()
+    dicts_root = get_dicts_root()
+    dicts_root.mkdir(parents=True, exist_ok=True)
+    _write_file_atomic(dicts_root / str(dict_id), trained.as_bytes())
+    _write_file_atomic(_user_dict_pointer(user_id), str(dict_id).encode("ascii"))
+    logger.info(f"Dictionnaire zstd entraîné - user_id={user_id}, dict_id={dict_id}, samples={len(samples)}")
+    return dict_id
+
+
+def train_missing_dictionaries() -> int:
+    """Entraîne un dictionnaire pour chaque utilisateur qui n'en a pas encore."""
+    if not compression_enabled():
+        return 0
+
+    trained = 0
+    for user_dir in Path(settings.storage_path).iterdir():
+        if not user_dir.name.isdigit():
+            continue
+        user_id = int(user_dir.name)
+        if get_user_dict_id(user_id) is None and train_user_dictionary(user_id) is not None:
+            trained += 1
+    return trained
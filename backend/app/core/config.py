@@ -15,11 +15,59 @@ class Settings(BaseSettings):
     # Storage
     storage_path: str = "./data/storage"
 
+    # Compression zstd des notes au repos
+    note_compression: bool = False
+    note_compression_level: int = 3
+
+    # Stockage des notes : "files" (un fichier par note) ou "packs" (petites
+    # notes regroupées dans des segments par utilisateur)
+    note_storage: str = "files"
+    pack_note_max_bytes: int = 16 * 1024
+    pack_segment_max_bytes: int = 32 * 1024 * 1024
+    pack_compaction_interval_seconds: int = 3600
+
+    # Uploads reprenables : durée de conservation d'un upload inachevé
+    upload_expiry_hours: int = 24
+
+    # Push de notes / d'attachments : corps JSON lu au fil de la réception, avec
+    # un budget par requête et par note (les attachments sont limités à 25 Mo)
+    push_request_max_bytes: int = 512 * 1024 * 1024
+    push_note_max_bytes: int = 16 * 1024 * 1024
+
+    # Notes volumineuses : au-delà du seuil, le pull renvoie la note sans contenu
+    # (stream=True) et elle transite en flux par GET/PUT /sync/notes/{path}
+    note_stream_threshold_bytes: int = 1024 * 1024
+    note_stream_max_bytes: int = 256 * 1024 * 1024
+
+    # Historique des notes (patchs au pull) : deltas inverses, instantané complet
+    # toutes les note_version_snapshot_interval versions, rétention par nombre et âge
+    note_versions_kept: int = 50
+    note_versions_max_age_days: int = 90
+    note_version_snapshot_interval: int = 10
+
+    # Calcul des patchs par lignes (pull par patch, historique) : au-delà de ce
+    # nombre de paires de lignes à comparer, la partie modifiée est remplacée en bloc
+    note_diff_max_line_pairs: int = 1_000_000
+
+    # Pool de threads dédié aux accès disque du stockage
+    io_executor_workers: int = 8
+
     # Server
     host: str = "0.0.0.0"
     port: int = 8000
     request_timeout_seconds: int = 30
 
+    # Sync incrémental : durée de rétention du journal des changements
+    journal_retention_days: int = 30
+
+    # Cache mémoire des manifestes serveur (par worker)
+    manifest_cache_users: int = 64
+    manifest_cache_max_entries: int = 500_000
+
+    # POST /sync/exchange : contenus échangés inline dans la requête de sync
+    inline_note_max_bytes: int = 64 * 1024
+    inline_response_max_bytes: int = 1024 * 1024
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
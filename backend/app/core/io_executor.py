@@ -0,0 +1,124 @@
+"""
+Exécuteur dédié aux accès disque du stockage.
+
+Chaque opération de stockage (vérification d'existence, mkdir, écriture, lien,
+stat, suppression...) est exécutée en un seul job dans un pool de threads
+dimensionné (IO_EXECUTOR_WORKERS) : un disque lent ne bloque plus la boucle
+asyncio, et la file d'attente reste mesurable.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, TypeVar
+
+from .config import settings
+
+
+T = TypeVar("T")
+
+
+class IOExecutor:
+    """
+    Pool de threads pour les accès disque, avec compteurs de file et de latence.
+    Le pool est créé au premier job (et recréé après shutdown).
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Les compteurs sont mis à jour depuis les threads du pool
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.errors = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+        self.run_seconds_max = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="storage-io"
+            )
+        return self._executor
+
+    def _job(self, submitted_at: float, fn: Callable[..., T], args: tuple) -> T:
+        started_at = time.perf_counter()
+        wait = started_at - submitted_at
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+        failed = False
+        try:
+            return fn(*args)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            duration = time.perf_counter() - started_at
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.errors += failed
+                self.run_seconds_total += duration
+                self.run_seconds_max = max(self.run_seconds_max, duration)
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Exécute fn(*args) dans le pool et attend son résultat."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.queued += 1
+        try:
+            future = loop.run_in_executor(
+                self._get_executor(), self._job, time.perf_counter(), fn, args
+            )
+        except BaseException:
+            with self._lock:
+                self.queued -= 1
+            raise
+        return await future
+
+    async def gather(self, aws: Iterable[Awaitable[T]], limit: Optional[int] = None) -> List[Any]:
+        """
+        Attend des opérations de stockage (coroutines passant par run) avec au
+        plus limit en cours (max_workers par défaut) : un gros lot ne remplit pas
+        la file au détriment des autres requêtes. Les résultats sont dans l'ordre ;
+        l'exception d'une opération est retournée à sa place.
+        """
+        semaphore = asyncio.Semaphore(limit or self.max_workers)
+
+        async def bounded(aw: Awaitable[T]) -> T:
+            async with semaphore:
+                return await aw
+
+        return await asyncio.gather(*(bounded(aw) for aw in aws), return_exceptions=True)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            completed = self.completed
+            return {
+                "max_workers": self.max_workers,
+                "queue_depth": self.queued,
+                "running": self.running,
+                "completed": completed,
+                "errors": self.errors,
+                "wait_ms_avg": round(1000 * self.wait_seconds_total / completed, 3) if completed else 0.0,
+                "wait_ms_max": round(1000 * self.wait_seconds_max, 3),
+                "run_ms_avg": round(1000 * self.run_seconds_total / completed, 3) if completed else 0.0,
+                "run_ms_max": round(1000 * self.run_seconds_max, 3),
+            }
+
+
+io_executor = IOExecutor(settings.io_executor_workers)
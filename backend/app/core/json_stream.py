@@ -0,0 +1,189 @@
+"""
+Lecture incrémentale des corps JSON de push ({"notes": [...]}, {"attachments": [...]}).
+
+Le corps n'est jamais chargé en entier : le flux est parcouru au fil de la
+réception et chaque élément du tableau demandé est rendu dès qu'il est complet,
+sous forme d'octets JSON à valider séparément. Seul l'élément en cours est gardé
+en mémoire ; la taille totale et la taille de chaque élément sont vérifiées au fil
+de l'eau (ContentTooLargeError dès le dépassement).
+
+Le parcours ne repère que la structure (chaînes, accolades, crochets) : les
+longues chaînes (contenu base64) sont sautées par recherche du guillemet suivant.
+Les éléments du tableau doivent être des objets.
+"""
+import re
+from typing import AsyncIterable, AsyncIterator
+
+from .storage import ContentTooLargeError
+
+
+# Prochain caractère de structure hors chaîne / prochaine fin ou échappement dans une chaîne
+_STRUCTURE = re.compile(rb'["{}\[\],:]')
+_STRING_SPECIAL = re.compile(rb'["\\]')
+_WHITESPACE = b" \t\r\n"
+
+# Longueur maximale d'une clé de premier niveau mémorisée
+_MAX_KEY_BYTES = 256
+
+
+class _ArrayItemSplitter:
+    """Automate de découpage : reçoit des blocs, produit les éléments complets."""
+
+    def __init__(self, key: str, max_item_bytes: int):
+        self.key = key.encode("utf-8")
+        self.max_item_bytes = max_item_bytes
+        self.buffer = bytearray()
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.started = False
+        self.finished = False
+        # Clé de premier niveau en cours de lecture / dernière clé lue
+        self.key_start = None
+        self.current_key = None
+        self.in_target = False
+        self.target_seen = False
+        # Début (dans buffer) de l'élément en cours, ou None
+        self.item_start = None
+
+    def feed(self, data: bytes, items: list):
+        """
+        Ajoute un bloc et complète items avec les éléments devenus complets. En cas
+        d'erreur, items contient déjà les éléments complets qui la précèdent.
+        """
+        self.buffer += data
+        buf = self.buffer
+        while self.pos < len(buf):
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                    self.pos += 1
+                    continue
+                match = _STRING_SPECIAL.search(buf, self.pos)
+                if match is None:
+                    self.pos = len(buf)
+                    break
+                self.pos = match.end()
+                if buf[match.start()] == 0x5C:  # antislash
+                    self.escape = True
+                else:
+                    self.in_string = False
+                    if self.key_start is not None:
+                        self.current_key = bytes(buf[self.key_start:match.start()])
+                        self.key_start = None
+                continue
+
+            match = _STRUCTURE.search(buf, self.pos)
+            self._check_scalars(buf, self.pos, match.start() if match else len(buf))
+            if match is None:
+                self.pos = len(buf)
+                break
+            char = buf[match.start()]
+            self.pos = match.end()
+
+            if char == 0x22:  # "
+                self.in_string = True
+                if self.depth == 1 and self.current_key is None:
+                    self.key_start = self.pos
+            elif char in b"{[":
+                if self.depth == 0:
+                    if char != 0x7B or self.started:
+                        raise ValueError("Un objet JSON est attendu")
+                    self.started = True
+                elif self.depth == 1 and char == 0x5B and self.current_key == self.key:
+                    self.in_target = True
+                    self.target_seen = True
+                elif self.depth == 2 and self.in_target:
+                    if char != 0x7B:
+                        raise ValueError("Les éléments du tableau doivent être des objets")
+                    self.item_start = match.start()
+                self.depth += 1
+            elif char in b"}]":
+                if self.depth == 0:
+                    raise ValueError("JSON invalide")
+                self.depth -= 1
+                if self.depth == 2 and self.in_target and self.item_start is not None:
+                    # Élément ouvert et fermé dans ce bloc : _compact ne le voit pas
+                    self._check_item_size()
+                    items.append(bytes(buf[self.item_start:self.pos]))
+                    self.item_start = None
+                elif self.depth == 1:
+                    self.in_target = False
+                    self.current_key = None
+                elif self.depth == 0:
+                    self.finished = True
+            elif char == 0x2C and self.depth == 1:  # ,
+                self.current_key = None
+
+        self._compact()
+
+    def _check_scalars(self, buf: bytearray, start: int, end: int) -> None:
+        """Hors chaîne, seuls des blancs et des littéraux sont permis ; rien après la fin."""
+        if start >= end:
+            return
+        segment = bytes(buf[start:end]).strip(_WHITESPACE)
+        if segment and (self.finished or not self.started or (self.depth == 2 and self.in_target)):
+            raise ValueError("JSON invalide")
+
+    def _check_item_size(self) -> None:
+        if self.pos - self.item_start > self.max_item_bytes:
+            raise ContentTooLargeError(f"Élément trop volumineux (max {self.max_item_bytes} octets)")
+
+    def _compact(self) -> None:
+        """Oublie les octets déjà parcourus qui n'appartiennent à aucun élément."""
+        keep_from = self.pos
+        if self.item_start is not None:
+            keep_from = self.item_start
+        elif self.key_start is not None:
+            keep_from = self.key_start
+            if self.pos - self.key_start > _MAX_KEY_BYTES:
+                # Clé trop longue : ce n'est pas celle recherchée
+                keep_from = self.pos
+                self.key_start = None
+                self.current_key = b""
+        if self.item_start is not None:
+            self._check_item_size()
+        if keep_from:
+            del self.buffer[:keep_from]
+            self.pos -= keep_from
+            if self.item_start is not None:
+                self.item_start -= keep_from
+            if self.key_start is not None:
+                self.key_start -= keep_from
+
+    def close(self) -> None:
+        if not self.finished or self.in_string:
+            raise ValueError("JSON incomplet")
+        if not self.target_seen:
+            raise ValueError(f"Champ \"{self.key.decode('utf-8')}\" manquant")
+
+
+async def iter_json_array_items(
+    chunks: AsyncIterable[bytes],
+    key: str,
+    max_item_bytes: int,
+    max_total_bytes: int
+) -> AsyncIterator[bytes]:
+    """
+    Parcourt un objet JSON reçu par blocs et rend, un par un, les éléments
+    (octets JSON d'un objet) du tableau associé à la clé de premier niveau key.
+
+    Raises:
+        ContentTooLargeError: Si le corps dépasse max_total_bytes ou un élément max_item_bytes
+        ValueError: Si le JSON est invalide ou si la clé est absente
+    """
+    splitter = _ArrayItemSplitter(key, max_item_bytes)
+    total = 0
+    async for chunk in chunks:
+        total += len(chunk)
+        if total > max_total_bytes:
+            raise ContentTooLargeError(f"Requête trop volumineuse (max {max_total_bytes} octets)")
+        items = []
+        try:
+            splitter.feed(chunk, items)
+        finally:
+            # Les éléments complets avant une erreur sont rendus avant qu'elle ne remonte
+            for item in items:
+                yield item
+    splitter.close()
@@ -0,0 +1,317 @@
+"""
+Stockage des petites notes en fichiers segments (NOTE_STORAGE=packs).
+
+Au lieu d'un fichier par note, les petites notes d'un utilisateur sont ajoutées
+à la fin de segments (storage_path/<user>/packs/<n>.pack). Chaque enregistrement
+porte son chemin, ce qui permet de reconstruire l'index (chemin -> position)
+en relisant les segments séquentiellement au premier accès.
+
+Format d'un enregistrement : en-tête RECORD_HEADER (magic, type, longueur du
+chemin, longueur des données, taille du contenu brut, CRC32), puis le chemin
+UTF-8 et les données stockées (éventuellement compressées, voir compression.py).
+Un enregistrement TOMBSTONE supprime le chemin. Les enregistrements remplacés
+sont récupérés par compact(), qui réécrit les notes vivantes des segments peu
+remplis.
+
+L'index est en mémoire : un seul processus doit écrire dans les packs
+(déploiement par défaut : un worker uvicorn). Toutes les méthodes sont
+bloquantes et doivent être appelées depuis l'exécuteur d'I/O.
+"""
+import os
+import struct
+import zlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+
+from .config import settings
+
+
+logger = logging.getLogger(__name__)
+
+PACKS_DIRNAME = "packs"
+SEGMENT_SUFFIX = ".pack"
+
+RECORD_MAGIC = b"SOPK"
+RECORD_PUT = 0
+RECORD_TOMBSTONE = 1
+# magic, type, longueur du chemin, longueur des données, taille brute, crc32(chemin + données)
+RECORD_HEADER = struct.Struct("<4sBHIII")
+
+# Un segment scellé est compacté quand moins de la moitié de ses octets est vivante
+COMPACTION_LIVE_RATIO = 0.5
+
+
+class PackEntry(NamedTuple):
+    """Position des données d'une note dans un segment."""
+    segment: int
+    offset: int
+    length: int
+    size: int  # Taille du contenu décompressé
+
+
+class _Segment:
+    __slots__ = ("total_bytes", "live_bytes")
+
+    def __init__(self):
+        self.total_bytes = 0
+        self.live_bytes = 0
+
+
+def _record_length(path_bytes: bytes, length: int) -> int:
+    return RECORD_HEADER.size + len(path_bytes) + length
+
+
+class PackStore:
+    """Segments et index des petites notes d'un utilisateur."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._lock = threading.Lock()
+        self._index: Dict[str, PackEntry] = {}
+        self._segments: Dict[int, _Segment] = {}
+        self._loaded = False
+
+    # ---- Chargement ----
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.root / f"{segment:08d}{SEGMENT_SUFFIX}"
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        if self.root.is_dir():
+            numbers = sorted(
+                int(p.name[:-len(SEGMENT_SUFFIX)])
+                for p in self.root.iterdir()
+                if p.name.endswith(SEGMENT_SUFFIX) and p.name[:-len(SEGMENT_SUFFIX)].isdigit()
+            )
+            for segment in numbers:
+                self._scan_segment(segment)
+        self._loaded = True
+
+    def _scan_segment(self, segment: int) -> None:
+        """Rejoue un segment dans l'index ; une fin tronquée (crash en écriture) est coupée."""
+        seg_path = self._segment_path(segment)
+        info = self._segments[segment] = _Segment()
+        offset = 0
+        with open(seg_path, "rb") as f:
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if not header:
+                    break
+                if len(header) < RECORD_HEADER.size:
+                    self._truncate(seg_path, offset)
+                    break
+                magic, kind, path_len, length, size, crc = RECORD_HEADER.unpack(header)
+                body = f.read(path_len + length)
+                if magic != RECORD_MAGIC or len(body) < path_len + length or zlib.crc32(body) != crc:
+                    self._truncate(seg_path, offset)
+                    break
+
+                path = body[:path_len].decode("utf-8")
+                record_len = RECORD_HEADER.size + path_len + length
+                self._forget(path)
+                if kind == RECORD_PUT:
+                    self._index[path] = PackEntry(segment, offset + RECORD_HEADER.size + path_len, length, size)
+                    info.live_bytes += record_len
+                info.total_bytes += record_len
+                offset += record_len
+
+    @staticmethod
+    def _truncate(seg_path: Path, offset: int) -> None:
+        logger.warning(f"Segment tronqué (enregistrement incomplet) - path={seg_path}, offset={offset}")
+        with open(seg_path, "r+b") as f:
+            f.truncate(offset)
+
+    # ---- Écriture ----
+
+    def _forget(self, path: str) -> None:
+        """Retire un chemin de l'index ; son enregistrement devient récupérable."""
+        entry = self._index.pop(path, None)
+        if entry is not None:
+            path_bytes = path.encode("utf-8")
+            self._segments[entry.segment].live_bytes -= _record_length(path_bytes, entry.length)
+
+    def _active_segment(self, incoming: int) -> int:
+        if self._segments:
+            segment = max(self._segments)
+            if self._segments[segment].total_bytes + incoming <= settings.pack_segment_max_bytes:
+                return segment
+            segment += 1
+        else:
+            segment = 1
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._segments[segment] = _Segment()
+        return segment
+
+    def _append(self, kind: int, path: str, data: bytes, size: int) -> None:
+        path_bytes = path.encode("utf-8")
+        body = path_bytes + data
+        record = RECORD_HEADER.pack(
+            RECORD_MAGIC, kind, len(path_bytes), len(data), size, zlib.crc32(body)
+        ) + body
+        segment = self._active_segment(len(record))
+        info = self._segments[segment]
+        offset = info.total_bytes
+
+        with open(self._segment_path(segment), "ab") as f:
+            f.write(record)
+        info.total_bytes += len(record)
+
+        self._forget(path)
+        if kind == RECORD_PUT:
+            self._index[path] = PackEntry(segment, offset + RECORD_HEADER.size + len(path_bytes), len(data), size)
+            info.live_bytes += len(record)
+
+    def put(self, path: str, data: bytes, size: int) -> None:
+        """Enregistre les données stockées d'une note (size : taille du contenu brut)."""
+        with self._lock:
+            self._load()
+            self._append(RECORD_PUT, path, data, size)
+
+    def delete(self, path: str) -> bool:
+        """Supprime une note du pack. Retourne False si elle n'y est pas."""
+        with self._lock:
+            self._load()
+            if path not in self._index:
+                return False
+            self._append(RECORD_TOMBSTONE, path, b"", 0)
+            return True
+
+    def move(self, from_path: str, to_path: str) -> bool:
+        """Déplace une note à l'intérieur du pack. Retourne False si elle n'y est pas."""
+        with self._lock:
+            self._load()
+            entry = self._index.get(from_path)
+            if entry is None:
+                return False
+            data = self._read_entry(entry)
+            self._append(RECORD_PUT, to_path, data, entry.size)
+            self._append(RECORD_TOMBSTONE, from_path, b"", 0)
+            return True
+
+    # ---- Lecture ----
+
+    def _read_entry(self, entry: PackEntry) -> bytes:
+        with open(self._segment_path(entry.segment), "rb") as f:
+            f.seek(entry.offset)
+            return f.read(entry.length)
+
+    def lookup(self, path: str) -> Optional[PackEntry]:
+        with self._lock:
+            self._load()
+            return self._index.get(path)
+
+    def get(self, path: str) -> Optional[bytes]:
+        """Retourne les données stockées d'une note, ou None si elle n'est pas dans le pack."""
+        with self._lock:
+            self._load()
+            entry = self._index.get(path)
+            return self._read_entry(entry) if entry is not None else None
+
+    def iter_live(self) -> Iterator[Tuple[str, bytes]]:
+        """Parcourt les notes vivantes dans l'ordre des segments (lecture séquentielle)."""
+        with self._lock:
+            self._load()
+            entries = sorted(self._index.items(), key=lambda item: (item[1].segment, item[1].offset))
+        for path, entry in entries:
+            try:
+                yield path, self._read_entry(entry)
+            except OSError:
+                continue
+
+    # ---- Compaction ----
+
+    def compact(self) -> int:
+        """
+        Réécrit les notes vivantes des segments scellés peu remplis dans le segment
+        actif, puis supprime ces segments. Retourne le nombre d'octets récupérés.
+        """
+        with self._lock:
+            self._load()
+            if len(self._segments) < 2:
+                return 0
+            active = max(self._segments)
+            candidates = [
+                segment for segment, info in sorted(self._segments.items())
+                if segment != active and info.live_bytes < info.total_bytes * COMPACTION_LIVE_RATIO
+            ]
+            reclaimed = 0
+            for segment in candidates:
+                reclaimed += self._compact_segment(segment)
+            return reclaimed
+
+    def _compact_segment(self, segment: int) -> int:
+        seg_path = self._segment_path(segment)
+        with open(seg_path, "rb") as f:
+            content = f.read()
+        has_older = any(other < segment for other in self._segments)
+
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(content):
+            _, kind, path_len, length, _, _ = RECORD_HEADER.unpack_from(content, offset)
+            body_start = offset + RECORD_HEADER.size
+            path = content[body_start:body_start + path_len].decode("utf-8")
+            data_start = body_start + path_len
+            entry = self._index.get(path)
+            if kind == RECORD_PUT and entry is not None and (entry.segment, entry.offset) == (segment, data_start):
+                self._append(RECORD_PUT, path, content[data_start:data_start + length], entry.size)
+            elif kind == RECORD_TOMBSTONE and entry is None and has_older:
+                # La suppression peut masquer une version plus ancienne d'un autre segment
+                self._append(RECORD_TOMBSTONE, path, b"", 0)
+            offset = data_start + length
+
+        info = self._segments.pop(segment)
+        os.remove(seg_path)
+        return info.total_bytes - info.live_bytes
+
+
+_stores: Dict[int, PackStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_packs_root(user_id: int) -> Path:
+    return Path(settings.storage_path) / str(user_id) / PACKS_DIRNAME
+
+
+def get_pack_store(user_id: int) -> PackStore:
+    """Retourne le pack d'un utilisateur (index chargé au premier accès)."""
+    with _stores_lock:
+        store = _stores.get(user_id)
+        if store is None or store.root != get_packs_root(user_id):
+            store = _stores[user_id] = PackStore(get_packs_root(user_id))
+        return store
+
+
+def packs_enabled() -> bool:
+    return settings.note_storage == "packs"
+
+
+def should_pack(stored_size: int) -> bool:
+    """Une note de cette taille (une fois stockée) va-t-elle dans un pack ?"""
+    return packs_enabled() and stored_size <= settings.pack_note_max_bytes
+
+
+def compact_all_packs() -> int:
+    """Compacte les packs de tous les utilisateurs. Retourne le nombre d'octets récupérés."""
+    root = Path(settings.storage_path)
+    if not root.is_dir():
+        return 0
+    reclaimed = 0
+    for user_dir in root.iterdir():
+        if user_dir.name.isdigit() and (user_dir / PACKS_DIRNAME).is_dir():
+            try:
+                reclaimed += get_pack_store(int(user_dir.name)).compact()
+            except OSError as e:
+                logger.warning(f"Compaction des packs impossible - user_id={user_dir.name}, error={str(e)}")
+    if reclaimed:
+        logger.info(f"Packs compactés - {reclaimed} octets récupérés")
+    return reclaimed
+
+
+def reset_pack_stores() -> None:
+    """Oublie les index chargés (ils seront relus depuis les segments)."""
+    with _stores_lock:
+        _stores.clear()
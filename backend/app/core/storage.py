@@ -1,9 +1,37 @@
+import io
 import os
+import re
+import codecs
+import shutil
 import hashlib
-import aiofiles
+import logging
+import tempfile
+import time
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterable, AsyncIterator, BinaryIO, Callable, List, Optional, Set, Tuple, Union
 from .config import settings
+from . import compression, packs
+from .io_executor import io_executor
+
+
+logger = logging.getLogger(__name__)
+
+# Stockage adressé par contenu : storage_path/blobs/ab/<sha256>.
+# Les fichiers par chemin (notes/, attachments/) sont des liens physiques vers
+# ces blobs : un contenu identique n'occupe l'espace disque qu'une fois, quel
+# que soit le nombre de chemins ou d'utilisateurs qui le référencent.
+BLOBS_DIRNAME = "blobs"
+# Morceaux d'attachments reçus en attente d'assemblage : storage_path/<user>/chunks/<sha256>
+CHUNKS_DIRNAME = "chunks"
+TEMP_PREFIX = ".tmp-"
+_HASH_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+# Taille du tampon d'écriture des uploads en streaming
+STREAM_BUFFER_SIZE = 256 * 1024
+
+
+class ContentTooLargeError(Exception):
+    """Contenu reçu au-delà de la taille maximale autorisée."""
 
 
 def sanitize_path(path: str) -> str:
@@ -48,10 +76,11 @@ def sanitize_path(path: str) -> str:
 
 
 def get_user_storage_path(user_id: int) -> Path:
-    """Retourne le chemin de stockage pour un utilisateur."""
-    path = Path(settings.storage_path) / str(user_id)
-    path.mkdir(parents=True, exist_ok=True)
-    return path
+    """
+    Retourne le chemin de stockage pour un utilisateur.
+    Aucun accès disque : les dossiers sont créés par les écritures.
+    """
+    return Path(settings.storage_path) / str(user_id)
 
 
 def get_note_path(user_id: int, note_path: str) -> Path:
@@ -73,92 +102,723 @@ def compute_hash(content: bytes) -> str:
     return hashlib.sha256(content).hexdigest()
 
 
-async def save_note(user_id: int, path: str, content: str) -> str:
-    """Sauvegarde une note et retourne son hash."""
-    note_path = get_note_path(user_id, path)
-    note_path.parent.mkdir(parents=True, exist_ok=True)
+def get_blobs_root() -> Path:
+    """Retourne le dossier racine des blobs."""
+    return Path(settings.storage_path) / BLOBS_DIRNAME
+
+
+def get_blob_path(content_hash: str) -> Path:
+    """Retourne le chemin du blob d'un contenu (sha256 hexadécimal)."""
+    if not _HASH_PATTERN.fullmatch(content_hash):
+        raise ValueError("Hash de contenu invalide")
+    return get_blobs_root() / content_hash[:2] / content_hash
+
+
+def _write_atomic(target: Path, content: bytes) -> None:
+    """Écrit un fichier via un fichier temporaire renommé : jamais de fichier partiel."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=target.parent, prefix=TEMP_PREFIX)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_name, target)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+
+def _store_blob(content: bytes, content_hash: str) -> Path:
+    blob_path = get_blob_path(content_hash)
+    if not blob_path.exists():
+        _write_atomic(blob_path, content)
+    return blob_path
+
+
+async def store_blob(content: bytes, content_hash: Optional[str] = None) -> Path:
+    """Enregistre un contenu dans le stockage par contenu (sans effet s'il existe déjà)."""
+    return await io_executor.run(_store_blob, content, content_hash or compute_hash(content))
+
+
+def link_blob(blob_path: Path, target: Path) -> None:
+    """
+    Fait pointer un chemin vers un blob (lien physique, remplacement atomique).
+    Le fichier n'est jamais modifié en place : cela modifierait le blob partagé.
+    Bloquant : à appeler depuis un job de l'exécuteur d'I/O.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=target.parent, prefix=TEMP_PREFIX)
+    os.close(fd)
+    os.remove(tmp_name)
+    try:
+        try:
+            os.link(blob_path, tmp_name)
+        except OSError:
+            # Système de fichiers sans liens physiques : copie
+            shutil.copyfile(blob_path, tmp_name)
+        os.replace(tmp_name, target)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+
+# Opérations bloquantes : chacune est exécutée en un seul job de l'exécuteur d'I/O,
+# qui regroupe tous ses appels système (existence, mkdir, écriture, lien...).
+
+def _save_file(target: Path, content: bytes, blob_hash: str) -> None:
+    link_blob(_store_blob(content, blob_hash), target)
+
+
+def _read_file(target: Path) -> Optional[bytes]:
+    try:
+        with open(target, "rb") as f:
+            return f.read()
+    except (FileNotFoundError, IsADirectoryError):
+        return None
+
+
+def _delete_file(target: Path) -> bool:
+    try:
+        os.remove(target)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _move_file(source: Path, target: Path) -> bool:
+    if not source.exists():
+        return False
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(source, target)
+    return True
+
+
+def _file_size(target: Path) -> Optional[int]:
+    try:
+        return target.stat().st_size
+    except OSError:
+        return None
+
+
+def _note_file_size(note_path: Path) -> Optional[int]:
+    try:
+        with open(note_path, "rb") as f:
+            size = compression.decompressed_size(f.read(compression.FRAME_HEADER_MAX_BYTES))
+            return size if size is not None else os.fstat(f.fileno()).st_size
+    except OSError:
+        return None
 
+
+# Notes : les petites notes peuvent être rangées dans les packs de l'utilisateur
+# (NOTE_STORAGE=packs, voir packs.py) ; les autres restent des fichiers liés à un blob.
+# Une note n'existe jamais aux deux endroits.
+
+def _save_note_file(user_id: int, key: str, note_path: Path, content: str) -> str:
     content_bytes = content.encode("utf-8")
     content_hash = compute_hash(content_bytes)
 
-    async with aiofiles.open(note_path, "w", encoding="utf-8") as f:
-        await f.write(content)
-
+    # Le hash de la note reste celui du contenu brut ; un blob compressé est
+    # rangé sous le hash de ses propres octets (jamais lié comme contenu brut)
+    stored_bytes, blob_hash = content_bytes, content_hash
+    if compression.compression_enabled():
+        compressed = compression.compress_note(user_id, content_bytes)
+        if compressed is not content_bytes:
+            stored_bytes, blob_hash = compressed, compute_hash(compressed)
+
+    pack = packs.get_pack_store(user_id)
+    if packs.should_pack(len(stored_bytes)):
+        pack.put(key, stored_bytes, len(content_bytes))
+        _delete_file(note_path)
+    else:
+        _save_file(note_path, stored_bytes, blob_hash)
+        pack.delete(key)
     return content_hash
 
 
-async def read_note(user_id: int, path: str) -> Optional[str]:
-    """Lit le contenu d'une note."""
+def _read_note_file(user_id: int, key: str, note_path: Path, max_bytes: Optional[int] = None) -> Optional[str]:
+    data = packs.get_pack_store(user_id).get(key)
+    if data is None:
+        if max_bytes is not None:
+            size = _note_file_size(note_path)
+            if size is not None and size > max_bytes:
+                raise ContentTooLargeError(f"Note trop volumineuse ({size} octets, max {max_bytes})")
+        data = _read_file(note_path)
+    if data is None:
+        return None
+    return compression.decompress(data).decode("utf-8")
+
+
+def _delete_note_file(user_id: int, key: str, note_path: Path) -> bool:
+    in_pack = packs.get_pack_store(user_id).delete(key)
+    return _delete_file(note_path) or in_pack
+
+
+def _move_note_file(user_id: int, from_key: str, to_key: str, source: Path, target: Path) -> bool:
+    pack = packs.get_pack_store(user_id)
+    if pack.move(from_key, to_key):
+        _delete_file(target)
+        return True
+    if _move_file(source, target):
+        pack.delete(to_key)
+        return True
+    return False
+
+
+def _note_size(user_id: int, key: str, note_path: Path) -> Optional[int]:
+    entry = packs.get_pack_store(user_id).lookup(key)
+    if entry is not None:
+        return entry.size
+    return _note_file_size(note_path)
+
+
+async def save_note(user_id: int, path: str, content: str) -> str:
+    """Sauvegarde une note et retourne son hash."""
     note_path = get_note_path(user_id, path)
+    return await io_executor.run(_save_note_file, user_id, sanitize_path(path), note_path, content)
+
 
-    if not note_path.exists():
+async def read_note(user_id: int, path: str, max_bytes: Optional[int] = None) -> Optional[str]:
+    """
+    Lit le contenu d'une note (décompressé si elle est stockée compressée).
+
+    Raises:
+        ContentTooLargeError: Si max_bytes est fourni et que la note le dépasse
+                              (vérifié avant la lecture)
+    """
+    note_path = get_note_path(user_id, path)
+    return await io_executor.run(_read_note_file, user_id, sanitize_path(path), note_path, max_bytes)
+
+
+def _open_note_file(user_id: int, key: str, note_path: Path) -> Optional[Tuple[BinaryIO, int]]:
+    data = packs.get_pack_store(user_id).get(key)
+    if data is not None:
+        # Note rangée dans un pack : petite par construction
+        content = compression.decompress(data)
+        return io.BytesIO(content), len(content)
+    opened = _open_file(note_path)
+    if opened is None:
         return None
+    f, size = opened
+    header = f.read(compression.FRAME_HEADER_MAX_BYTES)
+    f.seek(0)
+    if compression.is_compressed(header):
+        try:
+            return compression.open_decompressed(f, header)
+        except BaseException:
+            f.close()
+            raise
+    return f, size
+
+
+async def open_note(user_id: int, path: str) -> Optional[Tuple[BinaryIO, int]]:
+    """
+    Ouvre une note pour la lire par blocs (via l'exécuteur d'I/O), décompressée au
+    fil de la lecture si elle est stockée compressée. Retourne (fichier, taille du
+    contenu), ou None si elle n'existe pas. L'appelant ferme le fichier.
+
+    Raises:
+        ValueError: Si le chemin est invalide
+    """
+    note_path = get_note_path(user_id, path)
+    return await io_executor.run(_open_note_file, user_id, sanitize_path(path), note_path)
+
+
+async def iter_file_blocks(f: BinaryIO, size: int) -> AsyncIterator[bytes]:
+    """Lit size octets d'un fichier ouvert par blocs de STREAM_BUFFER_SIZE, puis le ferme."""
+    try:
+        remaining = size
+        while remaining > 0:
+            block = await io_executor.run(f.read, min(STREAM_BUFFER_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+    finally:
+        await io_executor.run(f.close)
+
+
+def _preserve_note_version(user_id: int, key: str, note_path: Path, content_hash: str) -> bool:
+    blob_path = get_blob_path(content_hash)
+    if blob_path.exists():
+        return True
+    content = _read_note_file(user_id, key, note_path)
+    if content is None:
+        return False
+    content_bytes = content.encode("utf-8")
+    if compute_hash(content_bytes) != content_hash:
+        return False
+    _write_atomic(blob_path, content_bytes)
+    return True
+
+
+async def preserve_note_version(user_id: int, path: str, content_hash: str) -> bool:
+    """
+    Conserve le contenu actuel d'une note (avant remplacement) comme blob brut de
+    hash content_hash. Sans copie si la note est déjà stockée brute. Retourne False
+    si la note est introuvable ou si son contenu n'a pas ce hash.
+    """
+    note_path = get_note_path(user_id, path)
+    return await io_executor.run(_preserve_note_version, user_id, sanitize_path(path), note_path, content_hash)
 
-    async with aiofiles.open(note_path, "r", encoding="utf-8") as f:
-        return await f.read()
+
+async def read_blob_text(content_hash: str) -> Optional[str]:
+    """Lit un blob brut contenant du texte UTF-8, ou None s'il n'existe pas."""
+    data = await io_executor.run(_read_file, get_blob_path(content_hash))
+    return data.decode("utf-8") if data is not None else None
 
 
 async def delete_note(user_id: int, path: str) -> bool:
     """Supprime une note."""
     note_path = get_note_path(user_id, path)
-
-    if note_path.exists():
-        os.remove(note_path)
-        return True
-    return False
+    return await io_executor.run(_delete_note_file, user_id, sanitize_path(path), note_path)
 
 
 async def save_attachment(user_id: int, path: str, content: bytes) -> str:
     """Sauvegarde une pièce jointe et retourne son hash."""
     attachment_path = get_attachment_path(user_id, path)
-    attachment_path.parent.mkdir(parents=True, exist_ok=True)
 
     content_hash = compute_hash(content)
-
-    async with aiofiles.open(attachment_path, "wb") as f:
-        await f.write(content)
+    await io_executor.run(_save_file, attachment_path, content, content_hash)
 
     return content_hash
 
 
-async def read_attachment(user_id: int, path: str) -> Optional[bytes]:
-    """Lit le contenu d'une pièce jointe."""
+def _link_existing_blob(content_hash: str, target: Path) -> Optional[int]:
+    blob_path = get_blob_path(content_hash)
+    size = _file_size(blob_path)
+    if size is not None:
+        link_blob(blob_path, target)
+    return size
+
+
+async def link_attachment(user_id: int, path: str, content_hash: str) -> Optional[int]:
+    """
+    Fait pointer une pièce jointe vers un blob déjà stocké, sans transfert de contenu.
+    Retourne la taille du blob, ou None s'il n'existe pas.
+
+    Raises:
+        ValueError: Si le chemin ou le hash est invalide
+    """
+    attachment_path = get_attachment_path(user_id, path)
+    return await io_executor.run(_link_existing_blob, content_hash, attachment_path)
+
+
+def _open_temp_blob() -> BinaryIO:
+    """Fichier temporaire dans le stockage par contenu (même système de fichiers que les blobs)."""
+    root = get_blobs_root()
+    root.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=root, prefix=TEMP_PREFIX)
+    os.close(fd)
+    # Ouvert par son nom : f.name sert ensuite au renommage
+    return open(tmp_name, "wb")
+
+
+def _discard_temp_blob(f: BinaryIO) -> None:
+    f.close()
+    if os.path.exists(f.name):
+        os.remove(f.name)
+
+
+def _adopt_blob_file(source: str, content_hash: str, target: Path) -> None:
+    """
+    Range un fichier complet sous son hash (il est supprimé si le blob existe déjà)
+    et y lie target. source doit être sur le même système de fichiers que les blobs.
+    """
+    blob_path = get_blob_path(content_hash)
+    if blob_path.exists():
+        os.remove(source)
+    else:
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source, blob_path)
+    link_blob(blob_path, target)
+
+
+def _commit_temp_blob(f: BinaryIO, content_hash: str, target: Path) -> None:
+    f.close()
+    _adopt_blob_file(f.name, content_hash, target)
+
+
+def _hash_file(source: Path) -> Tuple[str, int]:
+    hasher = hashlib.sha256()
+    size = 0
+    with open(source, "rb") as f:
+        while chunk := f.read(STREAM_BUFFER_SIZE):
+            hasher.update(chunk)
+            size += len(chunk)
+    return hasher.hexdigest(), size
+
+
+async def _save_stream(
+    chunks: AsyncIterable[bytes],
+    max_size: int,
+    expected_hash: Optional[str],
+    commit: Callable[[BinaryIO, str], None],
+    text: bool = False
+) -> Tuple[str, int]:
+    """
+    Écrit un contenu reçu par morceaux dans un blob temporaire en calculant son
+    hash (et en validant l'UTF-8 si text), puis appelle commit(fichier, hash)
+    dans l'exécuteur d'I/O. Le blob temporaire est supprimé en cas d'échec.
+    """
+    f = await io_executor.run(_open_temp_blob)
+    try:
+        hasher = hashlib.sha256()
+        decoder = codecs.getincrementaldecoder("utf-8")() if text else None
+        size = 0
+        buffer = bytearray()
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_size:
+                raise ContentTooLargeError(f"Contenu trop volumineux (max {max_size} octets)")
+            hasher.update(chunk)
+            if decoder is not None:
+                _check_utf8(decoder, chunk)
+            buffer += chunk
+            if len(buffer) >= STREAM_BUFFER_SIZE:
+                await io_executor.run(f.write, buffer)
+                buffer.clear()
+        if buffer:
+            await io_executor.run(f.write, buffer)
+        if decoder is not None:
+            _check_utf8(decoder, b"", final=True)
+
+        content_hash = hasher.hexdigest()
+        if expected_hash is not None and expected_hash != content_hash:
+            raise ValueError("Le hash du contenu reçu ne correspond pas au hash annoncé")
+        await io_executor.run(commit, f, content_hash)
+    except BaseException:
+        await io_executor.run(_discard_temp_blob, f)
+        raise
+
+    return content_hash, size
+
+
+def _check_utf8(decoder: codecs.IncrementalDecoder, data: bytes, final: bool = False) -> None:
+    try:
+        decoder.decode(data, final)
+    except UnicodeDecodeError:
+        raise ValueError("Le contenu de la note n'est pas de l'UTF-8 valide")
+
+
+async def save_attachment_stream(
+    user_id: int,
+    path: str,
+    chunks: AsyncIterable[bytes],
+    max_size: int,
+    expected_hash: Optional[str] = None
+) -> Tuple[str, int]:
+    """
+    Sauvegarde une pièce jointe reçue par morceaux et retourne (hash, taille).
+    Le hash est calculé au fil de l'écriture dans un fichier temporaire, renommé
+    atomiquement une fois complet : la mémoire utilisée reste celle d'un tampon.
+
+    Raises:
+        ContentTooLargeError: Si le contenu dépasse max_size (détecté dès réception)
+        ValueError: Si le chemin est invalide ou si le hash diffère de expected_hash
+    """
     attachment_path = get_attachment_path(user_id, path)
+    return await _save_stream(
+        chunks, max_size, expected_hash,
+        lambda f, content_hash: _commit_temp_blob(f, content_hash, attachment_path)
+    )
+
+
+def _commit_note_blob(user_id: int, key: str, note_path: Path, f: BinaryIO, content_hash: str) -> None:
+    _commit_temp_blob(f, content_hash, note_path)
+    packs.get_pack_store(user_id).delete(key)
+
+
+async def save_note_stream(
+    user_id: int,
+    path: str,
+    chunks: AsyncIterable[bytes],
+    max_size: int,
+    expected_hash: Optional[str] = None
+) -> Tuple[str, int]:
+    """
+    Sauvegarde une note reçue par morceaux (UTF-8 brut) et retourne (hash, taille),
+    comme save_attachment_stream. La note est stockée brute (ni compressée ni
+    rangée dans un pack) : elle peut ensuite être relue en flux.
+
+    Raises:
+        ContentTooLargeError: Si le contenu dépasse max_size (détecté dès réception)
+        ValueError: Si le chemin est invalide, si le contenu n'est pas de l'UTF-8
+                    valide ou si le hash diffère de expected_hash
+    """
+    note_path = get_note_path(user_id, path)
+    key = sanitize_path(path)
+    return await _save_stream(
+        chunks, max_size, expected_hash,
+        lambda f, content_hash: _commit_note_blob(user_id, key, note_path, f, content_hash),
+        text=True
+    )
+
+
+async def adopt_attachment_file(
+    user_id: int,
+    path: str,
+    source: Path,
+    expected_hash: Optional[str] = None
+) -> Tuple[str, int]:
+    """
+    Enregistre comme pièce jointe un fichier déjà écrit sur le disque (upload
+    reprenable terminé), sans le copier. Retourne (hash, taille).
 
-    if not attachment_path.exists():
+    Raises:
+        ValueError: Si le chemin est invalide ou si le hash diffère de expected_hash
+                    (le fichier source est alors laissé en place)
+    """
+    attachment_path = get_attachment_path(user_id, path)
+    content_hash, size = await io_executor.run(_hash_file, source)
+    if expected_hash is not None and expected_hash != content_hash:
+        raise ValueError("Le hash du contenu reçu ne correspond pas au hash annoncé")
+    await io_executor.run(_adopt_blob_file, str(source), content_hash, attachment_path)
+    return content_hash, size
+
+
+# Morceaux (voir chunking.py) : le client n'envoie que les morceaux que le serveur
+# n'a pas ; l'attachment est ensuite assemblé à partir des morceaux reçus et de
+# morceaux lus dans des blobs existants.
+
+# Source d'un morceau : fichier reçu, ou (blob, position, longueur)
+ChunkSource = Union[Path, Tuple[Path, int, int]]
+
+
+def get_staged_chunk_path(user_id: int, chunk_hash: str) -> Path:
+    """Retourne le chemin d'un morceau reçu (sha256 hexadécimal)."""
+    if not _HASH_PATTERN.fullmatch(chunk_hash):
+        raise ValueError("Hash de morceau invalide")
+    return get_user_storage_path(user_id) / CHUNKS_DIRNAME / chunk_hash
+
+
+async def save_staged_chunk(
+    user_id: int,
+    chunk_hash: str,
+    chunks: AsyncIterable[bytes],
+    max_size: int
+) -> int:
+    """
+    Enregistre un morceau reçu après vérification de son hash. Retourne sa taille.
+
+    Raises:
+        ContentTooLargeError: Si le morceau dépasse max_size
+        ValueError: Si le hash est invalide ou ne correspond pas au contenu
+    """
+    chunk_path = get_staged_chunk_path(user_id, chunk_hash)
+    data = bytearray()
+    async for part in chunks:
+        if len(data) + len(part) > max_size:
+            raise ContentTooLargeError(f"Morceau trop volumineux (max {max_size} octets)")
+        data += part
+    if compute_hash(data) != chunk_hash:
+        raise ValueError("Le hash du morceau ne correspond pas à son contenu")
+    await io_executor.run(_write_atomic, chunk_path, bytes(data))
+    return len(data)
+
+
+def _existing_files(paths: List[Path]) -> List[bool]:
+    return [path.is_file() for path in paths]
+
+
+async def staged_chunks_exist(user_id: int, chunk_hashes: List[str]) -> List[bool]:
+    """Indique, pour chaque hash, si le morceau a déjà été reçu (un seul job d'I/O)."""
+    paths = [get_staged_chunk_path(user_id, chunk_hash) for chunk_hash in chunk_hashes]
+    return await io_executor.run(_existing_files, paths)
+
+
+def _file_sizes(paths: List[Path]) -> List[Optional[int]]:
+    return [_file_size(path) for path in paths]
+
+
+async def staged_chunk_sizes(user_id: int, chunk_hashes: List[str]) -> List[Optional[int]]:
+    """Taille de chaque morceau reçu, None s'il ne l'a pas été (un seul job d'I/O)."""
+    paths = [get_staged_chunk_path(user_id, chunk_hash) for chunk_hash in chunk_hashes]
+    return await io_executor.run(_file_sizes, paths)
+
+
+def _copy_chunk(source: ChunkSource, out: BinaryIO, hasher) -> int:
+    if isinstance(source, Path):
+        data = source.read_bytes()
+    else:
+        blob_path, offset, length = source
+        with open(blob_path, "rb") as f:
+            f.seek(offset)
+            data = f.read(length)
+            if len(data) != length:
+                raise ValueError(f"Morceau illisible dans {blob_path.name}")
+    out.write(data)
+    hasher.update(data)
+    return len(data)
+
+
+def _assemble_file(sources: List[ChunkSource], expected_hash: str, target: Path) -> int:
+    f = _open_temp_blob()
+    try:
+        hasher = hashlib.sha256()
+        size = 0
+        for source in sources:
+            size += _copy_chunk(source, f, hasher)
+        if hasher.hexdigest() != expected_hash:
+            raise ValueError("Le hash du contenu assemblé ne correspond pas au hash annoncé")
+        _commit_temp_blob(f, expected_hash, target)
+    except BaseException:
+        _discard_temp_blob(f)
+        raise
+    for source in sources:
+        if isinstance(source, Path):
+            _delete_file(source)
+    return size
+
+
+async def assemble_attachment(
+    user_id: int,
+    path: str,
+    sources: List[ChunkSource],
+    expected_hash: str
+) -> int:
+    """
+    Assemble une pièce jointe à partir de ses morceaux (un morceau en mémoire à la
+    fois), vérifie son hash et l'enregistre. Les morceaux reçus utilisés sont
+    supprimés. Retourne la taille.
+
+    Raises:
+        ValueError: Si le chemin est invalide ou si le hash ne correspond pas
+    """
+    attachment_path = get_attachment_path(user_id, path)
+    return await io_executor.run(_assemble_file, sources, expected_hash, attachment_path)
+
+
+def purge_staged_chunks(max_age_seconds: float) -> int:
+    """Supprime les morceaux reçus jamais assemblés (bloquant). Retourne leur nombre."""
+    root = Path(settings.storage_path)
+    if not root.is_dir():
+        return 0
+    limit = time.time() - max_age_seconds
+    purged = 0
+    for user_dir in root.iterdir():
+        chunks_dir = user_dir / CHUNKS_DIRNAME
+        if not user_dir.name.isdigit() or not chunks_dir.is_dir():
+            continue
+        for chunk in chunks_dir.iterdir():
+            try:
+                if chunk.stat().st_mtime < limit:
+                    chunk.unlink()
+                    purged += 1
+            except OSError as e:
+                logger.warning(f"Morceau non supprimé - path={chunk}, error={str(e)}")
+    if purged:
+        logger.info(f"Morceaux non assemblés supprimés - {purged}")
+    return purged
+
+
+def _open_file(target: Path) -> Optional[Tuple[BinaryIO, int]]:
+    try:
+        f = open(target, "rb")
+    except (FileNotFoundError, IsADirectoryError):
         return None
+    # Taille du fichier ouvert : un remplacement concurrent du chemin ne l'affecte pas
+    return f, os.fstat(f.fileno()).st_size
 
-    async with aiofiles.open(attachment_path, "rb") as f:
-        return await f.read()
+
+async def open_attachment(user_id: int, path: str) -> Optional[Tuple[BinaryIO, int]]:
+    """
+    Ouvre une pièce jointe en lecture binaire pour la lire par blocs (via l'exécuteur
+    d'I/O). Retourne (fichier, taille), ou None si elle n'existe pas. L'appelant ferme
+    le fichier.
+
+    Raises:
+        ValueError: Si le chemin est invalide
+    """
+    return await io_executor.run(_open_file, get_attachment_path(user_id, path))
+
+
+async def read_attachment(user_id: int, path: str) -> Optional[bytes]:
+    """Lit le contenu d'une pièce jointe."""
+    attachment_path = get_attachment_path(user_id, path)
+    return await io_executor.run(_read_file, attachment_path)
 
 
 async def delete_attachment(user_id: int, path: str) -> bool:
     """Supprime une pièce jointe."""
     attachment_path = get_attachment_path(user_id, path)
+    return await io_executor.run(_delete_file, attachment_path)
 
-    if attachment_path.exists():
-        os.remove(attachment_path)
-        return True
-    return False
 
+async def move_note(user_id: int, from_path: str, to_path: str) -> bool:
+    """Déplace une note. Retourne False si la note source n'existe pas."""
+    return await io_executor.run(
+        _move_note_file, user_id, sanitize_path(from_path), sanitize_path(to_path),
+        get_note_path(user_id, from_path), get_note_path(user_id, to_path)
+    )
 
-def get_note_size(user_id: int, path: str) -> Optional[int]:
-    """Retourne la taille d'une note en octets, ou None si elle n'existe pas."""
+
+async def move_attachment(user_id: int, from_path: str, to_path: str) -> bool:
+    """Déplace une pièce jointe. Retourne False si elle n'existe pas."""
+    return await io_executor.run(
+        _move_file, get_attachment_path(user_id, from_path), get_attachment_path(user_id, to_path)
+    )
+
+
+async def get_note_size(user_id: int, path: str) -> Optional[int]:
+    """Retourne la taille d'une note en octets (décompressée), ou None si elle n'existe pas."""
     try:
         note_path = get_note_path(user_id, path)
-        if note_path.exists():
-            return note_path.stat().st_size
-    except (ValueError, OSError):
-        pass
-    return None
+    except ValueError:
+        return None
+    return await io_executor.run(_note_size, user_id, sanitize_path(path), note_path)
 
 
-def get_attachment_size(user_id: int, path: str) -> Optional[int]:
+async def get_attachment_size(user_id: int, path: str) -> Optional[int]:
     """Retourne la taille d'une pièce jointe en octets, ou None si elle n'existe pas."""
     try:
         attachment_path = get_attachment_path(user_id, path)
-        if attachment_path.exists():
-            return attachment_path.stat().st_size
-    except (ValueError, OSError):
-        pass
-    return None
+    except ValueError:
+        return None
+    return await io_executor.run(_file_size, attachment_path)
+
+
+def _is_linked_compressed_blob(blob: Path) -> bool:
+    if blob.stat().st_nlink <= 1:
+        return False
+    with open(blob, "rb") as f:
+        return compression.is_compressed(f.read(len(compression.ZSTD_MAGIC)))
+
+
+def collect_blobs(referenced: Set[str]) -> int:
+    """
+    Supprime les blobs dont le hash n'est pas dans `referenced` (références tirées
+    des lignes en base). Un chemin lié à un blob garde son contenu quand le blob
+    est supprimé : le nombre de liens physiques ne compte pas pour un blob brut.
+    Exception : un blob de note compressée est rangé sous le hash de ses octets
+    compressés, qu'aucune ligne ne porte ; il n'est référencé que par les chemins
+    qui y sont liés et reste conservé tant qu'il en a (sans lien, après un repli
+    sur copie notamment, il ne sert plus à rien).
+    Supprime aussi les fichiers temporaires orphelins. Retourne le nombre de blobs supprimés.
+    Bloquant : à exécuter via l'exécuteur d'I/O.
+    À appeler hors trafic (démarrage) : un push concurrent pourrait lier un blob collecté.
+    """
+    root = get_blobs_root()
+    if not root.exists():
+        return 0
+
+    removed = 0
+    for prefix_dir in root.iterdir():
+        if not prefix_dir.is_dir():
+            # Upload en streaming interrompu
+            if prefix_dir.name.startswith(TEMP_PREFIX):
+                try:
+                    prefix_dir.unlink()
+                except OSError as e:
+                    logger.warning(f"Fichier temporaire non supprimé - path={prefix_dir}, error={str(e)}")
+            continue
+        for blob in prefix_dir.iterdir():
+            try:
+                if blob.name.startswith(TEMP_PREFIX):
+                    blob.unlink()
+                elif blob.name not in referenced and not _is_linked_compressed_blob(blob):
+                    blob.unlink()
+                    removed += 1
+            except OSError as e:
+                logger.warning(f"Blob non collecté - path={blob}, error={str(e)}")
+    return removed
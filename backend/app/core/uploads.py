@@ -0,0 +1,226 @@
+"""
+Uploads reprenables de pièces jointes (dans l'esprit du protocole tus).
+
+Une session d'upload est un fichier partiel storage_path/uploads/<user>/<id>.part
+accompagné de ses métadonnées <id>.json. L'offset courant est la taille du fichier
+partiel : un PATCH interrompu conserve les octets déjà reçus et le client reprend
+à l'offset retourné par GET. Une session terminée est rangée dans le stockage par
+contenu sans copie (même système de fichiers) ; les sessions abandonnées expirent
+après UPLOAD_EXPIRY_HOURS.
+"""
+import asyncio
+import json
+import os
+import re
+import uuid
+import logging
+import weakref
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import AsyncIterable, NamedTuple, Optional, Tuple
+
+from .config import settings
+from .io_executor import io_executor
+from .storage import ContentTooLargeError, STREAM_BUFFER_SIZE, sanitize_path
+
+
+logger = logging.getLogger(__name__)
+
+UPLOADS_DIRNAME = "uploads"
+PART_SUFFIX = ".part"
+META_SUFFIX = ".json"
+_UPLOAD_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+# Un seul PATCH à la fois par session (l'offset est vérifié puis étendu)
+_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+class UploadSession(NamedTuple):
+    """Métadonnées d'une session d'upload."""
+    upload_id: str
+    path: str
+    size: int
+    content_hash: str
+    mime_type: Optional[str]
+    modified_at: datetime
+    expires_at: datetime
+
+
+class UploadOffsetMismatch(Exception):
+    """L'offset annoncé par le client ne correspond pas à celui du serveur."""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Offset attendu : {offset}")
+        self.offset = offset
+
+
+def get_uploads_root(user_id: int) -> Path:
+    return Path(settings.storage_path) / UPLOADS_DIRNAME / str(user_id)
+
+
+def get_part_path(user_id: int, upload_id: str) -> Path:
+    """Fichier partiel d'une session (ValueError si l'identifiant est invalide)."""
+    if not _UPLOAD_ID_PATTERN.fullmatch(upload_id):
+        raise ValueError("Identifiant d'upload invalide")
+    return get_uploads_root(user_id) / f"{upload_id}{PART_SUFFIX}"
+
+
+def _meta_path(part_path: Path) -> Path:
+    return part_path.with_suffix(META_SUFFIX)
+
+
+def _remove_session(part_path: Path) -> bool:
+    removed = False
+    for target in (part_path, _meta_path(part_path)):
+        try:
+            os.remove(target)
+            removed = True
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def _create_session(part_path: Path, session: UploadSession) -> None:
+    part_path.parent.mkdir(parents=True, exist_ok=True)
+    part_path.touch()
+    meta = session._asdict()
+    meta["modified_at"] = session.modified_at.isoformat()
+    meta["expires_at"] = session.expires_at.isoformat()
+    _meta_path(part_path).write_text(json.dumps(meta), encoding="utf-8")
+
+
+def _load_session(part_path: Path) -> Optional[Tuple[UploadSession, int]]:
+    """Session et offset courant, ou None si elle n'existe pas ou a expiré."""
+    try:
+        meta = json.loads(_meta_path(part_path).read_bytes())
+        offset = part_path.stat().st_size
+    except (OSError, ValueError):
+        return None
+    meta["modified_at"] = datetime.fromisoformat(meta["modified_at"])
+    meta["expires_at"] = datetime.fromisoformat(meta["expires_at"])
+    session = UploadSession(**meta)
+    if session.expires_at <= datetime.utcnow():
+        _remove_session(part_path)
+        return None
+    return session, offset
+
+
+async def create_upload(
+    user_id: int,
+    path: str,
+    size: int,
+    content_hash: str,
+    mime_type: Optional[str],
+    modified_at: datetime,
+    max_size: int
+) -> UploadSession:
+    """
+    Ouvre une session d'upload.
+
+    Raises:
+        ValueError: Si le chemin est invalide
+        ContentTooLargeError: Si la taille annoncée dépasse max_size
+    """
+    sanitize_path(path)
+    if size > max_size:
+        raise ContentTooLargeError(f"Contenu trop volumineux (max {max_size} octets)")
+
+    session = UploadSession(
+        upload_id=uuid.uuid4().hex,
+        path=path,
+        size=size,
+        content_hash=content_hash,
+        mime_type=mime_type,
+        modified_at=modified_at,
+        expires_at=datetime.utcnow() + timedelta(hours=settings.upload_expiry_hours)
+    )
+    await io_executor.run(_create_session, get_part_path(user_id, session.upload_id), session)
+    return session
+
+
+async def get_upload(user_id: int, upload_id: str) -> Optional[Tuple[UploadSession, int]]:
+    """Retourne (session, offset courant), ou None si la session n'existe pas ou a expiré."""
+    try:
+        part_path = get_part_path(user_id, upload_id)
+    except ValueError:
+        return None
+    return await io_executor.run(_load_session, part_path)
+
+
+async def append_upload(
+    user_id: int,
+    upload_id: str,
+    offset: int,
+    chunks: AsyncIterable[bytes]
+) -> Optional[int]:
+    """
+    Ajoute au fichier partiel les octets reçus, à partir de offset.
+    Les octets reçus avant une interruption sont conservés. Retourne le nouvel
+    offset, ou None si la session n'existe pas.
+
+    Raises:
+        UploadOffsetMismatch: Si offset n'est pas l'offset courant de la session
+        ContentTooLargeError: Si les octets reçus dépassent la taille annoncée
+    """
+    try:
+        part_path = get_part_path(user_id, upload_id)
+    except ValueError:
+        return None
+
+    lock = _locks.setdefault(upload_id, asyncio.Lock())
+    async with lock:
+        loaded = await io_executor.run(_load_session, part_path)
+        if loaded is None:
+            return None
+        session, current = loaded
+        if offset != current:
+            raise UploadOffsetMismatch(current)
+
+        f = await io_executor.run(open, part_path, "ab")
+        buffer = bytearray()
+        try:
+            async for chunk in chunks:
+                if current + len(buffer) + len(chunk) > session.size:
+                    raise ContentTooLargeError("Octets reçus au-delà de la taille annoncée")
+                buffer += chunk
+                if len(buffer) >= STREAM_BUFFER_SIZE:
+                    await io_executor.run(f.write, buffer)
+                    current += len(buffer)
+                    buffer.clear()
+        finally:
+            # Même en cas d'interruption : les octets reçus servent à la reprise
+            if buffer:
+                await io_executor.run(f.write, buffer)
+                current += len(buffer)
+            await io_executor.run(f.close)
+        return current
+
+
+async def delete_upload(user_id: int, upload_id: str) -> bool:
+    """Abandonne une session. Retourne False si elle n'existe pas."""
+    try:
+        part_path = get_part_path(user_id, upload_id)
+    except ValueError:
+        return False
+    return await io_executor.run(_remove_session, part_path)
+
+
+def purge_expired_uploads() -> int:
+    """Supprime les sessions expirées de tous les utilisateurs (bloquant). Retourne leur nombre."""
+    root = Path(settings.storage_path) / UPLOADS_DIRNAME
+    if not root.is_dir():
+        return 0
+    purged = 0
+    for user_dir in root.iterdir():
+        if not user_dir.is_dir():
+            continue
+        for part_path in user_dir.glob(f"*{PART_SUFFIX}"):
+            if _load_session(part_path) is None:
+                purged += _remove_session(part_path)
+        # Métadonnées sans fichier partiel (création interrompue)
+        for meta_path in user_dir.glob(f"*{META_SUFFIX}"):
+            if not meta_path.with_suffix(PART_SUFFIX).exists():
+                purged += _remove_session(meta_path.with_suffix(PART_SUFFIX))
+    if purged:
+        logger.info(f"Uploads expirés supprimés - {purged}")
+    return purged
@@ -2,6 +2,8 @@
 Point d'entrée FastAPI pour SyncObsidian API.
 """
 import asyncio
+import logging
+from datetime import timedelta
 from pathlib import Path
 from contextlib import asynccontextmanager
 
@@ -13,8 +15,27 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, JSONResponse
 
 from .core.config import settings
-from .core.database import init_db
+from .core.database import init_db, async_session_maker
+from .core.compression import train_missing_dictionaries
+from .core.io_executor import io_executor
+from .core.packs import compact_all_packs
+from .core.storage import purge_staged_chunks
+from .core.uploads import purge_expired_uploads
 from .routers import auth, sync
+from .services import compact_all_journals, prune_note_versions, collect_unreferenced_blobs, manifest_cache
+
+
+logger = logging.getLogger(__name__)
+
+
+async def compact_packs_periodically():
+    """Compaction des packs de notes en tâche de fond (NOTE_STORAGE=packs)."""
+    while True:
+        await asyncio.sleep(settings.pack_compaction_interval_seconds)
+        try:
+            await io_executor.run(compact_all_packs)
+        except Exception:
+            logger.exception("Erreur lors de la compaction des packs")
 
 
 @asynccontextmanager
@@ -22,9 +43,19 @@ async def lifespan(app: FastAPI):
     """Lifecycle events : startup et shutdown."""
     # Startup
     await init_db()
+    async with async_session_maker() as db:
+        await compact_all_journals(db, timedelta(days=settings.journal_retention_days))
+        await prune_note_versions(db)
+        await collect_unreferenced_blobs(db)
+    await io_executor.run(train_missing_dictionaries)
+    await io_executor.run(compact_all_packs)
+    await io_executor.run(purge_expired_uploads)
+    await io_executor.run(purge_staged_chunks, settings.upload_expiry_hours * 3600)
+    compaction_task = asyncio.create_task(compact_packs_periodically())
     yield
     # Shutdown
-    pass
+    compaction_task.cancel()
+    io_executor.shutdown()
 
 
 app = FastAPI(
@@ -84,6 +115,12 @@ async def health_check():
     return {"status": "healthy", "service": "syncobsidian"}
 
 
+@app.get("/health/metrics", tags=["Health"])
+async def health_metrics():
+    """Compteurs internes du worker (dimensionnement des caches et de l'exécuteur d'I/O)."""
+    return {"manifest_cache": manifest_cache.stats(), "io_executor": io_executor.stats()}
+
+
 @app.get("/sync-viewer", tags=["Health"])
 async def sync_viewer():
     """Page HTML de visualisation des notes synchronisées."""
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .core.database import Base
@@ -55,3 +55,111 @@ class Attachment(Base):
     __table_args__ = (
         UniqueConstraint('user_id', 'path', name='uq_attachments_user_path'),
     )
+
+
+class SyncJournalEntry(Base):
+    """
+    Journal append-only des changements d'un utilisateur.
+    L'id sert de numéro de séquence : strictement croissant et jamais réutilisé
+    (AUTOINCREMENT SQLite), il fonde les curseurs de synchronisation incrémentale.
+    """
+    __tablename__ = "sync_journal"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String(16), nullable=False)  # "note" ou "attachment"
+    path = Column(String(500), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_sync_journal_user_seq", "user_id", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
+
+class PathMove(Base):
+    """
+    Déplacement appliqué par POST /sync/move (même contenu, nouveau chemin).
+    Permet de proposer le déplacement aux autres devices en sync incrémental,
+    quand le client n'a pas renvoyé le hash de l'ancien chemin.
+    """
+    __tablename__ = "path_moves"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String(16), nullable=False)  # "note" ou "attachment"
+    from_path = Column(String(500), nullable=False)
+    to_path = Column(String(500), nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_path_moves_user_from", "user_id", "from_path"),
+    )
+
+
+class UserSyncState(Base):
+    """État de synchronisation par utilisateur (plancher de compaction du journal)."""
+    __tablename__ = "user_sync_state"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    # Séquence jusqu'à laquelle le journal a été tronqué : un curseur
+    # strictement inférieur n'est plus exploitable
+    journal_floor = Column(Integer, nullable=False, default=0)
+
+
+class VaultTreeNode(Base):
+    """
+    Nœud dossier de l'arbre de hachage du vault (un par dossier non vide, plus la racine "").
+    Le digest d'un dossier est la somme modulo 2^256 des hachages de ses enfants,
+    ce qui permet une mise à jour incrémentale sans relire le dossier.
+    """
+    __tablename__ = "vault_tree"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    path = Column(String(500), nullable=False)  # "" pour la racine
+    parent = Column(String(500), nullable=True)  # None pour la racine
+    digest = Column(String(64), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'path', name='uq_vault_tree_user_path'),
+        Index("ix_vault_tree_user_parent", "user_id", "parent"),
+    )
+
+
+class NoteVersion(Base):
+    """
+    Version antérieure d'une note (historique, pull par patch).
+
+    delta : patch par lignes (JSON) qui transforme la version suivante de la même
+    note (ou la note actuelle pour la plus récente) en cette version. NULL pour un
+    instantané complet, stocké comme blob brut de hash content_hash.
+    """
+    __tablename__ = "note_versions"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    path = Column(String(500), nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    delta = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_note_versions_user_path", "user_id", "path"),
+        Index("ix_note_versions_user_hash", "user_id", "content_hash"),
+    )
+
+
+class AttachmentChunk(Base):
+    """
+    Morceau d'un blob d'attachment (découpage défini par le contenu, voir core/chunking.py).
+    Permet de retrouver un morceau dans un blob existant pour ne pas le recevoir à nouveau.
+    """
+    __tablename__ = "attachment_chunks"
+
+    id = Column(Integer, primary_key=True)
+    blob_hash = Column(String(64), nullable=False, index=True)
+    chunk_hash = Column(String(64), nullable=False, index=True)
+    chunk_offset = Column(Integer, nullable=False)
+    length = Column(Integer, nullable=False)
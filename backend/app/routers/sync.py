@@ -1,62 +1,159 @@
 """
 Endpoints de synchronisation.
 """
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, Optional, Type
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..core.config import settings
 from ..core.database import get_db
 from ..core.security import get_current_user
+from ..core.storage import ContentTooLargeError, iter_file_blocks
+from ..core.io_executor import io_executor
+from ..core import uploads
 from ..models import User
 from ..schemas import (
     SyncRequest, SyncResponse,
+    ExchangeRequest, ExchangeResponse,
+    MoveRequest, MoveResponse,
+    NoteDelta, AttachmentContent,
     PushNotesRequest, PushNotesResponse,
     PullNotesRequest, PullNotesResponse,
     PushAttachmentsRequest, PushAttachmentsResponse,
+    BlobCheckRequest, BlobCheckResponse,
     PullAttachmentsRequest, PullAttachmentsResponse,
+    UploadNoteResponse, UploadAttachmentResponse,
+    CreateUploadRequest, UploadStatus,
+    ChunkNegotiationRequest, ChunkNegotiationResponse, ChunkedAttachmentRequest,
     SyncedNotesResponse,
-    CompareRequest, CompareResponse
+    CompareRequest, CompareResponse,
+    DigestRequest, DigestResponse
 )
 from ..services import (
     process_sync,
-    push_notes, pull_notes,
-    push_attachments, pull_attachments,
-    get_synced_notes, compare_notes
+    load_sync_state,
+    wants_ndjson, iter_sync_ndjson, NDJSON_MEDIA_TYPE,
+    process_exchange,
+    apply_moves,
+    advance_cursor,
+    push_notes, pull_notes, upload_note, open_note_download,
+    load_export_entries, iter_attachments_tar, TAR_MEDIA_TYPE,
+    push_attachments, pull_attachments, check_blobs, upload_attachment, get_attachment_download,
+    start_upload, get_upload_status, complete_upload,
+    negotiate_chunks, upload_chunk, commit_chunked_attachment, MissingChunksError,
+    iter_request_items,
+    MAX_ATTACHMENT_SIZE, MAX_ATTACHMENT_ITEM_BYTES,
+    get_synced_notes, compare_notes,
+    get_digest_nodes
 )
 
 
 router = APIRouter(prefix="/sync", tags=["Synchronization"])
 
+CURSOR_PARAM_DESCRIPTION = (
+    "Curseur du dernier sync : rendu dans la réponse, avancé au-delà des écritures "
+    "de cette requête (elles ne seront pas renvoyées au prochain sync)"
+)
+
+
+def _json_body(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Documente dans OpenAPI le corps JSON d'un endpoint qui lit la requête en streaming."""
+    schema = model.model_json_schema(ref_template="#/components/schemas/{model}")
+    schema.pop("$defs", None)
+    return {"requestBody": {"required": True, "content": {"application/json": {"schema": schema}}}}
+
+
+@asynccontextmanager
+async def _streamed_push(content_length: Optional[int]):
+    """
+    Erreurs d'un push lu en streaming : 413 dès que la requête ou un élément dépasse
+    sa limite, 422 pour un JSON ou un élément invalide. Les éléments précédents
+    sont déjà enregistrés ; un nouveau push est sans effet sur eux.
+    """
+    if content_length is not None and content_length > settings.push_request_max_bytes:
+        raise HTTPException(status_code=413, detail="Requête trop volumineuse")
+    try:
+        yield
+    except ContentTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+    except ValueError as e:
+        raise RequestValidationError([{"type": "json_invalid", "loc": ("body",), "msg": str(e), "input": {}}])
+
 
 @router.post("", response_model=SyncResponse)
 async def sync(
     request: SyncRequest,
+    accept: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Endpoint principal de synchronisation.
     Reçoit les métadonnées des notes locales et retourne les actions à effectuer.
+    Avec Accept: application/x-ndjson, le plan est envoyé en streaming, une entrée par ligne.
     """
+    if wants_ndjson(accept):
+        state = await load_sync_state(db, current_user, request)
+        return StreamingResponse(iter_sync_ndjson(state, request), media_type=NDJSON_MEDIA_TYPE)
     return await process_sync(db, current_user, request)
 
 
-@router.post("/push", response_model=PushNotesResponse)
+@router.post("/exchange", response_model=ExchangeResponse)
+async def sync_exchange(
+    request: ExchangeRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Sync en un aller-retour : applique les notes modifiées envoyées inline et
+    renvoie le contenu des petites notes à récupérer.
+    Le reste (notes volumineuses, attachments) passe par les endpoints séparés.
+    """
+    return await process_exchange(db, current_user, request)
+
+
+@router.post(
+    "/push",
+    response_model=PushNotesResponse,
+    response_model_exclude_none=True,
+    openapi_extra=_json_body(PushNotesRequest)
+)
 async def sync_push(
-    request: PushNotesRequest,
+    request: Request,
+    cursor: Optional[str] = Query(None, description=CURSOR_PARAM_DESCRIPTION),
+    content_length: Optional[int] = Header(None),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Reçoit les contenus des notes à pousser vers le serveur.
+    Reçoit les contenus des notes à pousser vers le serveur (corps PushNotesRequest).
+    Une note modifiée peut être envoyée sous forme de patch contre base_hash ;
+    si la base ne correspond plus, elle est listée dans needs_full_content.
+    Le corps est lu au fil de la réception et les notes traitées par lots bornés
+    (un commit par lot) : la mémoire utilisée ne dépend pas de la taille de la requête.
     """
-    success, failed = await push_notes(db, current_user, request.notes)
-    return PushNotesResponse(success=success, failed=failed)
+    user_id = current_user.id  # Lu avant le service : un rollback expire current_user
+    notes = iter_request_items(request.stream(), "notes", NoteDelta, settings.push_note_max_bytes)
+    needs_full_content = []
+    async with _streamed_push(content_length):
+        success, failed = await push_notes(db, current_user, notes, needs_full_content)
+    return PushNotesResponse(
+        success=success,
+        failed=failed,
+        needs_full_content=needs_full_content,
+        cursor=await advance_cursor(db, user_id, cursor)
+    )
 
 
-@router.post("/pull", response_model=PullNotesResponse)
+@router.post("/pull", response_model=PullNotesResponse, response_model_exclude_none=True)
 async def sync_pull(
     request: PullNotesRequest,
     db: AsyncSession = Depends(get_db),
@@ -65,10 +162,94 @@ async def sync_pull(
     """
     Retourne le contenu des notes demandées.
     """
-    notes = await pull_notes(db, current_user, request.paths)
+    notes = await pull_notes(db, current_user, request.paths, request.base_hashes)
     return PullNotesResponse(notes=notes)
 
 
+@router.get("/notes/{path:path}")
+async def sync_note_download(
+    path: str,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Télécharge une note en UTF-8 brut, lue sur le disque bloc par bloc : c'est le
+    pull des notes volumineuses (stream=True dans /sync/pull), sans échappement
+    JSON ni chargement en mémoire. ETag = content_hash ; If-None-Match supporté.
+    """
+    download = await open_note_download(db, current_user, path)
+    if download is None:
+        raise HTTPException(status_code=404, detail="Note introuvable")
+
+    f, size, note = download
+    etag = f'"{note.content_hash}"'
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or etag in (tag.strip() for tag in if_none_match.split(","))
+    ):
+        await io_executor.run(f.close)
+        return Response(status_code=304, headers={"ETag": etag})
+
+    return StreamingResponse(
+        iter_file_blocks(f, size),
+        media_type="text/markdown; charset=utf-8",
+        headers={"ETag": etag, "Content-Length": str(size)}
+    )
+
+
+@router.put("/notes/{path:path}", response_model=UploadNoteResponse, response_model_exclude_none=True)
+async def sync_note_upload(
+    path: str,
+    request: Request,
+    modified_at: datetime = Query(..., description="Date de modification côté client"),
+    content_hash: Optional[str] = Query(None, description="Hash SHA256 attendu (vérifié avant enregistrement)"),
+    cursor: Optional[str] = Query(None, description=CURSOR_PARAM_DESCRIPTION),
+    content_length: Optional[int] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Reçoit une note en UTF-8 brut (corps de la requête) : c'est le push des notes
+    volumineuses. Le corps est écrit sur disque au fil de la réception, avec
+    calcul du hash : la mémoire utilisée ne dépend pas de la taille de la note.
+    """
+    user_id = current_user.id
+    too_large = HTTPException(
+        status_code=413, detail=f"Note trop volumineuse (max {settings.note_stream_max_bytes} octets)"
+    )
+    if content_length is not None and content_length > settings.note_stream_max_bytes:
+        raise too_large
+    try:
+        result = await upload_note(
+            db, current_user, path, request.stream(),
+            modified_at=modified_at,
+            expected_hash=content_hash
+        )
+    except ContentTooLargeError:
+        raise too_large
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result.cursor = await advance_cursor(db, user_id, cursor)
+    return result
+
+
+@router.post("/move", response_model=MoveResponse, response_model_exclude_none=True)
+async def sync_move(
+    request: MoveRequest,
+    cursor: Optional[str] = Query(None, description=CURSOR_PARAM_DESCRIPTION),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Applique des déplacements (renommages) de notes ou d'attachments
+    sans renvoyer leur contenu.
+    """
+    user_id = current_user.id
+    success, failed = await apply_moves(db, current_user, request.moves)
+    return MoveResponse(success=success, failed=failed, cursor=await advance_cursor(db, user_id, cursor))
+
+
 @router.get("/notes", response_model=SyncedNotesResponse)
 async def get_notes(
     page: int = Query(1, ge=1, description="Numéro de page"),
@@ -109,18 +290,62 @@ async def sync_compare(
     return await compare_notes(db, current_user, request.notes)
 
 
-@router.post("/attachments/push", response_model=PushAttachmentsResponse)
+@router.post("/digest", response_model=DigestResponse)
+async def sync_digest(
+    request: DigestRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Retourne le digest racine de l'arbre de hachage du vault et le détail des dossiers demandés.
+    Le client compare les digests et ne descend que dans les sous-arbres qui diffèrent.
+    """
+    root_digest, nodes = await get_digest_nodes(db, current_user.id, request.paths)
+    return DigestResponse(root_digest=root_digest, nodes=nodes)
+
+
+@router.post(
+    "/attachments/push",
+    response_model=PushAttachmentsResponse,
+    response_model_exclude_none=True,
+    openapi_extra=_json_body(PushAttachmentsRequest)
+)
 async def sync_attachments_push(
-    request: PushAttachmentsRequest,
+    request: Request,
+    cursor: Optional[str] = Query(None, description=CURSOR_PARAM_DESCRIPTION),
+    content_length: Optional[int] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Reçoit les pièces jointes à pousser vers le serveur (corps PushAttachmentsRequest).
+    Les fichiers sont encodés en base64. Limite : 25 Mo par fichier, vérifiée au
+    fil de la réception. Un contenu déjà présent (voir /sync/blobs/check) est
+    envoyé sans content_base64.
+    """
+    user_id = current_user.id
+    attachments = iter_request_items(
+        request.stream(), "attachments", AttachmentContent, MAX_ATTACHMENT_ITEM_BYTES
+    )
+    async with _streamed_push(content_length):
+        success, failed = await push_attachments(db, current_user, attachments)
+    return PushAttachmentsResponse(
+        success=success, failed=failed, cursor=await advance_cursor(db, user_id, cursor)
+    )
+
+
+@router.post("/blobs/check", response_model=BlobCheckResponse)
+async def sync_blobs_check(
+    request: BlobCheckRequest,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Reçoit les pièces jointes à pousser vers le serveur.
-    Les fichiers sont encodés en base64. Limite : 25 Mo par fichier.
+    Indique quels contenus (hashes SHA256) le serveur possède déjà : les
+    attachments correspondants sont poussés par référence, sans transfert.
     """
-    success, failed = await push_attachments(db, current_user, request.attachments)
-    return PushAttachmentsResponse(success=success, failed=failed)
+    existing = await check_blobs(db, current_user, request.hashes)
+    return BlobCheckResponse(existing=existing)
 
 
 @router.post("/attachments/pull", response_model=PullAttachmentsResponse)
@@ -134,3 +359,246 @@ async def sync_attachments_pull(
     """
     attachments = await pull_attachments(db, current_user, request.paths)
     return PullAttachmentsResponse(attachments=attachments)
+
+
+@router.post("/attachments/export")
+async def sync_attachments_export(
+    request: PullAttachmentsRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Retourne les pièces jointes demandées dans une archive tar envoyée en streaming
+    (métadonnées de chaque entrée dans ses en-têtes PAX). Pensé pour le premier
+    sync d'un vault volumineux : mémoire bornée côté serveur, un seul flux côté client.
+    """
+    entries = await load_export_entries(db, current_user, request.paths)
+    return StreamingResponse(
+        iter_attachments_tar(current_user.id, entries),
+        media_type=TAR_MEDIA_TYPE,
+        # Contenu en grande partie incompressible : pas de GZipMiddleware
+        headers={"Content-Encoding": "identity"}
+    )
+
+
+@router.get("/attachments/{path:path}")
+async def sync_attachment_download(
+    path: str,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Télécharge une pièce jointe brute, servie directement depuis le disque
+    (sans base64 ni chargement en mémoire). ETag = content_hash ; les requêtes
+    Range (reprise, lecture partielle) et If-None-Match sont supportées.
+    """
+    download = await get_attachment_download(db, current_user, path)
+    if download is None:
+        raise HTTPException(status_code=404, detail="Pièce jointe introuvable")
+
+    file_path, att = download
+    etag = f'"{att.content_hash}"'
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or etag in (tag.strip() for tag in if_none_match.split(","))
+    ):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    return FileResponse(
+        file_path,
+        media_type=att.mime_type or "application/octet-stream",
+        # Content-Encoding déjà posé : GZipMiddleware laisse passer le fichier
+        # tel quel (binaires incompressibles, Content-Length et Range préservés)
+        headers={"ETag": etag, "Content-Encoding": "identity"}
+    )
+
+
+@router.put("/attachments/{path:path}", response_model=UploadAttachmentResponse, response_model_exclude_none=True)
+async def sync_attachment_upload(
+    path: str,
+    request: Request,
+    modified_at: datetime = Query(..., description="Date de modification côté client"),
+    content_hash: Optional[str] = Query(None, description="Hash SHA256 attendu (vérifié avant enregistrement)"),
+    cursor: Optional[str] = Query(None, description=CURSOR_PARAM_DESCRIPTION),
+    content_type: Optional[str] = Header(None),
+    content_length: Optional[int] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Reçoit une pièce jointe en binaire brut (corps de la requête, sans base64).
+    Le corps est écrit sur disque au fil de la réception : la mémoire utilisée
+    ne dépend pas de la taille du fichier. Limite : 25 Mo.
+    """
+    user_id = current_user.id
+    too_large = HTTPException(status_code=413, detail="Pièce jointe trop volumineuse (max 25 Mo)")
+    if content_length is not None and content_length > MAX_ATTACHMENT_SIZE:
+        raise too_large
+    try:
+        result = await upload_attachment(
+            db, current_user, path, request.stream(),
+            modified_at=modified_at,
+            mime_type=content_type,
+            expected_hash=content_hash
+        )
+    except ContentTooLargeError:
+        raise too_large
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result.cursor = await advance_cursor(db, user_id, cursor)
+    return result
+
+
+# ============ Uploads reprenables ============
+
+def _upload_not_found() -> HTTPException:
+    return HTTPException(status_code=404, detail="Upload introuvable ou expiré")
+
+
+def _offset_conflict(e: uploads.UploadOffsetMismatch) -> HTTPException:
+    return HTTPException(status_code=409, detail=str(e), headers={"Upload-Offset": str(e.offset)})
+
+
+@router.post("/uploads", response_model=UploadStatus, status_code=201)
+async def sync_upload_create(
+    request: CreateUploadRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Ouvre un upload reprenable de pièce jointe (fichiers volumineux, connexions instables).
+    Le contenu est ensuite envoyé par PATCH, morceau par morceau, puis finalisé.
+    """
+    try:
+        return await start_upload(current_user, request)
+    except ContentTooLargeError:
+        raise HTTPException(status_code=413, detail="Pièce jointe trop volumineuse (max 25 Mo)")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/uploads/{upload_id}", response_model=UploadStatus)
+async def sync_upload_status(
+    upload_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Retourne l'offset courant d'un upload : le client reprend l'envoi à cet offset."""
+    status = await get_upload_status(current_user, upload_id)
+    if status is None:
+        raise _upload_not_found()
+    return status
+
+
+@router.patch("/uploads/{upload_id}", response_model=UploadStatus)
+async def sync_upload_append(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., description="Offset du premier octet envoyé"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Ajoute un morceau (corps brut) à un upload, à partir de Upload-Offset.
+    Si la connexion est coupée, les octets déjà reçus sont conservés.
+    """
+    try:
+        offset = await uploads.append_upload(current_user.id, upload_id, upload_offset, request.stream())
+    except uploads.UploadOffsetMismatch as e:
+        raise _offset_conflict(e)
+    except ContentTooLargeError:
+        raise HTTPException(status_code=413, detail="Octets reçus au-delà de la taille annoncée")
+    status = await get_upload_status(current_user, upload_id) if offset is not None else None
+    if status is None:
+        raise _upload_not_found()
+    return status
+
+
+@router.post(
+    "/uploads/{upload_id}/complete", response_model=UploadAttachmentResponse, response_model_exclude_none=True
+)
+async def sync_upload_complete(
+    upload_id: str,
+    cursor: Optional[str] = Query(None, description=CURSOR_PARAM_DESCRIPTION),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Finalise un upload complet : vérifie le hash et enregistre la pièce jointe."""
+    user_id = current_user.id
+    try:
+        result = await complete_upload(db, current_user, upload_id)
+    except uploads.UploadOffsetMismatch as e:
+        raise _offset_conflict(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise _upload_not_found()
+    result.cursor = await advance_cursor(db, user_id, cursor)
+    return result
+
+
+# ============ Attachments par morceaux ============
+
+@router.post("/chunks/negotiate", response_model=ChunkNegotiationResponse)
+async def sync_chunks_negotiate(
+    request: ChunkNegotiationRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Retourne les morceaux d'un attachment que le serveur n'a pas encore : seuls
+    ceux-là sont à envoyer (PUT /sync/chunks/{hash}) avant l'assemblage.
+    """
+    try:
+        return await negotiate_chunks(db, current_user, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.put("/chunks/{chunk_hash}", status_code=204)
+async def sync_chunk_upload(
+    chunk_hash: str,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Reçoit un morceau (corps brut), vérifié contre son hash SHA256."""
+    try:
+        await upload_chunk(current_user, chunk_hash, request.stream())
+    except ContentTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(status_code=204)
+
+
+@router.post("/attachments/chunked", response_model=UploadAttachmentResponse, response_model_exclude_none=True)
+async def sync_chunked_attachment(
+    request: ChunkedAttachmentRequest,
+    cursor: Optional[str] = Query(None, description=CURSOR_PARAM_DESCRIPTION),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Assemble une pièce jointe à partir de la liste ordonnée de ses morceaux.
+    409 avec la liste des morceaux manquants s'ils n'ont pas tous été envoyés.
+    """
+    user_id = current_user.id
+    try:
+        result = await commit_chunked_attachment(db, current_user, request)
+    except MissingChunksError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "missing": e.missing})
+    except ContentTooLargeError:
+        raise HTTPException(status_code=413, detail="Pièce jointe trop volumineuse (max 25 Mo)")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result.cursor = await advance_cursor(db, user_id, cursor)
+    return result
+
+
+@router.delete("/uploads/{upload_id}", status_code=204)
+async def sync_upload_abort(
+    upload_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Abandonne un upload et supprime les octets reçus."""
+    if not await uploads.delete_upload(current_user.id, upload_id):
+        raise _upload_not_found()
+    return Response(status_code=204)
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Optional, List, Literal, Tuple, Union
 
 
 # Auth schemas
@@ -63,7 +63,9 @@ class AttachmentMetadata(BaseModel):
 class AttachmentContent(BaseModel):
     """Contenu complet d'un attachment pour push/pull."""
     path: str
-    content_base64: str  # Contenu encodé en base64
+    # Contenu encodé en base64. Au push, None référence un contenu déjà présent
+    # sur le serveur par son content_hash (voir POST /sync/blobs/check)
+    content_base64: Optional[str] = None
     content_hash: str
     size: int
     mime_type: Optional[str] = None
@@ -71,10 +73,25 @@ class AttachmentContent(BaseModel):
     is_deleted: bool = False
 
 
+class MoveEntry(BaseModel):
+    """Déplacement d'un fichier sans transfert de contenu."""
+    kind: str  # "note" ou "attachment"
+    from_path: str
+    to_path: str
+    content_hash: str  # Contenu attendu à from_path (à vérifier avant de déplacer)
+    modified_at: datetime
+
+
 class SyncRequest(BaseModel):
     last_sync: Optional[datetime] = None
+    # Curseur retourné par le sync précédent. S'il est valide, notes/attachments
+    # ne contiennent que les changements locaux depuis ce sync.
+    cursor: Optional[str] = None
     notes: List[NoteMetadata] = []
     attachments: List[AttachmentMetadata] = []
+    # Détecter les renommages (suppression + création de même hash) et les
+    # retourner dans moves_to_push / moves_to_pull plutôt que comme push/pull
+    detect_moves: bool = False
 
 
 class SyncResponse(BaseModel):
@@ -84,32 +101,160 @@ class SyncResponse(BaseModel):
     conflicts: List[NoteMetadata] = []
     attachments_to_pull: List[AttachmentMetadata] = []
     attachments_to_push: List[str] = []
+    cursor: Optional[str] = None  # À renvoyer au prochain sync
+    # False si le curseur était absent ou expiré : le serveur a fait une
+    # réconciliation complète (le client doit alors envoyer tout son manifeste)
+    incremental: bool = False
+    moves_to_push: List[MoveEntry] = []  # À appliquer sur le serveur via /sync/move
+    moves_to_pull: List[MoveEntry] = []  # À appliquer localement par le client
+
+
+class ExchangeRequest(SyncRequest):
+    """Sync en un aller-retour : manifeste + contenu des notes modifiées localement."""
+    notes_content: List[NoteContent] = []
+
+
+class ExchangeResponse(SyncResponse):
+    """
+    Plan de sync après application des pushes inline.
+    notes_to_push / notes_to_pull ne contiennent que ce qui reste à échanger
+    via /sync/push et /sync/pull (contenus absents ou trop volumineux).
+    """
+    pushed: List[str] = []
+    push_failed: List[str] = []
+    notes_content: List[NoteContent] = []  # Notes à puller, contenu inclus
+
+
+class MoveRequest(BaseModel):
+    moves: List[MoveEntry]
+
+
+class MoveResponse(BaseModel):
+    success: List[str] = []  # to_path des déplacements appliqués
+    failed: List[str] = []
+    cursor: Optional[str] = None  # Voir PushNotesResponse
+
+
+class NoteDelta(NoteContent):
+    """
+    Note échangée (push/pull) en contenu complet, ou en patch par lignes contre
+    la version base_hash (voir services/note_delta.py) : content est alors None.
+    Au pull, une note au-delà de NOTE_STREAM_THRESHOLD_BYTES est renvoyée sans
+    contenu avec stream=True et sa taille : elle se télécharge par
+    GET /sync/notes/{path}.
+    """
+    content: Optional[str] = None
+    base_hash: Optional[str] = None
+    patch: Optional[List[Tuple[Literal["=", "-", "+"], Union[int, str]]]] = None
+    stream: Optional[bool] = None
+    size: Optional[int] = None
 
 
 class PushNotesRequest(BaseModel):
-    notes: List[NoteContent]
+    notes: List[NoteDelta]
 
 
 class PushNotesResponse(BaseModel):
     success: List[str] = []
     failed: List[str] = []
+    # Notes poussées par patch dont la base ne correspond plus : à renvoyer en entier
+    needs_full_content: List[str] = []
+    # Curseur envoyé en paramètre (cursor), avancé au-delà des entrées du journal
+    # ajoutées par cette requête : à utiliser au prochain sync (voir advance_cursor)
+    cursor: Optional[str] = None
 
 
 class PullNotesRequest(BaseModel):
     paths: List[str]
+    # Hash de la version locale par chemin : la note peut être renvoyée en patch
+    base_hashes: Dict[str, str] = {}
 
 
 class PullNotesResponse(BaseModel):
-    notes: List[NoteContent]
+    notes: List[NoteDelta]
 
 
 class PushAttachmentsRequest(BaseModel):
     attachments: List[AttachmentContent]
 
 
+class BlobCheckRequest(BaseModel):
+    """Hashes de contenus que le client s'apprête à pousser."""
+    hashes: List[str]
+
+
+class BlobCheckResponse(BaseModel):
+    """Hashes déjà présents : poussables par référence, sans renvoyer le contenu."""
+    existing: List[str]
+
+
 class PushAttachmentsResponse(BaseModel):
     success: List[str] = []
     failed: List[str] = []
+    cursor: Optional[str] = None  # Voir PushNotesResponse
+
+
+class UploadAttachmentResponse(BaseModel):
+    """Attachment enregistré par PUT /sync/attachments/{path}."""
+    path: str
+    content_hash: str
+    size: int
+    cursor: Optional[str] = None  # Voir PushNotesResponse
+
+
+class UploadNoteResponse(BaseModel):
+    """Note enregistrée par PUT /sync/notes/{path}."""
+    path: str
+    content_hash: str
+    size: int
+    cursor: Optional[str] = None  # Voir PushNotesResponse
+
+
+class CreateUploadRequest(BaseModel):
+    """Ouverture d'un upload reprenable (POST /sync/uploads)."""
+    path: str
+    size: int = Field(ge=0)
+    content_hash: str  # Vérifié à la finalisation
+    mime_type: Optional[str] = None
+    modified_at: datetime
+
+
+class UploadStatus(BaseModel):
+    """État d'un upload reprenable : le client reprend l'envoi à offset."""
+    upload_id: str
+    path: str
+    size: int
+    offset: int
+    expires_at: datetime
+
+
+class ChunkNegotiationRequest(BaseModel):
+    """Morceaux d'un attachment que le client s'apprête à envoyer (POST /sync/chunks/negotiate)."""
+    path: Optional[str] = None  # Version précédente de l'attachment, découpée si besoin
+    chunk_hashes: List[str]
+
+
+class ChunkNegotiationResponse(BaseModel):
+    """Morceaux absents du serveur et paramètres de découpage attendus."""
+    missing: List[str]
+    min_chunk_size: int
+    avg_chunk_size: int
+    max_chunk_size: int
+
+
+class ChunkRef(BaseModel):
+    chunk_hash: str
+    size: int = Field(gt=0)
+
+
+class ChunkedAttachmentRequest(BaseModel):
+    """Attachment décrit par la liste ordonnée de ses morceaux (POST /sync/attachments/chunked)."""
+    path: str
+    content_hash: str
+    size: int = Field(ge=0)
+    mime_type: Optional[str] = None
+    modified_at: datetime
+    chunks: List[ChunkRef]
 
 
 class PullAttachmentsRequest(BaseModel):
@@ -226,3 +371,29 @@ class CompareResponse(BaseModel):
     to_pull: List[NoteToPull] = []
     conflicts: List[NoteConflict] = []
     deleted_on_server: List[NoteDeletedOnServer] = []
+
+
+# Schemas pour POST /sync/digest (arbre de hachage du vault)
+class DigestRequest(BaseModel):
+    """Dossiers dont on veut le détail ("" pour la racine)."""
+    paths: List[str] = [""]
+
+
+class DigestEntry(BaseModel):
+    """Enfant direct d'un dossier."""
+    name: str
+    kind: str  # "folder", "note" ou "attachment"
+    hash: str  # Digest du sous-arbre (dossier) ou content_hash (fichier)
+    is_deleted: bool = False
+
+
+class DigestNode(BaseModel):
+    """Dossier de l'arbre avec ses enfants directs."""
+    path: str
+    digest: str
+    children: List[DigestEntry] = []
+
+
+class DigestResponse(BaseModel):
+    root_digest: str
+    nodes: List[DigestNode] = []
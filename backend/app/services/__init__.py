@@ -6,34 +6,151 @@ from .sync_utils import (
     parse_attachment_references,
     get_server_notes,
     get_note_by_path,
+    get_note_state_by_path,
+    get_notes_by_paths,
+    upsert_notes,
     get_server_attachments,
     get_attachment_by_path,
+    get_attachment_state_by_path,
+    get_attachments_by_paths,
+    get_attachment_hashes,
+    iter_request_items,
     MAX_ATTACHMENT_SIZE,
+    MAX_ATTACHMENT_ITEM_BYTES,
     OBSIDIAN_LINK_PATTERN
 )
-from .notes_sync import process_sync, push_notes, pull_notes
-from .attachments_sync import push_attachments, pull_attachments
+from .journal import (
+    record_change,
+    record_changes,
+    encode_cursor,
+    decode_cursor,
+    advance_cursor,
+    get_journal_head,
+    get_changes_since,
+    compact_journal,
+    compact_all_journals
+)
+from .vault_tree import update_vault_tree, update_vault_tree_batch, rebuild_vault_tree, get_digest_nodes
+from .manifest_cache import manifest_cache
+from .blobs import get_referenced_hashes, collect_unreferenced_blobs
+from .notes_sync import (
+    process_sync,
+    load_sync_state,
+    iter_sync_plan,
+    push_notes,
+    pull_notes,
+    upload_note,
+    open_note_download
+)
+from .sync_stream import wants_ndjson, iter_sync_ndjson, NDJSON_MEDIA_TYPE
+from .exchange_sync import process_exchange
+from .moves import apply_moves, record_move, get_move_sources
+from .attachments_sync import (
+    push_attachments, pull_attachments, check_blobs, upload_attachment, get_attachment_download,
+    start_upload, get_upload_status, complete_upload
+)
+from .chunked_attachments import (
+    negotiate_chunks, upload_chunk, commit_chunked_attachment, index_blob_chunks, MissingChunksError
+)
+from .attachments_export import load_export_entries, iter_attachments_tar, TAR_MEDIA_TYPE
+from .note_versions import (
+    PendingVersion,
+    get_delta_runs,
+    prepare_note_version,
+    record_note_versions,
+    forget_note_versions,
+    move_note_versions,
+    get_version_content,
+    prune_note_versions
+)
 from .compare_sync import get_synced_notes, compare_notes
 
 __all__ = [
     # Sync principal
     "process_sync",
+    "process_exchange",
+    "load_sync_state",
+    "iter_sync_plan",
+    # Streaming NDJSON
+    "wants_ndjson",
+    "iter_sync_ndjson",
+    "NDJSON_MEDIA_TYPE",
     # Notes
     "push_notes",
     "pull_notes",
+    "upload_note",
+    "open_note_download",
+    # Déplacements
+    "apply_moves",
+    "record_move",
+    "get_move_sources",
     # Attachments
     "push_attachments",
     "pull_attachments",
+    "check_blobs",
+    "upload_attachment",
+    "get_attachment_download",
+    # Export tar
+    "load_export_entries",
+    "iter_attachments_tar",
+    "TAR_MEDIA_TYPE",
+    # Uploads reprenables
+    "start_upload",
+    "get_upload_status",
+    "complete_upload",
+    # Attachments par morceaux
+    "negotiate_chunks",
+    "upload_chunk",
+    "commit_chunked_attachment",
+    "index_blob_chunks",
+    "MissingChunksError",
     # Comparaison / Debug
     "get_synced_notes",
     "compare_notes",
+    # Journal / sync incrémental
+    "record_change",
+    "record_changes",
+    "encode_cursor",
+    "decode_cursor",
+    "advance_cursor",
+    "get_journal_head",
+    "get_changes_since",
+    "compact_journal",
+    "compact_all_journals",
+    # Arbre de hachage du vault
+    "update_vault_tree",
+    "update_vault_tree_batch",
+    "rebuild_vault_tree",
+    "get_digest_nodes",
+    # Versions des notes
+    "PendingVersion",
+    "get_delta_runs",
+    "prepare_note_version",
+    "record_note_versions",
+    "forget_note_versions",
+    "move_note_versions",
+    "get_version_content",
+    "prune_note_versions",
+    # Stockage par contenu
+    "get_referenced_hashes",
+    "collect_unreferenced_blobs",
+    # Cache des manifestes
+    "manifest_cache",
     # Utilitaires
     "normalize_datetime",
     "parse_attachment_references",
     "get_server_notes",
     "get_note_by_path",
+    "get_note_state_by_path",
+    "get_notes_by_paths",
+    "upsert_notes",
     "get_server_attachments",
     "get_attachment_by_path",
+    "get_attachment_state_by_path",
+    "get_attachments_by_paths",
+    "get_attachment_hashes",
+    "iter_request_items",
     "MAX_ATTACHMENT_SIZE",
+    "MAX_ATTACHMENT_ITEM_BYTES",
     "OBSIDIAN_LINK_PATTERN",
 ]
@@ -0,0 +1,97 @@
+"""
+Export en masse des pièces jointes en archive tar (POST /sync/attachments/export).
+
+Alternative à /sync/attachments/pull pour le premier sync d'un gros vault : une
+seule réponse séquentielle, lue sur le disque bloc par bloc (mémoire bornée par
+STREAM_BUFFER_SIZE quel que soit le volume), sans base64.
+
+Chaque entrée est un fichier régulier nommé par son chemin dans le vault, précédé
+d'un en-tête PAX portant ses métadonnées :
+
+    SYNCOBSIDIAN.content_hash, SYNCOBSIDIAN.mime_type, SYNCOBSIDIAN.modified_at (ISO 8601)
+    SYNCOBSIDIAN.is_deleted = "1" pour un attachment supprimé (entrée vide)
+
+Les chemins inconnus ou invalides sont ignorés, comme dans pull_attachments.
+"""
+import calendar
+import logging
+import tarfile
+from typing import AsyncIterator, List
+
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import User
+from ..core import storage
+from ..core.io_executor import io_executor
+from .sync_utils import get_attachments_by_paths
+
+
+logger = logging.getLogger(__name__)
+
+TAR_MEDIA_TYPE = "application/x-tar"
+PAX_PREFIX = "SYNCOBSIDIAN."
+
+
+async def load_export_entries(db: AsyncSession, user: User, paths: List[str]) -> List[Row]:
+    """
+    État des attachments demandés, dans l'ordre de la requête. Chargé avant le
+    streaming : la génération de l'archive n'accède plus à la base.
+    """
+    by_path = {row.path: row for row in await get_attachments_by_paths(db, user.id, paths)}
+    return [by_path[path] for path in dict.fromkeys(paths) if path in by_path]
+
+
+def _tar_header(att: Row, size: int) -> bytes:
+    info = tarfile.TarInfo(att.path)
+    info.size = size
+    info.mtime = calendar.timegm(att.modified_at.utctimetuple())
+    info.mode = 0o644
+    info.pax_headers = {
+        PAX_PREFIX + "content_hash": att.content_hash,
+        PAX_PREFIX + "modified_at": att.modified_at.isoformat(),
+    }
+    if att.mime_type:
+        info.pax_headers[PAX_PREFIX + "mime_type"] = att.mime_type
+    if att.is_deleted:
+        info.pax_headers[PAX_PREFIX + "is_deleted"] = "1"
+    return info.tobuf(format=tarfile.PAX_FORMAT, encoding="utf-8")
+
+
+def _padding(size: int) -> bytes:
+    return b"\0" * (-size % tarfile.BLOCKSIZE)
+
+
+async def iter_attachments_tar(user_id: int, entries: List[Row]) -> AsyncIterator[bytes]:
+    """Génère l'archive tar des attachments, en lisant chaque fichier par blocs."""
+    for att in entries:
+        if att.is_deleted:
+            yield _tar_header(att, 0)
+            continue
+        try:
+            opened = await storage.open_attachment(user_id, att.path)
+        except ValueError as e:
+            logger.warning(
+                f"Chemin invalide rejeté lors de l'export - user_id={user_id}, path={att.path}, error={str(e)}"
+            )
+            continue
+        if opened is None:
+            continue
+
+        f, size = opened
+        try:
+            yield _tar_header(att, size)
+            remaining = size
+            while remaining > 0:
+                block = await io_executor.run(f.read, min(storage.STREAM_BUFFER_SIZE, remaining))
+                if not block:
+                    # Ne devrait pas arriver (blob immuable) : l'archive reste lisible
+                    block = b"\0" * remaining
+                remaining -= len(block)
+                yield block
+            yield _padding(size)
+        finally:
+            await io_executor.run(f.close)
+
+    # Fin d'archive : deux blocs vides
+    yield b"\0" * (2 * tarfile.BLOCKSIZE)
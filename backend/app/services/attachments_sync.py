@@ -4,38 +4,103 @@ Logique de synchronisation des pièces jointes (attachments).
 import base64
 import logging
 from datetime import datetime
-from typing import List, Tuple
+from pathlib import Path
+from typing import AsyncIterable, Iterable, List, Optional, Tuple, Union
 
+from sqlalchemy import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models import Attachment, User
-from ..schemas import AttachmentContent
-from ..core import storage
+from ..schemas import AttachmentContent, UploadAttachmentResponse, CreateUploadRequest, UploadStatus
+from ..core import storage, uploads
+from ..core.io_executor import io_executor
 from .sync_utils import (
     get_attachment_by_path,
+    get_attachment_state_by_path,
+    get_attachments_by_paths,
+    get_attachment_hashes,
+    iter_items,
     MAX_ATTACHMENT_SIZE
 )
+from .journal import JOURNAL_KIND_ATTACHMENT, record_change
+from .vault_tree import update_vault_tree
 
 
 logger = logging.getLogger(__name__)
 
 
+def _record_attachment(
+    db: AsyncSession,
+    user_id: int,
+    path: str,
+    existing: Optional[Attachment],
+    content_hash: str,
+    size: int,
+    mime_type: Optional[str],
+    modified_at: datetime
+) -> None:
+    """Met à jour (ou crée) la ligne d'un attachment dont le contenu vient d'être stocké."""
+    if existing:
+        existing.content_hash = content_hash
+        existing.size = size
+        existing.mime_type = mime_type
+        existing.modified_at = modified_at
+        existing.synced_at = datetime.utcnow()
+        existing.is_deleted = False
+    else:
+        new_att = Attachment(
+            user_id=user_id,
+            path=path,
+            content_hash=content_hash,
+            size=size,
+            mime_type=mime_type,
+            modified_at=modified_at,
+            synced_at=datetime.utcnow(),
+            is_deleted=False
+        )
+        db.add(new_att)
+
+
+async def commit_stored_attachment(
+    db: AsyncSession,
+    user_id: int,
+    path: str,
+    existing: Optional[Attachment],
+    content_hash: str,
+    size: int,
+    mime_type: Optional[str],
+    modified_at: datetime
+) -> None:
+    """
+    Enregistre un attachment dont le contenu vient d'être stocké (upload brut,
+    reprenable ou par morceaux) : ligne Attachment, arbre du vault, journal, commit.
+    existing doit avoir été lu avant le stockage du contenu.
+    """
+    old_state = (existing.content_hash, existing.is_deleted) if existing else None
+    _record_attachment(db, user_id, path, existing, content_hash, size, mime_type, modified_at)
+    await update_vault_tree(db, user_id, JOURNAL_KIND_ATTACHMENT, path, old_state, (content_hash, False))
+    await record_change(db, user_id, JOURNAL_KIND_ATTACHMENT, path)
+    await db.commit()
+
+
 async def push_attachments(
     db: AsyncSession,
     user: User,
-    attachments: List[AttachmentContent]
+    attachments: Union[Iterable[AttachmentContent], AsyncIterable[AttachmentContent]]
 ) -> Tuple[List[str], List[str]]:
     """
-    Reçoit les attachments du client et les sauvegarde.
+    Reçoit les attachments du client et les sauvegarde, un par un (liste ou flux
+    lu au fil de la requête).
     Vérifie la taille max (25 Mo).
-    Gère également les suppressions (is_deleted=True).
+    Gère également les suppressions (is_deleted=True) et les contenus référencés
+    par leur hash (content_base64=None), déjà présents sur le serveur.
     Retourne les listes des succès et échecs.
     """
     success = []
     failed = []
     user_id = user.id
 
-    for att in attachments:
+    async for att in iter_items(attachments):
         try:
             # Vérifier la taille
             if att.size > MAX_ATTACHMENT_SIZE:
@@ -46,6 +111,7 @@ async def push_attachments(
                 continue
 
             existing = await get_attachment_by_path(db, user_id, att.path)
+            old_state = (existing.content_hash, existing.is_deleted) if existing else None
 
             if att.is_deleted:
                 # Suppression : supprimer le fichier physique et marquer en base
@@ -70,31 +136,34 @@ async def push_attachments(
                         is_deleted=True
                     )
                     db.add(new_att)
+            elif att.content_base64 is None:
+                # Contenu référencé par son hash : le serveur l'a déjà pour cet utilisateur
+                size = None
+                if await get_attachment_hashes(db, user_id, [att.content_hash]):
+                    size = await storage.link_attachment(user_id, att.path, att.content_hash)
+                if size is None:
+                    logger.warning(
+                        f"Contenu référencé introuvable - user_id={user_id}, path={att.path}, hash={att.content_hash}"
+                    )
+                    failed.append(att.path)
+                    continue
+                computed_hash = att.content_hash
+                _record_attachment(
+                    db, user_id, att.path, existing,
+                    computed_hash, size, att.mime_type, att.modified_at
+                )
             else:
                 # Création/modification normale
                 content_bytes = base64.b64decode(att.content_base64)
                 computed_hash = await storage.save_attachment(user_id, att.path, content_bytes)
+                _record_attachment(
+                    db, user_id, att.path, existing,
+                    computed_hash, len(content_bytes), att.mime_type, att.modified_at
+                )
 
-                if existing:
-                    existing.content_hash = computed_hash
-                    existing.size = len(content_bytes)
-                    existing.mime_type = att.mime_type
-                    existing.modified_at = att.modified_at
-                    existing.synced_at = datetime.utcnow()
-                    existing.is_deleted = False
-                else:
-                    new_att = Attachment(
-                        user_id=user_id,
-                        path=att.path,
-                        content_hash=computed_hash,
-                        size=len(content_bytes),
-                        mime_type=att.mime_type,
-                        modified_at=att.modified_at,
-                        synced_at=datetime.utcnow(),
-                        is_deleted=False
-                    )
-                    db.add(new_att)
-
+            new_state = ("", True) if att.is_deleted else (computed_hash, False)
+            await update_vault_tree(db, user_id, JOURNAL_KIND_ATTACHMENT, att.path, old_state, new_state)
+            await record_change(db, user_id, JOURNAL_KIND_ATTACHMENT, att.path)
             await db.commit()
             success.append(att.path)
 
@@ -116,6 +185,128 @@ async def push_attachments(
     return success, failed
 
 
+async def check_blobs(db: AsyncSession, user: User, hashes: List[str]) -> List[str]:
+    """
+    Retourne, parmi des hashes, ceux dont le contenu est déjà sur le serveur
+    (POST /sync/blobs/check) : le client les pousse par référence, sans le contenu.
+    Seuls les attachments actifs de l'utilisateur comptent, quel que soit leur
+    chemin : la réponse ne révèle rien du contenu des autres utilisateurs.
+    """
+    known = await get_attachment_hashes(db, user.id, hashes)
+    return [h for h in dict.fromkeys(hashes) if h in known]
+
+
+async def upload_attachment(
+    db: AsyncSession,
+    user: User,
+    path: str,
+    chunks: AsyncIterable[bytes],
+    modified_at: datetime,
+    mime_type: Optional[str] = None,
+    expected_hash: Optional[str] = None
+) -> UploadAttachmentResponse:
+    """
+    Enregistre un attachment reçu en binaire brut, en streaming (PUT /sync/attachments/{path}).
+    La taille max (25 Mo) est vérifiée au fil de la réception.
+
+    Raises:
+        ContentTooLargeError: Si le contenu dépasse MAX_ATTACHMENT_SIZE
+        ValueError: Si le chemin est invalide ou si le hash ne correspond pas
+    """
+    user_id = user.id
+    try:
+        existing = await get_attachment_by_path(db, user_id, path)
+        computed_hash, size = await storage.save_attachment_stream(
+            user_id, path, chunks, MAX_ATTACHMENT_SIZE, expected_hash
+        )
+        await commit_stored_attachment(
+            db, user_id, path, existing, computed_hash, size, mime_type, modified_at
+        )
+    except storage.ContentTooLargeError:
+        logger.warning(f"Attachment trop volumineux - user_id={user_id}, path={path}")
+        await db.rollback()
+        raise
+    except ValueError as e:
+        logger.warning(f"Upload rejeté - user_id={user_id}, path={path}, error={str(e)}")
+        await db.rollback()
+        raise
+
+    return UploadAttachmentResponse(path=path, content_hash=computed_hash, size=size)
+
+
+async def start_upload(user: User, request: CreateUploadRequest) -> UploadStatus:
+    """
+    Ouvre un upload reprenable (POST /sync/uploads).
+
+    Raises:
+        ContentTooLargeError: Si la taille annoncée dépasse MAX_ATTACHMENT_SIZE
+        ValueError: Si le chemin est invalide
+    """
+    session = await uploads.create_upload(
+        user.id, request.path, request.size, request.content_hash,
+        request.mime_type, request.modified_at, MAX_ATTACHMENT_SIZE
+    )
+    return _upload_status(session, 0)
+
+
+def _upload_status(session: uploads.UploadSession, offset: int) -> UploadStatus:
+    return UploadStatus(
+        upload_id=session.upload_id,
+        path=session.path,
+        size=session.size,
+        offset=offset,
+        expires_at=session.expires_at
+    )
+
+
+async def get_upload_status(user: User, upload_id: str) -> Optional[UploadStatus]:
+    """État d'un upload reprenable, ou None s'il n'existe pas ou a expiré."""
+    loaded = await uploads.get_upload(user.id, upload_id)
+    return _upload_status(*loaded) if loaded else None
+
+
+async def complete_upload(
+    db: AsyncSession,
+    user: User,
+    upload_id: str
+) -> Optional[UploadAttachmentResponse]:
+    """
+    Finalise un upload reprenable : vérifie la taille et le hash annoncés, range
+    le fichier dans le stockage sans copie et enregistre l'attachment.
+    Retourne None si la session n'existe pas.
+
+    Raises:
+        UploadOffsetMismatch: Si tous les octets n'ont pas encore été reçus
+        ValueError: Si le hash ne correspond pas (la session est abandonnée)
+    """
+    user_id = user.id
+    loaded = await uploads.get_upload(user_id, upload_id)
+    if loaded is None:
+        return None
+    session, offset = loaded
+    if offset != session.size:
+        raise uploads.UploadOffsetMismatch(offset)
+
+    try:
+        existing = await get_attachment_by_path(db, user_id, session.path)
+        computed_hash, size = await storage.adopt_attachment_file(
+            user_id, session.path, uploads.get_part_path(user_id, upload_id), session.content_hash
+        )
+        await commit_stored_attachment(
+            db, user_id, session.path, existing,
+            computed_hash, size, session.mime_type, session.modified_at
+        )
+    except ValueError as e:
+        logger.warning(f"Upload rejeté - user_id={user_id}, path={session.path}, error={str(e)}")
+        await db.rollback()
+        await uploads.delete_upload(user_id, upload_id)
+        raise
+
+    # Le fichier partiel est devenu le blob : seules les métadonnées restent
+    await uploads.delete_upload(user_id, upload_id)
+    return UploadAttachmentResponse(path=session.path, content_hash=computed_hash, size=size)
+
+
 async def pull_attachments(
     db: AsyncSession,
     user: User,
@@ -124,42 +315,79 @@ async def pull_attachments(
     """
     Retourne le contenu des attachments demandés (encodé en base64).
     Pour les attachments supprimés, retourne is_deleted=True avec contenu vide.
+    Les états sont chargés en une requête et les fichiers lus en parallèle.
     """
     attachments = []
     user_id = user.id
 
+    # États en une requête IN, contenus lus en parallèle (concurrence bornée)
+    records = {row.path: row for row in await get_attachments_by_paths(db, user_id, paths)}
+    to_read = [path for path in dict.fromkeys(paths) if path in records and not records[path].is_deleted]
+    contents = dict(zip(to_read, await io_executor.gather(
+        storage.read_attachment(user_id, path) for path in to_read
+    )))
+
     for path in paths:
-        try:
-            att_record = await get_attachment_by_path(db, user_id, path)
-            if att_record:
-                if att_record.is_deleted:
-                    # Attachment supprimé : renvoyer les métadonnées avec contenu vide
-                    attachments.append(AttachmentContent(
-                        path=path,
-                        content_base64="",
-                        content_hash="",
-                        size=0,
-                        mime_type=None,
-                        modified_at=att_record.modified_at,
-                        is_deleted=True
-                    ))
-                else:
-                    content = await storage.read_attachment(user_id, path)
-                    if content is not None:
-                        attachments.append(AttachmentContent(
-                            path=path,
-                            content_base64=base64.b64encode(content).decode("utf-8"),
-                            content_hash=att_record.content_hash,
-                            size=att_record.size,
-                            mime_type=att_record.mime_type,
-                            modified_at=att_record.modified_at,
-                            is_deleted=False
-                        ))
-        except ValueError as e:
+        att_record = records.get(path)
+        if att_record is None:
+            continue
+        if att_record.is_deleted:
+            # Attachment supprimé : renvoyer les métadonnées avec contenu vide
+            attachments.append(AttachmentContent(
+                path=path,
+                content_base64="",
+                content_hash="",
+                size=0,
+                mime_type=None,
+                modified_at=att_record.modified_at,
+                is_deleted=True
+            ))
+            continue
+
+        content = contents[path]
+        if isinstance(content, ValueError):
             # Erreur de validation de chemin (path traversal, etc.)
             logger.warning(
-                f"Chemin invalide rejeté lors du pull - user_id={user_id}, path={path}, error={str(e)}"
+                f"Chemin invalide rejeté lors du pull - user_id={user_id}, path={path}, error={str(content)}"
             )
             # Ne pas ajouter l'attachment à la liste
+            continue
+        if isinstance(content, BaseException):
+            raise content
+        if content is not None:
+            attachments.append(AttachmentContent(
+                path=path,
+                content_base64=base64.b64encode(content).decode("utf-8"),
+                content_hash=att_record.content_hash,
+                size=att_record.size,
+                mime_type=att_record.mime_type,
+                modified_at=att_record.modified_at,
+                is_deleted=False
+            ))
 
     return attachments
+
+
+async def get_attachment_download(
+    db: AsyncSession,
+    user: User,
+    path: str
+) -> Optional[Tuple[Path, Row]]:
+    """
+    Retourne le fichier stocké et l'état d'un attachment à télécharger tel quel
+    (GET /sync/attachments/{path}), ou None s'il n'existe pas ou est supprimé.
+    """
+    user_id = user.id
+    try:
+        att_record = await get_attachment_state_by_path(db, user_id, path)
+        if att_record is None or att_record.is_deleted:
+            return None
+        if await storage.get_attachment_size(user_id, path) is None:
+            return None
+        return storage.get_attachment_path(user_id, path), att_record
+    except ValueError as e:
+        # Erreur de validation de chemin (path traversal, etc.)
+        logger.warning(
+            f"Chemin invalide rejeté lors du téléchargement - user_id={user_id}, path={path}, error={str(e)}"
+        )
+        return None
@@ -0,0 +1,46 @@
+"""
+Collecte des blobs du stockage par contenu.
+
+Un blob est référencé par les lignes Note/Attachment actives de même content_hash
+et par les versions conservées en instantané des notes (NoteVersion sans delta) :
+la base fait foi, les liens physiques ne sont pas comptés, sauf pour les blobs de
+notes compressées (voir storage.collect_blobs). Seuls les blobs sans aucune de
+ces références sont supprimés, avec l'index de leurs morceaux.
+"""
+import logging
+from typing import Set
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, union, delete
+
+from ..models import Note, Attachment, AttachmentChunk, NoteVersion
+from ..core import storage
+from ..core.io_executor import io_executor
+
+
+logger = logging.getLogger(__name__)
+
+
+async def get_referenced_hashes(db: AsyncSession) -> Set[str]:
+    """Retourne les hashes des notes et attachments actifs et des instantanés de versions (tous utilisateurs)."""
+    result = await db.execute(union(
+        select(Note.content_hash).where(Note.is_deleted == False),
+        select(Attachment.content_hash).where(Attachment.is_deleted == False),
+        select(NoteVersion.content_hash).where(NoteVersion.delta.is_(None))
+    ))
+    return {row[0] for row in result.all()}
+
+
+async def collect_unreferenced_blobs(db: AsyncSession) -> int:
+    """Supprime les blobs orphelins et retourne leur nombre."""
+    referenced = await get_referenced_hashes(db)
+    removed = await io_executor.run(storage.collect_blobs, referenced)
+    await db.execute(
+        delete(AttachmentChunk).where(AttachmentChunk.blob_hash.not_in(
+            select(Attachment.content_hash).where(Attachment.is_deleted == False)
+        ))
+    )
+    await db.commit()
+    if removed:
+        logger.info(f"Blobs orphelins supprimés - {removed}")
+    return removed
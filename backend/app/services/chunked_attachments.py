@@ -0,0 +1,247 @@
+"""
+Envoi des attachments par morceaux définis par le contenu (voir core/chunking.py).
+
+Les blobs entiers restent le stockage de référence (téléchargement, Range, liens
+physiques par chemin) ; la table attachment_chunks indexe leurs morceaux. Le
+client découpe le fichier, négocie la liste des morceaux que le serveur n'a pas
+(ni dans un blob de ses attachments, ni déjà reçus), n'envoie que ceux-là, puis
+demande l'assemblage : après l'annotation d'un PDF, seuls les morceaux modifiés
+transitent et sont écrits.
+"""
+import re
+import logging
+from typing import AsyncIterable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, and_, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Attachment, AttachmentChunk, User
+from ..schemas import (
+    ChunkNegotiationRequest,
+    ChunkNegotiationResponse,
+    ChunkedAttachmentRequest,
+    UploadAttachmentResponse
+)
+from ..core import chunking, storage
+from ..core.io_executor import io_executor
+from .sync_utils import (
+    get_attachment_by_path,
+    get_attachment_state_by_path,
+    MAX_ATTACHMENT_SIZE,
+    IN_CLAUSE_BATCH_SIZE
+)
+from .attachments_sync import commit_stored_attachment
+
+
+logger = logging.getLogger(__name__)
+
+# Nombre maximal de morceaux d'un attachment (tous de taille minimale sauf le dernier)
+MAX_CHUNKS_PER_ATTACHMENT = MAX_ATTACHMENT_SIZE // chunking.MIN_CHUNK_SIZE + 1
+
+_CHUNK_HASH_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+# Position d'un morceau dans un blob : (blob_hash, offset, longueur)
+ChunkLocation = Tuple[str, int, int]
+
+
+class MissingChunksError(Exception):
+    """Des morceaux de la recette ne sont ni dans un blob connu ni reçus."""
+
+    def __init__(self, missing: List[str]):
+        super().__init__(f"{len(missing)} morceau(x) manquant(s)")
+        self.missing = missing
+
+
+def _validate_chunk_hashes(chunk_hashes: List[str]) -> None:
+    if len(chunk_hashes) > MAX_CHUNKS_PER_ATTACHMENT:
+        raise ValueError(f"Trop de morceaux (max {MAX_CHUNKS_PER_ATTACHMENT})")
+    for chunk_hash in chunk_hashes:
+        if not _CHUNK_HASH_PATTERN.fullmatch(chunk_hash):
+            raise ValueError(f"Hash de morceau invalide : {chunk_hash[:80]}")
+
+
+async def index_blob_chunks(
+    db: AsyncSession,
+    blob_hash: str,
+    chunks: Optional[List[chunking.Chunk]] = None
+) -> bool:
+    """
+    Indexe les morceaux d'un blob s'il ne l'est pas encore (découpage dans
+    l'exécuteur d'I/O si chunks n'est pas fourni). Ne committe pas.
+    Retourne False si le blob n'existe pas.
+    """
+    already = await db.execute(select(exists().where(AttachmentChunk.blob_hash == blob_hash)))
+    if already.scalar():
+        return True
+    if chunks is None:
+        try:
+            chunks = await io_executor.run(chunking.chunk_file, storage.get_blob_path(blob_hash))
+        except (FileNotFoundError, ValueError):
+            return False
+    db.add_all([
+        AttachmentChunk(
+            blob_hash=blob_hash,
+            chunk_hash=chunk.chunk_hash,
+            chunk_offset=chunk.offset,
+            length=chunk.length
+        )
+        for chunk in chunks
+    ])
+    return True
+
+
+async def locate_chunks(
+    db: AsyncSession,
+    user_id: int,
+    chunk_hashes: List[str]
+) -> Dict[str, ChunkLocation]:
+    """
+    Retrouve des morceaux dans les blobs des attachments actifs de l'utilisateur
+    (requêtes IN par lots). Limité à ses propres attachments : la négociation ne
+    révèle rien du contenu des autres utilisateurs.
+    """
+    wanted = list(dict.fromkeys(chunk_hashes))
+    located: Dict[str, ChunkLocation] = {}
+    for i in range(0, len(wanted), IN_CLAUSE_BATCH_SIZE):
+        batch = wanted[i:i + IN_CLAUSE_BATCH_SIZE]
+        result = await db.execute(
+            select(
+                AttachmentChunk.chunk_hash,
+                AttachmentChunk.blob_hash,
+                AttachmentChunk.chunk_offset,
+                AttachmentChunk.length
+            )
+            .join(Attachment, Attachment.content_hash == AttachmentChunk.blob_hash)
+            .where(and_(
+                Attachment.user_id == user_id,
+                Attachment.is_deleted == False,
+                AttachmentChunk.chunk_hash.in_(batch)
+            ))
+        )
+        for chunk_hash, blob_hash, offset, length in result.all():
+            located.setdefault(chunk_hash, (blob_hash, offset, length))
+    return located
+
+
+async def _find_missing(
+    db: AsyncSession,
+    user_id: int,
+    chunk_hashes: List[str]
+) -> Tuple[Dict[str, ChunkLocation], Dict[str, int], List[str]]:
+    """
+    Morceaux localisés dans des blobs, tailles des morceaux reçus, et morceaux
+    ni localisés ni reçus.
+    """
+    located = await locate_chunks(db, user_id, chunk_hashes)
+    remaining = [h for h in dict.fromkeys(chunk_hashes) if h not in located]
+    sizes = await storage.staged_chunk_sizes(user_id, remaining) if remaining else []
+    staged = {h: size for h, size in zip(remaining, sizes) if size is not None}
+    missing = [h for h in remaining if h not in staged]
+    return located, staged, missing
+
+
+async def negotiate_chunks(
+    db: AsyncSession,
+    user: User,
+    request: ChunkNegotiationRequest
+) -> ChunkNegotiationResponse:
+    """
+    Indique au client les morceaux à envoyer (POST /sync/chunks/negotiate).
+    Si request.path désigne un attachment existant (version précédente du
+    fichier), son blob est indexé au besoin pour que ses morceaux soient réutilisés.
+
+    Raises:
+        ValueError: Si un hash est invalide ou si la liste est trop longue
+    """
+    user_id = user.id
+    _validate_chunk_hashes(request.chunk_hashes)
+
+    if request.path:
+        previous = await get_attachment_state_by_path(db, user_id, request.path)
+        if previous is not None and not previous.is_deleted and previous.content_hash:
+            if await index_blob_chunks(db, previous.content_hash):
+                await db.commit()
+
+    _, _, missing = await _find_missing(db, user_id, request.chunk_hashes)
+    return ChunkNegotiationResponse(
+        missing=missing,
+        min_chunk_size=chunking.MIN_CHUNK_SIZE,
+        avg_chunk_size=chunking.AVG_CHUNK_SIZE,
+        max_chunk_size=chunking.MAX_CHUNK_SIZE
+    )
+
+
+async def upload_chunk(user: User, chunk_hash: str, chunks: AsyncIterable[bytes]) -> int:
+    """
+    Reçoit un morceau (PUT /sync/chunks/{hash}). Retourne sa taille.
+
+    Raises:
+        ContentTooLargeError: Si le morceau dépasse MAX_CHUNK_SIZE
+        ValueError: Si le hash est invalide ou ne correspond pas au contenu
+    """
+    return await storage.save_staged_chunk(user.id, chunk_hash, chunks, chunking.MAX_CHUNK_SIZE)
+
+
+async def commit_chunked_attachment(
+    db: AsyncSession,
+    user: User,
+    request: ChunkedAttachmentRequest
+) -> UploadAttachmentResponse:
+    """
+    Assemble un attachment à partir de ses morceaux et l'enregistre
+    (POST /sync/attachments/chunked). Les morceaux reçus utilisés sont supprimés
+    et les morceaux du nouveau blob sont indexés pour les envois suivants.
+
+    Raises:
+        ContentTooLargeError: Si la taille dépasse MAX_ATTACHMENT_SIZE
+        MissingChunksError: Si des morceaux n'ont pas été envoyés
+        ValueError: Si la recette est incohérente ou si le hash ne correspond pas
+    """
+    user_id = user.id
+    if request.size > MAX_ATTACHMENT_SIZE:
+        raise storage.ContentTooLargeError(f"Contenu trop volumineux (max {MAX_ATTACHMENT_SIZE} octets)")
+    chunk_hashes = [ref.chunk_hash for ref in request.chunks]
+    _validate_chunk_hashes(chunk_hashes)
+    if sum(ref.size for ref in request.chunks) != request.size:
+        raise ValueError("La somme des tailles des morceaux ne correspond pas à la taille annoncée")
+    if any(ref.size > chunking.MAX_CHUNK_SIZE for ref in request.chunks):
+        raise ValueError(f"Morceau trop volumineux (max {chunking.MAX_CHUNK_SIZE} octets)")
+
+    located, staged, missing = await _find_missing(db, user_id, chunk_hashes)
+    if missing:
+        raise MissingChunksError(missing)
+
+    # La recette est indexée telle quelle : chaque taille annoncée doit être celle
+    # du morceau (reçu, donc de hash vérifié, ou déjà indexé), pour que les
+    # intervalles se suivent et couvrent exactement [0, size) du blob assemblé
+    sources: List[storage.ChunkSource] = []
+    recipe: List[chunking.Chunk] = []
+    offset = 0
+    for ref in request.chunks:
+        location = located.get(ref.chunk_hash)
+        if location is None:
+            if staged[ref.chunk_hash] != ref.size:
+                raise ValueError(f"Taille incohérente pour le morceau {ref.chunk_hash}")
+            sources.append(storage.get_staged_chunk_path(user_id, ref.chunk_hash))
+        else:
+            blob_hash, chunk_offset, length = location
+            if length != ref.size:
+                raise ValueError(f"Taille incohérente pour le morceau {ref.chunk_hash}")
+            sources.append((storage.get_blob_path(blob_hash), chunk_offset, length))
+        recipe.append(chunking.Chunk(offset, ref.size, ref.chunk_hash))
+        offset += ref.size
+
+    try:
+        existing = await get_attachment_by_path(db, user_id, request.path)
+        size = await storage.assemble_attachment(user_id, request.path, sources, request.content_hash)
+        await index_blob_chunks(db, request.content_hash, recipe)
+        await commit_stored_attachment(
+            db, user_id, request.path, existing,
+            request.content_hash, size, request.mime_type, request.modified_at
+        )
+    except ValueError as e:
+        logger.warning(f"Assemblage rejeté - user_id={user_id}, path={request.path}, error={str(e)}")
+        await db.rollback()
+        raise
+
+    return UploadAttachmentResponse(path=request.path, content_hash=request.content_hash, size=size)
@@ -18,10 +18,15 @@ from ..schemas import (
 )
 from ..core import storage
 from .sync_utils import (
-    normalize_datetime,
     get_server_notes,
     parse_attachment_references
 )
+from .journal import get_journal_head
+from .manifest_cache import UserManifest, manifest_cache, to_note_states
+from .reconcile import (
+    PUSH, PULL, IDENTICAL, DELETED_ON_SERVER,
+    plan_compare, sort_by_path
+)
 
 
 logger = logging.getLogger(__name__)
@@ -86,7 +91,7 @@ async def get_synced_notes(
     # Construire la réponse avec les tailles de fichiers et les attachments référencés
     notes_list = []
     for note in notes_records:
-        size = storage.get_note_size(user_id, note.path) if not note.is_deleted else 0
+        size = await storage.get_note_size(user_id, note.path) if not note.is_deleted else 0
 
         # Parser le contenu pour trouver les références aux attachments
         referenced_attachments = []
@@ -162,12 +167,13 @@ async def compare_notes(
     server_time = datetime.utcnow()
     user_id = user.id
 
-    # Récupérer toutes les notes du serveur
-    all_server_notes = await get_server_notes(db, user_id, since=None)
-    server_notes_map = {n.path: n for n in all_server_notes}
-
-    # Map des notes client
-    client_notes_map = {n.path: n for n in client_notes}
+    # Récupérer toutes les notes du serveur (triées par chemin), via le cache de manifestes
+    journal_head = await get_journal_head(db, user_id)
+    manifest = manifest_cache.get(user_id, journal_head) or UserManifest(journal_head)
+    if manifest.notes is None:
+        manifest.notes = to_note_states(await get_server_notes(db, user_id, since=None))
+        manifest_cache.put(user_id, manifest)
+    all_server_notes = manifest.notes
 
     to_push: List[NoteToPush] = []
     to_pull: List[NoteToPull] = []
@@ -175,70 +181,37 @@ async def compare_notes(
     deleted_on_server: List[NoteDeletedOnServer] = []
     identical_count = 0
 
-    # Analyser chaque note du client
-    for client_note in client_notes:
-        server_note = server_notes_map.get(client_note.path)
-
-        if server_note is None:
-            # Note existe côté client mais pas serveur -> à pusher
+    for decision in plan_compare(all_server_notes, sort_by_path(client_notes)):
+        action = decision.action
+        if action == IDENTICAL:
+            identical_count += 1
+        elif action == PUSH:
             to_push.append(NoteToPush(
-                path=client_note.path,
-                reason="not_on_server",
-                client_modified=client_note.modified_at
+                path=decision.path,
+                reason=decision.reason,
+                client_modified=decision.client.modified_at
+            ))
+        elif action == PULL:
+            to_pull.append(NoteToPull(
+                path=decision.path,
+                reason=decision.reason,
+                server_modified=decision.server.modified_at,
+                client_modified=decision.client.modified_at if decision.client else None
             ))
-        elif server_note.is_deleted:
-            # Note supprimée sur le serveur
+        elif action == DELETED_ON_SERVER:
             deleted_on_server.append(NoteDeletedOnServer(
-                path=server_note.path,
-                deleted_at=server_note.modified_at
+                path=decision.path,
+                deleted_at=decision.server.modified_at
             ))
         else:
-            # Normaliser les timestamps pour comparaison
-            client_time = normalize_datetime(client_note.modified_at)
-            server_time_note = normalize_datetime(server_note.modified_at)
-
-            if server_note.content_hash == client_note.content_hash:
-                # Même hash -> identique
-                identical_count += 1
-            elif client_time > server_time_note:
-                # Client plus récent -> à pusher
-                to_push.append(NoteToPush(
-                    path=client_note.path,
-                    reason="client_newer",
-                    client_modified=client_note.modified_at
-                ))
-            elif server_time_note > client_time:
-                # Serveur plus récent -> à puller
-                to_pull.append(NoteToPull(
-                    path=server_note.path,
-                    reason="server_newer",
-                    server_modified=server_note.modified_at,
-                    client_modified=client_note.modified_at
-                ))
-            else:
-                # Même timestamp mais hash différent -> conflit
-                conflicts.append(NoteConflict(
-                    path=client_note.path,
-                    reason="both_modified",
-                    client_hash=client_note.content_hash,
-                    server_hash=server_note.content_hash,
-                    client_modified=client_note.modified_at,
-                    server_modified=server_note.modified_at
-                ))
-
-    # Notes sur le serveur que le client n'a pas
-    for path, server_note in server_notes_map.items():
-        if path not in client_notes_map:
-            if server_note.is_deleted:
-                # Ignorer les notes supprimées que le client ne connaît pas
-                pass
-            else:
-                # Note existe sur serveur mais pas client -> à puller
-                to_pull.append(NoteToPull(
-                    path=server_note.path,
-                    reason="not_on_client",
-                    server_modified=server_note.modified_at
-                ))
+            conflicts.append(NoteConflict(
+                path=decision.path,
+                reason=decision.reason,
+                client_hash=decision.client.content_hash,
+                server_hash=decision.server.content_hash,
+                client_modified=decision.client.modified_at,
+                server_modified=decision.server.modified_at
+            ))
 
     # Compter les notes serveur non supprimées
     server_active_count = sum(1 for n in all_server_notes if not n.is_deleted)
@@ -0,0 +1,101 @@
+"""
+Sync en un seul aller-retour (POST /sync/exchange).
+
+Le client envoie son manifeste et, inline, le contenu de ses notes modifiées.
+Le serveur calcule le plan comme POST /sync, applique les pushes prévus dont le
+contenu est fourni, et renvoie inline le contenu des petites notes à puller.
+Ce qui dépasse les seuils reste dans notes_to_push / notes_to_pull et passe par
+les endpoints séparés.
+"""
+from typing import Dict, List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import User
+from ..schemas import (
+    NoteMetadata, NoteContent,
+    ExchangeRequest, ExchangeResponse
+)
+from ..core import storage
+from ..core.config import settings
+from ..core.io_executor import io_executor
+from .notes_sync import process_sync, push_notes
+from .journal import advance_cursor
+
+
+def _content_size(note: NoteContent) -> int:
+    return len(note.content.encode("utf-8"))
+
+
+async def process_exchange(
+    db: AsyncSession,
+    user: User,
+    request: ExchangeRequest
+) -> ExchangeResponse:
+    """
+    Traite une requête de sync avec échange inline des contenus.
+    Les attachments ne sont jamais inline : ils passent par leurs endpoints dédiés.
+    """
+    user_id = user.id
+    plan = await process_sync(db, user, request)
+
+    # Pushes : seulement les notes que le plan demande, dans la limite de taille
+    inline_max = settings.inline_note_max_bytes
+    provided: Dict[str, NoteContent] = {
+        note.path: note for note in request.notes_content
+        if _content_size(note) <= inline_max
+    }
+    to_apply = [provided[path] for path in plan.notes_to_push if path in provided]
+    pushed, push_failed = await push_notes(db, user, to_apply) if to_apply else ([], [])
+    applied = set(pushed)
+    # Le curseur du plan précède les pushes inline : avancé au-delà, pour que le
+    # prochain sync ne renvoie pas au client les notes qu'il vient d'envoyer
+    cursor = await advance_cursor(db, user_id, plan.cursor) if pushed else plan.cursor
+    remaining_push = [path for path in plan.notes_to_push if path not in applied]
+
+    # Pulls : contenu inline tant que le budget de réponse le permet. Tailles puis
+    # contenus retenus lus chacun en un lot parallèle (concurrence bornée)
+    budget = settings.inline_response_max_bytes
+    candidates = [meta for meta in plan.notes_to_pull if not meta.is_deleted]
+    sizes = await io_executor.gather(storage.get_note_size(user_id, meta.path) for meta in candidates)
+    selected: List[NoteMetadata] = []
+    for meta, size in zip(candidates, sizes):
+        if isinstance(size, int) and size <= inline_max and size <= budget:
+            budget -= size
+            selected.append(meta)
+    contents = dict(zip(
+        (meta.path for meta in selected),
+        await io_executor.gather(storage.read_note(user_id, meta.path) for meta in selected)
+    ))
+
+    notes_content: List[NoteContent] = []
+    remaining_pull: List[NoteMetadata] = []
+    for meta in plan.notes_to_pull:
+        content = contents.get(meta.path)
+        if not isinstance(content, str):
+            # Suppression (les métadonnées suffisent), note trop volumineuse ou illisible
+            remaining_pull.append(meta)
+            continue
+        notes_content.append(NoteContent(
+            path=meta.path,
+            content=content,
+            content_hash=meta.content_hash,
+            modified_at=meta.modified_at,
+            is_deleted=False
+        ))
+
+    return ExchangeResponse(
+        server_time=plan.server_time,
+        notes_to_pull=remaining_pull,
+        notes_to_push=remaining_push,
+        conflicts=plan.conflicts,
+        attachments_to_pull=plan.attachments_to_pull,
+        attachments_to_push=plan.attachments_to_push,
+        cursor=cursor or plan.cursor,
+        incremental=plan.incremental,
+        moves_to_push=plan.moves_to_push,
+        moves_to_pull=plan.moves_to_pull,
+        pushed=pushed,
+        push_failed=push_failed,
+        notes_content=notes_content
+    )
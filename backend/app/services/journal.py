@@ -0,0 +1,233 @@
+"""
+Journal des changements et curseurs de synchronisation incrémentale.
+
+Chaque écriture (push de note ou d'attachment, suppression comprise) ajoute une
+entrée au journal. Un curseur encode le dernier numéro de séquence vu par le
+client : le sync suivant ne charge que les chemins modifiés depuis.
+"""
+import base64
+import binascii
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, delete, func
+
+from ..models import SyncJournalEntry, UserSyncState, PathMove
+
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_KIND_NOTE = "note"
+JOURNAL_KIND_ATTACHMENT = "attachment"
+
+
+# Numéros de séquence ajoutés par la requête en cours (db.info) : voir advance_cursor
+_REQUEST_ENTRIES_KEY = "journal_entries"
+
+
+def _remember_entries(db: AsyncSession, ids: Iterable[int]) -> None:
+    db.info.setdefault(_REQUEST_ENTRIES_KEY, set()).update(ids)
+
+
+async def record_change(db: AsyncSession, user_id: int, kind: str, path: str) -> None:
+    """Ajoute une entrée au journal (validée avec le commit de l'appelant)."""
+    result = await db.execute(
+        insert(SyncJournalEntry).values(
+            user_id=user_id,
+            kind=kind,
+            path=path,
+            created_at=datetime.utcnow()
+        ).returning(SyncJournalEntry.id)
+    )
+    _remember_entries(db, result.scalars().all())
+
+
+async def record_changes(db: AsyncSession, user_id: int, kind: str, paths: Iterable[str]) -> None:
+    """Ajoute une entrée au journal par chemin, en une requête (validée avec le commit de l'appelant)."""
+    now = datetime.utcnow()
+    rows = [
+        {"user_id": user_id, "kind": kind, "path": path, "created_at": now}
+        for path in paths
+    ]
+    if rows:
+        result = await db.execute(insert(SyncJournalEntry).returning(SyncJournalEntry.id), rows)
+        _remember_entries(db, result.scalars().all())
+
+
+def encode_cursor(user_id: int, seq: int) -> str:
+    """Encode un curseur opaque lié à l'utilisateur."""
+    raw = f"{user_id}:{seq}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, user_id: int) -> Optional[int]:
+    """
+    Décode un curseur et retourne son numéro de séquence.
+    Retourne None si le curseur est illisible ou appartient à un autre utilisateur.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        owner, seq = raw.split(":", 1)
+        if int(owner) != user_id:
+            return None
+        seq = int(seq)
+    except (ValueError, UnicodeError, binascii.Error):
+        return None
+    return seq if seq >= 0 else None
+
+
+async def get_journal_head(db: AsyncSession, user_id: int) -> int:
+    """Retourne le dernier numéro de séquence du journal (0 si vide)."""
+    result = await db.execute(
+        select(func.max(SyncJournalEntry.id)).where(SyncJournalEntry.user_id == user_id)
+    )
+    return result.scalar() or 0
+
+
+async def get_journal_floor(db: AsyncSession, user_id: int) -> int:
+    """Retourne le plancher de compaction du journal (0 si jamais tronqué)."""
+    result = await db.execute(
+        select(UserSyncState.journal_floor).where(UserSyncState.user_id == user_id)
+    )
+    return result.scalar() or 0
+
+
+async def advance_cursor(db: AsyncSession, user_id: int, cursor: Optional[str]) -> Optional[str]:
+    """
+    Curseur à rendre au client après ses propres écritures (push, upload,
+    déplacement) : cursor avancé au-delà des entrées ajoutées par la requête en
+    cours, jusqu'à la première entrée d'une autre écriture, qui sera vue au
+    prochain sync. Sans cela, le sync suivant renverrait au client ce qu'il vient
+    d'envoyer. Retourne None sans curseur ou si le curseur n'est plus exploitable.
+    Les entrées d'un lot annulé ne sont jamais réutilisées (AUTOINCREMENT).
+    """
+    if not cursor:
+        return None
+    seq = decode_cursor(cursor, user_id)
+    if seq is None or seq < await get_journal_floor(db, user_id):
+        return None
+
+    own = db.info.get(_REQUEST_ENTRIES_KEY, set())
+    result = await db.execute(
+        select(SyncJournalEntry.id)
+        .where(SyncJournalEntry.user_id == user_id, SyncJournalEntry.id > seq)
+        .order_by(SyncJournalEntry.id)
+        .limit(len(own) + 1)
+    )
+    for entry_id in result.scalars().all():
+        if entry_id not in own:
+            break
+        seq = entry_id
+    return encode_cursor(user_id, seq)
+
+
+async def get_changes_since(
+    db: AsyncSession,
+    user_id: int,
+    seq: int,
+    head: int
+) -> Optional[Tuple[Set[str], Set[str]]]:
+    """
+    Retourne les chemins (notes, attachments) modifiés après `seq` et jusqu'à `head`.
+    Retourne None si le curseur n'est plus exploitable (journal compacté,
+    ou curseur postérieur à la tête du journal) : il faut alors une réconciliation complète.
+    """
+    if seq > head or seq < await get_journal_floor(db, user_id):
+        return None
+
+    result = await db.execute(
+        select(SyncJournalEntry.kind, SyncJournalEntry.path)
+        .where(
+            SyncJournalEntry.user_id == user_id,
+            SyncJournalEntry.id > seq,
+            SyncJournalEntry.id <= head
+        )
+        .distinct()
+    )
+    note_paths: Set[str] = set()
+    attachment_paths: Set[str] = set()
+    for kind, path in result.all():
+        if kind == JOURNAL_KIND_NOTE:
+            note_paths.add(path)
+        else:
+            attachment_paths.add(path)
+    return note_paths, attachment_paths
+
+
+async def compact_journal(
+    db: AsyncSession,
+    user_id: int,
+    retention: timedelta
+) -> int:
+    """
+    Compacte le journal d'un utilisateur et retourne le nombre d'entrées supprimées.
+
+    1. Supprime les entrées remplacées par une entrée plus récente sur le même chemin
+       (sans effet sur les curseurs : la dernière entrée de chaque chemin est conservée).
+    2. Tronque les entrées plus anciennes que `retention` et relève le plancher :
+       les curseurs antérieurs déclencheront une réconciliation complète.
+    La dernière entrée est toujours conservée pour que la tête reste monotone.
+    Les déplacements enregistrés au-delà de la rétention sont aussi supprimés.
+    """
+    latest_per_path = (
+        select(func.max(SyncJournalEntry.id))
+        .where(SyncJournalEntry.user_id == user_id)
+        .group_by(SyncJournalEntry.kind, SyncJournalEntry.path)
+    )
+    result = await db.execute(
+        delete(SyncJournalEntry).where(
+            SyncJournalEntry.user_id == user_id,
+            SyncJournalEntry.id.not_in(latest_per_path)
+        )
+    )
+    removed = result.rowcount or 0
+
+    head = await get_journal_head(db, user_id)
+    cutoff = datetime.utcnow() - retention
+    result = await db.execute(
+        select(func.max(SyncJournalEntry.id)).where(
+            SyncJournalEntry.user_id == user_id,
+            SyncJournalEntry.created_at < cutoff
+        )
+    )
+    floor = result.scalar()
+
+    if floor:
+        result = await db.execute(
+            delete(SyncJournalEntry).where(
+                SyncJournalEntry.user_id == user_id,
+                SyncJournalEntry.id <= floor,
+                SyncJournalEntry.id != head
+            )
+        )
+        removed += result.rowcount or 0
+
+        state = await db.get(UserSyncState, user_id)
+        if state is None:
+            db.add(UserSyncState(user_id=user_id, journal_floor=floor))
+        elif floor > state.journal_floor:
+            state.journal_floor = floor
+
+    # Les déplacements ne servent qu'à interpréter la fenêtre du journal
+    await db.execute(
+        delete(PathMove).where(PathMove.user_id == user_id, PathMove.created_at < cutoff)
+    )
+    await db.commit()
+    return removed
+
+
+async def compact_all_journals(db: AsyncSession, retention: timedelta) -> int:
+    """Compacte le journal de tous les utilisateurs ayant des entrées."""
+    result = await db.execute(select(SyncJournalEntry.user_id).distinct())
+    user_ids = [row[0] for row in result.all()]
+
+    removed = 0
+    for user_id in user_ids:
+        removed += await compact_journal(db, user_id, retention)
+
+    if removed:
+        logger.info(f"Journal compacté - {removed} entrées supprimées ({len(user_ids)} utilisateurs)")
+    return removed
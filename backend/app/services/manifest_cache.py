@@ -0,0 +1,125 @@
+"""
+Cache mémoire LRU des manifestes serveur par utilisateur.
+
+Un manifeste est l'état compact (path, hash, dates, suppression) de toutes les notes
+et de tous les attachments d'un utilisateur, trié par chemin. Il est estampillé avec
+la tête du journal des changements : ce compteur, stocké en base, avance à chaque
+push, donc un manifeste dont l'estampille correspond à la tête courante est à jour.
+La fraîcheur se vérifie avec une seule requête indexée, y compris entre workers.
+"""
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from ..core.config import settings
+
+
+class NoteState:
+    """État compact d'une note côté serveur."""
+    __slots__ = ("path", "content_hash", "modified_at", "is_deleted")
+
+    def __init__(self, path, content_hash, modified_at, is_deleted):
+        self.path = path
+        self.content_hash = content_hash
+        self.modified_at = modified_at
+        self.is_deleted = is_deleted
+
+
+class AttachmentState:
+    """État compact d'un attachment côté serveur."""
+    __slots__ = ("path", "content_hash", "size", "mime_type", "modified_at", "is_deleted")
+
+    def __init__(self, path, content_hash, size, mime_type, modified_at, is_deleted):
+        self.path = path
+        self.content_hash = content_hash
+        self.size = size
+        self.mime_type = mime_type
+        self.modified_at = modified_at
+        self.is_deleted = is_deleted
+
+
+class UserManifest:
+    """Manifeste d'un utilisateur ; notes et attachments sont chargés à la demande."""
+    __slots__ = ("version", "notes", "attachments")
+
+    def __init__(self, version: int):
+        self.version = version
+        self.notes: Optional[List[NoteState]] = None
+        self.attachments: Optional[List[AttachmentState]] = None
+
+    def entry_count(self) -> int:
+        return len(self.notes or ()) + len(self.attachments or ())
+
+
+def to_note_states(rows: Iterable) -> List[NoteState]:
+    return [NoteState(r.path, r.content_hash, r.modified_at, r.is_deleted) for r in rows]
+
+
+def to_attachment_states(rows: Iterable) -> List[AttachmentState]:
+    return [
+        AttachmentState(r.path, r.content_hash, r.size, r.mime_type, r.modified_at, r.is_deleted)
+        for r in rows
+    ]
+
+
+class ManifestCache:
+    """
+    Cache LRU borné par nombre d'utilisateurs et par nombre total d'entrées.
+    Utilisé depuis la boucle asyncio uniquement (aucun verrou nécessaire).
+    """
+
+    def __init__(self, max_users: int, max_entries: int):
+        self.max_users = max_users
+        self.max_entries = max_entries
+        self._manifests: "OrderedDict[int, UserManifest]" = OrderedDict()
+        # Taille comptée à l'insertion (un manifeste peut être complété ensuite)
+        self._sizes: Dict[int, int] = {}
+        self._entries = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: int, version: int) -> Optional[UserManifest]:
+        """Retourne le manifeste s'il correspond à la version courante."""
+        manifest = self._manifests.get(user_id)
+        if manifest is None or manifest.version != version:
+            self.misses += 1
+            return None
+        self._manifests.move_to_end(user_id)
+        self.hits += 1
+        return manifest
+
+    def put(self, user_id: int, manifest: UserManifest) -> None:
+        """Enregistre (ou ré-enregistre après chargement partiel) un manifeste."""
+        if self._manifests.pop(user_id, None) is not None:
+            self._entries -= self._sizes.pop(user_id)
+
+        size = manifest.entry_count()
+        if self.max_users <= 0 or size > self.max_entries:
+            return
+
+        self._manifests[user_id] = manifest
+        self._sizes[user_id] = size
+        self._entries += size
+        while len(self._manifests) > self.max_users or self._entries > self.max_entries:
+            evicted_id, _ = self._manifests.popitem(last=False)
+            self._entries -= self._sizes.pop(evicted_id)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._manifests.clear()
+        self._sizes.clear()
+        self._entries = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "users": len(self._manifests),
+            "entries": self._entries,
+            "max_users": self.max_users,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+manifest_cache = ManifestCache(settings.manifest_cache_users, settings.manifest_cache_max_entries)
@@ -0,0 +1,216 @@
+"""
+Déplacements de fichiers (renommages) sans transfert de contenu.
+
+Le planificateur apparie une suppression et une création de même hash
+(voir reconcile.detect_moves) ; le client applique ensuite le déplacement via
+POST /sync/move, et le serveur déplace le fichier stocké.
+"""
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert
+
+from ..models import Note, Attachment, PathMove, User
+from ..schemas import MoveEntry
+from ..core import storage
+from .sync_utils import get_note_by_path, get_attachment_by_path, IN_CLAUSE_BATCH_SIZE
+from .journal import JOURNAL_KIND_NOTE, JOURNAL_KIND_ATTACHMENT, record_change
+from .vault_tree import update_vault_tree
+from .note_versions import move_note_versions
+
+
+logger = logging.getLogger(__name__)
+
+
+async def record_move(
+    db: AsyncSession,
+    user_id: int,
+    kind: str,
+    from_path: str,
+    to_path: str,
+    content_hash: str
+) -> None:
+    """Enregistre un déplacement (validé avec le commit de l'appelant)."""
+    await db.execute(
+        insert(PathMove).values(
+            user_id=user_id,
+            kind=kind,
+            from_path=from_path,
+            to_path=to_path,
+            content_hash=content_hash,
+            created_at=datetime.utcnow()
+        )
+    )
+
+
+async def get_move_sources(
+    db: AsyncSession,
+    user_id: int,
+    kind: str,
+    paths: Iterable[str]
+) -> Dict[str, str]:
+    """
+    Retourne {ancien chemin: hash déplacé} pour les chemins donnés qui ont été
+    déplacés sur le serveur (le déplacement le plus récent l'emporte).
+    """
+    paths = list(paths)
+    sources: Dict[str, str] = {}
+    for start in range(0, len(paths), IN_CLAUSE_BATCH_SIZE):
+        batch = paths[start:start + IN_CLAUSE_BATCH_SIZE]
+        result = await db.execute(
+            select(PathMove.from_path, PathMove.content_hash)
+            .where(
+                PathMove.user_id == user_id,
+                PathMove.kind == kind,
+                PathMove.from_path.in_(batch)
+            )
+            .order_by(PathMove.id)
+        )
+        for from_path, content_hash in result.all():
+            sources[from_path] = content_hash
+    return sources
+
+
+async def apply_moves(
+    db: AsyncSession,
+    user: User,
+    moves: List[MoveEntry]
+) -> Tuple[List[str], List[str]]:
+    """
+    Applique des déplacements : le fichier stocké est déplacé, l'ancien chemin
+    devient une suppression et le nouveau reprend le même contenu.
+    Un déplacement échoue si la source n'a plus le hash attendu ou si la
+    destination contient un autre contenu : le client repasse alors par push.
+    Si le commit échoue, le fichier est remis à son ancien chemin.
+    Retourne les listes des succès et échecs (par chemin de destination).
+    """
+    success = []
+    failed = []
+    user_id = user.id
+
+    for move in moves:
+        moved = False
+        try:
+            if move.kind == JOURNAL_KIND_NOTE:
+                get_by_path, move_file, delete_file = (
+                    get_note_by_path, storage.move_note, storage.delete_note
+                )
+            elif move.kind == JOURNAL_KIND_ATTACHMENT:
+                get_by_path, move_file, delete_file = (
+                    get_attachment_by_path, storage.move_attachment, storage.delete_attachment
+                )
+            else:
+                failed.append(move.to_path)
+                continue
+
+            source = await get_by_path(db, user_id, move.from_path)
+            target = await get_by_path(db, user_id, move.to_path)
+            if (
+                move.from_path == move.to_path
+                or source is None
+                or source.is_deleted
+                or source.content_hash != move.content_hash
+                or (target is not None and not target.is_deleted
+                    and target.content_hash != move.content_hash)
+            ):
+                failed.append(move.to_path)
+                continue
+
+            # Le fichier est déplacé avant le commit, et remis en place si la base
+            # échoue. Une destination vivante a déjà le même contenu : la source
+            # n'est supprimée qu'après le commit.
+            target_live = target is not None and not target.is_deleted
+            if not target_live:
+                if not await move_file(user_id, move.from_path, move.to_path):
+                    failed.append(move.to_path)
+                    continue
+                moved = True
+
+            now = datetime.utcnow()
+            target_old_state = (target.content_hash, target.is_deleted) if target else None
+            if move.kind == JOURNAL_KIND_NOTE:
+                # Avant l'ajout de la nouvelle ligne : ces requêtes déclenchent un
+                # autoflush, qui échouerait sur une Note encore incomplète
+                await move_note_versions(db, user_id, move.from_path, move.to_path)
+                if target is None:
+                    target = Note(user_id=user_id, path=move.to_path)
+                    db.add(target)
+            else:
+                if target is None:
+                    target = Attachment(user_id=user_id, path=move.to_path)
+                    db.add(target)
+                target.size = source.size
+                target.mime_type = source.mime_type
+                source.size = 0
+            target.content_hash = move.content_hash
+            target.modified_at = move.modified_at
+            target.synced_at = now
+            target.is_deleted = False
+
+            source.content_hash = ""
+            source.modified_at = move.modified_at
+            source.synced_at = now
+            source.is_deleted = True
+
+            await update_vault_tree(
+                db, user_id, move.kind, move.from_path, (move.content_hash, False), ("", True)
+            )
+            await update_vault_tree(
+                db, user_id, move.kind, move.to_path, target_old_state, (move.content_hash, False)
+            )
+            await record_change(db, user_id, move.kind, move.from_path)
+            await record_change(db, user_id, move.kind, move.to_path)
+            await record_move(db, user_id, move.kind, move.from_path, move.to_path, move.content_hash)
+            await db.commit()
+            success.append(move.to_path)
+
+        except ValueError as e:
+            # Erreur de validation de chemin (path traversal, etc.)
+            logger.warning(
+                f"Chemin invalide rejeté lors du déplacement - user_id={user_id}, "
+                f"from={move.from_path}, to={move.to_path}, error={str(e)}"
+            )
+            failed.append(move.to_path)
+            await db.rollback()
+            if moved:
+                await _restore_file(user_id, move, move_file)
+            continue
+        except Exception as e:
+            logger.error(
+                f"Erreur lors du déplacement - user_id={user_id}, from={move.from_path}, "
+                f"to={move.to_path}, error={str(e)}",
+                exc_info=True
+            )
+            failed.append(move.to_path)
+            await db.rollback()
+            if moved:
+                await _restore_file(user_id, move, move_file)
+            continue
+
+        if target_live:
+            try:
+                await delete_file(user_id, move.from_path)
+            except Exception as e:
+                # Fichier orphelin : l'ancien chemin est déjà supprimé en base
+                logger.warning(
+                    f"Ancien fichier non supprimé après déplacement - user_id={user_id}, "
+                    f"from={move.from_path}, error={str(e)}"
+                )
+
+    return success, failed
+
+
+async def _restore_file(user_id: int, move: MoveEntry, move_file) -> None:
+    """Remet le fichier à son ancien chemin après l'échec du commit d'un déplacement."""
+    try:
+        restored = await move_file(user_id, move.to_path, move.from_path)
+    except Exception as e:
+        restored = False
+        logger.error(f"Erreur lors de la remise en place - error={str(e)}")
+    if not restored:
+        logger.error(
+            f"Fichier non remis en place après un déplacement échoué - user_id={user_id}, "
+            f"from={move.from_path}, to={move.to_path}"
+        )
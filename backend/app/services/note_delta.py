@@ -0,0 +1,158 @@
+"""
+Push de notes par différence (delta) contre la version déjà synchronisée.
+
+Au lieu du contenu complet, le client envoie base_hash (hash de la version du
+serveur sur laquelle il a travaillé) et un patch par lignes. Les lignes sont
+découpées sur "\\n" uniquement, fin de ligne comprise : le découpage est le même
+côté client (UTF-16) et serveur. Opérations, appliquées dans l'ordre :
+
+    ["=", n]       garder les n lignes suivantes de la base
+    ["-", n]       supprimer les n lignes suivantes de la base
+    ["+", "texte"] insérer du texte
+
+Le patch doit consommer toute la base. Le résultat est vérifié contre le
+content_hash annoncé ; si la base du serveur n'est plus celle du client, la note
+est signalée pour être renvoyée en entier (needs_full_content).
+
+Le même format sert au pull : le serveur calcule le patch entre la version
+annoncée par le client (base_hashes) et la version actuelle.
+"""
+import json
+from difflib import SequenceMatcher
+from typing import List, Optional, Sequence, Tuple, Union
+
+from ..models import Note
+from ..core import storage
+from ..core.config import settings
+from ..core.io_executor import io_executor
+
+
+PatchOp = Tuple[str, Union[int, str]]
+
+
+class NoteDeltaMismatch(Exception):
+    """La base ou le résultat du patch ne correspond pas : renvoyer le contenu complet."""
+
+
+def split_lines(text: str) -> List[str]:
+    """Découpe sur "\\n" en gardant les fins de ligne ("a\\nb" -> ["a\\n", "b"])."""
+    lines = text.split("\n")
+    result = [line + "\n" for line in lines[:-1]]
+    if lines[-1]:
+        result.append(lines[-1])
+    return result
+
+
+def apply_line_patch(base: str, ops: Sequence[PatchOp]) -> str:
+    """
+    Applique un patch par lignes à base.
+
+    Raises:
+        ValueError: Si une opération est invalide ou si le patch ne consomme pas toute la base
+    """
+    lines = split_lines(base)
+    out: List[str] = []
+    pos = 0
+    for code, value in ops:
+        if code == "+":
+            if not isinstance(value, str):
+                raise ValueError("Opération + : texte attendu")
+            out.append(value)
+            continue
+        if not isinstance(value, int) or value < 0:
+            raise ValueError(f"Opération {code} : nombre de lignes attendu")
+        if pos + value > len(lines):
+            raise ValueError("Le patch dépasse la fin de la base")
+        if code == "=":
+            out.extend(lines[pos:pos + value])
+        elif code != "-":
+            raise ValueError(f"Opération inconnue : {code}")
+        pos += value
+    if pos != len(lines):
+        raise ValueError("Le patch ne couvre pas toute la base")
+    return "".join(out)
+
+
+def make_line_patch(base: str, target: str, max_line_pairs: Optional[int] = None) -> List[PatchOp]:
+    """
+    Calcule le patch par lignes qui transforme base en target.
+
+    Les lignes communes en début et en fin sont retirées avant la comparaison
+    (coût linéaire). Si la partie restante dépasse max_line_pairs (lignes de la
+    base × lignes de la cible), elle est remplacée en bloc au lieu d'être
+    comparée : le patch reste valide, moins compact, et le coût reste borné.
+    """
+    base_lines, target_lines = split_lines(base), split_lines(target)
+    ops: List[PatchOp] = []
+
+    def add(code: str, value: Union[int, str]) -> None:
+        if not value:
+            return
+        if ops and ops[-1][0] == code:
+            ops[-1] = (code, ops[-1][1] + value)
+        else:
+            ops.append((code, value))
+
+    start = 0
+    common = min(len(base_lines), len(target_lines))
+    while start < common and base_lines[start] == target_lines[start]:
+        start += 1
+    base_end, target_end = len(base_lines), len(target_lines)
+    while base_end > start and target_end > start and base_lines[base_end - 1] == target_lines[target_end - 1]:
+        base_end -= 1
+        target_end -= 1
+
+    add("=", start)
+    base_mid, target_mid = base_lines[start:base_end], target_lines[start:target_end]
+    if max_line_pairs is not None and len(base_mid) * len(target_mid) > max_line_pairs:
+        add("-", len(base_mid))
+        add("+", "".join(target_mid))
+    else:
+        matcher = SequenceMatcher(None, base_mid, target_mid, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                add("=", i2 - i1)
+                continue
+            add("-", i2 - i1)
+            add("+", "".join(target_mid[j1:j2]))
+    add("=", len(base_lines) - base_end)
+    return ops
+
+
+async def compute_line_patch(base: str, target: str) -> List[PatchOp]:
+    """
+    make_line_patch hors de la boucle asyncio (exécuteur d'I/O), borné par
+    NOTE_DIFF_MAX_LINE_PAIRS.
+    """
+    return await io_executor.run(make_line_patch, base, target, settings.note_diff_max_line_pairs)
+
+
+def patch_size(ops: Sequence[PatchOp]) -> int:
+    """Taille du patch une fois sérialisé en JSON (pour le comparer au contenu complet)."""
+    return len(json.dumps(ops, ensure_ascii=False))
+
+
+async def resolve_note_delta(
+    user_id: int,
+    existing: Optional[Note],
+    base_hash: str,
+    ops: Sequence[PatchOp],
+    content_hash: str
+) -> str:
+    """
+    Reconstruit le contenu d'une note poussée par delta.
+
+    Raises:
+        NoteDeltaMismatch: Si la note du serveur n'est pas à base_hash, ou si le
+                           résultat ne correspond pas à content_hash
+        ValueError: Si le patch est invalide
+    """
+    if existing is None or existing.is_deleted or existing.content_hash != base_hash:
+        raise NoteDeltaMismatch("La version du serveur n'est pas la base du patch")
+    base = await storage.read_note(user_id, existing.path)
+    if base is None:
+        raise NoteDeltaMismatch("Contenu de base introuvable")
+    content = apply_line_patch(base, ops)
+    if storage.compute_hash(content.encode("utf-8")) != content_hash:
+        raise NoteDeltaMismatch("Le contenu obtenu ne correspond pas au hash annoncé")
+    return content
@@ -0,0 +1,243 @@
+"""
+Historique des versions des notes.
+
+Quand le contenu d'une note est remplacé, l'ancienne version est conservée sous
+forme de delta inverse : le patch par lignes (voir note_delta) qui transforme la
+version suivante en celle-ci. La version la plus récente reste le fichier de la
+note (lecture unique) ; une version antérieure est reconstruite à la demande en
+remontant la chaîne depuis la note actuelle, ou depuis l'instantané complet le
+plus proche. Un instantané (blob brut) est pris dès que la chaîne de deltas
+atteindrait NOTE_VERSION_SNAPSHOT_INTERVAL, ou quand le delta ne serait pas
+plus petit que la version : la reconstruction applique au plus
+NOTE_VERSION_SNAPSHOT_INTERVAL - 1 patchs et le stockage croît avec la taille
+des modifications, pas avec celle de la note.
+
+Les versions les plus anciennes sont supprimées au-delà de NOTE_VERSIONS_KEPT
+par note ou de NOTE_VERSIONS_MAX_AGE_DAYS ; les chaînes allant du plus récent au
+plus ancien, cela ne rompt jamais la reconstruction des versions restantes.
+"""
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from sqlalchemy import select, delete, update, and_, or_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import NoteVersion
+from ..core import storage
+from ..core.config import settings
+from .note_delta import compute_line_patch, apply_line_patch
+
+
+logger = logging.getLogger(__name__)
+
+
+async def get_delta_runs(db: AsyncSession, user_id: int, paths: List[str]) -> Dict[str, int]:
+    """
+    Pour chaque note, nombre de deltas consécutifs parmi ses versions les plus
+    récentes (au plus NOTE_VERSION_SNAPSHOT_INTERVAL - 1), en une requête.
+    """
+    limit = settings.note_version_snapshot_interval - 1
+    runs = {path: 0 for path in paths}
+    if not paths or limit <= 0:
+        return runs
+    ranked = (
+        select(
+            NoteVersion.path,
+            NoteVersion.delta.is_(None).label("snapshot"),
+            func.row_number().over(
+                partition_by=NoteVersion.path, order_by=NoteVersion.id.desc()
+            ).label("rank")
+        )
+        .where(and_(NoteVersion.user_id == user_id, NoteVersion.path.in_(paths)))
+        .subquery()
+    )
+    result = await db.execute(
+        select(ranked.c.path, ranked.c.snapshot)
+        .where(ranked.c.rank <= limit)
+        .order_by(ranked.c.path, ranked.c.rank)
+    )
+    anchored: Set[str] = set()
+    for path, snapshot in result.all():
+        if path in anchored:
+            continue
+        if snapshot:
+            anchored.add(path)
+        else:
+            runs[path] += 1
+    return runs
+
+
+async def _prune_paths(db: AsyncSession, user_id: int, paths: List[str]) -> None:
+    """Applique la rétention (nombre et âge) aux versions des notes données, en une requête."""
+    ranked = (
+        select(
+            NoteVersion.id,
+            func.row_number().over(
+                partition_by=NoteVersion.path, order_by=NoteVersion.id.desc()
+            ).label("rank")
+        )
+        .where(and_(NoteVersion.user_id == user_id, NoteVersion.path.in_(paths)))
+        .subquery()
+    )
+    cutoff = datetime.utcnow() - timedelta(days=settings.note_versions_max_age_days)
+    await db.execute(
+        delete(NoteVersion).where(and_(
+            NoteVersion.user_id == user_id,
+            NoteVersion.path.in_(paths),
+            or_(
+                NoteVersion.id.in_(select(ranked.c.id).where(ranked.c.rank > settings.note_versions_kept)),
+                NoteVersion.created_at < cutoff
+            )
+        ))
+    )
+
+
+class PendingVersion(NamedTuple):
+    """Version remplacée prête à être enregistrée : delta inverse, ou None pour un instantané."""
+    path: str
+    content_hash: str
+    delta: Optional[str]
+
+
+async def prepare_note_version(
+    user_id: int,
+    path: str,
+    content_hash: str,
+    new_content: Optional[str],
+    delta_run: int = 0
+) -> Optional[PendingVersion]:
+    """
+    Prépare la conservation de la version actuelle d'une note (content_hash),
+    avant son remplacement par new_content : delta inverse calculé hors de la
+    boucle (borné par NOTE_DIFF_MAX_LINE_PAIRS), ou instantané si le delta n'est
+    pas plus petit, si la chaîne de deltas (delta_run, voir get_delta_runs) est
+    trop longue, ou sans new_content (note reçue en flux, jamais chargée en
+    mémoire). N'accède pas à la base : peut être appelée en parallèle pour un lot.
+    À appeler avant l'écriture du nouveau contenu ; la version n'est enregistrée
+    que par record_note_versions, une fois l'écriture réussie. Retourne None si
+    la version ne peut pas être conservée.
+    """
+    delta = None
+    if new_content is not None:
+        previous = await storage.read_note(user_id, path)
+        if previous is None or storage.compute_hash(previous.encode("utf-8")) != content_hash:
+            logger.warning(f"Version non conservée - user_id={user_id}, path={path}, hash={content_hash}")
+            return None
+        interval = settings.note_version_snapshot_interval
+        if delta_run < interval - 1:
+            delta = json.dumps(await compute_line_patch(new_content, previous), ensure_ascii=False)
+            if len(delta) >= len(previous):
+                delta = None
+
+    if delta is None:
+        if not await storage.preserve_note_version(user_id, path, content_hash):
+            logger.warning(f"Instantané non conservé - user_id={user_id}, path={path}, hash={content_hash}")
+            return None
+    return PendingVersion(path, content_hash, delta)
+
+
+async def record_note_versions(db: AsyncSession, user_id: int, versions: List[PendingVersion]) -> None:
+    """
+    Enregistre les versions préparées des notes effectivement écrites (une
+    insertion), puis applique la rétention (une requête). Ne committe pas.
+    """
+    if not versions:
+        return
+    db.add_all([
+        NoteVersion(user_id=user_id, path=v.path, content_hash=v.content_hash, delta=v.delta)
+        for v in versions
+    ])
+    await db.flush()
+    await _prune_paths(db, user_id, list(dict.fromkeys(v.path for v in versions)))
+
+
+async def forget_note_versions(db: AsyncSession, user_id: int, paths: Iterable[str]) -> None:
+    """Supprime les versions de notes supprimées (une requête). Ne committe pas."""
+    paths = list(paths)
+    if not paths:
+        return
+    await db.execute(
+        delete(NoteVersion).where(and_(NoteVersion.user_id == user_id, NoteVersion.path.in_(paths)))
+    )
+
+
+async def move_note_versions(db: AsyncSession, user_id: int, from_path: str, to_path: str) -> None:
+    """
+    Rattache l'historique d'une note déplacée à son nouveau chemin (les deltas
+    les plus récents s'appliquent à la note actuelle). Ne committe pas.
+    """
+    await forget_note_versions(db, user_id, [to_path])
+    await db.execute(
+        update(NoteVersion)
+        .where(and_(NoteVersion.user_id == user_id, NoteVersion.path == from_path))
+        .values(path=to_path)
+    )
+
+
+async def get_version_content(db: AsyncSession, user_id: int, content_hash: str) -> Optional[str]:
+    """
+    Contenu d'une version conservée d'une note de l'utilisateur (quel que soit son
+    chemin), reconstruit depuis l'ancre la plus proche : instantané plus récent
+    ou note actuelle. None si la version n'est pas conservée ou si la chaîne est
+    incohérente.
+    """
+    result = await db.execute(
+        select(NoteVersion.id, NoteVersion.path)
+        .where(and_(NoteVersion.user_id == user_id, NoteVersion.content_hash == content_hash))
+        .order_by(NoteVersion.id.desc())
+        .limit(1)
+    )
+    target = result.first()
+    if target is None:
+        return None
+
+    # Versions de la cible vers la plus récente, jusqu'au premier instantané
+    result = await db.execute(
+        select(NoteVersion.content_hash, NoteVersion.delta)
+        .where(and_(
+            NoteVersion.user_id == user_id,
+            NoteVersion.path == target.path,
+            NoteVersion.id >= target.id
+        ))
+        .order_by(NoteVersion.id)
+    )
+    chain = []
+    anchor_hash = None
+    for version_hash, delta in result.all():
+        if delta is None:
+            anchor_hash = version_hash
+            break
+        chain.append(delta)
+
+    try:
+        if anchor_hash is not None:
+            content = await storage.read_blob_text(anchor_hash)
+        else:
+            content = await storage.read_note(user_id, target.path)
+        if content is None:
+            return None
+        for delta in reversed(chain):
+            content = apply_line_patch(content, json.loads(delta))
+    except ValueError as e:
+        logger.warning(
+            f"Version non reconstruite - user_id={user_id}, path={target.path}, "
+            f"hash={content_hash}, error={str(e)}"
+        )
+        return None
+
+    if storage.compute_hash(content.encode("utf-8")) != content_hash:
+        return None
+    return content
+
+
+async def prune_note_versions(db: AsyncSession) -> int:
+    """Supprime les versions plus anciennes que NOTE_VERSIONS_MAX_AGE_DAYS (tous utilisateurs)."""
+    cutoff = datetime.utcnow() - timedelta(days=settings.note_versions_max_age_days)
+    result = await db.execute(delete(NoteVersion).where(NoteVersion.created_at < cutoff))
+    await db.commit()
+    removed = result.rowcount or 0
+    if removed:
+        logger.info(f"Versions de notes expirées supprimées - {removed}")
+    return removed
@@ -1,353 +1,652 @@
 """
 Logique de synchronisation des notes.
 """
+import asyncio
 import logging
 from datetime import datetime
-from typing import List, Tuple
+from typing import Any, AsyncIterable, BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
 
+from sqlalchemy import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..models import Note, User
+from ..models import User
 from ..schemas import (
-    NoteMetadata, NoteContent, AttachmentMetadata,
-    SyncRequest, SyncResponse
+    NoteMetadata, NoteContent, NoteDelta, AttachmentMetadata, MoveEntry,
+    SyncRequest, SyncResponse, UploadNoteResponse
 )
 from ..core import storage
+from ..core.config import settings
+from ..core.io_executor import io_executor
 from .sync_utils import (
-    normalize_datetime,
     get_server_notes,
-    get_note_by_path,
-    get_server_attachments
+    get_note_state_by_path,
+    get_notes_by_paths,
+    upsert_notes,
+    get_server_attachments,
+    get_attachments_by_paths,
+    iter_items
+)
+from .journal import (
+    JOURNAL_KIND_NOTE,
+    JOURNAL_KIND_ATTACHMENT,
+    record_changes,
+    encode_cursor,
+    decode_cursor,
+    get_journal_head,
+    get_changes_since
+)
+from .vault_tree import update_vault_tree, update_vault_tree_batch
+from .note_delta import resolve_note_delta, compute_line_patch, patch_size, NoteDeltaMismatch
+from .note_versions import (
+    PendingVersion,
+    get_delta_runs,
+    prepare_note_version,
+    record_note_versions,
+    forget_note_versions,
+    get_version_content
+)
+from .reconcile import (
+    PUSH, PULL, MOVE,
+    plan_notes, plan_attachments, detect_moves, sort_by_path
+)
+from .moves import get_move_sources
+from .manifest_cache import (
+    UserManifest,
+    manifest_cache,
+    to_note_states,
+    to_attachment_states
 )
 
 
 logger = logging.getLogger(__name__)
 
+# Lots de push : une requête IN, un upsert et un commit par lot. La taille en
+# octets borne la mémoire retenue quand les notes arrivent en flux.
+PUSH_BATCH_SIZE = 200
+PUSH_BATCH_MAX_BYTES = 32 * 1024 * 1024
+
+# Listes de SyncResponse alimentées par iter_sync_plan
+SYNC_PLAN_FIELDS = (
+    "notes_to_pull",
+    "notes_to_push",
+    "conflicts",
+    "attachments_to_pull",
+    "attachments_to_push",
+    "moves_to_push",
+    "moves_to_pull",
+)
+
 
-async def process_sync(
+class SyncState(NamedTuple):
+    """État serveur chargé pour un sync, prêt à être planifié sans accès à la base."""
+    server_time: datetime
+    cursor: str
+    incremental: bool
+    server_notes: list
+    server_attachments: list
+    changed_note_paths: Optional[Set[str]]
+    note_move_sources: Dict[str, str]
+    attachment_move_sources: Dict[str, str]
+
+
+async def load_sync_state(
     db: AsyncSession,
     user: User,
     request: SyncRequest
-) -> SyncResponse:
+) -> SyncState:
     """
-    Traite une requête de synchronisation.
-    Compare les métadonnées client/serveur et détermine les actions à effectuer.
-    Gère les suppressions : propage is_deleted aux autres devices.
+    Charge l'état serveur nécessaire au plan de sync.
+
+    Avec un curseur valide, seuls les chemins envoyés par le client et ceux
+    modifiés dans le journal depuis le curseur sont chargés (sync incrémental).
+    Sinon, tout l'état serveur est chargé (depuis le cache de manifestes si possible).
     """
     server_time = datetime.utcnow()
+    user_id = user.id
+
+    # Lire la tête du journal AVANT l'état serveur : un push concurrent
+    # sera revu au prochain sync plutôt que perdu
+    journal_head = await get_journal_head(db, user_id)
+    changes = None
+    if request.cursor:
+        since_seq = decode_cursor(request.cursor, user_id)
+        if since_seq is not None:
+            changes = await get_changes_since(db, user_id, since_seq, journal_head)
+    incremental = changes is not None
+
+    note_move_sources: Dict[str, str] = {}
+    attachment_move_sources: Dict[str, str] = {}
+    if incremental:
+        changed_note_paths, changed_attachment_paths = changes
+        server_notes = sort_by_path(await get_notes_by_paths(
+            db, user_id, changed_note_paths | {n.path for n in request.notes}
+        ))
+        server_attachments = sort_by_path(await get_attachments_by_paths(
+            db, user_id, changed_attachment_paths | {a.path for a in request.attachments}
+        ))
+        if request.detect_moves:
+            note_move_sources = await get_move_sources(
+                db, user_id, JOURNAL_KIND_NOTE, changed_note_paths
+            )
+            attachment_move_sources = await get_move_sources(
+                db, user_id, JOURNAL_KIND_ATTACHMENT, changed_attachment_paths
+            )
+    else:
+        # TOUTES les notes et attachments du serveur (triés par chemin),
+        # depuis le cache si aucun push n'a eu lieu depuis son chargement
+        changed_note_paths = None
+        manifest = manifest_cache.get(user_id, journal_head) or UserManifest(journal_head)
+        if manifest.notes is None:
+            manifest.notes = to_note_states(await get_server_notes(db, user_id, since=None))
+        if manifest.attachments is None:
+            manifest.attachments = to_attachment_states(await get_server_attachments(db, user_id))
+        manifest_cache.put(user_id, manifest)
+        server_notes = manifest.notes
+        server_attachments = manifest.attachments
+
+    return SyncState(
+        server_time=server_time,
+        cursor=encode_cursor(user_id, journal_head),
+        incremental=incremental,
+        server_notes=server_notes,
+        server_attachments=server_attachments,
+        changed_note_paths=changed_note_paths,
+        note_move_sources=note_move_sources,
+        attachment_move_sources=attachment_move_sources
+    )
 
-    # Récupérer TOUTES les notes du serveur pour la comparaison
-    # (pas seulement celles modifiées depuis last_sync)
-    all_server_notes = await get_server_notes(db, user.id, since=None)
-    server_notes_map = {n.path: n for n in all_server_notes}
 
-    # Récupérer les notes serveur modifiées depuis le dernier sync (pour notes_to_pull)
-    server_notes_changed = await get_server_notes(db, user.id, request.last_sync)
-    server_notes_changed_paths = {n.path for n in server_notes_changed}
+def iter_sync_plan(state: SyncState, request: SyncRequest) -> Iterator[Tuple[str, Any]]:
+    """
+    Produit le plan de sync entrée par entrée, sous forme (champ de SyncResponse, valeur),
+    au fur et à mesure du parcours (sans accès à la base).
+    """
+    # En incrémental, les suppressions du journal sont propagées même si le client
+    # n'a pas mentionné la note : il la connaissait peut-être au moment du curseur
+    note_decisions = plan_notes(
+        state.server_notes,
+        sort_by_path(request.notes),
+        since=request.last_sync,
+        changed_paths=state.changed_note_paths,
+        include_server_deleted=state.incremental
+    )
+    if request.detect_moves:
+        note_decisions = detect_moves(note_decisions, state.note_move_sources)
+
+    for decision in note_decisions:
+        if decision.action == MOVE:
+            field = "moves_to_push" if decision.direction == PUSH else "moves_to_pull"
+            yield field, _move_entry(JOURNAL_KIND_NOTE, decision)
+        elif decision.action == PUSH:
+            yield "notes_to_push", decision.path
+        elif decision.action == PULL:
+            yield "notes_to_pull", _note_metadata(decision.server)
+        else:
+            yield "conflicts", _note_metadata(decision.server)
 
-    # Notes envoyées par le client
-    client_notes_map = {n.path: n for n in request.notes}
+    # Logique pour les pièces jointes
+    attachment_decisions = plan_attachments(
+        state.server_attachments,
+        sort_by_path(request.attachments),
+        include_server_deleted=state.incremental
+    )
+    if request.detect_moves:
+        attachment_decisions = detect_moves(attachment_decisions, state.attachment_move_sources)
+
+    for decision in attachment_decisions:
+        if decision.action == MOVE:
+            field = "moves_to_push" if decision.direction == PUSH else "moves_to_pull"
+            yield field, _move_entry(JOURNAL_KIND_ATTACHMENT, decision)
+        elif decision.action == PUSH:
+            yield "attachments_to_push", decision.path
+        else:
+            yield "attachments_to_pull", _attachment_metadata(decision.server)
 
-    notes_to_pull: List[NoteMetadata] = []
-    notes_to_push: List[str] = []
-    conflicts: List[NoteMetadata] = []
 
-    # Analyser chaque note du client
-    for client_note in request.notes:
-        server_note = server_notes_map.get(client_note.path)
+async def process_sync(
+    db: AsyncSession,
+    user: User,
+    request: SyncRequest
+) -> SyncResponse:
+    """
+    Traite une requête de synchronisation.
+    Compare les métadonnées client/serveur et détermine les actions à effectuer.
+    Gère les suppressions : propage is_deleted aux autres devices.
+    """
+    state = await load_sync_state(db, user, request)
 
-        if server_note is None:
-            # Note n'existe pas sur le serveur -> le serveur veut la recevoir
-            notes_to_push.append(client_note.path)
-        else:
-            # Normaliser les timestamps pour comparaison
-            client_time = normalize_datetime(client_note.modified_at)
-            server_time_note = normalize_datetime(server_note.modified_at)
-
-            if client_note.is_deleted:
-                # Client signale une suppression
-                if not server_note.is_deleted:
-                    if client_time >= server_time_note:
-                        # Suppression client est plus récente -> accepter
-                        notes_to_push.append(client_note.path)
-                    else:
-                        # Serveur a été modifié après la suppression -> conflit
-                        conflicts.append(NoteMetadata(
-                            path=server_note.path,
-                            content_hash=server_note.content_hash,
-                            modified_at=server_note.modified_at,
-                            is_deleted=server_note.is_deleted
-                        ))
-                # Si déjà supprimé sur le serveur, rien à faire
-            elif server_note.is_deleted:
-                # Serveur a supprimé mais client a encore la note
-                if client_time > server_time_note:
-                    # Client a modifié après la suppression -> recréer la note
-                    notes_to_push.append(client_note.path)
-                else:
-                    # Suppression serveur est plus récente -> propager au client
-                    # Les suppressions sont toujours propagées (même si pas modifiées depuis last_sync)
-                    notes_to_pull.append(NoteMetadata(
-                        path=server_note.path,
-                        content_hash=server_note.content_hash,
-                        modified_at=server_note.modified_at,
-                        is_deleted=True
-                    ))
-            elif server_note.content_hash == client_note.content_hash:
-                # Même hash -> pas de changement
-                pass
-            elif client_time > server_time_note:
-                # Client plus récent -> le serveur veut recevoir la mise à jour
-                notes_to_push.append(client_note.path)
-            elif server_time_note > client_time:
-                # Serveur plus récent -> client doit récupérer
-                # Mais seulement si la note a été modifiée depuis last_sync
-                if server_note.path in server_notes_changed_paths:
-                    notes_to_pull.append(NoteMetadata(
-                        path=server_note.path,
-                        content_hash=server_note.content_hash,
-                        modified_at=server_note.modified_at,
-                        is_deleted=server_note.is_deleted
-                    ))
-            else:
-                # Même timestamp mais hash différent -> conflit
-                conflicts.append(NoteMetadata(
-                    path=server_note.path,
-                    content_hash=server_note.content_hash,
-                    modified_at=server_note.modified_at,
-                    is_deleted=server_note.is_deleted
-                ))
-
-    # Notes sur le serveur que le client n'a pas mentionnées
-    for path, server_note in server_notes_map.items():
-        if path not in client_notes_map:
-            # Ne pas envoyer les notes supprimées si le client ne les connaît pas
-            # (évite de propager des suppressions de notes jamais vues)
-            if not server_note.is_deleted:
-                # Le client n'a JAMAIS eu cette note -> TOUJOURS la proposer
-                # Correction: on ne filtre plus par last_sync ici car le client
-                # ne connaît pas cette note, il doit la recevoir indépendamment
-                # de quand elle a été créée/modifiée sur le serveur
-                notes_to_pull.append(NoteMetadata(
-                    path=server_note.path,
-                    content_hash=server_note.content_hash,
-                    modified_at=server_note.modified_at,
-                    is_deleted=server_note.is_deleted
-                ))
+    plan: Dict[str, list] = {field: [] for field in SYNC_PLAN_FIELDS}
+    for field, value in iter_sync_plan(state, request):
+        plan[field].append(value)
 
-    # Logique pour les pièces jointes
-    attachments_to_pull: List[AttachmentMetadata] = []
-    attachments_to_push: List[str] = []
+    return SyncResponse(
+        server_time=state.server_time,
+        cursor=state.cursor,
+        incremental=state.incremental,
+        **plan
+    )
 
-    # Récupérer tous les attachments du serveur
-    all_server_attachments = await get_server_attachments(db, user.id)
-    server_attachments_map = {a.path: a for a in all_server_attachments}
 
-    # Map des attachments client
-    client_attachments_map = {a.path: a for a in request.attachments}
+def _note_metadata(server_note) -> NoteMetadata:
+    """Métadonnées d'une note serveur (sans revalidation Pydantic)."""
+    return NoteMetadata.model_construct(
+        path=server_note.path,
+        content_hash=server_note.content_hash,
+        modified_at=server_note.modified_at,
+        is_deleted=bool(server_note.is_deleted)
+    )
 
-    # Analyser chaque attachment du client
-    for client_att in request.attachments:
-        server_att = server_attachments_map.get(client_att.path)
 
-        if server_att is None:
-            # Attachment n'existe pas sur le serveur -> le serveur veut le recevoir
-            attachments_to_push.append(client_att.path)
-        else:
-            # Normaliser les timestamps pour comparaison
-            client_time = normalize_datetime(client_att.modified_at)
-            server_time_att = normalize_datetime(server_att.modified_at)
-
-            if client_att.is_deleted:
-                # Client signale une suppression
-                if not server_att.is_deleted:
-                    if client_time >= server_time_att:
-                        # Suppression client est plus récente -> accepter
-                        attachments_to_push.append(client_att.path)
-                    # Sinon: serveur a été modifié après -> on garde la version serveur
-                    # (pas de conflit pour attachments, on re-propose le serveur)
-                    else:
-                        attachments_to_pull.append(AttachmentMetadata(
-                            path=server_att.path,
-                            content_hash=server_att.content_hash,
-                            size=server_att.size,
-                            mime_type=server_att.mime_type,
-                            modified_at=server_att.modified_at,
-                            is_deleted=server_att.is_deleted
-                        ))
-                # Si déjà supprimé sur le serveur, rien à faire
-            elif server_att.is_deleted:
-                # Serveur a supprimé mais client a encore l'attachment
-                if client_time > server_time_att:
-                    # Client a modifié après la suppression -> recréer l'attachment
-                    attachments_to_push.append(client_att.path)
-                else:
-                    # Suppression serveur est plus récente -> propager au client
-                    attachments_to_pull.append(AttachmentMetadata(
-                        path=server_att.path,
-                        content_hash=server_att.content_hash,
-                        size=server_att.size,
-                        mime_type=server_att.mime_type,
-                        modified_at=server_att.modified_at,
-                        is_deleted=True
-                    ))
-            elif server_att.content_hash != client_att.content_hash:
-                # Hash différent - comme les attachments sont immutables,
-                # on garde la version serveur (client doit pull)
-                attachments_to_pull.append(AttachmentMetadata(
-                    path=server_att.path,
-                    content_hash=server_att.content_hash,
-                    size=server_att.size,
-                    mime_type=server_att.mime_type,
-                    modified_at=server_att.modified_at,
-                    is_deleted=server_att.is_deleted
-                ))
-            # Si même hash, rien à faire
-
-    # Attachments sur le serveur que le client n'a pas
-    for path, server_att in server_attachments_map.items():
-        if path not in client_attachments_map:
-            # Ne pas envoyer les attachments supprimés si le client ne les connaît pas
-            if not server_att.is_deleted:
-                # Le client n'a pas cet attachment -> toujours le proposer
-                attachments_to_pull.append(AttachmentMetadata(
-                    path=server_att.path,
-                    content_hash=server_att.content_hash,
-                    size=server_att.size,
-                    mime_type=server_att.mime_type,
-                    modified_at=server_att.modified_at,
-                    is_deleted=server_att.is_deleted
-                ))
+def _move_entry(kind: str, move) -> MoveEntry:
+    """Déplacement à appliquer, décrit par l'entrée de destination."""
+    if move.direction == PUSH:
+        # Hash attendu à l'ancien chemin sur le serveur, date du client
+        content_hash = move.source.server.content_hash
+        modified_at = move.target.client.modified_at
+    else:
+        content_hash = move.target.server.content_hash
+        modified_at = move.target.server.modified_at
+    return MoveEntry.model_construct(
+        kind=kind,
+        from_path=move.from_path,
+        to_path=move.to_path,
+        content_hash=content_hash,
+        modified_at=modified_at
+    )
 
-    return SyncResponse(
-        server_time=server_time,
-        notes_to_pull=notes_to_pull,
-        notes_to_push=notes_to_push,
-        conflicts=conflicts,
-        attachments_to_pull=attachments_to_pull,
-        attachments_to_push=attachments_to_push
+
+def _attachment_metadata(server_att) -> AttachmentMetadata:
+    """Métadonnées d'un attachment serveur (sans revalidation Pydantic)."""
+    return AttachmentMetadata.model_construct(
+        path=server_att.path,
+        content_hash=server_att.content_hash,
+        size=server_att.size,
+        mime_type=server_att.mime_type,
+        modified_at=server_att.modified_at,
+        is_deleted=bool(server_att.is_deleted)
     )
 
 
 async def push_notes(
     db: AsyncSession,
     user: User,
-    notes: List[NoteContent]
+    notes: Union[Iterable[NoteContent], AsyncIterable[NoteContent]],
+    needs_full_content: Optional[List[str]] = None
 ) -> Tuple[List[str], List[str]]:
     """
-    Reçoit les notes du client et les sauvegarde.
-    Gère également les suppressions (is_deleted=True).
+    Reçoit les notes du client et les sauvegarde par lots (liste ou flux lu au
+    fil de la requête) : au plus PUSH_BATCH_SIZE notes et PUSH_BATCH_MAX_BYTES de
+    contenu par lot, un même chemin jamais deux fois dans un lot. Gère également
+    les suppressions (is_deleted=True) et les notes poussées par patch
+    (NoteDelta.patch) : celles dont la base ne correspond plus sont en échec et
+    ajoutées à needs_full_content.
     Retourne les listes des succès et échecs.
     """
     success = []
     failed = []
     user_id = user.id  # Capturer l'ID avant le try/except pour éviter les problèmes SQLAlchemy
 
-    for note in notes:
-        try:
-            existing = await get_note_by_path(db, user_id, note.path)
-
-            if note.is_deleted:
-                # Suppression : supprimer le fichier physique et marquer en base
-                await storage.delete_note(user.id, note.path)
-
-                if existing:
-                    existing.is_deleted = True
-                    existing.modified_at = note.modified_at
-                    existing.synced_at = datetime.utcnow()
-                    existing.content_hash = ""  # Hash vide pour note supprimée
-                else:
-                    # Créer une entrée pour tracer la suppression
-                    new_note = Note(
-                        user_id=user_id,
-                        path=note.path,
-                        content_hash="",
-                        modified_at=note.modified_at,
-                        synced_at=datetime.utcnow(),
-                        is_deleted=True
-                    )
-                    db.add(new_note)
-            else:
-                # Création/modification normale
-                computed_hash = await storage.save_note(user_id, note.path, note.content)
-
-                if existing:
-                    existing.content_hash = computed_hash
-                    existing.modified_at = note.modified_at
-                    existing.synced_at = datetime.utcnow()
-                    existing.is_deleted = False
-                else:
-                    new_note = Note(
-                        user_id=user_id,
-                        path=note.path,
-                        content_hash=computed_hash,
-                        modified_at=note.modified_at,
-                        synced_at=datetime.utcnow(),
-                        is_deleted=False
-                    )
-                    db.add(new_note)
-
-            await db.commit()
-            success.append(note.path)
-
-        except ValueError as e:
-            # Erreur de validation de chemin (path traversal, etc.)
-            logger.warning(
-                f"Chemin invalide rejeté - user_id={user_id}, path={note.path}, error={str(e)}"
-            )
-            failed.append(note.path)
-            await db.rollback()
-        except Exception as e:
-            logger.error(
-                f"Erreur lors de la sauvegarde de la note - user_id={user_id}, path={note.path}, error={str(e)}",
-                exc_info=True
-            )
-            failed.append(note.path)
-            await db.rollback()
+    batch: List[NoteContent] = []
+    batch_paths: Set[str] = set()
+    batch_bytes = 0
+    try:
+        async for note in iter_items(notes):
+            size = len(note.content or "")
+            if batch and (
+                note.path in batch_paths
+                or len(batch) >= PUSH_BATCH_SIZE
+                or batch_bytes + size > PUSH_BATCH_MAX_BYTES
+            ):
+                full, batch, batch_paths, batch_bytes = batch, [], set(), 0
+                await _push_note_batch(db, user_id, full, success, failed, needs_full_content)
+            batch.append(note)
+            batch_paths.add(note.path)
+            batch_bytes += size
+    except Exception:
+        # Flux interrompu (élément trop volumineux ou invalide) : les notes déjà
+        # reçues sont enregistrées avant que l'erreur ne remonte au client
+        if batch:
+            await _push_note_batch(db, user_id, batch, success, failed, needs_full_content)
+        raise
+    if batch:
+        await _push_note_batch(db, user_id, batch, success, failed, needs_full_content)
 
     return success, failed
 
 
+class _PreparedNote(NamedTuple):
+    """
+    Note d'un lot prête à être écrite : état précédent, contenu (None pour une
+    suppression) et version remplacée à enregistrer si l'écriture réussit.
+    """
+    note: NoteContent
+    old_state: Optional[Tuple[str, bool]]
+    content: Optional[str]
+    version: Optional[PendingVersion] = None
+
+
+def _log_push_error(user_id: int, path: str, error: Exception) -> None:
+    if isinstance(error, ValueError):
+        # Erreur de validation de chemin (path traversal, etc.)
+        logger.warning(f"Chemin invalide rejeté - user_id={user_id}, path={path}, error={str(error)}")
+    else:
+        logger.error(
+            f"Erreur lors de la sauvegarde de la note - user_id={user_id}, path={path}, error={str(error)}",
+            exc_info=error
+        )
+
+
+async def _prepare_note(
+    user_id: int,
+    note: NoteContent,
+    existing: Optional[Row],
+    delta_run: int
+) -> _PreparedNote:
+    """
+    Résout le contenu d'une note (patch éventuel) et prépare la conservation
+    de la version remplacée, avant toute écriture. N'accède pas à la base.
+
+    Raises:
+        NoteDeltaMismatch: Si la base du patch ne correspond plus
+        ValueError: Si le chemin, le patch ou le contenu est invalide
+    """
+    storage.sanitize_path(note.path)
+    old_state = (existing.content_hash, existing.is_deleted) if existing else None
+    if note.is_deleted:
+        return _PreparedNote(note, old_state, None)
+
+    content = note.content
+    patch = getattr(note, "patch", None)
+    if patch is not None:
+        content = await resolve_note_delta(user_id, existing, note.base_hash, patch, note.content_hash)
+    elif content is None:
+        raise ValueError("Contenu ou patch manquant")
+    version = None
+    if existing and not existing.is_deleted and existing.content_hash \
+            and existing.content_hash != storage.compute_hash(content.encode("utf-8")):
+        # Version remplacée conservée dans l'historique (delta inverse)
+        version = await prepare_note_version(user_id, note.path, existing.content_hash, content, delta_run)
+    return _PreparedNote(note, old_state, content, version)
+
+
+async def _write_note(user_id: int, prepared: _PreparedNote) -> str:
+    """Écrit (ou supprime) le fichier d'une note et retourne son nouveau hash."""
+    if prepared.content is None:
+        await storage.delete_note(user_id, prepared.note.path)
+        return ""
+    return await storage.save_note(user_id, prepared.note.path, prepared.content)
+
+
+async def _push_note_batch(
+    db: AsyncSession,
+    user_id: int,
+    batch: List[NoteContent],
+    success: List[str],
+    failed: List[str],
+    needs_full_content: Optional[List[str]]
+) -> None:
+    """
+    Applique un lot de notes : états existants en une requête IN, contenus
+    résolus et versions remplacées préparées en parallèle, fichiers écrits en
+    parallèle dans l'exécuteur d'I/O, puis arbre du vault, historique, lignes
+    (INSERT ... ON CONFLICT) et journal mis à jour pour tout le lot, et un seul
+    commit. Une note en erreur n'empêche pas les autres ; un échec du commit met
+    tout le lot en échec.
+    """
+    first_failed = len(failed)
+    try:
+        existing = {row.path: row for row in await get_notes_by_paths(db, user_id, [n.path for n in batch])}
+        delta_runs = await get_delta_runs(db, user_id, [
+            note.path for note in batch
+            if not note.is_deleted and note.path in existing and not existing[note.path].is_deleted
+        ])
+        results = await io_executor.gather(
+            _prepare_note(user_id, note, existing.get(note.path), delta_runs.get(note.path, 0))
+            for note in batch
+        )
+        prepared: List[_PreparedNote] = []
+        for note, result in zip(batch, results):
+            if isinstance(result, NoteDeltaMismatch):
+                logger.info(f"Delta refusé - user_id={user_id}, path={note.path}, reason={str(result)}")
+                failed.append(note.path)
+                if needs_full_content is not None:
+                    needs_full_content.append(note.path)
+            elif isinstance(result, ValueError):
+                _log_push_error(user_id, note.path, result)
+                failed.append(note.path)
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                prepared.append(result)
+
+        hashes = await asyncio.gather(
+            *(_write_note(user_id, item) for item in prepared),
+            return_exceptions=True
+        )
+        written: List[Tuple[_PreparedNote, str]] = []
+        for item, result in zip(prepared, hashes):
+            if isinstance(result, Exception):
+                _log_push_error(user_id, item.note.path, result)
+                failed.append(item.note.path)
+            else:
+                written.append((item, result))
+
+        now = datetime.utcnow()
+        rows = []
+        tree_changes = []
+        for item, computed_hash in written:
+            note = item.note
+            new_state = ("", True) if note.is_deleted else (computed_hash, False)
+            tree_changes.append((note.path, item.old_state, new_state))
+            rows.append({
+                "user_id": user_id,
+                "path": note.path,
+                "content_hash": computed_hash,  # Hash vide pour note supprimée
+                "modified_at": note.modified_at,
+                "synced_at": now,
+                "is_deleted": note.is_deleted
+            })
+        await update_vault_tree_batch(db, user_id, JOURNAL_KIND_NOTE, tree_changes)
+        await forget_note_versions(db, user_id, [item.note.path for item, _ in written if item.note.is_deleted])
+        # Historique : seulement pour les notes effectivement écrites
+        await record_note_versions(
+            db, user_id, [item.version for item, _ in written if item.version is not None]
+        )
+        if rows:
+            await upsert_notes(db, rows)
+            await record_changes(db, user_id, JOURNAL_KIND_NOTE, [row["path"] for row in rows])
+        await db.commit()
+        success.extend(row["path"] for row in rows)
+
+    except Exception as e:
+        logger.error(
+            f"Erreur lors de la sauvegarde d'un lot de notes - user_id={user_id}, notes={len(batch)}, error={str(e)}",
+            exc_info=True
+        )
+        await db.rollback()
+        done = set(failed[first_failed:])
+        failed.extend(note.path for note in batch if note.path not in done)
+
+
+async def _as_patch(
+    db: AsyncSession,
+    user_id: int,
+    path: str,
+    base_hash: Optional[str],
+    content: str,
+    note_record
+) -> Optional[NoteDelta]:
+    """Note sous forme de patch contre base_hash, si la base est conservée et le patch plus petit."""
+    if not base_hash or base_hash == note_record.content_hash:
+        return None
+    base = await get_version_content(db, user_id, base_hash)
+    if base is None:
+        return None
+    ops = await compute_line_patch(base, content)
+    if patch_size(ops) >= len(content):
+        return None
+    return NoteDelta(
+        path=path,
+        content=None,
+        base_hash=base_hash,
+        patch=ops,
+        content_hash=note_record.content_hash,
+        modified_at=note_record.modified_at,
+        is_deleted=False
+    )
+
+
 async def pull_notes(
     db: AsyncSession,
     user: User,
-    paths: List[str]
-) -> List[NoteContent]:
+    paths: List[str],
+    base_hashes: Optional[Dict[str, str]] = None
+) -> List[NoteDelta]:
     """
     Retourne le contenu des notes demandées.
     Pour les notes supprimées, retourne is_deleted=True avec contenu vide.
+    Si base_hashes indique la version que le client possède et que le serveur
+    l'a conservée, la note est renvoyée en patch (NoteDelta) quand c'est plus petit.
+    Les états sont chargés en une requête et les fichiers lus en parallèle ; une
+    note au-delà de NOTE_STREAM_THRESHOLD_BYTES n'est pas lue (stream=True).
     """
+    base_hashes = base_hashes or {}
     notes = []
     user_id = user.id  # Capturer l'ID avant la boucle pour éviter les problèmes SQLAlchemy
 
+    # États en une requête IN, contenus lus en parallèle (concurrence bornée)
+    records = {row.path: row for row in await get_notes_by_paths(db, user_id, paths)}
+    to_read = [path for path in dict.fromkeys(paths) if path in records and not records[path].is_deleted]
+    contents = dict(zip(to_read, await io_executor.gather(
+        storage.read_note(user_id, path, settings.note_stream_threshold_bytes) for path in to_read
+    )))
+
     for path in paths:
-        try:
-            note_record = await get_note_by_path(db, user_id, path)
-            if note_record:
-                if note_record.is_deleted:
-                    # Note supprimée : renvoyer les métadonnées avec contenu vide
-                    notes.append(NoteContent(
-                        path=path,
-                        content="",
-                        content_hash="",
-                        modified_at=note_record.modified_at,
-                        is_deleted=True
-                    ))
-                else:
-                    content = await storage.read_note(user_id, path)
-                    if content is not None:
-                        notes.append(NoteContent(
-                            path=path,
-                            content=content,
-                            content_hash=note_record.content_hash,
-                            modified_at=note_record.modified_at,
-                            is_deleted=False
-                        ))
-        except ValueError as e:
+        note_record = records.get(path)
+        if note_record is None:
+            continue
+        if note_record.is_deleted:
+            # Note supprimée : renvoyer les métadonnées avec contenu vide
+            notes.append(NoteDelta(
+                path=path,
+                content="",
+                content_hash="",
+                modified_at=note_record.modified_at,
+                is_deleted=True
+            ))
+            continue
+
+        content = contents[path]
+        if isinstance(content, ValueError):
             # Erreur de validation de chemin (path traversal, etc.)
             logger.warning(
-                f"Chemin invalide rejeté lors du pull - user_id={user_id}, path={path}, error={str(e)}"
+                f"Chemin invalide rejeté lors du pull - user_id={user_id}, path={path}, error={str(content)}"
             )
             # Ne pas ajouter la note à la liste (comme si elle n'existait pas)
+            continue
+        if isinstance(content, storage.ContentTooLargeError):
+            # Note volumineuse : à télécharger en flux (GET /sync/notes/{path})
+            notes.append(NoteDelta(
+                path=path,
+                content=None,
+                content_hash=note_record.content_hash,
+                modified_at=note_record.modified_at,
+                is_deleted=False,
+                stream=True,
+                size=await storage.get_note_size(user_id, path)
+            ))
+            continue
+        if isinstance(content, BaseException):
+            raise content
+        if content is not None:
+            delta = await _as_patch(db, user_id, path, base_hashes.get(path), content, note_record)
+            notes.append(delta or NoteDelta(
+                path=path,
+                content=content,
+                content_hash=note_record.content_hash,
+                modified_at=note_record.modified_at,
+                is_deleted=False
+            ))
 
     return notes
+
+
+async def upload_note(
+    db: AsyncSession,
+    user: User,
+    path: str,
+    chunks: AsyncIterable[bytes],
+    modified_at: datetime,
+    expected_hash: Optional[str] = None
+) -> UploadNoteResponse:
+    """
+    Enregistre une note reçue en UTF-8 brut, en streaming (PUT /sync/notes/{path}) :
+    hash et validité UTF-8 vérifiés au fil de l'écriture, sans charger la note en
+    mémoire. La version remplacée est conservée en instantané.
+
+    Raises:
+        ContentTooLargeError: Si le contenu dépasse NOTE_STREAM_MAX_BYTES
+        ValueError: Si le chemin ou le contenu est invalide, ou si le hash ne correspond pas
+    """
+    user_id = user.id
+    try:
+        existing = await get_note_state_by_path(db, user_id, path)
+        old_state = (existing.content_hash, existing.is_deleted) if existing else None
+        version = None
+        if existing and not existing.is_deleted and existing.content_hash \
+                and existing.content_hash != expected_hash:
+            version = await prepare_note_version(user_id, path, existing.content_hash, None)
+        computed_hash, size = await storage.save_note_stream(
+            user_id, path, chunks, settings.note_stream_max_bytes, expected_hash
+        )
+        if version is not None and version.content_hash != computed_hash:
+            await record_note_versions(db, user_id, [version])
+
+        await update_vault_tree(db, user_id, JOURNAL_KIND_NOTE, path, old_state, (computed_hash, False))
+        await upsert_notes(db, [{
+            "user_id": user_id,
+            "path": path,
+            "content_hash": computed_hash,
+            "modified_at": modified_at,
+            "synced_at": datetime.utcnow(),
+            "is_deleted": False
+        }])
+        await record_changes(db, user_id, JOURNAL_KIND_NOTE, [path])
+        await db.commit()
+    except storage.ContentTooLargeError:
+        logger.warning(f"Note trop volumineuse - user_id={user_id}, path={path}")
+        await db.rollback()
+        raise
+    except ValueError as e:
+        logger.warning(f"Upload de note rejeté - user_id={user_id}, path={path}, error={str(e)}")
+        await db.rollback()
+        raise
+
+    return UploadNoteResponse(path=path, content_hash=computed_hash, size=size)
+
+
+async def open_note_download(
+    db: AsyncSession,
+    user: User,
+    path: str
+) -> Optional[Tuple[BinaryIO, int, Row]]:
+    """
+    Ouvre une note à télécharger en flux (GET /sync/notes/{path}) : retourne
+    (fichier, taille, état), ou None si elle n'existe pas ou est supprimée.
+    L'appelant ferme le fichier.
+    """
+    user_id = user.id
+    try:
+        note_record = await get_note_state_by_path(db, user_id, path)
+        if note_record is None or note_record.is_deleted:
+            return None
+        opened = await storage.open_note(user_id, path)
+    except ValueError as e:
+        logger.warning(
+            f"Chemin invalide rejeté lors du téléchargement - user_id={user_id}, path={path}, error={str(e)}"
+        )
+        return None
+    if opened is None:
+        return None
+    f, size = opened
+    return f, size, note_record
@@ -0,0 +1,310 @@
+"""
+Moteur de réconciliation partagé par process_sync et compare_notes.
+
+Les états serveur et client sont parcourus comme deux séquences triées par chemin
+(merge-join) : aucun dictionnaire de l'état complet n'est construit, et chaque
+chemin produit au plus une décision compacte (tuple) que les endpoints convertissent
+en schémas de réponse.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Set, Tuple, Union
+
+from .sync_utils import normalize_datetime
+
+
+# Actions
+PUSH = "push"
+PULL = "pull"
+CONFLICT = "conflict"
+IDENTICAL = "identical"
+DELETED_ON_SERVER = "deleted_on_server"
+MOVE = "move"
+
+# Raisons (exposées telles quelles par /sync/compare)
+NOT_ON_SERVER = "not_on_server"
+NOT_ON_CLIENT = "not_on_client"
+CLIENT_NEWER = "client_newer"
+SERVER_NEWER = "server_newer"
+CLIENT_DELETED = "client_deleted"
+SERVER_DELETED = "server_deleted"
+BOTH_MODIFIED = "both_modified"
+CONTENT_DIFFERS = "content_differs"
+
+
+class Decision(NamedTuple):
+    """Décision de réconciliation pour un chemin."""
+    action: str
+    reason: str
+    path: str
+    client: Any  # Entrée du manifeste client (None si absente)
+    server: Any  # Ligne serveur (None si absente)
+
+
+class Move(NamedTuple):
+    """Suppression et création de même contenu, appariées en déplacement."""
+    action: str  # MOVE
+    direction: str  # PUSH (déplacement fait par le client) ou PULL (fait sur le serveur)
+    from_path: str
+    to_path: str
+    source: Decision  # Décision remplacée pour l'ancien chemin
+    target: Decision  # Décision remplacée pour le nouveau chemin
+
+
+def _path(item) -> str:
+    return item.path
+
+
+def sort_by_path(items: Iterable) -> list:
+    """Trie des entrées par chemin (ordre identique à ORDER BY path de SQLite)."""
+    return sorted(items, key=_path)
+
+
+def merge_join(
+    server_rows: Iterable,
+    client_items: Iterable
+) -> Iterator[Tuple[str, Any, Any]]:
+    """
+    Parcourt deux séquences triées par chemin et produit (path, client, server).
+    L'un des deux côtés vaut None si le chemin n'existe que de l'autre côté.
+    Pour un chemin en double côté client, la dernière entrée l'emporte.
+    """
+    server_iter = iter(server_rows)
+    client_iter = iter(client_items)
+    server = next(server_iter, None)
+    client = next(client_iter, None)
+
+    while client is not None:
+        # Dédupliquer : garder la dernière entrée client d'un même chemin
+        following = next(client_iter, None)
+        while following is not None and following.path == client.path:
+            client = following
+            following = next(client_iter, None)
+
+        client_path = client.path
+        while server is not None and server.path < client_path:
+            yield server.path, None, server
+            server = next(server_iter, None)
+
+        if server is not None and server.path == client_path:
+            yield client_path, client, server
+            server = next(server_iter, None)
+        else:
+            yield client_path, client, None
+        client = following
+
+    while server is not None:
+        yield server.path, None, server
+        server = next(server_iter, None)
+
+
+def plan_notes(
+    server_rows: Iterable,
+    client_notes: Iterable,
+    since: Optional[datetime] = None,
+    changed_paths: Optional[Set[str]] = None,
+    include_server_deleted: bool = False
+) -> Iterator[Decision]:
+    """
+    Décisions de synchronisation des notes (POST /sync).
+
+    Une note plus récente sur le serveur n'est proposée que si elle a changé depuis
+    le dernier sync : présente dans `changed_paths` si fourni (curseur), sinon
+    modifiée après `since`. Les suppressions serveur inconnues du client ne sont
+    proposées qu'avec `include_server_deleted`.
+    """
+    since = normalize_datetime(since)
+
+    for path, client, server in merge_join(server_rows, client_notes):
+        if server is None:
+            # Note n'existe pas sur le serveur -> le serveur veut la recevoir
+            yield Decision(PUSH, NOT_ON_SERVER, path, client, None)
+            continue
+
+        if client is None:
+            # Ne pas envoyer les notes supprimées si le client ne les connaît pas
+            # (évite de propager des suppressions de notes jamais vues)
+            if not server.is_deleted:
+                yield Decision(PULL, NOT_ON_CLIENT, path, None, server)
+            elif include_server_deleted:
+                yield Decision(PULL, SERVER_DELETED, path, None, server)
+            continue
+
+        client_deleted = client.is_deleted
+        server_deleted = server.is_deleted
+        if not client_deleted and not server_deleted and server.content_hash == client.content_hash:
+            # Cas le plus fréquent : note inchangée, sans comparer les dates
+            continue
+
+        client_time = normalize_datetime(client.modified_at)
+        server_time = normalize_datetime(server.modified_at)
+
+        if client_deleted:
+            # Client signale une suppression (rien à faire si déjà supprimée sur le serveur)
+            if not server_deleted:
+                if client_time >= server_time:
+                    yield Decision(PUSH, CLIENT_DELETED, path, client, server)
+                else:
+                    # Serveur modifié après la suppression -> conflit
+                    yield Decision(CONFLICT, BOTH_MODIFIED, path, client, server)
+        elif server_deleted:
+            if client_time > server_time:
+                # Client a modifié après la suppression -> recréer la note
+                yield Decision(PUSH, CLIENT_NEWER, path, client, server)
+            else:
+                # Suppression serveur plus récente -> toujours propagée
+                yield Decision(PULL, SERVER_DELETED, path, client, server)
+        elif client_time > server_time:
+            yield Decision(PUSH, CLIENT_NEWER, path, client, server)
+        elif server_time > client_time:
+            if changed_paths is not None:
+                changed = path in changed_paths
+            else:
+                changed = since is None or server_time > since
+            if changed:
+                yield Decision(PULL, SERVER_NEWER, path, client, server)
+        else:
+            # Même timestamp mais hash différent -> conflit
+            yield Decision(CONFLICT, BOTH_MODIFIED, path, client, server)
+
+
+def plan_attachments(
+    server_rows: Iterable,
+    client_attachments: Iterable,
+    include_server_deleted: bool = False
+) -> Iterator[Decision]:
+    """
+    Décisions de synchronisation des attachments (POST /sync).
+    Les attachments sont immutables : à contenu différent, la version serveur gagne.
+    """
+    for path, client, server in merge_join(server_rows, client_attachments):
+        if server is None:
+            yield Decision(PUSH, NOT_ON_SERVER, path, client, None)
+            continue
+
+        if client is None:
+            if not server.is_deleted:
+                yield Decision(PULL, NOT_ON_CLIENT, path, None, server)
+            elif include_server_deleted:
+                yield Decision(PULL, SERVER_DELETED, path, None, server)
+            continue
+
+        client_deleted = client.is_deleted
+        server_deleted = server.is_deleted
+        if not client_deleted and not server_deleted:
+            if server.content_hash != client.content_hash:
+                yield Decision(PULL, CONTENT_DIFFERS, path, client, server)
+            continue
+
+        client_time = normalize_datetime(client.modified_at)
+        server_time = normalize_datetime(server.modified_at)
+
+        if client_deleted:
+            if not server_deleted:
+                if client_time >= server_time:
+                    yield Decision(PUSH, CLIENT_DELETED, path, client, server)
+                else:
+                    # Serveur modifié après -> on re-propose la version serveur
+                    yield Decision(PULL, SERVER_NEWER, path, client, server)
+        elif client_time > server_time:
+            yield Decision(PUSH, CLIENT_NEWER, path, client, server)
+        else:
+            yield Decision(PULL, SERVER_DELETED, path, client, server)
+
+
+def plan_compare(
+    server_rows: Iterable,
+    client_notes: Iterable
+) -> Iterator[Decision]:
+    """Décisions de comparaison des notes (POST /sync/compare), notes identiques comprises."""
+    for path, client, server in merge_join(server_rows, client_notes):
+        if server is None:
+            yield Decision(PUSH, NOT_ON_SERVER, path, client, None)
+        elif client is None:
+            # Ignorer les notes supprimées que le client ne connaît pas
+            if not server.is_deleted:
+                yield Decision(PULL, NOT_ON_CLIENT, path, None, server)
+        elif server.is_deleted:
+            yield Decision(DELETED_ON_SERVER, SERVER_DELETED, path, client, server)
+        elif server.content_hash == client.content_hash:
+            yield Decision(IDENTICAL, IDENTICAL, path, client, server)
+        else:
+            client_time = normalize_datetime(client.modified_at)
+            server_time = normalize_datetime(server.modified_at)
+            if client_time > server_time:
+                yield Decision(PUSH, CLIENT_NEWER, path, client, server)
+            elif server_time > client_time:
+                yield Decision(PULL, SERVER_NEWER, path, client, server)
+            else:
+                yield Decision(CONFLICT, BOTH_MODIFIED, path, client, server)
+
+
+def _move_candidate(decision: Decision, source_hashes: Mapping[str, str]) -> Optional[Tuple[str, bool, str]]:
+    """
+    Retourne (direction, est_une_source, hash) si la décision peut faire partie
+    d'un déplacement, None sinon.
+    """
+    action, reason = decision.action, decision.reason
+    if action == PUSH:
+        if reason == CLIENT_DELETED:
+            return PUSH, True, decision.server.content_hash
+        if reason == NOT_ON_SERVER and not decision.client.is_deleted:
+            return PUSH, False, decision.client.content_hash
+    elif action == PULL:
+        if reason == SERVER_DELETED:
+            client = decision.client
+            if client is None:
+                content_hash = source_hashes.get(decision.path)
+            else:
+                content_hash = client.content_hash
+            return PULL, True, content_hash
+        if reason == NOT_ON_CLIENT:
+            return PULL, False, decision.server.content_hash
+    return None
+
+
+def detect_moves(
+    decisions: Iterable[Decision],
+    source_hashes: Optional[Mapping[str, str]] = None
+) -> Iterator[Union[Decision, Move]]:
+    """
+    Apparie les suppressions et les créations de même hash en déplacements.
+
+    Côté client (PUSH) : ancien chemin supprimé par le client, dont le hash serveur
+    égale celui d'un chemin absent du serveur. Côté serveur (PULL) : ancien chemin
+    supprimé sur le serveur, dont le hash client (ou, s'il est absent, celui de
+    `source_hashes`) égale celui d'un chemin absent du client.
+
+    Les décisions non candidates sont transmises immédiatement ; seules les
+    candidates sont gardées jusqu'à la fin, puis émises appariées ou telles quelles.
+    À hash égal, une destination de même nom de fichier est préférée.
+    """
+    source_hashes = source_hashes or {}
+    sources: Dict[str, List[Tuple[str, Decision]]] = {PUSH: [], PULL: []}
+    targets: Dict[str, Dict[str, List[Decision]]] = {PUSH: {}, PULL: {}}
+
+    for decision in decisions:
+        candidate = _move_candidate(decision, source_hashes)
+        if candidate is None or not candidate[2]:
+            yield decision
+            continue
+        direction, is_source, content_hash = candidate
+        if is_source:
+            sources[direction].append((content_hash, decision))
+        else:
+            targets[direction].setdefault(content_hash, []).append(decision)
+
+    for direction in (PUSH, PULL):
+        for content_hash, source in sources[direction]:
+            candidates = targets[direction].get(content_hash)
+            if not candidates:
+                yield source
+                continue
+            name = source.path.rsplit("/", 1)[-1]
+            index = next(
+                (i for i, t in enumerate(candidates) if t.path.rsplit("/", 1)[-1] == name),
+                0
+            )
+            target = candidates.pop(index)
+            yield Move(MOVE, direction, source.path, target.path, source, target)
+        for candidates in targets[direction].values():
+            yield from candidates
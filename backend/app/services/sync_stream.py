@@ -0,0 +1,61 @@
+"""
+Réponse de sync en streaming NDJSON (POST /sync avec Accept: application/x-ndjson).
+
+Le plan est sérialisé au fil du parcours, sans construire la liste complète des
+entrées ni le document JSON entier en mémoire. Une ligne JSON par objet :
+
+    {"type": "header", "server_time": "...", "incremental": false}
+    {"type": "notes_to_pull", "item": {...}}       (un champ de SyncResponse par ligne)
+    ...
+    {"type": "end", "cursor": "...", "counts": {"notes_to_pull": 12, ...}}
+
+Le curseur n'est envoyé qu'en dernière ligne : un flux interrompu ne doit pas
+faire avancer le client.
+"""
+import json
+from typing import Iterator
+
+from ..schemas import SyncRequest
+from .notes_sync import SyncState, SYNC_PLAN_FIELDS, iter_sync_plan
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Taille des blocs envoyés au client (les lignes sont regroupées)
+NDJSON_CHUNK_BYTES = 64 * 1024
+
+
+def wants_ndjson(accept: str) -> bool:
+    """Le client demande-t-il une réponse NDJSON ?"""
+    return bool(accept) and NDJSON_MEDIA_TYPE in accept
+
+
+def _item_json(value) -> str:
+    if isinstance(value, str):
+        return json.dumps(value)
+    return value.model_dump_json()
+
+
+def iter_sync_ndjson(state: SyncState, request: SyncRequest) -> Iterator[bytes]:
+    """Sérialise le plan de sync en NDJSON, par blocs d'environ NDJSON_CHUNK_BYTES."""
+    counts = dict.fromkeys(SYNC_PLAN_FIELDS, 0)
+    header = {
+        "type": "header",
+        "server_time": state.server_time.isoformat(),
+        "incremental": state.incremental
+    }
+    lines = [json.dumps(header)]
+    size = len(lines[0])
+
+    for field, value in iter_sync_plan(state, request):
+        counts[field] += 1
+        line = f'{{"type":"{field}","item":{_item_json(value)}}}'
+        lines.append(line)
+        size += len(line) + 1
+        if size >= NDJSON_CHUNK_BYTES:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+            size = 0
+
+    lines.append(json.dumps({"type": "end", "cursor": state.cursor, "counts": counts}))
+    yield ("\n".join(lines) + "\n").encode("utf-8")
@@ -4,22 +4,85 @@ Utilitaires partagés pour la synchronisation.
 import logging
 import re
 from datetime import datetime, timezone
-from typing import List
+from typing import AsyncIterable, AsyncIterator, Iterable, List, Optional, Set, Type, TypeVar, Union
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, Row
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from pydantic import BaseModel
 
 from ..models import Note, Attachment
+from ..core.config import settings
+from ..core.json_stream import iter_json_array_items
 
 
 logger = logging.getLogger(__name__)
 
+# Requêtes Core colonne par colonne pour la réconciliation et le pull : les lignes
+# retournées sont des tuples nommés (Row), sans identity map ni suivi ORM.
+notes_table = Note.__table__
+attachments_table = Attachment.__table__
+
+NOTE_STATE_COLUMNS = (
+    notes_table.c.path,
+    notes_table.c.content_hash,
+    notes_table.c.modified_at,
+    notes_table.c.is_deleted,
+)
+ATTACHMENT_STATE_COLUMNS = (
+    attachments_table.c.path,
+    attachments_table.c.content_hash,
+    attachments_table.c.size,
+    attachments_table.c.mime_type,
+    attachments_table.c.modified_at,
+    attachments_table.c.is_deleted,
+)
+
 # Regex pour trouver les références Obsidian: ![[file]] ou [[file]]
 OBSIDIAN_LINK_PATTERN = re.compile(r'!?\[\[([^\]|]+)(?:\|[^\]]+)?\]\]')
 
 # Limite de taille pour les attachments (25 Mo)
 MAX_ATTACHMENT_SIZE = 25 * 1024 * 1024
 
+# Taille maximale d'un attachment dans un corps JSON de push (base64 + métadonnées)
+MAX_ATTACHMENT_ITEM_BYTES = 4 * -(-MAX_ATTACHMENT_SIZE // 3) + 64 * 1024
+
+# Taille des lots pour les requêtes IN (limite de variables SQLite)
+IN_CLAUSE_BATCH_SIZE = 500
+
+
+T = TypeVar("T")
+M = TypeVar("M", bound=BaseModel)
+
+
+async def iter_items(items: Union[Iterable[T], AsyncIterable[T]]) -> AsyncIterator[T]:
+    """Parcourt une liste ou un flux d'éléments (push depuis un corps JSON lu en streaming)."""
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def iter_request_items(
+    chunks: AsyncIterable[bytes],
+    key: str,
+    model: Type[M],
+    max_item_bytes: int
+) -> AsyncIterator[M]:
+    """
+    Valide un par un les éléments du tableau key d'un corps JSON reçu par blocs,
+    sans charger le corps entier (budget total : PUSH_REQUEST_MAX_BYTES).
+
+    Raises:
+        ContentTooLargeError: Si le corps ou un élément dépasse sa limite
+        pydantic.ValidationError: Si un élément est invalide
+        ValueError: Si le JSON est invalide
+    """
+    async for raw in iter_json_array_items(chunks, key, max_item_bytes, settings.push_request_max_bytes):
+        yield model.model_validate_json(raw)
+
 
 def parse_attachment_references(content: str) -> List[str]:
     """
@@ -58,17 +121,31 @@ async def get_server_notes(
     db: AsyncSession,
     user_id: int,
     since: datetime = None
-) -> List[Note]:
-    """Récupère les notes modifiées depuis une date."""
-    query = select(Note).where(Note.user_id == user_id)
+) -> List[Row]:
+    """
+    Récupère l'état (path, content_hash, modified_at, is_deleted) des notes
+    modifiées depuis une date, trié par chemin.
+    """
+    query = select(*NOTE_STATE_COLUMNS).where(notes_table.c.user_id == user_id)
     if since:
-        query = query.where(Note.modified_at > since)
+        query = query.where(notes_table.c.modified_at > since)
+    query = query.order_by(notes_table.c.path)
     result = await db.execute(query)
-    return result.scalars().all()
+    return result.all()
+
+
+async def get_note_state_by_path(db: AsyncSession, user_id: int, path: str) -> Optional[Row]:
+    """Récupère l'état d'une note par son chemin (lecture seule)."""
+    result = await db.execute(
+        select(*NOTE_STATE_COLUMNS).where(
+            and_(notes_table.c.user_id == user_id, notes_table.c.path == path)
+        )
+    )
+    return result.first()
 
 
 async def get_note_by_path(db: AsyncSession, user_id: int, path: str) -> Note:
-    """Récupère une note par son chemin."""
+    """Récupère une note par son chemin (entité ORM, pour modification)."""
     result = await db.execute(
         select(Note).where(
             and_(Note.user_id == user_id, Note.path == path)
@@ -77,15 +154,109 @@ async def get_note_by_path(db: AsyncSession, user_id: int, path: str) -> Note:
     return result.scalar_one_or_none()
 
 
-async def get_server_attachments(db: AsyncSession, user_id: int) -> List[Attachment]:
-    """Récupère tous les attachments d'un utilisateur (y compris supprimés)."""
-    query = select(Attachment).where(Attachment.user_id == user_id)
+async def get_notes_by_paths(
+    db: AsyncSession,
+    user_id: int,
+    paths: Iterable[str]
+) -> List[Row]:
+    """Récupère l'état des notes d'une liste de chemins (requêtes IN par lots)."""
+    paths = list(paths)
+    notes: List[Row] = []
+    for i in range(0, len(paths), IN_CLAUSE_BATCH_SIZE):
+        batch = paths[i:i + IN_CLAUSE_BATCH_SIZE]
+        result = await db.execute(
+            select(*NOTE_STATE_COLUMNS).where(
+                and_(notes_table.c.user_id == user_id, notes_table.c.path.in_(batch))
+            )
+        )
+        notes.extend(result.all())
+    return notes
+
+
+async def upsert_notes(db: AsyncSession, rows: List[dict]) -> None:
+    """
+    Insère ou met à jour des notes en une requête (INSERT ... ON CONFLICT sur
+    user_id, path). Chaque ligne porte user_id, path, content_hash, modified_at,
+    synced_at et is_deleted. Ne committe pas.
+    """
+    stmt = sqlite_insert(notes_table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[notes_table.c.user_id, notes_table.c.path],
+        set_={
+            "content_hash": stmt.excluded.content_hash,
+            "modified_at": stmt.excluded.modified_at,
+            "synced_at": stmt.excluded.synced_at,
+            "is_deleted": stmt.excluded.is_deleted,
+        }
+    )
+    await db.execute(stmt, rows)
+
+
+async def get_server_attachments(db: AsyncSession, user_id: int) -> List[Row]:
+    """Récupère l'état de tous les attachments d'un utilisateur (y compris supprimés), trié par chemin."""
+    query = (
+        select(*ATTACHMENT_STATE_COLUMNS)
+        .where(attachments_table.c.user_id == user_id)
+        .order_by(attachments_table.c.path)
+    )
     result = await db.execute(query)
-    return result.scalars().all()
+    return result.all()
+
+
+async def get_attachments_by_paths(
+    db: AsyncSession,
+    user_id: int,
+    paths: Iterable[str]
+) -> List[Row]:
+    """Récupère l'état des attachments d'une liste de chemins (requêtes IN par lots)."""
+    paths = list(paths)
+    attachments: List[Row] = []
+    for i in range(0, len(paths), IN_CLAUSE_BATCH_SIZE):
+        batch = paths[i:i + IN_CLAUSE_BATCH_SIZE]
+        result = await db.execute(
+            select(*ATTACHMENT_STATE_COLUMNS).where(
+                and_(attachments_table.c.user_id == user_id, attachments_table.c.path.in_(batch))
+            )
+        )
+        attachments.extend(result.all())
+    return attachments
+
+
+async def get_attachment_hashes(
+    db: AsyncSession,
+    user_id: int,
+    hashes: Iterable[str]
+) -> Set[str]:
+    """Parmi des hashes, ceux d'attachments actifs de l'utilisateur (requêtes IN par lots)."""
+    hashes = list(set(hashes))
+    found: Set[str] = set()
+    for i in range(0, len(hashes), IN_CLAUSE_BATCH_SIZE):
+        batch = hashes[i:i + IN_CLAUSE_BATCH_SIZE]
+        result = await db.execute(
+            select(attachments_table.c.content_hash).distinct().where(
+                and_(
+                    attachments_table.c.user_id == user_id,
+                    attachments_table.c.is_deleted == False,
+                    attachments_table.c.content_hash.in_(batch)
+                )
+            )
+        )
+        found.update(row[0] for row in result.all())
+    return found
+
+
+async def get_attachment_state_by_path(db: AsyncSession, user_id: int, path: str) -> Optional[Row]:
+    """Récupère l'état d'un attachment par son chemin (lecture seule)."""
+    result = await db.execute(
+        select(*ATTACHMENT_STATE_COLUMNS).where(
+            and_(attachments_table.c.user_id == user_id, attachments_table.c.path == path)
+        )
+    )
+    return result.first()
 
 
 async def get_attachment_by_path(db: AsyncSession, user_id: int, path: str) -> Attachment:
-    """Récupère un attachment par son chemin."""
+    """Récupère un attachment par son chemin (entité ORM, pour modification)."""
     result = await db.execute(
         select(Attachment).where(
             and_(Attachment.user_id == user_id, Attachment.path == path)
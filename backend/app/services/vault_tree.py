@@ -0,0 +1,300 @@
+"""
+Arbre de hachage (Merkle) du vault pour une réconciliation en O(changements).
+
+Hachage d'une entrée (SHA-256, interprété comme entier big-endian) :
+- fichier : sha256("{kind}\\0{name}\\0{content_hash}\\0{0|1}") avec kind "note" ou
+  "attachment", name le dernier segment du chemin, 1 si supprimé ;
+- dossier : sha256("dir\\0{name}\\0{digest}") avec digest en hexadécimal (64 caractères).
+
+Le digest d'un dossier est la somme modulo 2^256 des hachages de ses enfants
+(un dossier vide n'existe pas). Une modification de fichier se propage donc
+à ses ancêtres en O(profondeur), sans relire le contenu des dossiers.
+"""
+import hashlib
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, update, and_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from ..models import Note, Attachment, VaultTreeNode
+from ..schemas import DigestEntry, DigestNode
+
+
+logger = logging.getLogger(__name__)
+
+DIGEST_MODULUS = 1 << 256
+ROOT_PATH = ""
+
+# État d'une feuille : (content_hash, is_deleted), ou None si absente
+LeafState = Optional[Tuple[str, bool]]
+
+
+def format_digest(value: int) -> str:
+    return f"{value:064x}"
+
+
+def _sha256_int(data: str) -> int:
+    return int.from_bytes(hashlib.sha256(data.encode("utf-8")).digest(), "big")
+
+
+def leaf_hash(kind: str, name: str, content_hash: str, is_deleted: bool) -> int:
+    """Hachage d'un fichier dans son dossier parent."""
+    return _sha256_int(f"{kind}\0{name}\0{content_hash}\0{1 if is_deleted else 0}")
+
+
+def folder_hash(name: str, digest: int) -> int:
+    """Hachage d'un sous-dossier dans son dossier parent (0 si le dossier est vide)."""
+    if digest == 0:
+        return 0
+    return _sha256_int(f"dir\0{name}\0{format_digest(digest)}")
+
+
+def split_path(path: str) -> Tuple[str, str]:
+    """Sépare un chemin en (dossier parent, nom). Le dossier racine est ""."""
+    if "/" not in path:
+        return ROOT_PATH, path
+    folder, name = path.rsplit("/", 1)
+    return folder, name
+
+
+def _ancestors(folder: str) -> List[str]:
+    """Retourne le dossier et tous ses ancêtres, du plus profond à la racine."""
+    folders = []
+    while folder != ROOT_PATH:
+        folders.append(folder)
+        folder = split_path(folder)[0]
+    folders.append(ROOT_PATH)
+    return folders
+
+
+def _leaf_value(kind: str, name: str, state: LeafState) -> int:
+    if state is None:
+        return 0
+    content_hash, is_deleted = state
+    return leaf_hash(kind, name, content_hash, is_deleted)
+
+
+async def update_vault_tree(
+    db: AsyncSession,
+    user_id: int,
+    kind: str,
+    path: str,
+    old: LeafState,
+    new: LeafState
+) -> None:
+    """
+    Propage le changement d'un fichier jusqu'à la racine.
+    Sans effet si l'arbre n'a pas encore été construit (il le sera au premier digest).
+    """
+    await update_vault_tree_batch(db, user_id, kind, [(path, old, new)])
+
+
+async def update_vault_tree_batch(
+    db: AsyncSession,
+    user_id: int,
+    kind: str,
+    changes: Iterable[Tuple[str, LeafState, LeafState]]
+) -> None:
+    """
+    Propage les changements (chemin, ancien état, nouvel état) d'un lot de
+    fichiers : une lecture des dossiers concernés, puis une écriture par dossier
+    modifié, quel que soit le nombre de fichiers du lot.
+    """
+    deltas: Dict[str, int] = {}
+    for path, old, new in changes:
+        folder, name = split_path(path)
+        delta = _leaf_value(kind, name, new) - _leaf_value(kind, name, old)
+        deltas[folder] = (deltas.get(folder, 0) + delta) % DIGEST_MODULUS
+    deltas = {folder: delta for folder, delta in deltas.items() if delta}
+    if deltas:
+        await _apply_folder_deltas(db, user_id, deltas)
+
+
+async def _apply_folder_deltas(db: AsyncSession, user_id: int, deltas: Dict[str, int]) -> None:
+    """
+    Ajoute à chaque dossier la somme des changements de ses fichiers et propage
+    jusqu'à la racine. Les nouveaux digests sont calculés en mémoire, puis écrits
+    sous condition (digest inchangé depuis la lecture, dossier toujours absent) :
+    si un push concurrent a modifié l'un des dossiers entre-temps, l'arbre est
+    invalidé (racine supprimée) et sera reconstruit au prochain digest, au lieu
+    de garder une mise à jour perdue.
+    """
+    folders: Set[str] = set()
+    for folder in deltas:
+        folders.update(_ancestors(folder))
+    result = await db.execute(
+        select(VaultTreeNode.path, VaultTreeNode.digest).where(
+            and_(VaultTreeNode.user_id == user_id, VaultTreeNode.path.in_(folders))
+        )
+    )
+    stored: Dict[str, int] = {path: int(digest, 16) for path, digest in result.all()}
+    if ROOT_PATH not in stored:
+        # Arbre absent, reconstruit au prochain digest. La suppression (sans effet
+        # ici) ordonne ce push avec une reconstruction en cours : si celle-ci est
+        # validée après la lecture ci-dessus, sans ce changement, elle est invalidée
+        await db.execute(delete(VaultTreeNode).where(
+            and_(VaultTreeNode.user_id == user_id, VaultTreeNode.path == ROOT_PATH)
+        ))
+        return
+
+    # Du plus profond à la racine : un dossier est calculé après tous ses sous-dossiers
+    pending = dict(deltas)
+    writes = []
+    for current in sorted(folders, key=lambda f: f.count("/") if f else -1, reverse=True):
+        old_digest = stored.get(current, 0)
+        new_digest = (old_digest + pending.get(current, 0)) % DIGEST_MODULUS
+        if new_digest == old_digest:
+            continue
+        writes.append((current, old_digest, new_digest))
+        if current != ROOT_PATH:
+            parent, name = split_path(current)
+            change = folder_hash(name, new_digest) - folder_hash(name, old_digest)
+            pending[parent] = (pending.get(parent, 0) + change) % DIGEST_MODULUS
+
+    for current, old_digest, new_digest in writes:
+        if current != ROOT_PATH and old_digest == 0:
+            stmt = sqlite_insert(VaultTreeNode).values(
+                user_id=user_id,
+                path=current,
+                parent=split_path(current)[0],
+                digest=format_digest(new_digest)
+            ).on_conflict_do_nothing(index_elements=["user_id", "path"])
+        else:
+            where = and_(
+                VaultTreeNode.user_id == user_id,
+                VaultTreeNode.path == current,
+                VaultTreeNode.digest == format_digest(old_digest)
+            )
+            if current != ROOT_PATH and new_digest == 0:
+                # Dossier devenu vide
+                stmt = delete(VaultTreeNode).where(where)
+            else:
+                stmt = update(VaultTreeNode).where(where).values(digest=format_digest(new_digest))
+        result = await db.execute(stmt)
+        if result.rowcount != 1:
+            logger.warning(
+                f"Arbre du vault modifié en concurrence, invalidé - user_id={user_id}, dossier={current}"
+            )
+            await db.execute(delete(VaultTreeNode).where(
+                and_(VaultTreeNode.user_id == user_id, VaultTreeNode.path == ROOT_PATH)
+            ))
+            return
+
+
+async def rebuild_vault_tree(db: AsyncSession, user_id: int) -> VaultTreeNode:
+    """
+    Reconstruit entièrement l'arbre d'un utilisateur et retourne la racine.
+    L'ancien arbre est supprimé avant la lecture des fichiers : cette écriture
+    ouvre la transaction et bloque les autres écritures jusqu'au commit, aucun
+    push ne peut donc être validé entre la lecture et l'écriture de l'arbre.
+    """
+    await db.execute(delete(VaultTreeNode).where(VaultTreeNode.user_id == user_id))
+    digests: Dict[str, int] = {ROOT_PATH: 0}
+
+    for kind, model in (("note", Note), ("attachment", Attachment)):
+        result = await db.execute(
+            select(model.path, model.content_hash, model.is_deleted)
+            .where(model.user_id == user_id)
+        )
+        for path, content_hash, is_deleted in result.all():
+            folder, name = split_path(path)
+            value = leaf_hash(kind, name, content_hash, bool(is_deleted))
+            digests[folder] = (digests.get(folder, 0) + value) % DIGEST_MODULUS
+            for ancestor in _ancestors(folder)[1:]:
+                digests.setdefault(ancestor, 0)
+
+    # Remonter les dossiers du plus profond au moins profond
+    for folder in sorted(digests, key=lambda f: f.count("/") if f else -1, reverse=True):
+        if folder == ROOT_PATH:
+            continue
+        parent, name = split_path(folder)
+        digests[parent] = (digests[parent] + folder_hash(name, digests[folder])) % DIGEST_MODULUS
+
+    root = None
+    for folder, digest in digests.items():
+        if folder != ROOT_PATH and digest == 0:
+            continue
+        node = VaultTreeNode(
+            user_id=user_id,
+            path=folder,
+            parent=None if folder == ROOT_PATH else split_path(folder)[0],
+            digest=format_digest(digest)
+        )
+        db.add(node)
+        if folder == ROOT_PATH:
+            root = node
+    await db.commit()
+    logger.info(f"Arbre du vault reconstruit - user_id={user_id}, dossiers={len(digests)}")
+    return root
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def _list_files(db: AsyncSession, model, user_id: int, folder: str):
+    """Liste les fichiers directement contenus dans un dossier."""
+    query = select(model.path, model.content_hash, model.is_deleted).where(model.user_id == user_id)
+    if folder == ROOT_PATH:
+        query = query.where(~model.path.like("%/%"))
+    else:
+        prefix = _escape_like(folder) + "/"
+        query = query.where(
+            model.path.like(prefix + "%", escape="\\"),
+            ~model.path.like(prefix + "%/%", escape="\\")
+        )
+    result = await db.execute(query)
+    return result.all()
+
+
+async def get_digest_nodes(
+    db: AsyncSession,
+    user_id: int,
+    folders: List[str]
+) -> Tuple[str, List[DigestNode]]:
+    """
+    Retourne le digest racine et, pour chaque dossier demandé, son digest et ses enfants.
+    Un dossier inexistant a un digest nul et aucun enfant.
+    """
+    root = await db.scalar(
+        select(VaultTreeNode).where(
+            and_(VaultTreeNode.user_id == user_id, VaultTreeNode.path == ROOT_PATH)
+        )
+    )
+    if root is None:
+        root = await rebuild_vault_tree(db, user_id)
+
+    nodes = []
+    for folder in folders:
+        folder = folder.strip("/")
+        node = root if folder == ROOT_PATH else await db.scalar(
+            select(VaultTreeNode).where(
+                and_(VaultTreeNode.user_id == user_id, VaultTreeNode.path == folder)
+            )
+        )
+        if node is None:
+            nodes.append(DigestNode(path=folder, digest=format_digest(0), children=[]))
+            continue
+
+        children = []
+        result = await db.execute(
+            select(VaultTreeNode.path, VaultTreeNode.digest).where(
+                and_(VaultTreeNode.user_id == user_id, VaultTreeNode.parent == folder)
+            )
+        )
+        for path, digest in result.all():
+            children.append(DigestEntry(name=split_path(path)[1], kind="folder", hash=digest))
+        for kind, model in (("note", Note), ("attachment", Attachment)):
+            for path, content_hash, is_deleted in await _list_files(db, model, user_id, folder):
+                children.append(DigestEntry(
+                    name=split_path(path)[1],
+                    kind=kind,
+                    hash=content_hash,
+                    is_deleted=bool(is_deleted)
+                ))
+        children.sort(key=lambda c: (c.name, c.kind))
+        nodes.append(DigestNode(path=folder, digest=node.digest, children=children))
+
+    return root.digest, nodes
@@ -0,0 +1,80 @@
+"""
+Benchmark du moteur de réconciliation (services/reconcile.py).
+
+Mesure le temps et le pic mémoire (tracemalloc) du planificateur de notes
+sur des manifestes synthétiques, pour un sync sans changement (cas le plus fréquent)
+et un premier sync (tout à récupérer).
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_reconcile
+    python -m benchmarks.bench_reconcile --sizes 10000 100000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+import app.core  # noqa: F401 - charge la configuration avant les modèles (import circulaire)
+from app.schemas import NoteMetadata
+from app.services.reconcile import PULL, plan_notes
+
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+class ServerRow(NamedTuple):
+    path: str
+    content_hash: str
+    modified_at: datetime
+    is_deleted: bool
+
+
+def build_manifests(size: int):
+    base = datetime(2024, 1, 1)
+    server = [
+        ServerRow(f"dossier-{i % 100:03d}/note-{i:07d}.md", f"{i:064x}", base + timedelta(seconds=i), False)
+        for i in range(size)
+    ]
+    server.sort(key=lambda r: r.path)
+    client = [
+        NoteMetadata.model_construct(
+            path=r.path, content_hash=r.content_hash, modified_at=r.modified_at, is_deleted=False
+        )
+        for r in server
+    ]
+    return server, client
+
+
+def measure(label: str, size: int, fn):
+    # Temps et mémoire mesurés séparément : tracemalloc ralentit fortement l'exécution
+    gc.collect()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {size:>10,} entrées  {elapsed * 1000:>10.1f} ms  pic {peak / 1024 / 1024:>8.2f} Mo  ({result} décisions)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        server, client = build_manifests(size)
+
+        measure("sync sans changement", size, lambda: sum(1 for _ in plan_notes(server, client)))
+        measure("premier sync (tout à pull)", size,
+                lambda: sum(1 for d in plan_notes(server, []) if d.action == PULL))
+        del server, client
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ import asyncio
 import shutil
 from pathlib import Path
 from typing import AsyncGenerator, Generator
+from unittest.mock import patch
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
@@ -24,6 +25,8 @@ os.environ["SECRET_KEY"] = "test-secret-key-for-testing"
 from app.main import app
 from app.core.database import Base, get_db
 from app.core.config import settings
+from app.core import compression, packs
+from app.services.manifest_cache import manifest_cache
 
 
 def ensure_test_dirs():
@@ -65,6 +68,28 @@ async def override_get_db():
             await session.close()
 
 
+def reset_storage_caches():
+    """Oublier les états gardés en mémoire d'un test à l'autre."""
+    manifest_cache.clear()
+    packs.reset_pack_stores()
+    compression._load_dictionary.cache_clear()
+
+
+@pytest.fixture(autouse=True)
+def isolated_storage(tmp_path_factory: pytest.TempPathFactory) -> Generator[Path, None, None]:
+    """
+    Stockage propre à chaque test (dossier temporaire distinct de tmp_path) :
+    aucun fichier ne passe d'un test à l'autre. Les caches (manifestes, index des
+    packs, dictionnaires zstd) sont vidés, la base (et donc le journal) étant
+    recréée à chaque test.
+    """
+    storage_path = tmp_path_factory.mktemp("storage")
+    reset_storage_caches()
+    with patch.object(settings, "storage_path", str(storage_path)):
+        yield storage_path
+    reset_storage_caches()
+
+
 @pytest.fixture(scope="session")
 def event_loop() -> Generator:
     """Créer un event loop pour la session de test."""
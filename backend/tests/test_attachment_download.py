@@ -0,0 +1,89 @@
+"""
+Tests d'intégration du téléchargement brut des pièces jointes (GET /sync/attachments/{path}).
+"""
+import base64
+import pytest
+from httpx import AsyncClient
+from .conftest import auth_headers
+
+from app.core.storage import compute_hash
+
+
+PDF_CONTENT = bytes(range(256)) * 40
+
+
+async def push_attachment(client: AsyncClient, token: str, path: str, content: bytes, is_deleted: bool = False):
+    resp = await client.post(
+        "/sync/attachments/push",
+        headers=auth_headers(token),
+        json={"attachments": [{
+            "path": path,
+            "content_base64": base64.b64encode(content).decode("ascii"),
+            "content_hash": compute_hash(content),
+            "size": len(content),
+            "mime_type": "application/pdf",
+            "modified_at": "2026-01-10T10:00:00",
+            "is_deleted": is_deleted
+        }]}
+    )
+    assert resp.json()["success"] == [path]
+
+
+class TestAttachmentDownload:
+    """Tests du téléchargement brut."""
+
+    @pytest.mark.asyncio
+    async def test_download_raw_bytes_with_etag(self, authenticated_client):
+        client, token = authenticated_client
+        await push_attachment(client, token, "docs/rapport.pdf", PDF_CONTENT)
+
+        resp = await client.get(
+            "/sync/attachments/docs/rapport.pdf",
+            headers={**auth_headers(token), "Accept-Encoding": "gzip"}
+        )
+        assert resp.status_code == 200
+        assert resp.content == PDF_CONTENT
+        assert resp.headers["content-length"] == str(len(PDF_CONTENT))
+        assert resp.headers["etag"] == f'"{compute_hash(PDF_CONTENT)}"'
+        assert resp.headers["content-type"] == "application/pdf"
+        assert resp.headers.get("content-encoding") != "gzip"
+
+    @pytest.mark.asyncio
+    async def test_range_request(self, authenticated_client):
+        client, token = authenticated_client
+        await push_attachment(client, token, "rapport.pdf", PDF_CONTENT)
+
+        resp = await client.get(
+            "/sync/attachments/rapport.pdf",
+            headers={**auth_headers(token), "Range": "bytes=100-199"}
+        )
+        assert resp.status_code == 206
+        assert resp.content == PDF_CONTENT[100:200]
+        assert resp.headers["content-range"] == f"bytes 100-199/{len(PDF_CONTENT)}"
+
+    @pytest.mark.asyncio
+    async def test_if_none_match_returns_304(self, authenticated_client):
+        client, token = authenticated_client
+        await push_attachment(client, token, "rapport.pdf", PDF_CONTENT)
+
+        resp = await client.get(
+            "/sync/attachments/rapport.pdf",
+            headers={**auth_headers(token), "If-None-Match": f'"{compute_hash(PDF_CONTENT)}"'}
+        )
+        assert resp.status_code == 304
+        assert resp.content == b""
+
+    @pytest.mark.asyncio
+    async def test_missing_or_deleted_attachment_is_404(self, authenticated_client):
+        client, token = authenticated_client
+        await push_attachment(client, token, "ancien.pdf", PDF_CONTENT)
+        await push_attachment(client, token, "ancien.pdf", b"", is_deleted=True)
+
+        for path in ("ancien.pdf", "inconnu.pdf", "../../etc/passwd"):
+            resp = await client.get(f"/sync/attachments/{path}", headers=auth_headers(token))
+            assert resp.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_requires_authentication(self, client):
+        resp = await client.get("/sync/attachments/rapport.pdf")
+        assert resp.status_code in (401, 403)
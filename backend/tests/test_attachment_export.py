@@ -0,0 +1,82 @@
+"""
+Tests d'intégration de l'export tar des pièces jointes (POST /sync/attachments/export).
+"""
+import io
+import tarfile
+
+import pytest
+from .conftest import auth_headers
+
+from app.core.storage import compute_hash
+
+
+IMAGE = bytes(range(256)) * 1500  # ~375 Ko : plusieurs blocs de lecture
+PDF = b"%PDF-1.7 " * 100
+
+
+async def _upload(client, token, path: str, content: bytes, content_type: str):
+    resp = await client.put(
+        f"/sync/attachments/{path}",
+        params={"modified_at": "2026-01-10T10:00:00"},
+        content=content,
+        headers={**auth_headers(token), "Content-Type": content_type}
+    )
+    assert resp.status_code == 200
+
+
+class TestAttachmentExport:
+    """Tests de l'export tar."""
+
+    @pytest.mark.asyncio
+    async def test_export_streams_requested_attachments(self, authenticated_client):
+        client, token = authenticated_client
+        await _upload(client, token, "images/photo.png", IMAGE, "image/png")
+        await _upload(client, token, "docs/article.pdf", PDF, "application/pdf")
+
+        resp = await client.post(
+            "/sync/attachments/export",
+            headers=auth_headers(token),
+            json={"paths": ["docs/article.pdf", "images/photo.png", "inconnu.png"]}
+        )
+        assert resp.status_code == 200
+        assert resp.headers["content-type"] == "application/x-tar"
+        assert "gzip" not in resp.headers.get("content-encoding", "")
+
+        archive = tarfile.open(fileobj=io.BytesIO(resp.content), mode="r:")
+        members = archive.getmembers()
+        assert [m.name for m in members] == ["docs/article.pdf", "images/photo.png"]
+        assert archive.extractfile("images/photo.png").read() == IMAGE
+        assert archive.extractfile("docs/article.pdf").read() == PDF
+
+        photo = members[1]
+        assert photo.pax_headers["SYNCOBSIDIAN.content_hash"] == compute_hash(IMAGE)
+        assert photo.pax_headers["SYNCOBSIDIAN.mime_type"] == "image/png"
+        assert photo.pax_headers["SYNCOBSIDIAN.modified_at"] == "2026-01-10T10:00:00"
+
+    @pytest.mark.asyncio
+    async def test_deleted_attachment_exported_as_empty_entry(self, authenticated_client):
+        client, token = authenticated_client
+        await _upload(client, token, "old.png", IMAGE, "image/png")
+        await client.post(
+            "/sync/attachments/push",
+            headers=auth_headers(token),
+            json={"attachments": [{
+                "path": "old.png", "content_base64": "", "content_hash": "", "size": 0,
+                "modified_at": "2026-01-11T10:00:00", "is_deleted": True
+            }]}
+        )
+
+        resp = await client.post(
+            "/sync/attachments/export", headers=auth_headers(token), json={"paths": ["old.png"]}
+        )
+        archive = tarfile.open(fileobj=io.BytesIO(resp.content), mode="r:")
+        member = archive.getmember("old.png")
+        assert member.size == 0
+        assert member.pax_headers["SYNCOBSIDIAN.is_deleted"] == "1"
+
+    @pytest.mark.asyncio
+    async def test_export_empty_request(self, authenticated_client):
+        client, token = authenticated_client
+        resp = await client.post("/sync/attachments/export", headers=auth_headers(token), json={"paths": []})
+        assert resp.status_code == 200
+        assert tarfile.open(fileobj=io.BytesIO(resp.content), mode="r:").getmembers() == []
@@ -0,0 +1,101 @@
+"""
+Tests d'intégration de l'upload binaire en streaming (PUT /sync/attachments/{path}).
+"""
+import pytest
+from unittest.mock import patch
+from .conftest import auth_headers
+
+from app.core import storage
+from app.core.storage import compute_hash
+
+
+IMAGE = bytes(range(256)) * 1200  # ~300 Ko : plusieurs tampons d'écriture
+MODIFIED = {"modified_at": "2026-01-10T10:00:00"}
+
+
+class TestAttachmentUpload:
+    """Tests de l'upload binaire."""
+
+    @pytest.mark.asyncio
+    async def test_upload_then_pull(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+
+        resp = await client.put(
+            "/sync/attachments/images/photo.png",
+            params=MODIFIED,
+            content=IMAGE,
+            headers={**auth_headers(token), "Content-Type": "image/png"}
+        )
+        assert resp.status_code == 200
+        assert resp.json() == {
+            "path": "images/photo.png",
+            "content_hash": compute_hash(IMAGE),
+            "size": len(IMAGE)
+        }
+        assert await storage.read_attachment(user_id, "images/photo.png") == IMAGE
+
+        resp = await client.post(
+            "/sync/attachments/pull", headers=auth_headers(token), json={"paths": ["images/photo.png"]}
+        )
+        att = resp.json()["attachments"][0]
+        assert att["content_hash"] == compute_hash(IMAGE)
+        assert att["mime_type"] == "image/png"
+
+    @pytest.mark.asyncio
+    async def test_hash_mismatch_rejected_and_not_stored(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+
+        resp = await client.put(
+            "/sync/attachments/photo.png",
+            params={**MODIFIED, "content_hash": "0" * 64},
+            content=IMAGE,
+            headers=auth_headers(token)
+        )
+        assert resp.status_code == 400
+        assert await storage.read_attachment(user_id, "photo.png") is None
+
+    @pytest.mark.asyncio
+    async def test_oversized_upload_rejected(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+
+        async def body():
+            yield IMAGE
+            yield IMAGE
+
+        with patch("app.services.attachments_sync.MAX_ATTACHMENT_SIZE", len(IMAGE)):
+            resp = await client.put(
+                "/sync/attachments/trop-gros.bin",
+                params=MODIFIED,
+                content=body(),
+                headers=auth_headers(token)
+            )
+        assert resp.status_code == 413
+        assert await storage.read_attachment(user_id, "trop-gros.bin") is None
+        assert not any(
+            p.name.startswith(storage.TEMP_PREFIX) for p in storage.get_blobs_root().iterdir()
+        )
+
+    @pytest.mark.asyncio
+    async def test_declared_length_over_limit_rejected_early(self, authenticated_client):
+        client, token = authenticated_client
+
+        with patch("app.routers.sync.MAX_ATTACHMENT_SIZE", 10):
+            resp = await client.put(
+                "/sync/attachments/photo.png",
+                params=MODIFIED,
+                content=IMAGE,
+                headers=auth_headers(token)
+            )
+        assert resp.status_code == 413
+
+    @pytest.mark.asyncio
+    async def test_invalid_path_rejected(self, authenticated_client):
+        client, token = authenticated_client
+
+        resp = await client.put(
+            "/sync/attachments/..%2F..%2Fetc%2Fpasswd",
+            params=MODIFIED,
+            content=b"x",
+            headers=auth_headers(token)
+        )
+        assert resp.status_code in (400, 404)
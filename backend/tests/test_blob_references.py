@@ -0,0 +1,127 @@
+"""
+Tests d'intégration du push d'attachments par référence (POST /sync/blobs/check).
+"""
+import base64
+
+import pytest
+from .conftest import auth_headers
+
+from app.core import storage
+from app.core.storage import compute_hash
+
+
+TEMPLATE = b"%PDF-1.7 modele partage " * 500
+TEMPLATE_HASH = compute_hash(TEMPLATE)
+
+
+def _attachment(path: str, content=None, content_hash=TEMPLATE_HASH) -> dict:
+    att = {
+        "path": path,
+        "content_hash": content_hash,
+        "size": len(TEMPLATE),
+        "mime_type": "application/pdf",
+        "modified_at": "2026-01-10T10:00:00"
+    }
+    if content is not None:
+        att["content_base64"] = base64.b64encode(content).decode("utf-8")
+    return att
+
+
+class TestBlobReferences:
+    """Tests du push par référence."""
+
+    @pytest.mark.asyncio
+    async def test_check_reports_existing_hashes(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+
+        await client.post(
+            "/sync/attachments/push", headers=auth_headers(token),
+            json={"attachments": [_attachment("modeles/facture.pdf", TEMPLATE)]}
+        )
+        resp = await client.post(
+            "/sync/blobs/check", headers=auth_headers(token),
+            json={"hashes": [TEMPLATE_HASH, "f" * 64, TEMPLATE_HASH]}
+        )
+        assert resp.status_code == 200
+        assert resp.json() == {"existing": [TEMPLATE_HASH]}
+
+    @pytest.mark.asyncio
+    async def test_push_by_reference_copies_without_content(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+
+        await client.post(
+            "/sync/attachments/push", headers=auth_headers(token),
+            json={"attachments": [_attachment("modeles/facture.pdf", TEMPLATE)]}
+        )
+        resp = await client.post(
+            "/sync/attachments/push", headers=auth_headers(token),
+            json={"attachments": [_attachment("clients/acme/facture.pdf")]}
+        )
+        assert resp.json() == {"success": ["clients/acme/facture.pdf"], "failed": []}
+        assert await storage.read_attachment(user_id, "clients/acme/facture.pdf") == TEMPLATE
+
+        resp = await client.post(
+            "/sync/attachments/pull", headers=auth_headers(token),
+            json={"paths": ["clients/acme/facture.pdf"]}
+        )
+        att = resp.json()["attachments"][0]
+        assert att["content_hash"] == TEMPLATE_HASH
+        assert att["size"] == len(TEMPLATE)
+
+    @pytest.mark.asyncio
+    async def test_push_by_unknown_reference_fails(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+
+        resp = await client.post(
+            "/sync/attachments/push", headers=auth_headers(token),
+            json={"attachments": [_attachment("facture.pdf")]}
+        )
+        assert resp.json() == {"success": [], "failed": ["facture.pdf"]}
+        assert await storage.read_attachment(user_id, "facture.pdf") is None
+
+    @pytest.mark.asyncio
+    async def test_reference_to_deleted_attachment_fails(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+
+        await client.post(
+            "/sync/attachments/push", headers=auth_headers(token),
+            json={"attachments": [_attachment("facture.pdf", TEMPLATE)]}
+        )
+        await client.post(
+            "/sync/attachments/push", headers=auth_headers(token),
+            json={"attachments": [{**_attachment("facture.pdf"), "content_base64": "", "is_deleted": True}]}
+        )
+        resp = await client.post(
+            "/sync/blobs/check", headers=auth_headers(token), json={"hashes": [TEMPLATE_HASH]}
+        )
+        assert resp.json() == {"existing": []}
+
+        resp = await client.post(
+            "/sync/attachments/push", headers=auth_headers(token),
+            json={"attachments": [_attachment("copie.pdf")]}
+        )
+        assert resp.json()["failed"] == ["copie.pdf"]
+
+    @pytest.mark.asyncio
+    async def test_other_users_content_not_reported(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+
+        await client.post(
+            "/sync/attachments/push", headers=auth_headers(token),
+            json={"attachments": [_attachment("facture.pdf", TEMPLATE)]}
+        )
+        await client.post("/auth/register", json={
+            "username": "other", "email": "other@example.com", "password": "password123"
+        })
+        login = await client.post("/auth/login", json={"username": "other", "password": "password123"})
+        token_other = login.json()["access_token"]
+
+        resp = await client.post(
+            "/sync/blobs/check", headers=auth_headers(token_other), json={"hashes": [TEMPLATE_HASH]}
+        )
+        assert resp.json() == {"existing": []}
+        resp = await client.post(
+            "/sync/attachments/push", headers=auth_headers(token_other),
+            json={"attachments": [_attachment("facture.pdf")]}
+        )
+        assert resp.json()["failed"] == ["facture.pdf"]
@@ -0,0 +1,126 @@
+"""
+Tests d'intégration pour le stockage adressé par contenu (blobs + liens physiques).
+"""
+import os
+import pytest
+from unittest.mock import patch
+from httpx import AsyncClient
+from .conftest import auth_headers
+
+from app.core import storage
+from app.services.blobs import collect_unreferenced_blobs
+
+
+async def push_note(client: AsyncClient, token: str, path: str, content: str, modified_at: str):
+    resp = await client.post(
+        "/sync/push",
+        headers=auth_headers(token),
+        json={"notes": [{
+            "path": path,
+            "content": content,
+            "content_hash": "ignored",
+            "modified_at": modified_at,
+            "is_deleted": False
+        }]}
+    )
+    assert path in resp.json()["success"]
+
+
+def note_hash(content: str) -> str:
+    return storage.compute_hash(content.encode("utf-8"))
+
+
+class TestBlobStore:
+    """Tests de la déduplication par contenu."""
+
+    @pytest.mark.asyncio
+    async def test_identical_content_stored_once(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        await push_note(client, token, "a.md", "# Modèle", "2026-01-10T10:00:00")
+        await push_note(client, token, "copie/b.md", "# Modèle", "2026-01-10T10:00:00")
+
+        blob = storage.get_blob_path(note_hash("# Modèle"))
+        a = storage.get_note_path(user_id, "a.md")
+        b = storage.get_note_path(user_id, "copie/b.md")
+
+        assert blob.exists()
+        assert os.stat(a).st_ino == os.stat(b).st_ino == os.stat(blob).st_ino
+        assert os.stat(blob).st_nlink == 3
+
+    @pytest.mark.asyncio
+    async def test_update_does_not_touch_shared_blob(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        await push_note(client, token, "a.md", "# V1", "2026-01-10T10:00:00")
+        await push_note(client, token, "b.md", "# V1", "2026-01-10T10:00:00")
+
+        await push_note(client, token, "a.md", "# V2", "2026-01-11T10:00:00")
+
+        assert await storage.read_note(user_id, "a.md") == "# V2"
+        assert await storage.read_note(user_id, "b.md") == "# V1"
+        assert storage.get_blob_path(note_hash("# V1")).read_text(encoding="utf-8") == "# V1"
+
+    @pytest.mark.asyncio
+    async def test_collect_removes_only_unreferenced_blobs(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        await push_note(client, token, "keep.md", "# Gardée", "2026-01-10T10:00:00")
+        await push_note(client, token, "drop.md", "# Supprimée", "2026-01-10T10:00:00")
+        await client.post(
+            "/sync/push",
+            headers=auth_headers(token),
+            json={"notes": [{
+                "path": "drop.md",
+                "content": "",
+                "content_hash": "",
+                "modified_at": "2026-01-11T10:00:00",
+                "is_deleted": True
+            }]}
+        )
+
+        removed = await collect_unreferenced_blobs(db)
+
+        assert removed >= 1
+        assert not storage.get_blob_path(note_hash("# Supprimée")).exists()
+        assert storage.get_blob_path(note_hash("# Gardée")).exists()
+
+    @pytest.mark.asyncio
+    async def test_collect_ignores_links_without_rows(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        await push_note(client, token, "liee.md", "# Liée", "2026-01-10T10:00:00")
+        blob = storage.get_blob_path(note_hash("# Liée"))
+        # Chemin lié au blob sans ligne en base (commit échoué)
+        orphan = storage.get_note_path(user_id, "orpheline.md")
+        storage.link_blob(blob, orphan)
+        await client.post(
+            "/sync/push",
+            headers=auth_headers(token),
+            json={"notes": [{
+                "path": "liee.md",
+                "content": "",
+                "content_hash": "",
+                "modified_at": "2026-01-11T10:00:00",
+                "is_deleted": True
+            }]}
+        )
+
+        await collect_unreferenced_blobs(db)
+
+        assert not blob.exists()
+        assert orphan.read_text(encoding="utf-8") == "# Liée"
+
+    @pytest.mark.asyncio
+    async def test_collect_keeps_copied_blob(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        await push_note(client, token, "copiee.md", "# Copiée", "2026-01-10T10:00:00")
+        # Repli sur copie : le chemin n'est plus un lien physique du blob
+        with patch("app.core.storage.os.link", side_effect=OSError("pas de liens")):
+            storage.link_blob(
+                storage.get_blob_path(note_hash("# Copiée")), storage.get_note_path(user_id, "copiee.md")
+            )
+
+        await collect_unreferenced_blobs(db)
+
+        assert storage.get_blob_path(note_hash("# Copiée")).exists()
+
+    def test_invalid_hash_rejected(self):
+        with pytest.raises(ValueError):
+            storage.get_blob_path("../../etc/passwd")
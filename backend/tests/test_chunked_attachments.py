@@ -0,0 +1,176 @@
+"""
+Tests d'intégration de l'envoi des attachments par morceaux
+(POST /sync/chunks/negotiate, PUT /sync/chunks/{hash}, POST /sync/attachments/chunked).
+"""
+import random
+
+import pytest
+from sqlalchemy import select, func
+from .conftest import auth_headers
+
+from app.core import storage
+from app.core.chunking import chunk_bytes
+from app.core.storage import compute_hash
+from app.models import Attachment, AttachmentChunk
+
+
+PDF = random.Random(42).randbytes(600 * 1024)
+ANNOTATED = PDF[:300 * 1024] + b"/Annot << /Contents (relu) >>" + PDF[300 * 1024:]
+MODIFIED_AT = "2026-01-10T10:00:00"
+
+
+def _recipe(content: bytes, path: str) -> dict:
+    return {
+        "path": path,
+        "content_hash": compute_hash(content),
+        "size": len(content),
+        "mime_type": "application/pdf",
+        "modified_at": MODIFIED_AT,
+        "chunks": [{"chunk_hash": c.chunk_hash, "size": c.length} for c in chunk_bytes(content)]
+    }
+
+
+async def _send_chunked(client, token, content: bytes, path: str, previous_path=None):
+    """Négocie, envoie les morceaux manquants et assemble. Retourne (réponse, morceaux envoyés)."""
+    chunks = chunk_bytes(content)
+    resp = await client.post(
+        "/sync/chunks/negotiate",
+        headers=auth_headers(token),
+        json={"path": previous_path, "chunk_hashes": [c.chunk_hash for c in chunks]}
+    )
+    assert resp.status_code == 200
+    missing = set(resp.json()["missing"])
+    for chunk in chunks:
+        if chunk.chunk_hash in missing:
+            put = await client.put(
+                f"/sync/chunks/{chunk.chunk_hash}",
+                headers=auth_headers(token),
+                content=content[chunk.offset:chunk.offset + chunk.length]
+            )
+            assert put.status_code == 204
+    resp = await client.post("/sync/attachments/chunked", headers=auth_headers(token), json=_recipe(content, path))
+    return resp, missing
+
+
+class TestChunkedAttachments:
+    """Tests de l'envoi par morceaux."""
+
+    @pytest.mark.asyncio
+    async def test_first_upload_sends_all_chunks(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+
+        resp, sent = await _send_chunked(client, token, PDF, "docs/article.pdf")
+        assert resp.status_code == 200
+        assert resp.json() == {"path": "docs/article.pdf", "content_hash": compute_hash(PDF), "size": len(PDF)}
+        assert sent == {c.chunk_hash for c in chunk_bytes(PDF)}
+        assert await storage.read_attachment(user_id, "docs/article.pdf") == PDF
+
+        # Morceaux reçus consommés par l'assemblage
+        staged = await storage.staged_chunks_exist(user_id, list(sent))
+        assert not any(staged)
+
+    @pytest.mark.asyncio
+    async def test_annotated_pdf_sends_only_new_chunks(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+
+        await _send_chunked(client, token, PDF, "docs/article.pdf")
+        resp, sent = await _send_chunked(client, token, ANNOTATED, "docs/article.pdf", "docs/article.pdf")
+
+        assert resp.status_code == 200
+        assert 1 <= len(sent) <= 2
+        assert await storage.read_attachment(user_id, "docs/article.pdf") == ANNOTATED
+
+        pulled = await client.post(
+            "/sync/attachments/pull", headers=auth_headers(token), json={"paths": ["docs/article.pdf"]}
+        )
+        assert pulled.json()["attachments"][0]["content_hash"] == compute_hash(ANNOTATED)
+
+    @pytest.mark.asyncio
+    async def test_blob_uploaded_without_chunks_indexed_on_negotiation(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+
+        resp = await client.put(
+            "/sync/attachments/article.pdf",
+            params={"modified_at": MODIFIED_AT},
+            content=PDF,
+            headers=auth_headers(token)
+        )
+        assert resp.status_code == 200
+
+        resp, sent = await _send_chunked(client, token, ANNOTATED, "article.pdf", "article.pdf")
+        assert resp.status_code == 200
+        assert 1 <= len(sent) <= 2
+        count = await db.scalar(
+            select(func.count()).select_from(AttachmentChunk).where(AttachmentChunk.blob_hash == compute_hash(PDF))
+        )
+        assert count == len(chunk_bytes(PDF))
+
+    @pytest.mark.asyncio
+    async def test_missing_chunks_conflict(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+
+        recipe = _recipe(PDF, "article.pdf")
+        resp = await client.post("/sync/attachments/chunked", headers=auth_headers(token), json=recipe)
+        assert resp.status_code == 409
+        assert set(resp.json()["detail"]["missing"]) == {c["chunk_hash"] for c in recipe["chunks"]}
+        assert await storage.read_attachment(user_id, "article.pdf") is None
+        assert await db.scalar(
+            select(func.count()).select_from(Attachment).where(Attachment.path == "article.pdf")
+        ) == 0
+
+    @pytest.mark.asyncio
+    async def test_chunk_hash_mismatch_rejected(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+
+        resp = await client.put(f"/sync/chunks/{'0' * 64}", headers=auth_headers(token), content=b"data")
+        assert resp.status_code == 400
+        resp = await client.put("/sync/chunks/not-a-hash", headers=auth_headers(token), content=b"data")
+        assert resp.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_inconsistent_recipe_rejected(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+
+        recipe = _recipe(PDF, "article.pdf")
+        recipe["size"] += 1
+        resp = await client.post("/sync/attachments/chunked", headers=auth_headers(token), json=recipe)
+        assert resp.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_wrong_chunk_sizes_not_indexed(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        for chunk in chunk_bytes(PDF):
+            await client.put(
+                f"/sync/chunks/{chunk.chunk_hash}",
+                headers=auth_headers(token),
+                content=PDF[chunk.offset:chunk.offset + chunk.length]
+            )
+
+        # Même taille totale, mais des intervalles qui ne correspondent pas aux morceaux
+        recipe = _recipe(PDF, "article.pdf")
+        recipe["chunks"][0]["size"] -= 1
+        recipe["chunks"][1]["size"] += 1
+        resp = await client.post("/sync/attachments/chunked", headers=auth_headers(token), json=recipe)
+
+        assert resp.status_code == 400
+        assert await db.scalar(
+            select(func.count()).select_from(AttachmentChunk).where(AttachmentChunk.blob_hash == compute_hash(PDF))
+        ) == 0
+
+    @pytest.mark.asyncio
+    async def test_chunks_of_other_users_not_reused(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        await _send_chunked(client, token, PDF, "article.pdf")
+
+        await client.post("/auth/register", json={
+            "username": "other", "email": "other@example.com", "password": "password123"
+        })
+        login = await client.post("/auth/login", json={"username": "other", "password": "password123"})
+        token_other = login.json()["access_token"]
+
+        resp = await client.post(
+            "/sync/chunks/negotiate",
+            headers=auth_headers(token_other),
+            json={"chunk_hashes": [c.chunk_hash for c in chunk_bytes(PDF)]}
+        )
+        assert len(resp.json()["missing"]) == len(chunk_bytes(PDF))
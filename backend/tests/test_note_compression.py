@@ -0,0 +1,129 @@
+"""
+Tests d'intégration pour la compression zstd des notes au repos.
+"""
+import pytest
+import zstandard
+from unittest.mock import patch
+from httpx import AsyncClient
+from .conftest import auth_headers
+
+from app.core import storage, compression
+from app.core.config import settings
+from app.services.blobs import collect_unreferenced_blobs
+
+
+async def push_notes(client: AsyncClient, token: str, notes: dict):
+    resp = await client.post(
+        "/sync/push",
+        headers=auth_headers(token),
+        json={"notes": [
+            {
+                "path": path,
+                "content": content,
+                "content_hash": "ignored",
+                "modified_at": "2026-01-10T10:00:00",
+                "is_deleted": False
+            }
+            for path, content in notes.items()
+        ]}
+    )
+    assert sorted(resp.json()["success"]) == sorted(notes)
+
+
+DAILY_NOTE = """---
+date: 2026-01-{day:02d}
+tags: [journal, quotidien]
+---
+# Journal du {day:02d} janvier
+
+> [!note] Objectifs
+> - Relire les notes de la veille
+> - Avancer sur le projet {day}
+
+## Tâches
+- [ ] Tâche {day}.1
+- [ ] Tâche {day}.2
+"""
+
+
+@pytest.fixture
+def compression_on():
+    with patch.object(settings, "note_compression", True):
+        yield
+
+
+class TestNoteCompression:
+    """Tests du stockage compressé des notes."""
+
+    @pytest.mark.asyncio
+    async def test_note_stored_compressed_and_read_back(self, authenticated_client_with_db, compression_on):
+        client, token, db, user_id = authenticated_client_with_db
+        content = DAILY_NOTE.format(day=1) * 5
+        await push_notes(client, token, {"journal.md": content})
+
+        raw = storage.get_note_path(user_id, "journal.md").read_bytes()
+        assert compression.is_compressed(raw)
+        assert len(raw) < len(content.encode("utf-8"))
+
+        resp = await client.post("/sync/pull", headers=auth_headers(token), json={"paths": ["journal.md"]})
+        note = resp.json()["notes"][0]
+        assert note["content"] == content
+        assert note["content_hash"] == storage.compute_hash(content.encode("utf-8"))
+        assert await storage.get_note_size(user_id, "journal.md") == len(content.encode("utf-8"))
+
+    @pytest.mark.asyncio
+    async def test_incompressible_note_stored_raw(self, authenticated_client_with_db, compression_on):
+        client, token, db, user_id = authenticated_client_with_db
+        await push_notes(client, token, {"court.md": "ok"})
+
+        assert storage.get_note_path(user_id, "court.md").read_bytes() == b"ok"
+
+    @pytest.mark.asyncio
+    async def test_trained_dictionary_used_for_new_notes(self, authenticated_client_with_db, compression_on):
+        client, token, db, user_id = authenticated_client_with_db
+        samples = {f"journal/{i:03d}.md": DAILY_NOTE.format(day=i % 28 + 1) + f"\nNote {i}\n" for i in range(120)}
+        await push_notes(client, token, samples)
+
+        dict_id = compression.train_user_dictionary(user_id)
+        assert dict_id is not None
+        assert compression.get_user_dict_id(user_id) == dict_id
+
+        content = DAILY_NOTE.format(day=15) + "\nNouvelle note\n"
+        await push_notes(client, token, {"journal/new.md": content})
+
+        raw = storage.get_note_path(user_id, "journal/new.md").read_bytes()
+        assert zstandard.get_frame_parameters(raw).dict_id == dict_id
+        assert await storage.read_note(user_id, "journal/new.md") == content
+
+    @pytest.mark.asyncio
+    async def test_raw_notes_still_readable(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        await push_notes(client, token, {"brut.md": DAILY_NOTE.format(day=2)})
+
+        with patch.object(settings, "note_compression", True):
+            assert await storage.read_note(user_id, "brut.md") == DAILY_NOTE.format(day=2)
+
+    @pytest.mark.asyncio
+    async def test_identical_attachment_not_linked_to_compressed_blob(self, authenticated_client_with_db, compression_on):
+        client, token, db, user_id = authenticated_client_with_db
+        content = DAILY_NOTE.format(day=3) * 5
+        await push_notes(client, token, {"journal.md": content})
+        await storage.save_attachment(user_id, "export.md", content.encode("utf-8"))
+
+        assert await storage.read_attachment(user_id, "export.md") == content.encode("utf-8")
+        assert await storage.read_note(user_id, "journal.md") == content
+
+    @pytest.mark.asyncio
+    async def test_collect_keeps_linked_compressed_blob(self, authenticated_client_with_db, compression_on):
+        client, token, db, user_id = authenticated_client_with_db
+        content = DAILY_NOTE.format(day=4) * 5
+        await push_notes(client, token, {"journal.md": content})
+        raw = storage.get_note_path(user_id, "journal.md").read_bytes()
+        blob = storage.get_blob_path(storage.compute_hash(raw))
+        assert blob.exists()
+
+        await collect_unreferenced_blobs(db)
+
+        assert blob.exists()
+        await push_notes(client, token, {"copie.md": content})
+        assert storage.get_note_path(user_id, "copie.md").stat().st_ino == blob.stat().st_ino
@@ -0,0 +1,107 @@
+"""
+Tests d'intégration du pull de notes par patch (/sync/pull avec base_hashes).
+"""
+import pytest
+from unittest.mock import patch
+from .conftest import auth_headers
+
+from app.core.config import settings
+from app.core.storage import compute_hash
+from app.services.note_delta import apply_line_patch
+
+
+V1 = "".join(f"- entrée {i}\n" for i in range(2000))
+V2 = V1 + "- ajout depuis le téléphone\n"
+V3 = V2 + "- ajout depuis le portable\n"
+
+
+def _hash(text: str) -> str:
+    return compute_hash(text.encode("utf-8"))
+
+
+async def _push(client, token, content: str, path: str = "journal.md"):
+    resp = await client.post("/sync/push", headers=auth_headers(token), json={"notes": [{
+        "path": path, "content": content, "content_hash": _hash(content), "modified_at": "2026-01-10T10:00:00"
+    }]})
+    assert resp.json()["success"] == [path]
+
+
+async def _pull(client, token, base_hashes: dict, paths=("journal.md",)) -> list:
+    resp = await client.post(
+        "/sync/pull", headers=auth_headers(token), json={"paths": list(paths), "base_hashes": base_hashes}
+    )
+    assert resp.status_code == 200
+    return resp.json()["notes"]
+
+
+class TestNoteDeltaPull:
+    """Tests du pull par patch."""
+
+    @pytest.mark.asyncio
+    async def test_pull_returns_patch_against_base(self, authenticated_client):
+        client, token = authenticated_client
+        await _push(client, token, V1)
+        await _push(client, token, V2)
+
+        note = (await _pull(client, token, {"journal.md": _hash(V1)}))[0]
+        assert "content" not in note
+        assert note["base_hash"] == _hash(V1)
+        assert note["content_hash"] == _hash(V2)
+        assert apply_line_patch(V1, [tuple(op) for op in note["patch"]]) == V2
+
+    @pytest.mark.asyncio
+    async def test_patch_against_older_version(self, authenticated_client):
+        client, token = authenticated_client
+        for version in (V1, V2, V3):
+            await _push(client, token, version)
+
+        note = (await _pull(client, token, {"journal.md": _hash(V1)}))[0]
+        assert apply_line_patch(V1, [tuple(op) for op in note["patch"]]) == V3
+
+    @pytest.mark.asyncio
+    async def test_full_content_without_or_with_unknown_base(self, authenticated_client):
+        client, token = authenticated_client
+        await _push(client, token, V1)
+        await _push(client, token, V2)
+
+        without = (await _pull(client, token, {}))[0]
+        assert without["content"] == V2
+        assert "patch" not in without
+
+        unknown = (await _pull(client, token, {"journal.md": "0" * 64}))[0]
+        assert unknown["content"] == V2
+
+    @pytest.mark.asyncio
+    async def test_full_content_when_patch_not_smaller(self, authenticated_client):
+        client, token = authenticated_client
+        await _push(client, token, "court\n")
+        await _push(client, token, "autre\n")
+
+        note = (await _pull(client, token, {"journal.md": _hash("court\n")}))[0]
+        assert note["content"] == "autre\n"
+
+    @pytest.mark.asyncio
+    async def test_versions_pruned_beyond_limit(self, authenticated_client):
+        client, token = authenticated_client
+        with patch.object(settings, "note_versions_kept", 1):
+            for version in (V1, V2, V3):
+                await _push(client, token, version)
+
+        assert (await _pull(client, token, {"journal.md": _hash(V1)}))[0]["content"] == V3
+        assert "patch" in (await _pull(client, token, {"journal.md": _hash(V2)}))[0]
+
+    @pytest.mark.asyncio
+    async def test_versions_of_other_users_not_used(self, authenticated_client):
+        client, token = authenticated_client
+        await _push(client, token, V1)
+        await _push(client, token, V2)
+
+        await client.post("/auth/register", json={
+            "username": "other", "email": "other@example.com", "password": "password123"
+        })
+        login = await client.post("/auth/login", json={"username": "other", "password": "password123"})
+        token_other = login.json()["access_token"]
+        await _push(client, token_other, V3)
+
+        note = (await _pull(client, token_other, {"journal.md": _hash(V1)}))[0]
+        assert note["content"] == V3
@@ -0,0 +1,101 @@
+"""
+Tests d'intégration du push de notes par patch (/sync/push avec base_hash + patch).
+"""
+import pytest
+from .conftest import auth_headers
+
+from app.core import storage
+from app.core.storage import compute_hash
+
+
+BASE = "".join(f"- entrée {i}\n" for i in range(2000))
+APPENDED = BASE + "- nouvelle entrée\n"
+
+
+def _hash(text: str) -> str:
+    return compute_hash(text.encode("utf-8"))
+
+
+async def _push(client, token, note: dict) -> dict:
+    resp = await client.post("/sync/push", headers=auth_headers(token), json={"notes": [note]})
+    assert resp.status_code == 200
+    return resp.json()
+
+
+class TestNoteDeltaPush:
+    """Tests du push par patch."""
+
+    @pytest.mark.asyncio
+    async def test_patch_applied_to_stored_base(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        await _push(client, token, {
+            "path": "journal.md", "content": BASE, "content_hash": _hash(BASE),
+            "modified_at": "2026-01-10T10:00:00"
+        })
+
+        result = await _push(client, token, {
+            "path": "journal.md",
+            "base_hash": _hash(BASE),
+            "patch": [["=", 2000], ["+", "- nouvelle entrée\n"]],
+            "content_hash": _hash(APPENDED),
+            "modified_at": "2026-01-11T10:00:00"
+        })
+        assert result == {"success": ["journal.md"], "failed": [], "needs_full_content": []}
+        assert await storage.read_note(user_id, "journal.md") == APPENDED
+
+    @pytest.mark.asyncio
+    async def test_stale_base_needs_full_content(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        await _push(client, token, {
+            "path": "journal.md", "content": APPENDED, "content_hash": _hash(APPENDED),
+            "modified_at": "2026-01-10T10:00:00"
+        })
+
+        result = await _push(client, token, {
+            "path": "journal.md",
+            "base_hash": _hash(BASE),
+            "patch": [["=", 2000], ["+", "- autre\n"]],
+            "content_hash": _hash(BASE + "- autre\n"),
+            "modified_at": "2026-01-11T10:00:00"
+        })
+        assert result["failed"] == ["journal.md"]
+        assert result["needs_full_content"] == ["journal.md"]
+        assert await storage.read_note(user_id, "journal.md") == APPENDED
+
+    @pytest.mark.asyncio
+    async def test_result_hash_mismatch_needs_full_content(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        await _push(client, token, {
+            "path": "journal.md", "content": BASE, "content_hash": _hash(BASE),
+            "modified_at": "2026-01-10T10:00:00"
+        })
+
+        result = await _push(client, token, {
+            "path": "journal.md",
+            "base_hash": _hash(BASE),
+            "patch": [["=", 2000], ["+", "- nouvelle entrée\n"]],
+            "content_hash": "0" * 64,
+            "modified_at": "2026-01-11T10:00:00"
+        })
+        assert result["needs_full_content"] == ["journal.md"]
+        assert await storage.read_note(user_id, "journal.md") == BASE
+
+    @pytest.mark.asyncio
+    async def test_patch_for_unknown_note_needs_full_content(self, authenticated_client):
+        client, token = authenticated_client
+        result = await _push(client, token, {
+            "path": "inconnue.md",
+            "base_hash": _hash(BASE),
+            "patch": [["+", "x"]],
+            "content_hash": _hash("x"),
+            "modified_at": "2026-01-11T10:00:00"
+        })
+        assert result["needs_full_content"] == ["inconnue.md"]
+
+    @pytest.mark.asyncio
+    async def test_missing_content_and_patch_fails(self, authenticated_client):
+        client, token = authenticated_client
+        result = await _push(client, token, {
+            "path": "vide.md", "content_hash": "x", "modified_at": "2026-01-11T10:00:00"
+        })
+        assert result == {"success": [], "failed": ["vide.md"], "needs_full_content": []}
@@ -0,0 +1,78 @@
+"""
+Tests d'intégration du stockage des petites notes en packs (NOTE_STORAGE=packs).
+"""
+import pytest
+from unittest.mock import patch
+from httpx import AsyncClient
+from .conftest import auth_headers
+
+from app.core import storage, packs
+from app.core.config import settings
+
+
+async def push_note(client: AsyncClient, token: str, path: str, content: str):
+    resp = await client.post(
+        "/sync/push",
+        headers=auth_headers(token),
+        json={"notes": [{
+            "path": path,
+            "content": content,
+            "content_hash": "ignored",
+            "modified_at": "2026-01-10T10:00:00",
+            "is_deleted": False
+        }]}
+    )
+    assert resp.json()["success"] == [path]
+
+
+@pytest.fixture
+def packs_on():
+    with patch.object(settings, "note_storage", "packs"):
+        yield
+
+
+class TestNotePacks:
+    """Tests du stockage en packs."""
+
+    @pytest.mark.asyncio
+    async def test_small_note_packed_and_pulled(self, authenticated_client_with_db, packs_on):
+        client, token, db, user_id = authenticated_client_with_db
+        await push_note(client, token, "petite.md", "# Petite note")
+
+        assert not storage.get_note_path(user_id, "petite.md").exists()
+        assert packs.get_pack_store(user_id).lookup("petite.md") is not None
+        assert await storage.get_note_size(user_id, "petite.md") == len("# Petite note")
+
+        resp = await client.post("/sync/pull", headers=auth_headers(token), json={"paths": ["petite.md"]})
+        assert resp.json()["notes"][0]["content"] == "# Petite note"
+
+    @pytest.mark.asyncio
+    async def test_large_note_stays_a_file(self, authenticated_client_with_db, packs_on):
+        client, token, db, user_id = authenticated_client_with_db
+        content = "x" * (settings.pack_note_max_bytes + 1)
+        await push_note(client, token, "grande.md", content)
+
+        assert storage.get_note_path(user_id, "grande.md").exists()
+        assert packs.get_pack_store(user_id).lookup("grande.md") is None
+        assert await storage.read_note(user_id, "grande.md") == content
+
+    @pytest.mark.asyncio
+    async def test_note_growing_past_threshold_leaves_pack(self, authenticated_client_with_db, packs_on):
+        client, token, db, user_id = authenticated_client_with_db
+        await push_note(client, token, "journal.md", "# Début")
+        content = "y" * (settings.pack_note_max_bytes + 1)
+        await push_note(client, token, "journal.md", content)
+
+        assert packs.get_pack_store(user_id).lookup("journal.md") is None
+        assert await storage.read_note(user_id, "journal.md") == content
+
+    @pytest.mark.asyncio
+    async def test_packed_note_moved_and_deleted(self, authenticated_client_with_db, packs_on):
+        client, token, db, user_id = authenticated_client_with_db
+        await push_note(client, token, "a.md", "# A")
+
+        assert await storage.move_note(user_id, "a.md", "dossier/a.md") is True
+        assert await storage.read_note(user_id, "a.md") is None
+        assert await storage.read_note(user_id, "dossier/a.md") == "# A"
+        assert await storage.delete_note(user_id, "dossier/a.md") is True
+        assert await storage.read_note(user_id, "dossier/a.md") is None
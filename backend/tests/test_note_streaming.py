@@ -0,0 +1,122 @@
+"""
+Tests d'intégration du transfert en flux des notes volumineuses
+(PUT/GET /sync/notes/{path}, stream=True dans /sync/pull).
+"""
+import pytest
+from unittest.mock import patch
+from .conftest import auth_headers
+
+from app.core import storage
+from app.core.config import settings
+from app.core.storage import compute_hash
+from app.services.note_versions import get_version_content
+
+
+LOG = "".join(f"2026-01-10 10:00:{i % 60:02d} INFO requête {i} traitée — ok\n" for i in range(20000))
+LOG_BYTES = LOG.encode("utf-8")  # ~1 Mo : plusieurs tampons d'écriture
+MODIFIED = {"modified_at": "2026-01-10T10:00:00"}
+
+
+async def _upload(client, token, path: str, content: bytes, **params):
+    return await client.put(
+        f"/sync/notes/{path}",
+        params={**MODIFIED, **params},
+        content=content,
+        headers={**auth_headers(token), "Content-Type": "text/markdown; charset=utf-8"}
+    )
+
+
+class TestNoteStreaming:
+    """Tests du transfert en flux des notes."""
+
+    @pytest.mark.asyncio
+    async def test_upload_then_download(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+
+        resp = await _upload(client, token, "logs/serveur.md", LOG_BYTES, content_hash=compute_hash(LOG_BYTES))
+        assert resp.status_code == 200
+        assert resp.json() == {
+            "path": "logs/serveur.md",
+            "content_hash": compute_hash(LOG_BYTES),
+            "size": len(LOG_BYTES)
+        }
+        assert await storage.read_note(user_id, "logs/serveur.md") == LOG
+
+        resp = await client.get("/sync/notes/logs/serveur.md", headers=auth_headers(token))
+        assert resp.status_code == 200
+        assert resp.content == LOG_BYTES
+        etag = resp.headers["etag"]
+        assert etag == f'"{compute_hash(LOG_BYTES)}"'
+
+        resp = await client.get(
+            "/sync/notes/logs/serveur.md", headers={**auth_headers(token), "If-None-Match": etag}
+        )
+        assert resp.status_code == 304
+
+    @pytest.mark.asyncio
+    async def test_pull_defers_large_notes_to_stream(self, authenticated_client):
+        client, token = authenticated_client
+        await _upload(client, token, "gros.md", LOG_BYTES)
+        await client.post("/sync/push", headers=auth_headers(token), json={"notes": [{
+            "path": "petit.md", "content": "# Petit", "content_hash": compute_hash(b"# Petit"),
+            "modified_at": "2026-01-10T10:00:00"
+        }]})
+
+        with patch.object(settings, "note_stream_threshold_bytes", 64 * 1024):
+            resp = await client.post(
+                "/sync/pull", headers=auth_headers(token), json={"paths": ["gros.md", "petit.md"]}
+            )
+        big, small = resp.json()["notes"]
+        assert big["stream"] is True
+        assert big["size"] == len(LOG_BYTES)
+        assert big["content_hash"] == compute_hash(LOG_BYTES)
+        assert "content" not in big
+        assert small["content"] == "# Petit"
+        assert "stream" not in small
+
+    @pytest.mark.asyncio
+    async def test_replaced_version_kept_as_snapshot(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        await _upload(client, token, "log.md", LOG_BYTES)
+        updated = LOG_BYTES + "fin du journal\n".encode("utf-8")
+        await _upload(client, token, "log.md", updated)
+
+        assert await storage.read_note(user_id, "log.md") == updated.decode("utf-8")
+        assert await get_version_content(db, user_id, compute_hash(LOG_BYTES)) == LOG
+
+    @pytest.mark.asyncio
+    async def test_hash_mismatch_rejected_and_not_stored(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+
+        resp = await _upload(client, token, "log.md", LOG_BYTES, content_hash="0" * 64)
+        assert resp.status_code == 400
+        assert await storage.read_note(user_id, "log.md") is None
+
+    @pytest.mark.asyncio
+    async def test_invalid_utf8_rejected(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+
+        resp = await _upload(client, token, "binaire.md", LOG_BYTES + b"\xff\xfe")
+        assert resp.status_code == 400
+        assert await storage.read_note(user_id, "binaire.md") is None
+
+    @pytest.mark.asyncio
+    async def test_oversized_upload_rejected(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+
+        with patch.object(settings, "note_stream_max_bytes", 1024):
+            resp = await _upload(client, token, "log.md", LOG_BYTES)
+        assert resp.status_code == 413
+        assert await storage.read_note(user_id, "log.md") is None
+
+    @pytest.mark.asyncio
+    async def test_download_unknown_or_deleted_note(self, authenticated_client):
+        client, token = authenticated_client
+        await _upload(client, token, "log.md", LOG_BYTES)
+        await client.post("/sync/push", headers=auth_headers(token), json={"notes": [{
+            "path": "log.md", "content": "", "content_hash": "", "modified_at": "2026-01-11T10:00:00",
+            "is_deleted": True
+        }]})
+
+        assert (await client.get("/sync/notes/log.md", headers=auth_headers(token))).status_code == 404
+        assert (await client.get("/sync/notes/absente.md", headers=auth_headers(token))).status_code == 404
@@ -0,0 +1,133 @@
+"""
+Tests d'intégration de l'historique des notes (deltas inverses et instantanés).
+"""
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from sqlalchemy import select, update
+from .conftest import auth_headers
+
+from app.core.config import settings
+from app.core.storage import compute_hash, get_blob_path
+from app.models import NoteVersion
+from app.services.note_versions import get_version_content, prune_note_versions
+
+
+BASE = "".join(f"- entrée {i}\n" for i in range(2000))
+VERSIONS = [BASE + "".join(f"- ajout {j}\n" for j in range(i)) for i in range(10)]
+
+
+def _hash(text: str) -> str:
+    return compute_hash(text.encode("utf-8"))
+
+
+async def _push(client, token, content: str, path: str = "journal.md"):
+    resp = await client.post("/sync/push", headers=auth_headers(token), json={"notes": [{
+        "path": path, "content": content, "content_hash": _hash(content), "modified_at": "2026-01-10T10:00:00"
+    }]})
+    assert resp.json()["success"] == [path]
+
+
+async def _versions(db, user_id):
+    result = await db.execute(
+        select(NoteVersion).where(NoteVersion.user_id == user_id).order_by(NoteVersion.id)
+    )
+    return result.scalars().all()
+
+
+class TestNoteVersionHistory:
+    """Tests du stockage et de la reconstruction des versions."""
+
+    @pytest.mark.asyncio
+    async def test_versions_stored_as_small_deltas_with_periodic_snapshots(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        with patch.object(settings, "note_version_snapshot_interval", 4):
+            for version in VERSIONS:
+                await _push(client, token, version)
+
+        versions = await _versions(db, user_id)
+        assert [v.content_hash for v in versions] == [_hash(v) for v in VERSIONS[:-1]]
+        # Au plus 3 deltas consécutifs, puis un instantané
+        assert [v.delta is None for v in versions] == [False, False, False, True] * 2 + [False]
+        for version in versions:
+            if version.delta is None:
+                assert get_blob_path(version.content_hash).exists()
+            else:
+                assert len(version.delta) < 100
+
+    @pytest.mark.asyncio
+    async def test_every_version_reconstructed(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        with patch.object(settings, "note_version_snapshot_interval", 4):
+            for version in VERSIONS:
+                await _push(client, token, version)
+
+        for version in VERSIONS[:-1]:
+            assert await get_version_content(db, user_id, _hash(version)) == version
+
+    @pytest.mark.asyncio
+    async def test_rewrite_stored_as_snapshot(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        await _push(client, token, "première version\n")
+        await _push(client, token, "tout autre chose\n")
+
+        versions = await _versions(db, user_id)
+        assert versions[0].delta is None
+        assert await get_version_content(db, user_id, _hash("première version\n")) == "première version\n"
+
+    @pytest.mark.asyncio
+    async def test_old_versions_pruned_by_age(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        for version in VERSIONS[:4]:
+            await _push(client, token, version)
+
+        old = datetime.utcnow() - timedelta(days=settings.note_versions_max_age_days + 1)
+        await db.execute(
+            update(NoteVersion).where(NoteVersion.content_hash == _hash(VERSIONS[0])).values(created_at=old)
+        )
+        await db.commit()
+        assert await prune_note_versions(db) == 1
+
+        assert await get_version_content(db, user_id, _hash(VERSIONS[0])) is None
+        assert await get_version_content(db, user_id, _hash(VERSIONS[1])) == VERSIONS[1]
+
+    @pytest.mark.asyncio
+    async def test_history_follows_moved_note(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        await _push(client, token, VERSIONS[0])
+        await _push(client, token, VERSIONS[1])
+
+        resp = await client.post("/sync/move", headers=auth_headers(token), json={"moves": [{
+            "kind": "note",
+            "from_path": "journal.md",
+            "to_path": "archives/journal.md",
+            "content_hash": _hash(VERSIONS[1]),
+            "modified_at": "2026-01-11T10:00:00"
+        }]})
+        assert resp.json()["success"] == ["archives/journal.md"]
+
+        assert await get_version_content(db, user_id, _hash(VERSIONS[0])) == VERSIONS[0]
+
+    @pytest.mark.asyncio
+    async def test_failed_write_records_no_version(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        await _push(client, token, VERSIONS[0])
+
+        with patch("app.services.notes_sync.storage.save_note", side_effect=OSError("disque plein")):
+            resp = await client.post("/sync/push", headers=auth_headers(token), json={"notes": [{
+                "path": "journal.md", "content": VERSIONS[1], "content_hash": _hash(VERSIONS[1]),
+                "modified_at": "2026-01-11T10:00:00"
+            }]})
+        assert resp.json()["failed"] == ["journal.md"]
+        assert await _versions(db, user_id) == []
+
+    @pytest.mark.asyncio
+    async def test_large_repetitive_note_versioned_quickly(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        before = "- même ligne\n" * 20000
+        after = "".join("- autre ligne\n" if i % 2 else "- même ligne\n" for i in range(20000))
+        await _push(client, token, before)
+        with patch.object(settings, "note_diff_max_line_pairs", 10_000):
+            await _push(client, token, after)
+
+        assert await get_version_content(db, user_id, _hash(before)) == before
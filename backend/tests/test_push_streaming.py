@@ -0,0 +1,111 @@
+"""
+Tests d'intégration du push lu en streaming (/sync/push, /sync/attachments/push).
+"""
+import base64
+import json
+from unittest.mock import patch
+
+import pytest
+from .conftest import auth_headers
+
+from app.core import storage
+from app.core.config import settings
+from app.services import MAX_ATTACHMENT_SIZE
+from app.services.sync_utils import get_note_by_path
+
+
+def _note(i: int) -> dict:
+    return {
+        "path": f"journal/{i:03d}.md",
+        "content": f"# Jour {i}\n" + "texte " * 200,
+        "content_hash": "x",
+        "modified_at": "2026-01-10T10:00:00"
+    }
+
+
+class TestPushStreaming:
+    """Tests de l'ingestion incrémentale des push."""
+
+    @pytest.mark.asyncio
+    async def test_push_many_notes_sent_in_blocks(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        body = json.dumps({"notes": [_note(i) for i in range(150)]}).encode("utf-8")
+
+        async def blocks():
+            for i in range(0, len(body), 4096):
+                yield body[i:i + 4096]
+
+        resp = await client.post(
+            "/sync/push",
+            headers={**auth_headers(token), "Content-Type": "application/json"},
+            content=blocks()
+        )
+        assert resp.status_code == 200
+        assert len(resp.json()["success"]) == 150
+        assert await storage.read_note(user_id, "journal/149.md") == _note(149)["content"]
+
+    @pytest.mark.asyncio
+    async def test_request_budget_enforced(self, authenticated_client):
+        client, token = authenticated_client
+        with patch.object(settings, "push_request_max_bytes", 10_000):
+            resp = await client.post(
+                "/sync/push", headers=auth_headers(token), json={"notes": [_note(i) for i in range(20)]}
+            )
+        assert resp.status_code == 413
+
+    @pytest.mark.asyncio
+    async def test_oversized_note_rejected(self, authenticated_client):
+        client, token = authenticated_client
+        with patch.object(settings, "push_note_max_bytes", 1000):
+            resp = await client.post("/sync/push", headers=auth_headers(token), json={"notes": [_note(1)]})
+        assert resp.status_code == 413
+
+    @pytest.mark.asyncio
+    async def test_oversized_attachment_rejected_while_receiving(self, authenticated_client):
+        client, token = authenticated_client
+        content = base64.b64encode(b"\0" * (MAX_ATTACHMENT_SIZE + 1024 * 1024)).decode("ascii")
+        resp = await client.post(
+            "/sync/attachments/push",
+            headers=auth_headers(token),
+            json={"attachments": [{
+                "path": "enorme.bin", "content_base64": content, "content_hash": "x",
+                "size": 1, "modified_at": "2026-01-10T10:00:00"
+            }]}
+        )
+        assert resp.status_code == 413
+
+    @pytest.mark.asyncio
+    async def test_invalid_json_rejected(self, authenticated_client):
+        client, token = authenticated_client
+        resp = await client.post(
+            "/sync/push",
+            headers={**auth_headers(token), "Content-Type": "application/json"},
+            content=b'{"notes": [{"path": "a.md"'
+        )
+        assert resp.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_items_before_invalid_one_are_kept(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        resp = await client.post(
+            "/sync/push",
+            headers=auth_headers(token),
+            json={"notes": [_note(1), {"path": "incomplet.md"}]}
+        )
+        assert resp.status_code == 422
+        assert await storage.read_note(user_id, "journal/001.md") == _note(1)["content"]
+
+    @pytest.mark.asyncio
+    async def test_items_before_oversized_one_are_kept(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        oversized = {**_note(2), "content": "x" * 2000}
+        with patch.object(settings, "push_note_max_bytes", 1500):
+            resp = await client.post(
+                "/sync/push", headers=auth_headers(token), json={"notes": [_note(1), oversized]}
+            )
+
+        assert resp.status_code == 413
+        assert await storage.read_note(user_id, "journal/001.md") == _note(1)["content"]
+        note = await get_note_by_path(db, user_id, "journal/001.md")
+        assert note is not None and not note.is_deleted
+
@@ -0,0 +1,140 @@
+"""
+Tests d'intégration des uploads reprenables (POST/GET/PATCH/DELETE /sync/uploads).
+"""
+import pytest
+from httpx import AsyncClient
+from .conftest import auth_headers
+
+from app.core import storage
+from app.core.storage import compute_hash
+
+
+PDF = bytes(range(256)) * 400
+
+
+async def create_upload(client: AsyncClient, token: str, content: bytes = PDF, path: str = "docs/gros.pdf") -> str:
+    resp = await client.post(
+        "/sync/uploads",
+        headers=auth_headers(token),
+        json={
+            "path": path,
+            "size": len(content),
+            "content_hash": compute_hash(content),
+            "mime_type": "application/pdf",
+            "modified_at": "2026-01-10T10:00:00"
+        }
+    )
+    assert resp.status_code == 201
+    assert resp.json()["offset"] == 0
+    return resp.json()["upload_id"]
+
+
+async def patch_chunk(client: AsyncClient, token: str, upload_id: str, offset: int, chunk: bytes):
+    return await client.patch(
+        f"/sync/uploads/{upload_id}",
+        content=chunk,
+        headers={**auth_headers(token), "Upload-Offset": str(offset)}
+    )
+
+
+class TestResumableUploads:
+    """Tests des uploads reprenables."""
+
+    @pytest.mark.asyncio
+    async def test_upload_in_chunks_then_complete(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        upload_id = await create_upload(client, token)
+
+        half = len(PDF) // 2
+        resp = await patch_chunk(client, token, upload_id, 0, PDF[:half])
+        assert resp.json()["offset"] == half
+
+        # Reprise : le client redemande l'offset avant de continuer
+        resp = await client.get(f"/sync/uploads/{upload_id}", headers=auth_headers(token))
+        assert resp.json()["offset"] == half
+        resp = await patch_chunk(client, token, upload_id, half, PDF[half:])
+        assert resp.json()["offset"] == len(PDF)
+
+        resp = await client.post(f"/sync/uploads/{upload_id}/complete", headers=auth_headers(token))
+        assert resp.status_code == 200
+        assert resp.json()["content_hash"] == compute_hash(PDF)
+        assert await storage.read_attachment(user_id, "docs/gros.pdf") == PDF
+
+        resp = await client.post(
+            "/sync/attachments/pull", headers=auth_headers(token), json={"paths": ["docs/gros.pdf"]}
+        )
+        assert resp.json()["attachments"][0]["size"] == len(PDF)
+
+        resp = await client.get(f"/sync/uploads/{upload_id}", headers=auth_headers(token))
+        assert resp.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_wrong_offset_is_conflict(self, authenticated_client):
+        client, token = authenticated_client
+        upload_id = await create_upload(client, token)
+        await patch_chunk(client, token, upload_id, 0, PDF[:100])
+
+        resp = await patch_chunk(client, token, upload_id, 0, PDF[:100])
+        assert resp.status_code == 409
+        assert resp.headers["upload-offset"] == "100"
+
+    @pytest.mark.asyncio
+    async def test_complete_before_all_bytes_is_conflict(self, authenticated_client):
+        client, token = authenticated_client
+        upload_id = await create_upload(client, token)
+        await patch_chunk(client, token, upload_id, 0, PDF[:100])
+
+        resp = await client.post(f"/sync/uploads/{upload_id}/complete", headers=auth_headers(token))
+        assert resp.status_code == 409
+
+    @pytest.mark.asyncio
+    async def test_bytes_beyond_declared_size_rejected(self, authenticated_client):
+        client, token = authenticated_client
+        upload_id = await create_upload(client, token, content=b"abc")
+
+        resp = await patch_chunk(client, token, upload_id, 0, b"abcdef")
+        assert resp.status_code == 413
+
+    @pytest.mark.asyncio
+    async def test_hash_mismatch_rejected(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        upload_id = await create_upload(client, token, content=b"abc", path="faux.bin")
+        await patch_chunk(client, token, upload_id, 0, b"abd")
+
+        resp = await client.post(f"/sync/uploads/{upload_id}/complete", headers=auth_headers(token))
+        assert resp.status_code == 400
+        assert await storage.read_attachment(user_id, "faux.bin") is None
+
+    @pytest.mark.asyncio
+    async def test_abort_and_isolation_between_users(self, authenticated_client):
+        client, token = authenticated_client
+        upload_id = await create_upload(client, token)
+
+        await client.post("/auth/register", json={
+            "username": "autre", "email": "autre@example.com", "password": "autrepassword123"
+        })
+        other = (await client.post("/auth/login", json={
+            "username": "autre", "password": "autrepassword123"
+        })).json()["access_token"]
+        resp = await client.get(f"/sync/uploads/{upload_id}", headers=auth_headers(other))
+        assert resp.status_code == 404
+
+        resp = await client.delete(f"/sync/uploads/{upload_id}", headers=auth_headers(token))
+        assert resp.status_code == 204
+        resp = await client.get(f"/sync/uploads/{upload_id}", headers=auth_headers(token))
+        assert resp.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_oversized_declaration_rejected(self, authenticated_client):
+        client, token = authenticated_client
+        resp = await client.post(
+            "/sync/uploads",
+            headers=auth_headers(token),
+            json={
+                "path": "enorme.bin",
+                "size": 26 * 1024 * 1024,
+                "content_hash": "0" * 64,
+                "modified_at": "2026-01-10T10:00:00"
+            }
+        )
+        assert resp.status_code == 413
@@ -0,0 +1,187 @@
+"""
+Tests d'intégration pour l'arbre de hachage du vault (POST /sync/digest).
+"""
+import sqlite3
+from datetime import datetime
+import pytest
+from unittest.mock import patch
+from httpx import AsyncClient
+from sqlalchemy import select
+from .conftest import auth_headers, TEST_DB_PATH, test_async_session_maker as session_maker
+
+from app.core.storage import compute_hash
+from app.models import Note, VaultTreeNode
+from app.services.vault_tree import rebuild_vault_tree, update_vault_tree_batch, folder_hash
+
+
+async def push_notes(client: AsyncClient, token: str, notes: list):
+    resp = await client.post(
+        "/sync/push",
+        headers=auth_headers(token),
+        json={"notes": [
+            {
+                "path": path,
+                "content": content,
+                "content_hash": "",
+                "modified_at": "2026-01-10T10:00:00",
+                "is_deleted": content is None
+            } if content is not None else {
+                "path": path,
+                "content": "",
+                "content_hash": "",
+                "modified_at": "2026-01-11T10:00:00",
+                "is_deleted": True
+            }
+            for path, content in notes
+        ]}
+    )
+    assert resp.status_code == 200
+    assert resp.json()["failed"] == []
+
+
+async def get_digest(client: AsyncClient, token: str, paths=None) -> dict:
+    resp = await client.post(
+        "/sync/digest",
+        headers=auth_headers(token),
+        json={"paths": paths if paths is not None else [""]}
+    )
+    assert resp.status_code == 200
+    return resp.json()
+
+
+class TestVaultDigest:
+    """Tests du digest du vault."""
+
+    @pytest.mark.asyncio
+    async def test_empty_vault(self, authenticated_client):
+        client, token = authenticated_client
+
+        data = await get_digest(client, token)
+
+        assert data["root_digest"] == "0" * 64
+        assert data["nodes"][0]["children"] == []
+
+    @pytest.mark.asyncio
+    async def test_root_children(self, authenticated_client):
+        client, token = authenticated_client
+        await push_notes(client, token, [("root.md", "# Racine"), ("projets/a.md", "# A")])
+
+        data = await get_digest(client, token)
+
+        children = {(c["name"], c["kind"]) for c in data["nodes"][0]["children"]}
+        assert children == {("root.md", "note"), ("projets", "folder")}
+
+    @pytest.mark.asyncio
+    async def test_descend_into_folder(self, authenticated_client):
+        client, token = authenticated_client
+        await push_notes(client, token, [("projets/a.md", "# A"), ("projets/sub/b.md", "# B")])
+
+        data = await get_digest(client, token, ["projets"])
+
+        node = data["nodes"][0]
+        assert node["path"] == "projets"
+        assert {(c["name"], c["kind"]) for c in node["children"]} == {("a.md", "note"), ("sub", "folder")}
+
+    @pytest.mark.asyncio
+    async def test_change_updates_root_digest(self, authenticated_client):
+        client, token = authenticated_client
+        await push_notes(client, token, [("projets/a.md", "# A")])
+        before = (await get_digest(client, token))["root_digest"]
+
+        await push_notes(client, token, [("projets/a.md", "# A modifiée")])
+        after = (await get_digest(client, token))["root_digest"]
+
+        assert before != after
+
+    @pytest.mark.asyncio
+    async def test_incremental_updates_match_rebuild(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        await push_notes(client, token, [("a.md", "# A"), ("x/b.md", "# B")])
+        await get_digest(client, token)  # Construit l'arbre
+
+        await push_notes(client, token, [
+            ("x/y/c.md", "# C"),
+            ("x/b.md", "# B2"),
+            ("a.md", None),
+        ])
+        incremental = (await get_digest(client, token))["root_digest"]
+
+        root = await rebuild_vault_tree(db, user_id)
+        assert root.digest == incremental
+
+    @pytest.mark.asyncio
+    async def test_concurrent_update_invalidates_tree(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        await push_notes(client, token, [("x/a.md", "# A")])
+        await get_digest(client, token)  # Construit l'arbre
+
+        def racing_folder_hash(name, digest):
+            # Un autre push écrit le dossier entre la lecture et l'écriture des digests
+            with sqlite3.connect(TEST_DB_PATH) as conn:
+                conn.execute("UPDATE vault_tree SET digest = ? WHERE path = 'x'", ("1" * 64,))
+            return folder_hash(name, digest)
+
+        with patch("app.services.vault_tree.folder_hash", side_effect=racing_folder_hash):
+            await push_notes(client, token, [("x/b.md", "# B")])
+
+        assert await db.scalar(select(VaultTreeNode).where(
+            VaultTreeNode.user_id == user_id, VaultTreeNode.path == ""
+        )) is None
+        incremental = (await get_digest(client, token))["root_digest"]
+        root = await rebuild_vault_tree(db, user_id)
+        assert root.digest == incremental
+
+    @pytest.mark.asyncio
+    async def test_push_during_rebuild_invalidates_tree(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        await push_notes(client, token, [("x/a.md", "# A")])
+        content_hash = compute_hash(b"# B")
+
+        async with session_maker() as pushing, session_maker() as rebuilding:
+            execute = pushing.execute
+            calls = []
+
+            async def racing_execute(*args, **kwargs):
+                result = await execute(*args, **kwargs)
+                calls.append(args[0])
+                if len(calls) == 1:
+                    # L'arbre est reconstruit (sans x/b.md) juste après la lecture du push
+                    await rebuild_vault_tree(rebuilding, user_id)
+                return result
+
+            with patch.object(pushing, "execute", side_effect=racing_execute):
+                await update_vault_tree_batch(
+                    pushing, user_id, "note", [("x/b.md", None, (content_hash, False))]
+                )
+            pushing.add(Note(
+                user_id=user_id, path="x/b.md", content_hash=content_hash,
+                modified_at=datetime(2026, 1, 10, 10), is_deleted=False
+            ))
+            await pushing.commit()
+
+        incremental = (await get_digest(client, token))["root_digest"]
+        root = await rebuild_vault_tree(db, user_id)
+        assert root.digest == incremental
+
+    @pytest.mark.asyncio
+    async def test_deletion_kept_as_tombstone(self, authenticated_client):
+        client, token = authenticated_client
+        await push_notes(client, token, [("tmp/x.md", "# X")])
+        before = (await get_digest(client, token))["root_digest"]
+
+        await push_notes(client, token, [("tmp/x.md", None)])
+        data = await get_digest(client, token, ["tmp"])
+
+        assert data["root_digest"] != before
+        assert data["nodes"][0]["children"] == [
+            {"name": "x.md", "kind": "note", "hash": "", "is_deleted": True}
+        ]
+
+    @pytest.mark.asyncio
+    async def test_unknown_folder(self, authenticated_client):
+        client, token = authenticated_client
+
+        data = await get_digest(client, token, ["inexistant"])
+
+        assert data["nodes"][0]["digest"] == "0" * 64
+        assert data["nodes"][0]["children"] == []
@@ -0,0 +1,169 @@
+"""
+Tests d'intégration pour le sync en un aller-retour (POST /sync/exchange).
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+from httpx import AsyncClient
+from .conftest import auth_headers
+
+from app.core import storage
+from app.core.config import settings
+
+
+def note_meta(path: str, modified_at: str, content_hash: str = "local"):
+    return {"path": path, "content_hash": content_hash, "modified_at": modified_at}
+
+
+def note_content(path: str, content: str, modified_at: str):
+    return {
+        "path": path,
+        "content": content,
+        "content_hash": "local",
+        "modified_at": modified_at,
+        "is_deleted": False
+    }
+
+
+async def push_note(client: AsyncClient, token: str, path: str, content: str, modified_at: str):
+    resp = await client.post(
+        "/sync/push",
+        headers=auth_headers(token),
+        json={"notes": [note_content(path, content, modified_at)]}
+    )
+    assert path in resp.json()["success"]
+
+
+class TestSyncExchange:
+    """Tests du endpoint /sync/exchange."""
+
+    @pytest.mark.asyncio
+    async def test_inline_push_applied(self, authenticated_client):
+        client, token = authenticated_client
+
+        resp = await client.post(
+            "/sync/exchange",
+            headers=auth_headers(token),
+            json={
+                "notes": [note_meta("new.md", "2026-01-10T10:00:00")],
+                "notes_content": [note_content("new.md", "# Nouvelle", "2026-01-10T10:00:00")]
+            }
+        )
+
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["pushed"] == ["new.md"]
+        assert data["notes_to_push"] == []
+
+        pulled = await client.post("/sync/pull", headers=auth_headers(token), json={"paths": ["new.md"]})
+        assert pulled.json()["notes"][0]["content"] == "# Nouvelle"
+
+    @pytest.mark.asyncio
+    async def test_cursor_skips_inline_pushes(self, authenticated_client):
+        client, token = authenticated_client
+
+        resp = await client.post(
+            "/sync/exchange",
+            headers=auth_headers(token),
+            json={
+                "notes": [note_meta("envoyee.md", "2026-01-10T10:00:00")],
+                "notes_content": [note_content("envoyee.md", "# Envoyée", "2026-01-10T10:00:00")]
+            }
+        )
+        assert resp.json()["pushed"] == ["envoyee.md"]
+
+        resp = await client.post(
+            "/sync", headers=auth_headers(token), json={"cursor": resp.json()["cursor"], "notes": []}
+        )
+
+        assert resp.json()["incremental"] is True
+        assert resp.json()["notes_to_pull"] == []
+
+    @pytest.mark.asyncio
+    async def test_inline_pull_returns_content(self, authenticated_client):
+        client, token = authenticated_client
+        await push_note(client, token, "remote.md", "# Distante", "2026-01-10T10:00:00")
+
+        resp = await client.post("/sync/exchange", headers=auth_headers(token), json={"notes": []})
+
+        data = resp.json()
+        assert data["notes_to_pull"] == []
+        assert [n["content"] for n in data["notes_content"]] == ["# Distante"]
+        assert data["cursor"]
+
+    @pytest.mark.asyncio
+    async def test_unplanned_inline_note_not_applied(self, authenticated_client):
+        """Une note en conflit n'est pas écrasée même si son contenu est fourni."""
+        client, token = authenticated_client
+        await push_note(client, token, "note.md", "# Serveur", "2026-01-10T10:00:00")
+
+        resp = await client.post(
+            "/sync/exchange",
+            headers=auth_headers(token),
+            json={
+                "notes": [note_meta("note.md", "2026-01-10T10:00:00", "autre")],
+                "notes_content": [note_content("note.md", "# Client", "2026-01-10T10:00:00")]
+            }
+        )
+
+        data = resp.json()
+        assert data["pushed"] == []
+        assert [c["path"] for c in data["conflicts"]] == ["note.md"]
+
+    @pytest.mark.asyncio
+    async def test_large_notes_fall_back_to_separate_calls(self, authenticated_client):
+        client, token = authenticated_client
+        await push_note(client, token, "big_remote.md", "x" * 200, "2026-01-10T10:00:00")
+
+        with patch.object(settings, "inline_note_max_bytes", 100):
+            resp = await client.post(
+                "/sync/exchange",
+                headers=auth_headers(token),
+                json={
+                    "notes": [note_meta("big_local.md", "2026-01-10T10:00:00")],
+                    "notes_content": [note_content("big_local.md", "y" * 200, "2026-01-10T10:00:00")]
+                }
+            )
+
+        data = resp.json()
+        assert data["pushed"] == []
+        assert data["notes_to_push"] == ["big_local.md"]
+        assert data["notes_content"] == []
+        assert [n["path"] for n in data["notes_to_pull"]] == ["big_remote.md"]
+
+    @pytest.mark.asyncio
+    async def test_response_budget_limits_inline_pulls(self, authenticated_client):
+        client, token = authenticated_client
+        await push_note(client, token, "a.md", "a" * 60, "2026-01-10T10:00:00")
+        await push_note(client, token, "b.md", "b" * 60, "2026-01-10T10:00:00")
+
+        with patch.object(settings, "inline_response_max_bytes", 100):
+            resp = await client.post("/sync/exchange", headers=auth_headers(token), json={"notes": []})
+
+        data = resp.json()
+        assert [n["path"] for n in data["notes_content"]] == ["a.md"]
+        assert [n["path"] for n in data["notes_to_pull"]] == ["b.md"]
+
+    @pytest.mark.asyncio
+    async def test_inline_pulls_read_concurrently(self, authenticated_client):
+        client, token = authenticated_client
+        for i in range(5):
+            await push_note(client, token, f"lot/{i}.md", f"# Note {i}", "2026-01-10T10:00:00")
+
+        read_note = storage.read_note
+        in_flight, peak = 0, 0
+
+        async def slow_read(*args, **kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return await read_note(*args, **kwargs)
+
+        with patch("app.services.exchange_sync.storage.read_note", side_effect=slow_read):
+            resp = await client.post("/sync/exchange", headers=auth_headers(token), json={"notes": []})
+
+        contents = {n["path"]: n["content"] for n in resp.json()["notes_content"]}
+        assert contents == {f"lot/{i}.md": f"# Note {i}" for i in range(5)}
+        assert peak > 1
@@ -0,0 +1,309 @@
+"""
+Tests d'intégration pour le sync incrémental (journal des changements + curseurs).
+"""
+import json
+import pytest
+from datetime import timedelta
+from httpx import AsyncClient
+from .conftest import auth_headers
+
+from app.services.journal import compact_journal
+
+
+async def push_note(client: AsyncClient, token: str, path: str, content: str, modified_at: str):
+    resp = await client.post(
+        "/sync/push",
+        headers=auth_headers(token),
+        json={"notes": [{
+            "path": path,
+            "content": content,
+            "content_hash": "ignored",
+            "modified_at": modified_at,
+            "is_deleted": False
+        }]}
+    )
+    assert resp.status_code == 200
+    assert path in resp.json()["success"]
+
+
+class TestIncrementalSync:
+    """Tests du sync avec curseur."""
+
+    @pytest.mark.asyncio
+    async def test_full_sync_returns_cursor(self, authenticated_client):
+        client, token = authenticated_client
+
+        resp = await client.post("/sync", headers=auth_headers(token), json={"notes": []})
+
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["cursor"]
+        assert data["incremental"] is False
+
+    @pytest.mark.asyncio
+    async def test_cursor_returns_only_changes_since(self, authenticated_client):
+        client, token = authenticated_client
+        await push_note(client, token, "old.md", "# Ancienne", "2026-01-10T10:00:00")
+
+        first = await client.post("/sync", headers=auth_headers(token), json={"notes": []})
+        cursor = first.json()["cursor"]
+
+        # Un autre device pousse une nouvelle note
+        await push_note(client, token, "new.md", "# Nouvelle", "2026-01-11T10:00:00")
+
+        resp = await client.post(
+            "/sync",
+            headers=auth_headers(token),
+            json={"cursor": cursor, "notes": [], "attachments": []}
+        )
+
+        data = resp.json()
+        assert data["incremental"] is True
+        assert [n["path"] for n in data["notes_to_pull"]] == ["new.md"]
+        assert data["cursor"] != cursor
+
+    @pytest.mark.asyncio
+    async def test_cursor_propagates_deletion(self, authenticated_client):
+        client, token = authenticated_client
+        await push_note(client, token, "doomed.md", "# Bientôt supprimée", "2026-01-10T10:00:00")
+        cursor = (await client.post("/sync", headers=auth_headers(token), json={})).json()["cursor"]
+
+        await client.post(
+            "/sync/push",
+            headers=auth_headers(token),
+            json={"notes": [{
+                "path": "doomed.md",
+                "content": "",
+                "content_hash": "",
+                "modified_at": "2026-01-11T10:00:00",
+                "is_deleted": True
+            }]}
+        )
+
+        resp = await client.post("/sync", headers=auth_headers(token), json={"cursor": cursor})
+
+        pulled = resp.json()["notes_to_pull"]
+        assert len(pulled) == 1
+        assert pulled[0]["path"] == "doomed.md"
+        assert pulled[0]["is_deleted"] is True
+
+    @pytest.mark.asyncio
+    async def test_local_change_pushed_with_cursor(self, authenticated_client):
+        client, token = authenticated_client
+        await push_note(client, token, "note.md", "# V1", "2026-01-10T10:00:00")
+        cursor = (await client.post("/sync", headers=auth_headers(token), json={})).json()["cursor"]
+
+        resp = await client.post(
+            "/sync",
+            headers=auth_headers(token),
+            json={
+                "cursor": cursor,
+                "notes": [{
+                    "path": "note.md",
+                    "content_hash": "v2hash",
+                    "modified_at": "2026-01-12T10:00:00"
+                }]
+            }
+        )
+
+        data = resp.json()
+        assert data["incremental"] is True
+        assert data["notes_to_push"] == ["note.md"]
+        assert data["notes_to_pull"] == []
+
+    @pytest.mark.asyncio
+    async def test_push_returns_cursor_past_own_changes(self, authenticated_client):
+        client, token = authenticated_client
+        cursor = (await client.post("/sync", headers=auth_headers(token), json={})).json()["cursor"]
+
+        resp = await client.post(
+            "/sync/push",
+            params={"cursor": cursor},
+            headers=auth_headers(token),
+            json={"notes": [{
+                "path": "echo.md",
+                "content": "# Poussée par ce client",
+                "content_hash": "ignored",
+                "modified_at": "2026-01-12T10:00:00",
+                "is_deleted": False
+            }]}
+        )
+        pushed_cursor = resp.json()["cursor"]
+        assert pushed_cursor != cursor
+
+        resp = await client.post("/sync", headers=auth_headers(token), json={"cursor": pushed_cursor})
+
+        assert resp.json()["incremental"] is True
+        assert resp.json()["notes_to_pull"] == []
+
+    @pytest.mark.asyncio
+    async def test_push_cursor_keeps_foreign_changes(self, authenticated_client):
+        client, token = authenticated_client
+        cursor = (await client.post("/sync", headers=auth_headers(token), json={})).json()["cursor"]
+
+        # Un autre device pousse entre le sync et le push de ce client
+        await push_note(client, token, "autre.md", "# Autre device", "2026-01-11T10:00:00")
+        resp = await client.post(
+            "/sync/move",
+            params={"cursor": cursor},
+            headers=auth_headers(token),
+            json={"moves": []}
+        )
+        assert resp.json()["cursor"] == cursor
+
+        resp = await client.post("/sync", headers=auth_headers(token), json={"cursor": cursor})
+
+        assert [n["path"] for n in resp.json()["notes_to_pull"]] == ["autre.md"]
+
+    @pytest.mark.asyncio
+    async def test_push_without_cursor_returns_none(self, authenticated_client):
+        client, token = authenticated_client
+
+        resp = await client.post("/sync/push", headers=auth_headers(token), json={"notes": []})
+
+        assert "cursor" not in resp.json()
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor_falls_back_to_full_sync(self, authenticated_client):
+        client, token = authenticated_client
+        await push_note(client, token, "note.md", "# Note", "2026-01-10T10:00:00")
+
+        resp = await client.post(
+            "/sync",
+            headers=auth_headers(token),
+            json={"cursor": "pas-un-curseur", "notes": []}
+        )
+
+        data = resp.json()
+        assert data["incremental"] is False
+        assert [n["path"] for n in data["notes_to_pull"]] == ["note.md"]
+
+
+class TestJournalCompaction:
+    """Tests de compaction du journal."""
+
+    @pytest.mark.asyncio
+    async def test_truncated_cursor_falls_back_to_full_sync(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        await push_note(client, token, "a.md", "# A", "2026-01-10T10:00:00")
+        cursor = (await client.post("/sync", headers=auth_headers(token), json={})).json()["cursor"]
+        await push_note(client, token, "b.md", "# B", "2026-01-11T10:00:00")
+
+        # Rétention nulle : tout le journal sauf la tête est tronqué
+        await compact_journal(db, user_id, timedelta(0))
+
+        resp = await client.post("/sync", headers=auth_headers(token), json={"cursor": cursor})
+
+        data = resp.json()
+        assert data["incremental"] is False
+        assert sorted(n["path"] for n in data["notes_to_pull"]) == ["a.md", "b.md"]
+
+    @pytest.mark.asyncio
+    async def test_superseded_entries_keep_cursor_valid(self, authenticated_client_with_db):
+        client, token, db, user_id = authenticated_client_with_db
+        await push_note(client, token, "a.md", "# A1", "2026-01-10T10:00:00")
+        cursor = (await client.post("/sync", headers=auth_headers(token), json={})).json()["cursor"]
+        await push_note(client, token, "a.md", "# A2", "2026-01-11T10:00:00")
+        await push_note(client, token, "a.md", "# A3", "2026-01-12T10:00:00")
+
+        removed = await compact_journal(db, user_id, timedelta(days=30))
+
+        assert removed == 2
+        resp = await client.post("/sync", headers=auth_headers(token), json={"cursor": cursor})
+        data = resp.json()
+        assert data["incremental"] is True
+        assert [n["path"] for n in data["notes_to_pull"]] == ["a.md"]
+
+
+class TestManifestCache:
+    """Tests du cache des manifestes serveur (sync complet)."""
+
+    @pytest.mark.asyncio
+    async def test_repeated_full_sync_hits_cache(self, authenticated_client):
+        client, token = authenticated_client
+        await push_note(client, token, "note.md", "# Note", "2026-01-10T10:00:00")
+
+        await client.post("/sync", headers=auth_headers(token), json={"notes": []})
+        before = (await client.get("/health/metrics")).json()["manifest_cache"]
+        resp = await client.post("/sync", headers=auth_headers(token), json={"notes": []})
+        after = (await client.get("/health/metrics")).json()["manifest_cache"]
+
+        assert [n["path"] for n in resp.json()["notes_to_pull"]] == ["note.md"]
+        assert after["hits"] == before["hits"] + 1
+
+    @pytest.mark.asyncio
+    async def test_push_invalidates_cached_manifest(self, authenticated_client):
+        client, token = authenticated_client
+        await push_note(client, token, "a.md", "# A", "2026-01-10T10:00:00")
+        await client.post("/sync", headers=auth_headers(token), json={"notes": []})
+
+        await push_note(client, token, "b.md", "# B", "2026-01-11T10:00:00")
+        resp = await client.post("/sync", headers=auth_headers(token), json={"notes": []})
+
+        assert sorted(n["path"] for n in resp.json()["notes_to_pull"]) == ["a.md", "b.md"]
+
+    @pytest.mark.asyncio
+    async def test_compare_shares_cached_notes(self, authenticated_client):
+        client, token = authenticated_client
+        await push_note(client, token, "a.md", "# A", "2026-01-10T10:00:00")
+        await client.post("/sync", headers=auth_headers(token), json={"notes": []})
+        before = (await client.get("/health/metrics")).json()["manifest_cache"]
+
+        resp = await client.post("/sync/compare", headers=auth_headers(token), json={"notes": []})
+
+        after = (await client.get("/health/metrics")).json()["manifest_cache"]
+        assert resp.status_code == 200
+        assert after["hits"] == before["hits"] + 1
+
+
+class TestNdjsonSync:
+    """Tests du plan de sync en streaming NDJSON."""
+
+    @pytest.mark.asyncio
+    async def test_stream_matches_json_plan(self, authenticated_client):
+        client, token = authenticated_client
+        await push_note(client, token, "a.md", "# A", "2026-01-10T10:00:00")
+        await push_note(client, token, "b.md", "# B", "2026-01-10T10:00:00")
+        body = {"notes": [{"path": "local.md", "content_hash": "h", "modified_at": "2026-01-10T10:00:00"}]}
+
+        resp = await client.post(
+            "/sync",
+            headers={**auth_headers(token), "Accept": "application/x-ndjson"},
+            json=body
+        )
+
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in resp.text.splitlines()]
+        assert lines[0]["type"] == "header"
+        assert lines[0]["incremental"] is False
+        assert lines[-1]["type"] == "end"
+        assert lines[-1]["counts"]["notes_to_pull"] == 2
+
+        entries = lines[1:-1]
+        pulled = [e["item"]["path"] for e in entries if e["type"] == "notes_to_pull"]
+        pushed = [e["item"] for e in entries if e["type"] == "notes_to_push"]
+        assert pulled == ["a.md", "b.md"]
+        assert pushed == ["local.md"]
+
+        # Le curseur de fin permet un sync incrémental
+        resp = await client.post("/sync", headers=auth_headers(token), json={"cursor": lines[-1]["cursor"]})
+        assert resp.json()["incremental"] is True
+
+    @pytest.mark.asyncio
+    async def test_large_plan_streamed_in_chunks(self, authenticated_client):
+        client, token = authenticated_client
+        notes = [
+            {"path": f"dossier/note-{i:05d}.md", "content_hash": "h", "modified_at": "2026-01-10T10:00:00"}
+            for i in range(2000)
+        ]
+
+        resp = await client.post(
+            "/sync",
+            headers={**auth_headers(token), "Accept": "application/x-ndjson"},
+            json={"notes": notes}
+        )
+
+        lines = [json.loads(line) for line in resp.text.splitlines()]
+        assert lines[-1]["counts"]["notes_to_push"] == 2000
+        assert len(lines) == 2002
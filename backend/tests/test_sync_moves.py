@@ -0,0 +1,247 @@
+"""
+Tests d'intégration pour la détection et l'application des déplacements (POST /sync/move).
+"""
+import base64
+import pytest
+from unittest.mock import patch
+from httpx import AsyncClient
+from .conftest import auth_headers
+
+from app.core import storage
+
+
+async def push_note(client: AsyncClient, token: str, path: str, content: str, modified_at: str):
+    resp = await client.post(
+        "/sync/push",
+        headers=auth_headers(token),
+        json={"notes": [{
+            "path": path,
+            "content": content,
+            "content_hash": "ignored",
+            "modified_at": modified_at,
+            "is_deleted": False
+        }]}
+    )
+    assert path in resp.json()["success"]
+
+
+def note_hash(content: str) -> str:
+    return storage.compute_hash(content.encode("utf-8"))
+
+
+class TestMoveDetection:
+    """Tests de la détection des renommages par /sync."""
+
+    @pytest.mark.asyncio
+    async def test_client_rename_proposed_as_move(self, authenticated_client):
+        client, token = authenticated_client
+        await push_note(client, token, "old/a.md", "# A", "2026-01-10T10:00:00")
+
+        resp = await client.post(
+            "/sync",
+            headers=auth_headers(token),
+            json={
+                "detect_moves": True,
+                "notes": [
+                    {"path": "old/a.md", "content_hash": "", "modified_at": "2026-01-11T10:00:00",
+                     "is_deleted": True},
+                    {"path": "new/a.md", "content_hash": note_hash("# A"),
+                     "modified_at": "2026-01-11T10:00:00"}
+                ]
+            }
+        )
+
+        data = resp.json()
+        assert data["notes_to_push"] == []
+        assert len(data["moves_to_push"]) == 1
+        move = data["moves_to_push"][0]
+        assert (move["kind"], move["from_path"], move["to_path"]) == ("note", "old/a.md", "new/a.md")
+        assert move["content_hash"] == note_hash("# A")
+
+    @pytest.mark.asyncio
+    async def test_moves_not_detected_without_opt_in(self, authenticated_client):
+        client, token = authenticated_client
+        await push_note(client, token, "old/a.md", "# A", "2026-01-10T10:00:00")
+
+        resp = await client.post(
+            "/sync",
+            headers=auth_headers(token),
+            json={"notes": [
+                {"path": "old/a.md", "content_hash": "", "modified_at": "2026-01-11T10:00:00",
+                 "is_deleted": True},
+                {"path": "new/a.md", "content_hash": note_hash("# A"),
+                 "modified_at": "2026-01-11T10:00:00"}
+            ]}
+        )
+
+        data = resp.json()
+        assert sorted(data["notes_to_push"]) == ["new/a.md", "old/a.md"]
+        assert data["moves_to_push"] == []
+
+
+class TestApplyMoves:
+    """Tests de POST /sync/move."""
+
+    @pytest.mark.asyncio
+    async def test_move_note_relocates_content(self, authenticated_client):
+        client, token = authenticated_client
+        await push_note(client, token, "old/a.md", "# A", "2026-01-10T10:00:00")
+
+        resp = await client.post(
+            "/sync/move",
+            headers=auth_headers(token),
+            json={"moves": [{
+                "kind": "note",
+                "from_path": "old/a.md",
+                "to_path": "new/a.md",
+                "content_hash": note_hash("# A"),
+                "modified_at": "2026-01-11T10:00:00"
+            }]}
+        )
+
+        assert resp.json() == {"success": ["new/a.md"], "failed": []}
+        pulled = await client.post(
+            "/sync/pull", headers=auth_headers(token), json={"paths": ["new/a.md", "old/a.md"]}
+        )
+        notes = {n["path"]: n for n in pulled.json()["notes"]}
+        assert notes["new/a.md"]["content"] == "# A"
+        assert notes["old/a.md"]["is_deleted"] is True
+
+    @pytest.mark.asyncio
+    async def test_move_attachment_keeps_metadata(self, authenticated_client):
+        client, token = authenticated_client
+        content = b"\x89PNG fake"
+        await client.post(
+            "/sync/attachments/push",
+            headers=auth_headers(token),
+            json={"attachments": [{
+                "path": "img/a.png",
+                "content_base64": base64.b64encode(content).decode(),
+                "content_hash": "ignored",
+                "size": len(content),
+                "mime_type": "image/png",
+                "modified_at": "2026-01-10T10:00:00"
+            }]}
+        )
+
+        resp = await client.post(
+            "/sync/move",
+            headers=auth_headers(token),
+            json={"moves": [{
+                "kind": "attachment",
+                "from_path": "img/a.png",
+                "to_path": "media/a.png",
+                "content_hash": storage.compute_hash(content),
+                "modified_at": "2026-01-11T10:00:00"
+            }]}
+        )
+
+        assert resp.json()["success"] == ["media/a.png"]
+        pulled = await client.post(
+            "/sync/attachments/pull", headers=auth_headers(token), json={"paths": ["media/a.png"]}
+        )
+        att = pulled.json()["attachments"][0]
+        assert base64.b64decode(att["content_base64"]) == content
+        assert att["size"] == len(content)
+        assert att["mime_type"] == "image/png"
+
+    @pytest.mark.asyncio
+    async def test_stale_hash_rejected(self, authenticated_client):
+        client, token = authenticated_client
+        await push_note(client, token, "a.md", "# A", "2026-01-10T10:00:00")
+
+        resp = await client.post(
+            "/sync/move",
+            headers=auth_headers(token),
+            json={"moves": [{
+                "kind": "note",
+                "from_path": "a.md",
+                "to_path": "b.md",
+                "content_hash": "perime",
+                "modified_at": "2026-01-11T10:00:00"
+            }]}
+        )
+
+        assert resp.json() == {"success": [], "failed": ["b.md"]}
+
+    @pytest.mark.asyncio
+    async def test_failed_commit_restores_file(self, authenticated_client):
+        client, token = authenticated_client
+        await push_note(client, token, "old/b.md", "# B", "2026-01-10T10:00:00")
+
+        with patch("app.services.moves.record_move", side_effect=RuntimeError("base indisponible")):
+            resp = await client.post(
+                "/sync/move",
+                headers=auth_headers(token),
+                json={"moves": [{
+                    "kind": "note",
+                    "from_path": "old/b.md",
+                    "to_path": "new/b.md",
+                    "content_hash": note_hash("# B"),
+                    "modified_at": "2026-01-11T10:00:00"
+                }]}
+            )
+
+        assert resp.json() == {"success": [], "failed": ["new/b.md"]}
+        pulled = await client.post(
+            "/sync/pull", headers=auth_headers(token), json={"paths": ["old/b.md"]}
+        )
+        assert pulled.json()["notes"][0]["content"] == "# B"
+
+    @pytest.mark.asyncio
+    async def test_move_onto_identical_note(self, authenticated_client):
+        client, token = authenticated_client
+        await push_note(client, token, "copie-1.md", "# Copie", "2026-01-10T10:00:00")
+        await push_note(client, token, "copie-2.md", "# Copie", "2026-01-10T10:00:00")
+
+        resp = await client.post(
+            "/sync/move",
+            headers=auth_headers(token),
+            json={"moves": [{
+                "kind": "note",
+                "from_path": "copie-1.md",
+                "to_path": "copie-2.md",
+                "content_hash": note_hash("# Copie"),
+                "modified_at": "2026-01-11T10:00:00"
+            }]}
+        )
+
+        assert resp.json() == {"success": ["copie-2.md"], "failed": []}
+        pulled = await client.post(
+            "/sync/pull", headers=auth_headers(token), json={"paths": ["copie-1.md", "copie-2.md"]}
+        )
+        notes = {n["path"]: n for n in pulled.json()["notes"]}
+        assert notes["copie-1.md"]["is_deleted"] is True
+        assert notes["copie-2.md"]["content"] == "# Copie"
+
+    @pytest.mark.asyncio
+    async def test_other_device_gets_pull_move_incrementally(self, authenticated_client):
+        client, token = authenticated_client
+        await push_note(client, token, "old/a.md", "# A", "2026-01-10T10:00:00")
+        cursor = (await client.post("/sync", headers=auth_headers(token), json={})).json()["cursor"]
+
+        await client.post(
+            "/sync/move",
+            headers=auth_headers(token),
+            json={"moves": [{
+                "kind": "note",
+                "from_path": "old/a.md",
+                "to_path": "new/a.md",
+                "content_hash": note_hash("# A"),
+                "modified_at": "2026-01-11T10:00:00"
+            }]}
+        )
+
+        # Le second device n'a rien modifié : il n'envoie pas old/a.md
+        resp = await client.post(
+            "/sync",
+            headers=auth_headers(token),
+            json={"cursor": cursor, "detect_moves": True}
+        )
+
+        data = resp.json()
+        assert data["incremental"] is True
+        assert data["notes_to_pull"] == []
+        assert [(m["from_path"], m["to_path"]) for m in data["moves_to_pull"]] == [
+            ("old/a.md", "new/a.md")
+        ]
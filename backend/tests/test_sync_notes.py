@@ -239,6 +239,37 @@ Ceci est un test avec des émojis 🎉 et des accents éèêë.
         assert response.status_code == 200
         assert "unicode-test.md" in response.json()["success"]
 
+    @pytest.mark.asyncio
+    async def test_push_many_notes_across_batches(self, authenticated_client):
+        """Un push de plusieurs lots (chemin répété compris) doit tout enregistrer."""
+        client, token = authenticated_client
+        notes = [
+            {
+                "path": f"import/note{i}.md",
+                "content": f"# Note {i}",
+                "content_hash": f"hash{i}",
+                "modified_at": "2026-01-11T10:00:00",
+                "is_deleted": False
+            }
+            for i in range(450)
+        ]
+        notes.append({**notes[0], "content": "# Note 0 modifiée"})
+
+        response = await client.post("/sync/push", headers=auth_headers(token), json={"notes": notes})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["success"]) == 451
+        assert data["failed"] == []
+
+        pulled = await client.post(
+            "/sync/pull",
+            headers=auth_headers(token),
+            json={"paths": ["import/note0.md", "import/note449.md"]}
+        )
+        contents = {note["path"]: note["content"] for note in pulled.json()["notes"]}
+        assert contents == {"import/note0.md": "# Note 0 modifiée", "import/note449.md": "# Note 449"}
+
 
 class TestPullNotes:
     """Tests du endpoint /sync/pull."""
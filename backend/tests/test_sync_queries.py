@@ -0,0 +1,35 @@
+"""
+Tests d'intégration des requêtes Core de sync_utils (lignes légères, sans entités ORM).
+"""
+import pytest
+from .conftest import auth_headers
+
+from app.services.sync_utils import (
+    get_server_notes,
+    get_note_state_by_path,
+    get_notes_by_paths,
+)
+
+
+@pytest.mark.asyncio
+async def test_state_queries_bypass_identity_map(authenticated_client_with_db):
+    client, token, db, user_id = authenticated_client_with_db
+    await client.post(
+        "/sync/push",
+        headers=auth_headers(token),
+        json={"notes": [
+            {"path": p, "content": f"# {p}", "content_hash": "", "modified_at": "2026-01-10T10:00:00"}
+            for p in ["b.md", "a.md", "dossier/c.md"]
+        ]}
+    )
+    db.expunge_all()
+
+    rows = await get_server_notes(db, user_id)
+    by_paths = await get_notes_by_paths(db, user_id, ["a.md", "absente.md"])
+    single = await get_note_state_by_path(db, user_id, "b.md")
+
+    assert [r.path for r in rows] == ["a.md", "b.md", "dossier/c.md"]
+    assert rows[0]._fields == ("path", "content_hash", "modified_at", "is_deleted")
+    assert [r.path for r in by_paths] == ["a.md"]
+    assert single.is_deleted is False
+    assert len(db.identity_map) == 0
@@ -33,6 +33,13 @@ def mock_user():
 class TestPushAttachments:
     """Tests pour push_attachments()"""
 
+    @pytest.fixture(autouse=True)
+    def no_vault_tree(self):
+        """L'arbre de hachage et le journal sont testés séparément."""
+        with patch('app.services.attachments_sync.update_vault_tree'), \
+             patch('app.services.attachments_sync.record_change'):
+            yield
+
     @pytest.mark.asyncio
     async def test_push_new_attachment(self, mock_db, mock_user):
         """Nouvel attachment créé avec succès"""
@@ -199,6 +206,7 @@ class TestPullAttachments:
     async def test_pull_existing_attachment(self, mock_db, mock_user):
         """Pull d'un attachment existant"""
         att_record = MagicMock()
+        att_record.path = "image.png"
         att_record.is_deleted = False
         att_record.content_hash = "hash123"
         att_record.size = 100
@@ -207,7 +215,7 @@ class TestPullAttachments:
 
         content = b"binary data"
 
-        with patch('app.services.attachments_sync.get_attachment_by_path', return_value=att_record), \
+        with patch('app.services.attachments_sync.get_attachments_by_paths', return_value=[att_record]), \
              patch('app.services.attachments_sync.storage.read_attachment', return_value=content):
 
             result = await pull_attachments(mock_db, mock_user, ["image.png"])
@@ -221,10 +229,12 @@ class TestPullAttachments:
     async def test_pull_deleted_attachment(self, mock_db, mock_user):
         """Pull d'un attachment supprimé"""
         att_record = MagicMock()
+        att_record.path = "deleted.png"
         att_record.is_deleted = True
         att_record.modified_at = datetime.utcnow()
 
-        with patch('app.services.attachments_sync.get_attachment_by_path', return_value=att_record):
+        with patch('app.services.attachments_sync.get_attachments_by_paths', return_value=[att_record]), \
+             patch('app.services.attachments_sync.storage.read_attachment') as read_attachment:
 
             result = await pull_attachments(mock_db, mock_user, ["deleted.png"])
 
@@ -232,11 +242,12 @@ class TestPullAttachments:
             assert result[0].path == "deleted.png"
             assert result[0].content_base64 == ""
             assert result[0].is_deleted == True
+            read_attachment.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_pull_nonexistent_attachment(self, mock_db, mock_user):
         """Pull d'un attachment inexistant"""
-        with patch('app.services.attachments_sync.get_attachment_by_path', return_value=None):
+        with patch('app.services.attachments_sync.get_attachments_by_paths', return_value=[]):
 
             result = await pull_attachments(mock_db, mock_user, ["nonexistent.png"])
 
@@ -245,7 +256,10 @@ class TestPullAttachments:
     @pytest.mark.asyncio
     async def test_pull_invalid_path(self, mock_db, mock_user):
         """Pull avec path invalide → ignoré"""
-        with patch('app.services.attachments_sync.get_attachment_by_path', side_effect=ValueError("Invalid")):
+        att_record = MagicMock(path="../bad.png", is_deleted=False)
+
+        with patch('app.services.attachments_sync.get_attachments_by_paths', return_value=[att_record]), \
+             patch('app.services.attachments_sync.storage.read_attachment', side_effect=ValueError("Invalid")):
 
             result = await pull_attachments(mock_db, mock_user, ["../bad.png"])
 
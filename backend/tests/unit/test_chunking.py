@@ -0,0 +1,67 @@
+"""
+Tests unitaires du découpage défini par le contenu (core/chunking.py).
+"""
+import hashlib
+import random
+
+from app.core import chunking
+from app.core.chunking import chunk_bytes, chunk_file, MIN_CHUNK_SIZE, MAX_CHUNK_SIZE
+
+
+def _data(size: int, seed: int = 1) -> bytes:
+    return random.Random(seed).randbytes(size)
+
+
+class TestChunkBytes:
+    def test_small_content_single_chunk(self):
+        data = b"x" * (MIN_CHUNK_SIZE - 1)
+        chunks = chunk_bytes(data)
+        assert len(chunks) == 1
+        assert chunks[0].length == len(data)
+        assert chunks[0].chunk_hash == hashlib.sha256(data).hexdigest()
+
+    def test_empty_content(self):
+        assert chunk_bytes(b"") == []
+
+    def test_chunks_cover_content_within_bounds(self):
+        data = _data(2 * 1024 * 1024)
+        chunks = chunk_bytes(data)
+        assert sum(c.length for c in chunks) == len(data)
+        offset = 0
+        for chunk in chunks:
+            assert chunk.offset == offset
+            assert chunk.length <= MAX_CHUNK_SIZE
+            assert chunk.chunk_hash == hashlib.sha256(data[offset:offset + chunk.length]).hexdigest()
+            offset += chunk.length
+        assert all(c.length >= MIN_CHUNK_SIZE for c in chunks[:-1])
+
+    def test_uniform_content_cut_at_max(self):
+        chunks = chunk_bytes(b"\0" * (3 * MAX_CHUNK_SIZE))
+        assert [c.length for c in chunks] == [MAX_CHUNK_SIZE] * 3
+
+    def test_local_edit_changes_few_chunks(self):
+        """Une insertion ne modifie que les morceaux qui l'entourent."""
+        data = _data(2 * 1024 * 1024)
+        edited = data[:1_000_000] + b"annotation" + data[1_000_000:]
+        before = {c.chunk_hash for c in chunk_bytes(data)}
+        after = [c.chunk_hash for c in chunk_bytes(edited)]
+        new = [h for h in after if h not in before]
+        assert 1 <= len(new) <= 2
+
+    def test_gear_table_is_fixed(self):
+        """Le client doit pouvoir reproduire la table."""
+        assert chunking.GEAR[0] == int.from_bytes(hashlib.sha256(b"\0").digest()[:8], "little")
+        assert len(set(chunking.GEAR)) == 256
+
+
+class TestChunkFile:
+    def test_same_chunks_as_in_memory(self, tmp_path):
+        data = _data(3 * 1024 * 1024 + 123, seed=7)
+        path = tmp_path / "file.bin"
+        path.write_bytes(data)
+        assert chunk_file(path) == chunk_bytes(data)
+
+    def test_empty_file(self, tmp_path):
+        path = tmp_path / "empty.bin"
+        path.write_bytes(b"")
+        assert chunk_file(path) == []
@@ -28,6 +28,31 @@ def mock_user():
 class TestCompareNotes:
     """Tests pour compare_notes()"""
 
+    @pytest.fixture(autouse=True)
+    def journal_head(self):
+        """Tête du journal (version du cache de manifestes) : le journal est testé séparément."""
+        with patch('app.services.compare_sync.get_journal_head', return_value=1) as head:
+            yield head
+
+    @pytest.mark.asyncio
+    async def test_manifest_cached_until_journal_moves(self, mock_db, mock_user, journal_head):
+        """Le manifeste est rechargé seulement quand la tête du journal change"""
+        server_note = MagicMock()
+        server_note.path = "server.md"
+        server_note.content_hash = "hash1"
+        server_note.modified_at = datetime.utcnow()
+        server_note.is_deleted = False
+
+        with patch('app.services.compare_sync.get_server_notes', return_value=[server_note]) as load:
+            await compare_notes(mock_db, mock_user, [])
+            result = await compare_notes(mock_db, mock_user, [])
+            assert load.call_count == 1
+            assert result.summary.to_pull == 1
+
+            journal_head.return_value = 2
+            await compare_notes(mock_db, mock_user, [])
+            assert load.call_count == 2
+
     @pytest.mark.asyncio
     async def test_compare_empty_both(self, mock_db, mock_user):
         """Client et serveur vides"""
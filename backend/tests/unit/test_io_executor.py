@@ -0,0 +1,76 @@
+"""
+Tests unitaires de l'exécuteur d'I/O du stockage.
+"""
+import threading
+import time
+import pytest
+
+from app.core.io_executor import IOExecutor
+
+
+class TestIOExecutor:
+
+    @pytest.mark.asyncio
+    async def test_runs_job_in_pool_thread(self):
+        executor = IOExecutor(max_workers=2)
+        try:
+            name = await executor.run(lambda: threading.current_thread().name)
+            assert name.startswith("storage-io")
+        finally:
+            executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_stats_count_jobs_and_errors(self):
+        executor = IOExecutor(max_workers=1)
+
+        def fail():
+            raise OSError("disque")
+
+        try:
+            assert await executor.run(pow, 2, 10) == 1024
+            with pytest.raises(OSError):
+                await executor.run(fail)
+        finally:
+            executor.shutdown()
+
+        stats = executor.stats()
+        assert stats["completed"] == 2
+        assert stats["errors"] == 1
+        assert stats["queue_depth"] == 0
+        assert stats["running"] == 0
+        assert stats["run_ms_max"] >= 0.0
+
+    @pytest.mark.asyncio
+    async def test_pool_recreated_after_shutdown(self):
+        executor = IOExecutor(max_workers=1)
+        await executor.run(int)
+        executor.shutdown()
+        assert await executor.run(int, "7") == 7
+        executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_gather_bounds_concurrency_and_keeps_order(self):
+        executor = IOExecutor(max_workers=8)
+        lock = threading.Lock()
+        active = [0, 0]  # en cours, maximum observé
+
+        def job(i):
+            with lock:
+                active[0] += 1
+                active[1] = max(active[1], active[0])
+            time.sleep(0.01)
+            with lock:
+                active[0] -= 1
+            if i == 3:
+                raise OSError("disque")
+            return i * 2
+
+        try:
+            results = await executor.gather((executor.run(job, i) for i in range(10)), limit=2)
+        finally:
+            executor.shutdown()
+
+        assert results[:3] == [0, 2, 4]
+        assert isinstance(results[3], OSError)
+        assert results[4:] == [8, 10, 12, 14, 16, 18]
+        assert active[1] <= 2
@@ -0,0 +1,88 @@
+"""
+Tests unitaires de la lecture incrémentale des corps JSON de push (core/json_stream.py).
+"""
+import json
+
+import pytest
+
+from app.core.json_stream import iter_json_array_items
+from app.core.storage import ContentTooLargeError
+
+
+NOTES = [
+    {"path": f'dossier "{i}"/[note]{{x}}.md', "content": "ligne\\n" * i + "fin \"}]", "tags": [1, {"a": []}]}
+    for i in range(20)
+]
+BODY = json.dumps({"meta": {"notes": [0]}, "label": "notes", "notes": NOTES, "after": [1]}).encode("utf-8")
+
+
+async def _blocks(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+async def _items(data: bytes, size: int = 7, max_item: int = 10**9, max_total: int = 10**9):
+    return [
+        json.loads(raw)
+        async for raw in iter_json_array_items(_blocks(data, size), "notes", max_item, max_total)
+    ]
+
+
+class TestIterJsonArrayItems:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("size", [1, 5, 64, 1 << 20])
+    async def test_items_independent_of_block_size(self, size):
+        assert await _items(BODY, size) == NOTES
+
+    @pytest.mark.asyncio
+    async def test_pretty_printed_body(self):
+        body = json.dumps({"notes": NOTES}, indent=2, ensure_ascii=False).encode("utf-8")
+        assert await _items(body) == NOTES
+
+    @pytest.mark.asyncio
+    async def test_empty_array(self):
+        assert await _items(b'{"notes": []}') == []
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("body", [
+        b'{"notes": [1]}',
+        b'{"notes": [{}]',
+        b'[]',
+        b'{"autre": []}',
+        b'{"notes": []} reste',
+        b'',
+    ])
+    async def test_invalid_bodies(self, body):
+        with pytest.raises(ValueError):
+            await _items(body)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("size", [7, 1 << 20])
+    async def test_item_limit(self, size):
+        # 1 Mo : chaque élément est ouvert et fermé dans le même bloc
+        with pytest.raises(ContentTooLargeError):
+            await _items(BODY, size, max_item=100)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("size", [7, 1 << 20])
+    async def test_items_before_oversized_one_returned(self, size):
+        body = json.dumps({"notes": [{"a": 1}, {"b": "x" * 200}]}).encode("utf-8")
+        received = []
+        with pytest.raises(ContentTooLargeError):
+            async for raw in iter_json_array_items(_blocks(body, size), "notes", 100, 10**9):
+                received.append(json.loads(raw))
+        assert received == [{"a": 1}]
+
+    @pytest.mark.asyncio
+    async def test_total_limit_checked_while_receiving(self):
+        received = []
+
+        async def blocks():
+            for i in range(0, len(BODY), 100):
+                received.append(i)
+                yield BODY[i:i + 100]
+
+        with pytest.raises(ContentTooLargeError):
+            async for _ in iter_json_array_items(blocks(), "notes", 10**9, 500):
+                pass
+        assert len(received) == 6  # Arrêt au premier bloc qui dépasse
@@ -0,0 +1,62 @@
+"""
+Tests unitaires du cache LRU des manifestes.
+"""
+from app.services.manifest_cache import ManifestCache, UserManifest, NoteState
+
+
+def make_manifest(version: int, note_count: int) -> UserManifest:
+    manifest = UserManifest(version)
+    manifest.notes = [NoteState(f"n{i}.md", "h", None, False) for i in range(note_count)]
+    manifest.attachments = []
+    return manifest
+
+
+class TestManifestCache:
+
+    def test_hit_requires_same_version(self):
+        cache = ManifestCache(max_users=4, max_entries=100)
+        manifest = make_manifest(5, 2)
+        cache.put(1, manifest)
+
+        assert cache.get(1, 5) is manifest
+        assert cache.get(1, 6) is None
+        assert cache.get(2, 5) is None
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    def test_evicts_least_recently_used_user(self):
+        cache = ManifestCache(max_users=2, max_entries=100)
+        cache.put(1, make_manifest(1, 1))
+        cache.put(2, make_manifest(1, 1))
+        cache.get(1, 1)  # 1 devient le plus récent
+        cache.put(3, make_manifest(1, 1))
+
+        assert cache.get(2, 1) is None
+        assert cache.get(1, 1) is not None
+        assert cache.evictions == 1
+
+    def test_entry_budget_bounds_total_size(self):
+        cache = ManifestCache(max_users=10, max_entries=5)
+        cache.put(1, make_manifest(1, 3))
+        cache.put(2, make_manifest(1, 3))
+
+        assert cache.stats()["users"] == 1
+        assert cache.stats()["entries"] == 3
+        assert cache.get(2, 1) is not None
+
+    def test_oversized_manifest_not_cached(self):
+        cache = ManifestCache(max_users=10, max_entries=5)
+        cache.put(1, make_manifest(1, 6))
+
+        assert cache.get(1, 1) is None
+        assert cache.stats()["entries"] == 0
+
+    def test_put_again_recounts_entries(self):
+        cache = ManifestCache(max_users=10, max_entries=100)
+        manifest = UserManifest(1)
+        manifest.notes = [NoteState("a.md", "h", None, False)]
+        cache.put(1, manifest)
+        manifest.attachments = []
+        manifest.notes.append(NoteState("b.md", "h", None, False))
+        cache.put(1, manifest)
+
+        assert cache.stats()["entries"] == 2
@@ -0,0 +1,78 @@
+"""
+Tests unitaires des patchs de notes par lignes (services/note_delta.py).
+"""
+import pytest
+
+from app.services.note_delta import apply_line_patch, make_line_patch, patch_size, split_lines
+
+
+JOURNAL = "# Journal\n\n- lundi\n- mardi\n"
+
+
+class TestSplitLines:
+    def test_keeps_line_endings(self):
+        assert split_lines("a\nb\n") == ["a\n", "b\n"]
+
+    def test_last_line_without_newline(self):
+        assert split_lines("a\r\nb") == ["a\r\n", "b"]
+
+    def test_empty(self):
+        assert split_lines("") == []
+
+
+class TestApplyLinePatch:
+    def test_append_line(self):
+        assert apply_line_patch(JOURNAL, [("=", 4), ("+", "- mercredi\n")]) == JOURNAL + "- mercredi\n"
+
+    def test_replace_and_delete(self):
+        ops = [("+", "# Semaine\n"), ("-", 1), ("=", 1), ("-", 1), ("=", 1)]
+        assert apply_line_patch(JOURNAL, ops) == "# Semaine\n\n- mardi\n"
+
+    def test_empty_base(self):
+        assert apply_line_patch("", [("+", "nouveau")]) == "nouveau"
+
+    @pytest.mark.parametrize("ops", [
+        [("=", 3)],                 # base non entièrement couverte
+        [("=", 5)],                 # au-delà de la fin
+        [("=", 4), ("+", 3)],       # insertion sans texte
+        [("=", -1), ("=", 5)],      # nombre négatif
+        [("*", 4)],                 # opération inconnue
+    ])
+    def test_invalid_patch(self, ops):
+        with pytest.raises(ValueError):
+            apply_line_patch(JOURNAL, ops)
+
+
+class TestMakeLinePatch:
+    @pytest.mark.parametrize("target", [
+        JOURNAL + "- mercredi\n",
+        "# Semaine\n\n- mardi\n",
+        "",
+        "tout nouveau",
+        JOURNAL,
+    ])
+    def test_roundtrip(self, target):
+        assert apply_line_patch(JOURNAL, make_line_patch(JOURNAL, target)) == target
+
+    def test_append_to_large_note_is_small(self):
+        base = "".join(f"- entrée {i}\n" for i in range(5000))
+        ops = make_line_patch(base, base + "- fin\n")
+        assert ops == [("=", 5000), ("+", "- fin\n")]
+        assert patch_size(ops) < 50
+
+    def test_repeated_lines_do_not_stall(self):
+        base = "- même ligne\n" * 20000
+        target = base[:len(base) // 2] + "- milieu\n" + base[len(base) // 2:]
+        assert apply_line_patch(base, make_line_patch(base, target, max_line_pairs=1000)) == target
+
+    def test_large_change_replaced_as_block(self):
+        base = "# Titre\n" + "".join(f"- a{i}\n" for i in range(100)) + "# Fin\n"
+        target = "# Titre\n" + "".join(f"- a{i}\n" if i % 2 else f"- b{i}\n" for i in range(100)) + "# Fin\n"
+        ops = make_line_patch(base, target, max_line_pairs=1000)
+        assert ops[0] == ("=", 1)
+        # "- a99" et "# Fin" sont communes en fin de note
+        assert ops[1] == ("-", 99)
+        assert ops[-1] == ("=", 2)
+        assert apply_line_patch(base, ops) == target
+        # Sous la borne : comparaison ligne à ligne
+        assert len(make_line_patch(base, target)) > 4
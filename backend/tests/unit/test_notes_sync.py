@@ -6,6 +6,7 @@ from datetime import datetime, timezone
 from unittest.mock import AsyncMock, MagicMock, patch
 
 from app.services.notes_sync import push_notes, pull_notes, process_sync
+from app.services.journal import encode_cursor, decode_cursor
 from app.schemas import NoteContent, NoteMetadata, SyncRequest
 
 
@@ -31,10 +32,30 @@ def mock_user():
 class TestPushNotes:
     """Tests pour push_notes()"""
 
+    @pytest.fixture(autouse=True)
+    def no_side_tables(self):
+        """Arbre de hachage, historique et journal sont testés séparément."""
+        with patch('app.services.notes_sync.update_vault_tree_batch'), \
+             patch('app.services.notes_sync.get_delta_runs', return_value={}), \
+             patch('app.services.notes_sync.prepare_note_version'), \
+             patch('app.services.notes_sync.record_note_versions'), \
+             patch('app.services.notes_sync.forget_note_versions'), \
+             patch('app.services.notes_sync.record_changes'):
+            yield
+
+    @pytest.fixture
+    def mock_upsert(self):
+        with patch('app.services.notes_sync.upsert_notes') as upsert:
+            yield upsert
+
+    @staticmethod
+    def upserted(mock_upsert):
+        return [row for call in mock_upsert.call_args_list for row in call.args[1]]
+
     @pytest.mark.asyncio
-    async def test_push_new_note(self, mock_db, mock_user):
+    async def test_push_new_note(self, mock_db, mock_user, mock_upsert):
         """Nouvelle note créée avec succès"""
-        with patch('app.services.notes_sync.get_note_by_path', return_value=None), \
+        with patch('app.services.notes_sync.get_notes_by_paths', return_value=[]), \
              patch('app.services.notes_sync.storage.save_note', return_value='hash123'):
 
             notes = [NoteContent(
@@ -49,16 +70,16 @@ class TestPushNotes:
 
             assert success == ["test.md"]
             assert failed == []
-            mock_db.add.assert_called_once()
+            rows = self.upserted(mock_upsert)
+            assert [(r["path"], r["content_hash"], r["is_deleted"]) for r in rows] == [("test.md", "hash123", False)]
             mock_db.commit.assert_called_once()
 
     @pytest.mark.asyncio
-    async def test_push_update_existing_note(self, mock_db, mock_user):
+    async def test_push_update_existing_note(self, mock_db, mock_user, mock_upsert):
         """Note existante mise à jour"""
-        existing_note = MagicMock()
-        existing_note.content_hash = "old_hash"
+        existing_note = MagicMock(path="test.md", content_hash="old_hash", is_deleted=False)
 
-        with patch('app.services.notes_sync.get_note_by_path', return_value=existing_note), \
+        with patch('app.services.notes_sync.get_notes_by_paths', return_value=[existing_note]), \
              patch('app.services.notes_sync.storage.save_note', return_value='new_hash'):
 
             notes = [NoteContent(
@@ -73,17 +94,15 @@ class TestPushNotes:
 
             assert success == ["test.md"]
             assert failed == []
-            assert existing_note.content_hash == "new_hash"
-            mock_db.add.assert_not_called()  # Pas d'ajout, juste update
+            assert self.upserted(mock_upsert)[0]["content_hash"] == "new_hash"
 
     @pytest.mark.asyncio
-    async def test_push_deleted_note_existing(self, mock_db, mock_user):
-        """Suppression d'une note existante"""
-        existing_note = MagicMock()
-        existing_note.is_deleted = False
+    async def test_push_deleted_note(self, mock_db, mock_user, mock_upsert):
+        """Suppression d'une note : fichier supprimé, ligne marquée supprimée"""
+        existing_note = MagicMock(path="test.md", content_hash="old_hash", is_deleted=False)
 
-        with patch('app.services.notes_sync.get_note_by_path', return_value=existing_note), \
-             patch('app.services.notes_sync.storage.delete_note', return_value=None):
+        with patch('app.services.notes_sync.get_notes_by_paths', return_value=[existing_note]), \
+             patch('app.services.notes_sync.storage.delete_note', return_value=None) as delete_note:
 
             notes = [NoteContent(
                 path="test.md",
@@ -96,32 +115,16 @@ class TestPushNotes:
             success, failed = await push_notes(mock_db, mock_user, notes)
 
             assert success == ["test.md"]
-            assert existing_note.is_deleted == True
-            assert existing_note.content_hash == ""
+            delete_note.assert_called_once_with(1, "test.md")
+            row = self.upserted(mock_upsert)[0]
+            assert row["is_deleted"] is True
+            assert row["content_hash"] == ""
 
     @pytest.mark.asyncio
-    async def test_push_deleted_note_not_existing(self, mock_db, mock_user):
-        """Suppression d'une note qui n'existe pas encore"""
-        with patch('app.services.notes_sync.get_note_by_path', return_value=None), \
-             patch('app.services.notes_sync.storage.delete_note', return_value=None):
-
-            notes = [NoteContent(
-                path="test.md",
-                content="",
-                content_hash="",
-                modified_at=datetime.utcnow(),
-                is_deleted=True
-            )]
-
-            success, failed = await push_notes(mock_db, mock_user, notes)
-
-            assert success == ["test.md"]
-            mock_db.add.assert_called_once()  # Crée une entrée pour tracer
-
-    @pytest.mark.asyncio
-    async def test_push_invalid_path_value_error(self, mock_db, mock_user):
-        """Path invalide lève ValueError → failed"""
-        with patch('app.services.notes_sync.get_note_by_path', side_effect=ValueError("Invalid path")):
+    async def test_push_invalid_path_value_error(self, mock_db, mock_user, mock_upsert):
+        """Path invalide → failed, sans écriture"""
+        with patch('app.services.notes_sync.get_notes_by_paths', return_value=[]), \
+             patch('app.services.notes_sync.storage.save_note') as save_note:
 
             notes = [NoteContent(
                 path="../../../etc/passwd",
@@ -135,40 +138,35 @@ class TestPushNotes:
 
             assert success == []
             assert failed == ["../../../etc/passwd"]
-            mock_db.rollback.assert_called_once()
+            save_note.assert_not_called()
+            mock_upsert.assert_not_called()
 
     @pytest.mark.asyncio
-    async def test_push_exception_rollback(self, mock_db, mock_user):
-        """Exception → rollback et note dans failed"""
-        with patch('app.services.notes_sync.get_note_by_path', side_effect=Exception("DB error")):
+    async def test_push_exception_rollback(self, mock_db, mock_user, mock_upsert):
+        """Exception de la base → rollback et tout le lot dans failed"""
+        with patch('app.services.notes_sync.get_notes_by_paths', side_effect=Exception("DB error")):
 
-            notes = [NoteContent(
-                path="test.md",
-                content="# Test",
-                content_hash="hash",
-                modified_at=datetime.utcnow(),
-                is_deleted=False
-            )]
+            notes = [
+                NoteContent(path="a.md", content="# A", content_hash="h1", modified_at=datetime.utcnow(), is_deleted=False),
+                NoteContent(path="b.md", content="# B", content_hash="h2", modified_at=datetime.utcnow(), is_deleted=False),
+            ]
 
             success, failed = await push_notes(mock_db, mock_user, notes)
 
             assert success == []
-            assert failed == ["test.md"]
+            assert failed == ["a.md", "b.md"]
             mock_db.rollback.assert_called_once()
 
     @pytest.mark.asyncio
-    async def test_push_multiple_notes_partial_failure(self, mock_db, mock_user):
-        """Plusieurs notes, échec partiel"""
-        call_count = [0]
+    async def test_push_multiple_notes_partial_failure(self, mock_db, mock_user, mock_upsert):
+        """Plusieurs notes, échec d'écriture d'une seule"""
+        async def mock_save(user_id, path, content):
+            if path == "bad.md":
+                raise OSError("disk error")
+            return "hash"
 
-        async def mock_get_note(*args):
-            call_count[0] += 1
-            if call_count[0] == 2:
-                raise ValueError("Bad path")
-            return None
-
-        with patch('app.services.notes_sync.get_note_by_path', side_effect=mock_get_note), \
-             patch('app.services.notes_sync.storage.save_note', return_value='hash'):
+        with patch('app.services.notes_sync.get_notes_by_paths', return_value=[]), \
+             patch('app.services.notes_sync.storage.save_note', side_effect=mock_save):
 
             notes = [
                 NoteContent(path="good1.md", content="ok", content_hash="h1", modified_at=datetime.utcnow(), is_deleted=False),
@@ -178,23 +176,79 @@ class TestPushNotes:
 
             success, failed = await push_notes(mock_db, mock_user, notes)
 
-            assert "good1.md" in success
-            assert "good2.md" in success
-            assert "bad.md" in failed
+            assert success == ["good1.md", "good2.md"]
+            assert failed == ["bad.md"]
+            assert [r["path"] for r in self.upserted(mock_upsert)] == ["good1.md", "good2.md"]
+            mock_db.commit.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_push_batches_commits(self, mock_db, mock_user, mock_upsert):
+        """Un commit par lot ; un chemin répété ouvre un nouveau lot"""
+        with patch('app.services.notes_sync.get_notes_by_paths', return_value=[]) as get_notes, \
+             patch('app.services.notes_sync.storage.save_note', return_value='hash'), \
+             patch('app.services.notes_sync.PUSH_BATCH_SIZE', 2):
+
+            notes = [
+                NoteContent(path=path, content="ok", content_hash="h", modified_at=datetime.utcnow(), is_deleted=False)
+                for path in ("a.md", "b.md", "c.md", "c.md")
+            ]
+
+            success, failed = await push_notes(mock_db, mock_user, notes)
+
+            assert success == ["a.md", "b.md", "c.md", "c.md"]
+            assert mock_db.commit.call_count == 3
+            assert [call.args[2] for call in get_notes.call_args_list] == [["a.md", "b.md"], ["c.md"], ["c.md"]]
+
+
+    @pytest.mark.asyncio
+    async def test_push_side_tables_updated_once_per_batch(self, mock_db, mock_user, mock_upsert):
+        """Arbre et historique mis à jour une fois par lot, versions des seules notes écrites"""
+        existing = [MagicMock(path=path, content_hash=f"old_{path}", is_deleted=False) for path in ("a.md", "b.md")]
+
+        async def mock_save(user_id, path, content):
+            if path == "b.md":
+                raise OSError("disque plein")
+            return f"new_{path}"
+
+        async def mock_prepare(user_id, path, content_hash, new_content, delta_run=0):
+            return f"version_{path}"
+
+        with patch('app.services.notes_sync.get_notes_by_paths', return_value=existing), \
+             patch('app.services.notes_sync.storage.save_note', side_effect=mock_save), \
+             patch('app.services.notes_sync.prepare_note_version', side_effect=mock_prepare), \
+             patch('app.services.notes_sync.update_vault_tree_batch') as update_tree, \
+             patch('app.services.notes_sync.record_note_versions') as record_versions:
+
+            notes = [
+                NoteContent(path=path, content="nouveau", content_hash="h", modified_at=datetime.utcnow(), is_deleted=False)
+                for path in ("a.md", "b.md", "c.md")
+            ]
+
+            success, failed = await push_notes(mock_db, mock_user, notes)
+
+            assert success == ["a.md", "c.md"]
+            assert failed == ["b.md"]
+            update_tree.assert_called_once()
+            assert [change[0] for change in update_tree.call_args.args[3]] == ["a.md", "c.md"]
+            record_versions.assert_called_once_with(mock_db, 1, ["version_a.md"])
 
 
 class TestPullNotes:
     """Tests pour pull_notes()"""
 
+    @staticmethod
+    def note_record(path, is_deleted=False):
+        note = MagicMock()
+        note.path = path
+        note.is_deleted = is_deleted
+        note.content_hash = "hash123"
+        note.modified_at = datetime.utcnow()
+        return note
+
     @pytest.mark.asyncio
     async def test_pull_existing_note(self, mock_db, mock_user):
         """Pull d'une note existante"""
-        note_record = MagicMock()
-        note_record.is_deleted = False
-        note_record.content_hash = "hash123"
-        note_record.modified_at = datetime.utcnow()
-
-        with patch('app.services.notes_sync.get_note_by_path', return_value=note_record), \
+        with patch('app.services.notes_sync.get_notes_by_paths', return_value=[self.note_record("test.md")]), \
              patch('app.services.notes_sync.storage.read_note', return_value="# Content"):
 
             result = await pull_notes(mock_db, mock_user, ["test.md"])
@@ -207,11 +261,8 @@ class TestPullNotes:
     @pytest.mark.asyncio
     async def test_pull_deleted_note(self, mock_db, mock_user):
         """Pull d'une note supprimée → contenu vide, is_deleted=True"""
-        note_record = MagicMock()
-        note_record.is_deleted = True
-        note_record.modified_at = datetime.utcnow()
-
-        with patch('app.services.notes_sync.get_note_by_path', return_value=note_record):
+        with patch('app.services.notes_sync.get_notes_by_paths', return_value=[self.note_record("deleted.md", True)]), \
+             patch('app.services.notes_sync.storage.read_note') as read_note:
 
             result = await pull_notes(mock_db, mock_user, ["deleted.md"])
 
@@ -219,11 +270,12 @@ class TestPullNotes:
             assert result[0].path == "deleted.md"
             assert result[0].content == ""
             assert result[0].is_deleted == True
+            read_note.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_pull_nonexistent_note(self, mock_db, mock_user):
         """Pull d'une note inexistante → pas dans le résultat"""
-        with patch('app.services.notes_sync.get_note_by_path', return_value=None):
+        with patch('app.services.notes_sync.get_notes_by_paths', return_value=[]):
 
             result = await pull_notes(mock_db, mock_user, ["nonexistent.md"])
 
@@ -232,7 +284,8 @@ class TestPullNotes:
     @pytest.mark.asyncio
     async def test_pull_invalid_path(self, mock_db, mock_user):
         """Pull avec path invalide → ignoré"""
-        with patch('app.services.notes_sync.get_note_by_path', side_effect=ValueError("Invalid")):
+        with patch('app.services.notes_sync.get_notes_by_paths', return_value=[self.note_record("../bad.md")]), \
+             patch('app.services.notes_sync.storage.read_note', side_effect=ValueError("Invalid")):
 
             result = await pull_notes(mock_db, mock_user, ["../bad.md"])
 
@@ -240,28 +293,32 @@ class TestPullNotes:
 
     @pytest.mark.asyncio
     async def test_pull_multiple_notes(self, mock_db, mock_user):
-        """Pull de plusieurs notes"""
-        def mock_get_note(db, user_id, path):
-            if path == "exists.md":
-                note = MagicMock()
-                note.is_deleted = False
-                note.content_hash = "hash"
-                note.modified_at = datetime.utcnow()
-                return note
-            return None
+        """Pull de plusieurs notes : une seule requête, résultats dans l'ordre demandé"""
+        records = [self.note_record("b.md"), self.note_record("a.md")]
 
-        with patch('app.services.notes_sync.get_note_by_path', side_effect=mock_get_note), \
-             patch('app.services.notes_sync.storage.read_note', return_value="content"):
+        async def mock_read(user_id, path, max_bytes=None):
+            return f"content {path}"
 
-            result = await pull_notes(mock_db, mock_user, ["exists.md", "notexists.md"])
+        with patch('app.services.notes_sync.get_notes_by_paths', return_value=records) as get_notes, \
+             patch('app.services.notes_sync.storage.read_note', side_effect=mock_read):
 
-            assert len(result) == 1
-            assert result[0].path == "exists.md"
+            result = await pull_notes(mock_db, mock_user, ["a.md", "notexists.md", "b.md"])
+
+            get_notes.assert_called_once()
+            assert [(note.path, note.content) for note in result] == [
+                ("a.md", "content a.md"), ("b.md", "content b.md")
+            ]
 
 
 class TestProcessSync:
     """Tests pour process_sync()"""
 
+    @pytest.fixture(autouse=True)
+    def empty_journal(self):
+        """Journal vide : tête à 0."""
+        with patch('app.services.notes_sync.get_journal_head', return_value=0):
+            yield
+
     @pytest.mark.asyncio
     async def test_sync_client_has_new_note(self, mock_db, mock_user):
         """Client a une note que le serveur n'a pas → to_push"""
@@ -434,3 +491,83 @@ class TestProcessSync:
 
             assert len(result.notes_to_pull) == 1
             assert result.notes_to_pull[0].is_deleted == True
+
+
+class TestProcessSyncIncremental:
+    """Tests pour process_sync() avec un curseur (sync incrémental)"""
+
+    @pytest.mark.asyncio
+    async def test_valid_cursor_loads_only_changed_paths(self, mock_db, mock_user):
+        """Curseur valide → seuls les chemins du journal et du client sont chargés"""
+        changed = MagicMock()
+        changed.path = "changed.md"
+        changed.content_hash = "hash"
+        changed.modified_at = datetime(2024, 1, 1, 10, 0, 0)
+        changed.is_deleted = False
+
+        with patch('app.services.notes_sync.get_journal_head', return_value=12), \
+             patch('app.services.notes_sync.get_changes_since',
+                   return_value=({"changed.md"}, set())), \
+             patch('app.services.notes_sync.get_notes_by_paths',
+                   return_value=[changed]) as by_paths, \
+             patch('app.services.notes_sync.get_attachments_by_paths', return_value=[]), \
+             patch('app.services.notes_sync.get_server_notes') as full_scan:
+
+            request = SyncRequest(cursor=encode_cursor(1, 10), notes=[], attachments=[])
+            result = await process_sync(mock_db, mock_user, request)
+
+            full_scan.assert_not_called()
+            assert by_paths.call_args.args[2] == {"changed.md"}
+            assert result.incremental is True
+            assert [n.path for n in result.notes_to_pull] == ["changed.md"]
+            assert decode_cursor(result.cursor, 1) == 12
+
+    @pytest.mark.asyncio
+    async def test_incremental_propagates_deletions(self, mock_db, mock_user):
+        """En incrémental, une suppression du journal est propagée même si le client ne l'a pas envoyée"""
+        deleted = MagicMock()
+        deleted.path = "gone.md"
+        deleted.content_hash = ""
+        deleted.modified_at = datetime(2024, 1, 1, 10, 0, 0)
+        deleted.is_deleted = True
+
+        with patch('app.services.notes_sync.get_journal_head', return_value=5), \
+             patch('app.services.notes_sync.get_changes_since',
+                   return_value=({"gone.md"}, set())), \
+             patch('app.services.notes_sync.get_notes_by_paths', return_value=[deleted]), \
+             patch('app.services.notes_sync.get_attachments_by_paths', return_value=[]):
+
+            request = SyncRequest(cursor=encode_cursor(1, 3), notes=[], attachments=[])
+            result = await process_sync(mock_db, mock_user, request)
+
+            assert len(result.notes_to_pull) == 1
+            assert result.notes_to_pull[0].is_deleted is True
+
+    @pytest.mark.asyncio
+    async def test_expired_cursor_falls_back_to_full_sync(self, mock_db, mock_user):
+        """Curseur compacté → réconciliation complète"""
+        with patch('app.services.notes_sync.get_journal_head', return_value=50), \
+             patch('app.services.notes_sync.get_changes_since', return_value=None), \
+             patch('app.services.notes_sync.get_server_notes', return_value=[]) as full_scan, \
+             patch('app.services.notes_sync.get_server_attachments', return_value=[]):
+
+            request = SyncRequest(cursor=encode_cursor(1, 3), notes=[], attachments=[])
+            result = await process_sync(mock_db, mock_user, request)
+
+            full_scan.assert_called()
+            assert result.incremental is False
+            assert decode_cursor(result.cursor, 1) == 50
+
+    @pytest.mark.asyncio
+    async def test_foreign_cursor_ignored(self, mock_db, mock_user):
+        """Curseur d'un autre utilisateur → réconciliation complète"""
+        with patch('app.services.notes_sync.get_journal_head', return_value=50), \
+             patch('app.services.notes_sync.get_changes_since') as changes_since, \
+             patch('app.services.notes_sync.get_server_notes', return_value=[]), \
+             patch('app.services.notes_sync.get_server_attachments', return_value=[]):
+
+            request = SyncRequest(cursor=encode_cursor(2, 3), notes=[], attachments=[])
+            result = await process_sync(mock_db, mock_user, request)
+
+            changes_since.assert_not_called()
+            assert result.incremental is False
@@ -0,0 +1,67 @@
+"""
+Tests unitaires des packs de notes (segments + index).
+"""
+from unittest.mock import patch
+
+from app.core.config import settings
+from app.core.packs import PackStore, RECORD_HEADER
+
+
+class TestPackStore:
+
+    def test_put_get_and_reload_from_segments(self, tmp_path):
+        store = PackStore(tmp_path)
+        store.put("a.md", b"# A", 3)
+        store.put("b.md", b"# B", 3)
+        store.put("a.md", b"# A2", 4)
+        assert store.get("a.md") == b"# A2"
+
+        reloaded = PackStore(tmp_path)
+        assert reloaded.get("a.md") == b"# A2"
+        assert reloaded.get("b.md") == b"# B"
+        assert reloaded.lookup("a.md").size == 4
+
+    def test_delete_and_move_survive_reload(self, tmp_path):
+        store = PackStore(tmp_path)
+        store.put("a.md", b"# A", 3)
+        store.put("b.md", b"# B", 3)
+        assert store.delete("a.md") is True
+        assert store.delete("a.md") is False
+        assert store.move("b.md", "dossier/b.md") is True
+
+        reloaded = PackStore(tmp_path)
+        assert reloaded.get("a.md") is None
+        assert reloaded.get("b.md") is None
+        assert reloaded.get("dossier/b.md") == b"# B"
+
+    def test_truncated_tail_is_discarded(self, tmp_path):
+        store = PackStore(tmp_path)
+        store.put("a.md", b"# A", 3)
+        store.put("b.md", b"# B", 3)
+        segment = next(tmp_path.iterdir())
+        segment.write_bytes(segment.read_bytes()[:-2])
+
+        reloaded = PackStore(tmp_path)
+        assert reloaded.get("a.md") == b"# A"
+        assert reloaded.get("b.md") is None
+        reloaded.put("c.md", b"# C", 3)
+        assert PackStore(tmp_path).get("c.md") == b"# C"
+
+    def test_compaction_drops_superseded_records(self, tmp_path):
+        record_size = RECORD_HEADER.size + len("n0.md") + 100
+        with patch.object(settings, "pack_segment_max_bytes", record_size * 4):
+            store = PackStore(tmp_path)
+            for version in range(3):
+                for i in range(4):
+                    store.put(f"n{i}.md", bytes([version]) * 100, 100)
+            store.delete("n3.md")
+
+            assert len(list(tmp_path.iterdir())) == 4
+            reclaimed = store.compact()
+            assert reclaimed > 0
+            assert len(list(tmp_path.iterdir())) < 4
+
+        reloaded = PackStore(tmp_path)
+        for i in range(3):
+            assert reloaded.get(f"n{i}.md") == bytes([2]) * 100
+        assert reloaded.get("n3.md") is None
@@ -0,0 +1,186 @@
+"""
+Tests unitaires pour services/reconcile.py
+"""
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.services.reconcile import (
+    PUSH, PULL, CONFLICT, IDENTICAL, DELETED_ON_SERVER,
+    NOT_ON_SERVER, NOT_ON_CLIENT, CLIENT_NEWER, SERVER_NEWER, SERVER_DELETED,
+    CONTENT_DIFFERS, MOVE,
+    merge_join, plan_notes, plan_attachments, plan_compare, detect_moves, sort_by_path
+)
+
+
+T1 = datetime(2024, 1, 1, 10, 0, 0)
+T2 = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def entry(path, content_hash="h", modified_at=T1, is_deleted=False):
+    return SimpleNamespace(path=path, content_hash=content_hash,
+                           modified_at=modified_at, is_deleted=is_deleted)
+
+
+class TestMergeJoin:
+    """Tests pour merge_join()"""
+
+    def test_interleaved_paths(self):
+        server = [entry("a"), entry("c")]
+        client = [entry("b"), entry("c")]
+
+        pairs = [(p, c is not None, s is not None) for p, c, s in merge_join(server, client)]
+
+        assert pairs == [("a", False, True), ("b", True, False), ("c", True, True)]
+
+    def test_empty_sides(self):
+        assert list(merge_join([], [])) == []
+        assert [p for p, _, _ in merge_join([entry("a")], [])] == ["a"]
+        assert [p for p, _, _ in merge_join([], [entry("a")])] == ["a"]
+
+    def test_duplicate_client_path_last_wins(self):
+        client = sort_by_path([entry("a", "first"), entry("a", "last")])
+
+        pairs = list(merge_join([], client))
+
+        assert len(pairs) == 1
+        assert pairs[0][1].content_hash == "last"
+
+
+class TestPlanNotes:
+    """Tests pour plan_notes()"""
+
+    def test_client_only_is_pushed(self):
+        decisions = list(plan_notes([], [entry("a")]))
+        assert [(d.action, d.reason) for d in decisions] == [(PUSH, NOT_ON_SERVER)]
+
+    def test_server_only_is_pulled(self):
+        decisions = list(plan_notes([entry("a")], []))
+        assert [(d.action, d.reason) for d in decisions] == [(PULL, NOT_ON_CLIENT)]
+
+    def test_unknown_server_deletion_skipped_unless_requested(self):
+        server = [entry("a", "", is_deleted=True)]
+        assert list(plan_notes(server, [])) == []
+        assert [d.reason for d in plan_notes(server, [], include_server_deleted=True)] == [SERVER_DELETED]
+
+    def test_identical_emits_nothing(self):
+        assert list(plan_notes([entry("a")], [entry("a")])) == []
+
+    def test_server_newer_filtered_by_since(self):
+        server = [entry("a", "s", T1)]
+        client = [entry("a", "c", datetime(2024, 1, 1, 9, 0, 0))]
+
+        assert list(plan_notes(server, client, since=T2)) == []
+        assert [d.reason for d in plan_notes(server, client, since=None)] == [SERVER_NEWER]
+
+    def test_server_newer_filtered_by_changed_paths(self):
+        server = [entry("a", "s", T2)]
+        client = [entry("a", "c", T1)]
+
+        assert list(plan_notes(server, client, changed_paths=set())) == []
+        assert [d.action for d in plan_notes(server, client, changed_paths={"a"})] == [PULL]
+
+    def test_late_client_deletion_is_conflict(self):
+        server = [entry("a", "s", T2)]
+        client = [entry("a", "", T1, is_deleted=True)]
+
+        assert [d.action for d in plan_notes(server, client)] == [CONFLICT]
+
+
+class TestPlanAttachments:
+    """Tests pour plan_attachments()"""
+
+    def test_different_content_server_wins(self):
+        server = [entry("img.png", "s", T1)]
+        client = [entry("img.png", "c", T2)]
+
+        decisions = list(plan_attachments(server, client))
+
+        assert [(d.action, d.reason) for d in decisions] == [(PULL, CONTENT_DIFFERS)]
+
+
+class TestPlanCompare:
+    """Tests pour plan_compare()"""
+
+    def test_categories(self):
+        server = [
+            entry("deleted", "", T1, is_deleted=True),
+            entry("same", "h"),
+            entry("server-only"),
+            entry("newer", "s", T1),
+        ]
+        client = [entry("same", "h"), entry("deleted"), entry("newer", "c", T2), entry("client-only")]
+
+        decisions = {d.path: (d.action, d.reason)
+                     for d in plan_compare(sort_by_path(server), sort_by_path(client))}
+
+        assert decisions == {
+            "client-only": (PUSH, NOT_ON_SERVER),
+            "deleted": (DELETED_ON_SERVER, SERVER_DELETED),
+            "newer": (PUSH, CLIENT_NEWER),
+            "same": (IDENTICAL, IDENTICAL),
+            "server-only": (PULL, NOT_ON_CLIENT),
+        }
+
+
+class TestDetectMoves:
+    """Tests pour detect_moves()"""
+
+    def test_client_rename_becomes_push_move(self):
+        server = [entry("old/a.md", "h1")]
+        client = sort_by_path([
+            entry("old/a.md", "", T2, is_deleted=True),
+            entry("new/a.md", "h1", T2),
+        ])
+
+        result = list(detect_moves(plan_notes(server, client)))
+
+        assert len(result) == 1
+        move = result[0]
+        assert move.action == MOVE
+        assert move.direction == PUSH
+        assert (move.from_path, move.to_path) == ("old/a.md", "new/a.md")
+
+    def test_server_rename_becomes_pull_move(self):
+        server = [entry("new/a.md", "h1", T2), entry("old/a.md", "", T2, is_deleted=True)]
+        client = [entry("old/a.md", "h1", T1)]
+
+        result = list(detect_moves(plan_notes(server, client)))
+
+        assert [(m.direction, m.from_path, m.to_path) for m in result] == [
+            (PULL, "old/a.md", "new/a.md")
+        ]
+
+    def test_source_hash_used_when_client_omits_old_path(self):
+        server = [entry("new/a.md", "h1", T2), entry("old/a.md", "", T2, is_deleted=True)]
+
+        decisions = plan_notes(server, [], changed_paths={"new/a.md", "old/a.md"},
+                               include_server_deleted=True)
+        result = list(detect_moves(decisions, {"old/a.md": "h1"}))
+
+        assert [(m.action, m.to_path) for m in result] == [(MOVE, "new/a.md")]
+
+    def test_unmatched_candidates_pass_through(self):
+        server = [entry("old.md", "h1")]
+        client = sort_by_path([
+            entry("old.md", "", T2, is_deleted=True),
+            entry("other.md", "h2", T2),
+        ])
+
+        result = list(detect_moves(plan_notes(server, client)))
+
+        assert sorted((d.action, d.path) for d in result) == [(PUSH, "old.md"), (PUSH, "other.md")]
+
+    def test_same_name_preferred_among_equal_hashes(self):
+        server = [entry("a/x.md", "h"), entry("a/y.md", "h")]
+        client = sort_by_path([
+            entry("a/x.md", "", T2, is_deleted=True),
+            entry("a/y.md", "", T2, is_deleted=True),
+            entry("b/x.md", "h", T2),
+            entry("b/y.md", "h", T2),
+        ])
+
+        result = list(detect_moves(plan_notes(server, client)))
+
+        assert sorted((m.from_path, m.to_path) for m in result) == [
+            ("a/x.md", "b/x.md"), ("a/y.md", "b/y.md")
+        ]
@@ -0,0 +1,42 @@
+"""
+Tests unitaires pour services/vault_tree.py
+"""
+from app.services.vault_tree import (
+    DIGEST_MODULUS,
+    split_path,
+    leaf_hash,
+    folder_hash,
+    format_digest,
+)
+
+
+class TestSplitPath:
+    """Tests pour split_path()"""
+
+    def test_root_file(self):
+        assert split_path("note.md") == ("", "note.md")
+
+    def test_nested_file(self):
+        assert split_path("a/b/note.md") == ("a/b", "note.md")
+
+
+class TestHashes:
+    """Tests pour leaf_hash() et folder_hash()"""
+
+    def test_leaf_hash_depends_on_deletion(self):
+        assert leaf_hash("note", "a.md", "h", False) != leaf_hash("note", "a.md", "h", True)
+
+    def test_leaf_hash_depends_on_kind(self):
+        assert leaf_hash("note", "a", "h", False) != leaf_hash("attachment", "a", "h", False)
+
+    def test_empty_folder_contributes_nothing(self):
+        assert folder_hash("dossier", 0) == 0
+
+    def test_sum_is_order_independent(self):
+        a = leaf_hash("note", "a.md", "h1", False)
+        b = leaf_hash("note", "b.md", "h2", False)
+        assert (a + b) % DIGEST_MODULUS == (b + a) % DIGEST_MODULUS
+
+    def test_format_digest_is_64_hex_chars(self):
+        assert format_digest(1) == "0" * 63 + "1"
+        assert len(format_digest(DIGEST_MODULUS - 1)) == 64